@@ -18,11 +18,11 @@ from dash.exceptions import PreventUpdate
 from python_app import analysis
 from python_app.analysis import ROI_LABELS
 from python_app.cache import clear_cache, delete_array, load_array, save_array
+from python_app.frame_server import clear_encoded, frame_url, prefetch_frames, register_frame_routes
 from python_app.processing import (
     base64_to_ndarray,
     compute_tic_dataframe,
     crop_frames,
-    frames_to_data_url,
     frame_to_color,
     load_dicom_from_bytes,
     make_preset_crop,
@@ -33,6 +33,7 @@ from python_app.processing import (
 
 app = Dash(__name__, suppress_callback_exceptions=True)
 server = app.server
+register_frame_routes(server)
 
 MAX_CROP_HISTORY = 10
 DEFAULT_CROP_STYLE = {
@@ -415,17 +416,25 @@ def _roi_summary(roi_store: Optional[Dict[str, str]]) -> str:
     return "Stored ROIs: " + ", ".join(labels)
 
 
-def _build_roi_figure(frame: np.ndarray, roi_store: Optional[Dict[str, str]]) -> go.Figure:
-    if frame.ndim == 3 and frame.shape[2] == 3:
-        color_frame = frame
-    else:
-        color_frame = frame_to_color(frame)
-    fig = go.Figure(data=go.Image(z=color_frame))
+def _build_roi_figure(image_url: str, width: int, height: int, roi_store: Optional[Dict[str, str]]) -> go.Figure:
+    # The frame is a layout image fetched from the frame route, not an inline trace
+    fig = go.Figure()
+    fig.add_layout_image(
+        source=image_url,
+        xref="x",
+        yref="y",
+        x=0,
+        y=0,
+        sizex=width,
+        sizey=height,
+        sizing="stretch",
+        layer="below",
+    )
     fig.update_layout(
         dragmode="drawrect",
         margin=dict(l=20, r=20, t=30, b=20),
-        xaxis=dict(showgrid=False, zeroline=False),
-        yaxis=dict(showgrid=False, zeroline=False, scaleanchor="x", autorange="reversed"),
+        xaxis=dict(showgrid=False, zeroline=False, range=[0, width]),
+        yaxis=dict(showgrid=False, zeroline=False, scaleanchor="x", range=[height, 0]),
         newshape=dict(line_color="#ff595e", fillcolor="rgba(255,89,94,0.18)", line_width=3),
         plot_bgcolor="rgba(0,0,0,0)",
         paper_bgcolor="rgba(0,0,0,0)",
@@ -488,6 +497,7 @@ def load_dicom(contents, filename):
         return no_update, no_update, no_update, f"Failed to load DICOM: {error}"
 
     clear_cache()
+    clear_encoded()
 
     frames_uint8 = video.as_uint8()
     crop_box = [0, 0, frames_uint8.shape[2], frames_uint8.shape[1]]
@@ -536,11 +546,9 @@ def update_crop_background(dicom_store):
         return style
 
     try:
-        frames_display = load_array(dicom_store["display_id"])
-        first_frame = frames_display[0]
-        data_url = frames_to_data_url(first_frame)
+        image_url = frame_url(dicom_store["display_id"], 0, fmt="jpeg")
         style["backgroundImage"] = (
-            f"linear-gradient(rgba(16,24,32,0.55), rgba(16,24,32,0.55)), url({data_url})"
+            f"linear-gradient(rgba(16,24,32,0.55), rgba(16,24,32,0.55)), url({image_url})"
         )
     except Exception:
         style.pop("backgroundImage", None)
@@ -594,6 +602,7 @@ def update_crop_views(dicom_store, crop_store, existing_cropped):
             identifier = existing_cropped.get(key)
             if identifier:
                 delete_array(identifier)
+                clear_encoded(identifier)
 
     cropped_store = {
         "frames_id": save_array(cropped_full.astype(np.float32)),
@@ -672,6 +681,8 @@ def init_flash_slider(cropped_store):
         return 0, 0, "Upload and crop a DICOM clip to select the flash frame."
 
     total_frames = int(cropped_store.get("shape", [0])[0])
+    # Encode the clip in the background while the user scrubs
+    prefetch_frames(cropped_store["display_id"])
     total_frames = max(total_frames - 1, 0)
     summary = "Use the slider or playback controls to choose the flash frame manually."
     return total_frames, 0, summary
@@ -701,13 +712,12 @@ def update_flash_preview(frame_index, cropped_store):
     if not cropped_store:
         return None
 
-    frames = load_array(cropped_store["display_id"])
-    if frames.size == 0:
+    total_frames = int(cropped_store.get("shape", [0])[0])
+    if total_frames == 0:
         return None
 
-    index = int(np.clip(frame_index or 0, 0, frames.shape[0] - 1))
-    frame = frames[index]
-    return frames_to_data_url(frame)
+    index = int(np.clip(frame_index or 0, 0, total_frames - 1))
+    return frame_url(cropped_store["display_id"], index)
 
 
 # ---------------------------------------------------------------------------
@@ -742,10 +752,10 @@ def update_roi_graph(cropped_store, flash_frame, roi_store):
         )
         return placeholder
 
-    frames = load_array(cropped_store["display_id"])
-    frame_index = min(int(flash_frame or 0) + 1, frames.shape[0] - 1)
-    frame = frames[frame_index]
-    return _build_roi_figure(frame, roi_store)
+    total_frames, height, width = (int(v) for v in cropped_store["shape"][:3])
+    frame_index = max(min(int(flash_frame or 0) + 1, total_frames - 1), 0)
+    image_url = frame_url(cropped_store["display_id"], frame_index)
+    return _build_roi_figure(image_url, width, height, roi_store)
 
 
 @app.callback(
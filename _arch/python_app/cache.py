@@ -1,12 +1,24 @@
-"""Simple disk-backed cache for large NumPy arrays used by the Dash app."""
+"""Bounded two-tier cache for large NumPy arrays used by the Dash app.
+
+Arrays are keyed by a hash of their content, so saving the same stack twice
+stores it once.  Recently used arrays that fit the memory budget stay in
+process memory; every array is also written to the temp directory, and arrays
+too large for memory are read back memory-mapped.  Both tiers are LRU with a
+byte budget (``BFA_CACHE_MEMORY_MB`` / ``BFA_CACHE_DISK_MB``).  Files still
+referenced by a ``save_array()`` call are never evicted: the disk tier may
+overshoot its budget until ``delete_array()`` releases them.
+Returned arrays are read-only and shared between callers.
+"""
 
 from __future__ import annotations
 
+import hashlib
 import os
 import tempfile
-import uuid
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Iterable
+from typing import Dict
 
 import numpy as np
 
@@ -14,37 +26,172 @@ import numpy as np
 CACHE_ROOT = Path(tempfile.gettempdir()) / "blood_flow_analyzer_cache"
 CACHE_ROOT.mkdir(parents=True, exist_ok=True)
 
+MEMORY_BUDGET = int(float(os.environ.get("BFA_CACHE_MEMORY_MB", 512)) * 2**20)
+DISK_BUDGET = int(float(os.environ.get("BFA_CACHE_DISK_MB", 4096)) * 2**20)
+
+_lock = threading.RLock()
+_memory: "OrderedDict[str, np.ndarray]" = OrderedDict()  # key -> read-only in-RAM array, LRU first
+_disk: "OrderedDict[str, int]" = OrderedDict()  # key -> file size, LRU first
+_refs: Dict[str, int] = {}  # save_array() calls not yet matched by delete_array()
+_memory_bytes = 0
+
 
 def _path_for(identifier: str) -> Path:
     return CACHE_ROOT / f"{identifier}.npy"
 
 
+def _content_key(array: np.ndarray) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{array.dtype.str}{array.shape}".encode())
+    digest.update(np.ascontiguousarray(array).data)
+    return digest.hexdigest()
+
+
+def _scan_disk() -> None:
+    """Pick up files left by earlier runs (or other workers), oldest first."""
+    entries = []
+    for file in CACHE_ROOT.glob("*.npy"):
+        try:
+            stat = file.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, file.stem, stat.st_size))
+    for _, key, size in sorted(entries):
+        _disk[key] = size
+
+
+def _remember(key: str, array: np.ndarray) -> None:
+    """Put an array in the memory tier, evicting least recently used ones."""
+    global _memory_bytes
+    if array.nbytes > MEMORY_BUDGET:
+        return
+    if key in _memory:
+        _memory.move_to_end(key)
+        return
+    _memory[key] = array
+    _memory_bytes += array.nbytes
+    while _memory_bytes > MEMORY_BUDGET:
+        _, evicted = _memory.popitem(last=False)
+        _memory_bytes -= evicted.nbytes
+
+
+def _forget(key: str) -> None:
+    global _memory_bytes
+    evicted = _memory.pop(key, None)
+    if evicted is not None:
+        _memory_bytes -= evicted.nbytes
+
+
+def _unlink(key: str) -> None:
+    _disk.pop(key, None)
+    try:
+        _path_for(key).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _evict_disk() -> None:
+    """Remove least recently used unreferenced files while over the disk budget."""
+    total = sum(_disk.values())
+    for key in list(_disk):
+        if total <= DISK_BUDGET:
+            break
+        if _refs.get(key, 0) > 0:
+            continue
+        total -= _disk[key]
+        _forget(key)
+        _unlink(key)
+
+
 def save_array(array: np.ndarray) -> str:
-    identifier = uuid.uuid4().hex
-    path = _path_for(identifier)
-    np.save(path, array, allow_pickle=False)
-    return identifier
+    """Cache an array and return its content key (identical arrays share one entry)."""
+    array = np.asarray(array)
+    key = _content_key(array)
+    with _lock:
+        _refs[key] = _refs.get(key, 0) + 1
+        path = _path_for(key)
+        if key in _disk and path.exists():
+            _disk.move_to_end(key)
+            os.utime(path)
+        else:
+            # Write under a temporary name so readers never see a partial file
+            tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as handle:
+                np.save(handle, array, allow_pickle=False)
+            os.replace(tmp, path)
+            _disk[key] = path.stat().st_size
+        if key in _memory:
+            _memory.move_to_end(key)
+        elif array.nbytes <= MEMORY_BUDGET:
+            frozen = array.copy()
+            frozen.flags.writeable = False
+            _remember(key, frozen)
+        _evict_disk()
+    return key
 
 
 def load_array(identifier: str) -> np.ndarray:
-    path = _path_for(identifier)
-    if not path.exists():
-        raise FileNotFoundError(f"Cached array {identifier} not found")
-    return np.load(path, allow_pickle=False)
+    """Return a cached array (read-only; memory-mapped if too large for the memory tier)."""
+    with _lock:
+        array = _memory.get(identifier)
+        if array is not None:
+            _memory.move_to_end(identifier)
+            if identifier in _disk:
+                _disk.move_to_end(identifier)
+            return array
+        path = _path_for(identifier)
+        if not path.exists():
+            _disk.pop(identifier, None)
+            raise FileNotFoundError(f"Cached array {identifier} not found")
+        array = np.load(path, mmap_mode="r", allow_pickle=False)
+        _disk[identifier] = path.stat().st_size
+        _disk.move_to_end(identifier)
+        os.utime(path)
+        if array.nbytes <= MEMORY_BUDGET:
+            # Small enough: read into RAM once for later calls
+            array = np.array(array)
+            array.flags.writeable = False
+            _remember(identifier, array)
+        return array
 
 
 def delete_array(identifier: str) -> None:
-    path = _path_for(identifier)
-    try:
-        path.unlink()
-    except FileNotFoundError:
-        pass
+    """Release one save_array() reference.
 
+    With the last one released the entry stays cached but may be evicted.
+    """
+    with _lock:
+        remaining = _refs.get(identifier, 0) - 1
+        if remaining > 0:
+            _refs[identifier] = remaining
+        else:
+            _refs.pop(identifier, None)
+        _evict_disk()
 
-def clear_cache(prefix: str = "") -> None:
-    for file in CACHE_ROOT.glob(f"{prefix}*.npy"):
-        try:
-            file.unlink()
-        except FileNotFoundError:
-            continue
 
+def clear_cache(prefix: str = "") -> None:
+    with _lock:
+        for key in [k for k in _memory if k.startswith(prefix)]:
+            _forget(key)
+        for key in [k for k in _refs if k.startswith(prefix)]:
+            del _refs[key]
+        for file in CACHE_ROOT.glob(f"{prefix}*.npy"):
+            _disk.pop(file.stem, None)
+            try:
+                file.unlink()
+            except FileNotFoundError:
+                continue
+
+
+def cache_info() -> Dict[str, int]:
+    """Entry counts and bytes held by each tier."""
+    with _lock:
+        return {
+            "memory_entries": len(_memory),
+            "memory_bytes": _memory_bytes,
+            "disk_entries": len(_disk),
+            "disk_bytes": sum(_disk.values()),
+        }
+
+
+_scan_disk()
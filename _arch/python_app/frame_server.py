@@ -0,0 +1,165 @@
+"""Serve encoded frames of cached arrays over HTTP for the Dash viewer.
+
+Figures and ``<img>`` elements reference ``/frames/<array id>/<index>.<fmt>``
+instead of embedding base64 PNG payloads.  Array ids are content hashes (see
+``cache.save_array``), so a URL always maps to the same image and responses
+are marked immutable for the browser cache.  Encoded images are kept in a
+bounded LRU, and a background pool pre-encodes whole clips after an upload.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+from python_app.cache import load_array
+from python_app.processing import frame_to_color
+
+
+FRAME_ROUTE = "/frames"
+FORMATS = {"png": "image/png", "jpeg": "image/jpeg"}
+JPEG_QUALITY = 85
+ENCODED_BUDGET = int(float(os.environ.get("BFA_FRAME_CACHE_MB", 256)) * 2**20)
+
+_ARRAY_ID = re.compile(r"^[0-9a-f]{8,64}$")
+_Key = Tuple[str, int, str, Optional[int]]  # array id, frame index, format, thumbnail size
+
+_lock = threading.Lock()
+_encoded: "OrderedDict[_Key, bytes]" = OrderedDict()
+_encoded_bytes = 0
+_pending: Set[_Key] = set()
+_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="frame-encode")
+
+
+def frame_url(array_id: str, index: int, fmt: str = "png", size: Optional[int] = None) -> str:
+    """URL of one encoded frame (size: longest side of a thumbnail, in pixels)."""
+    url = f"{FRAME_ROUTE}/{array_id}/{int(index)}.{fmt}"
+    return f"{url}?size={int(size)}" if size else url
+
+
+def encode_frame(frame: np.ndarray, fmt: str = "png", size: Optional[int] = None) -> bytes:
+    """Encode a frame as PNG or JPEG, optionally downscaled to fit size x size."""
+
+    import PIL.Image
+
+    image = PIL.Image.fromarray(frame_to_color(np.asarray(frame)))
+    if size:
+        image.thumbnail((int(size), int(size)))
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.save(buffer, format="JPEG", quality=JPEG_QUALITY)
+    else:
+        # Fast zlib level: the server cache makes size matter less than latency
+        image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def _store(key: _Key, data: bytes) -> None:
+    global _encoded_bytes
+    with _lock:
+        if key in _encoded or len(data) > ENCODED_BUDGET:
+            return
+        _encoded[key] = data
+        _encoded_bytes += len(data)
+        while _encoded_bytes > ENCODED_BUDGET:
+            _, evicted = _encoded.popitem(last=False)
+            _encoded_bytes -= len(evicted)
+
+
+def encoded_frame(array_id: str, index: int, fmt: str = "png", size: Optional[int] = None) -> bytes:
+    """Encoded frame from the LRU, encoding (and caching) it on a miss.
+
+    Raises:
+        FileNotFoundError: Unknown or evicted array id.
+        IndexError: Frame index out of range.
+    """
+    key = (array_id, int(index), fmt, size)
+    with _lock:
+        data = _encoded.get(key)
+        if data is not None:
+            _encoded.move_to_end(key)
+            return data
+    frames = load_array(array_id)
+    if not 0 <= key[1] < frames.shape[0]:
+        raise IndexError(f"Frame {index} out of range for {frames.shape[0]} frames")
+    data = encode_frame(frames[key[1]], fmt, size)
+    _store(key, data)
+    return data
+
+
+def _prefetch_one(key: _Key) -> None:
+    with _lock:
+        if key not in _pending:
+            return  # cancelled by clear_encoded()
+    try:
+        encoded_frame(*key)
+    except (FileNotFoundError, IndexError):
+        pass  # array deleted or replaced meanwhile
+    finally:
+        with _lock:
+            _pending.discard(key)
+
+
+def prefetch_frames(
+    array_id: str,
+    fmt: str = "png",
+    size: Optional[int] = None,
+    indices: Optional[Iterable[int]] = None,
+) -> int:
+    """Queue frames for background encoding; returns the number queued."""
+    if indices is None:
+        try:
+            indices = range(load_array(array_id).shape[0])
+        except FileNotFoundError:
+            return 0
+    queued = 0
+    for index in indices:
+        key = (array_id, int(index), fmt, size)
+        with _lock:
+            if key in _encoded or key in _pending:
+                continue
+            _pending.add(key)
+        _pool.submit(_prefetch_one, key)
+        queued += 1
+    return queued
+
+
+def clear_encoded(array_id: Optional[str] = None) -> None:
+    """Drop encoded frames and cancel queued prefetches (of one array, or all)."""
+    global _encoded_bytes
+    with _lock:
+        for key in [k for k in _encoded if array_id is None or k[0] == array_id]:
+            _encoded_bytes -= len(_encoded.pop(key))
+        _pending.difference_update([k for k in _pending if array_id is None or k[0] == array_id])
+
+
+def register_frame_routes(server) -> None:
+    """Add the frame route to the Flask server behind the Dash app."""
+
+    from flask import Response, abort, request
+
+    @server.route(f"{FRAME_ROUTE}/<array_id>/<int:index>.<fmt>")
+    def serve_frame(array_id: str, index: int, fmt: str):
+        fmt = "jpeg" if fmt == "jpg" else fmt
+        if fmt not in FORMATS or not _ARRAY_ID.match(array_id):
+            abort(404)
+        size = request.args.get("size", type=int) or None
+        etag = f"{array_id}-{index}-{fmt}-{size or 0}"
+        cache_control = "public, max-age=31536000, immutable"
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={"ETag": f'"{etag}"', "Cache-Control": cache_control})
+        try:
+            data = encoded_frame(array_id, index, fmt, size)
+        except (FileNotFoundError, IndexError):
+            abort(404)
+        response = Response(data, mimetype=FORMATS[fmt])
+        response.headers["Cache-Control"] = cache_control
+        response.set_etag(etag)
+        return response
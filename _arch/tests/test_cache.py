@@ -0,0 +1,100 @@
+"""
+Tests for the bounded two-tier array cache of the Dash app
+"""
+import sys
+from pathlib import Path
+
+# Add _arch to path
+arch_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(arch_dir))
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from python_app import cache
+
+MB = 2 ** 20
+
+
+@pytest.fixture
+def fresh_cache(tmp_path, monkeypatch):
+    """Empty cache in a temporary directory, 2 MB in memory and three 1 MB arrays on disk"""
+    monkeypatch.setattr(cache, 'CACHE_ROOT', tmp_path)
+    monkeypatch.setattr(cache, '_memory', OrderedDict())
+    monkeypatch.setattr(cache, '_disk', OrderedDict())
+    monkeypatch.setattr(cache, '_refs', {})
+    monkeypatch.setattr(cache, '_memory_bytes', 0)
+    monkeypatch.setattr(cache, 'MEMORY_BUDGET', 2 * MB)
+    monkeypatch.setattr(cache, 'DISK_BUDGET', 3 * MB + 4096)  # three arrays with .npy headers
+    return cache
+
+
+def _mb_array(value):
+    return np.full(MB // 4, value, dtype=np.float32)
+
+
+def test_content_keys_deduplicate_and_count_references(fresh_cache):
+    a = np.arange(1000, dtype=np.float32)
+    k1 = cache.save_array(a)
+    k2 = cache.save_array(a.copy())
+    assert k1 == k2 and cache.cache_info()['disk_entries'] == 1
+    assert cache.save_array(a.astype(np.float64)) != k1
+
+    loaded = cache.load_array(k1)
+    np.testing.assert_array_equal(loaded, a)
+    assert not loaded.flags.writeable
+    a[0] = -1  # the cache holds its own copy
+    assert cache.load_array(k1)[0] == 0
+
+    cache.delete_array(k1)
+    assert cache._refs[k1] == 1
+    cache.delete_array(k1)
+    assert k1 not in cache._refs
+    # Released but still cached until space is needed
+    assert cache.load_array(k1)[1] == 1
+
+
+def test_disk_tier_evicts_only_released_entries(fresh_cache):
+    keys = [cache.save_array(_mb_array(i)) for i in range(5)]
+    # Everything is referenced: over budget, nothing evicted
+    assert cache.cache_info()['disk_entries'] == 5
+    for key in keys:
+        assert cache.load_array(key)[0] == keys.index(key)
+
+    cache.delete_array(keys[1])
+    cache.delete_array(keys[3])
+    # Released entries go first, least recently used (keys[1]) before keys[3]
+    assert cache.cache_info()['disk_entries'] == 3
+    for key in (keys[1], keys[3]):
+        with pytest.raises(FileNotFoundError):
+            cache.load_array(key)
+    assert [cache.load_array(k)[0] for k in (keys[0], keys[2], keys[4])] == [0, 2, 4]
+
+
+def test_disk_lru_order_follows_use(fresh_cache):
+    keys = [cache.save_array(_mb_array(i)) for i in range(3)]
+    for key in keys:
+        cache.delete_array(key)
+    cache._memory.clear()
+    cache.load_array(keys[0])          # keys[1] is now least recently used
+    cache.save_array(_mb_array(9))
+    assert keys[1] not in cache._disk and keys[0] in cache._disk and keys[2] in cache._disk
+
+
+def test_memory_tier_lru_and_memmap_reads(fresh_cache):
+    small = [cache.save_array(_mb_array(i)) for i in range(3)]
+    # 2 MB budget: the first array was pushed out of memory (still on disk)
+    assert list(cache._memory) == small[1:]
+    assert cache.cache_info()['memory_bytes'] == 2 * MB
+    cache.load_array(small[1])
+    cache.load_array(small[0])         # reloaded into RAM, evicts small[2]
+    assert list(cache._memory) == [small[1], small[0]]
+    assert not isinstance(cache.load_array(small[0]), np.memmap)
+
+    # Too large for memory: never copied into the tier, read memory-mapped
+    big = cache.save_array(np.ones(3 * MB // 4, dtype=np.float32))
+    assert big not in cache._memory
+    loaded = cache.load_array(big)
+    assert isinstance(loaded, np.memmap) and loaded.mode == 'r'
+    assert big not in cache._memory and cache.cache_info()['memory_bytes'] <= 2 * MB
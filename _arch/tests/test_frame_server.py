@@ -0,0 +1,90 @@
+"""
+Tests for the encoded-frame cache and the /frames route of the Dash app
+"""
+import sys
+import time
+from pathlib import Path
+
+# Add _arch to path
+arch_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(arch_dir))
+
+from collections import OrderedDict
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+from python_app import cache, frame_server
+
+
+@pytest.fixture
+def frames(tmp_path, monkeypatch):
+    """A cached (6, 40, 60) uint8 clip in an empty cache; returns its id"""
+    monkeypatch.setattr(cache, 'CACHE_ROOT', tmp_path)
+    monkeypatch.setattr(cache, '_memory', OrderedDict())
+    monkeypatch.setattr(cache, '_disk', OrderedDict())
+    monkeypatch.setattr(cache, '_refs', {})
+    monkeypatch.setattr(cache, '_memory_bytes', 0)
+    monkeypatch.setattr(frame_server, '_encoded', OrderedDict())
+    monkeypatch.setattr(frame_server, '_encoded_bytes', 0)
+    monkeypatch.setattr(frame_server, '_pending', set())
+    rng = np.random.default_rng(0)
+    return cache.save_array(rng.integers(0, 255, (6, 40, 60), dtype=np.uint8))
+
+
+def test_encoded_frames_are_cached_within_budget(frames, monkeypatch):
+    png = frame_server.encoded_frame(frames, 2)
+    assert png.startswith(b'\x89PNG') and frame_server.encoded_frame(frames, 2) is png
+    assert Image.open(BytesIO(png)).size == (60, 40)
+    thumb = frame_server.encoded_frame(frames, 2, 'jpeg', 30)
+    assert thumb.startswith(b'\xff\xd8') and Image.open(BytesIO(thumb)).size == (30, 20)
+    with pytest.raises(IndexError):
+        frame_server.encoded_frame(frames, 6)
+
+    # Budget of about two PNG frames: least recently used ones are evicted
+    frame_server.clear_encoded()
+    monkeypatch.setattr(frame_server, 'ENCODED_BUDGET', 2 * len(png) + 100)
+    for index in range(4):
+        frame_server.encoded_frame(frames, index)
+    assert [k[1] for k in frame_server._encoded] == [2, 3]
+    assert frame_server._encoded_bytes <= frame_server.ENCODED_BUDGET
+
+
+def test_prefetch_and_clear(frames):
+    assert frame_server.prefetch_frames(frames) == 6
+    deadline = time.monotonic() + 10
+    while frame_server._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(k[1] for k in frame_server._encoded) == list(range(6))
+    assert frame_server.prefetch_frames(frames) == 0
+
+    frame_server.clear_encoded(frames)
+    assert not frame_server._encoded
+    # Cancelled before it runs: a queued prefetch does no work
+    frame_server._pending.add((frames, 0, 'png', None))
+    frame_server.clear_encoded(frames)
+    frame_server._prefetch_one((frames, 0, 'png', None))
+    assert not frame_server._encoded
+
+
+def test_frame_route(frames):
+    flask = pytest.importorskip('flask')
+    app = flask.Flask(__name__)
+    frame_server.register_frame_routes(app)
+    client = app.test_client()
+
+    response = client.get(frame_server.frame_url(frames, 1))
+    assert response.status_code == 200 and response.mimetype == 'image/png'
+    assert 'immutable' in response.headers['Cache-Control']
+    etag = response.headers['ETag']
+    assert client.get(frame_server.frame_url(frames, 1), headers={'If-None-Match': etag}).status_code == 304
+
+    thumb = client.get(frame_server.frame_url(frames, 1, 'jpeg', 30))
+    assert thumb.mimetype == 'image/jpeg' and Image.open(BytesIO(thumb.data)).size == (30, 20)
+    assert thumb.headers['ETag'] != etag
+
+    assert client.get(f'/frames/{frames}/6.png').status_code == 404       # out of range
+    assert client.get('/frames/not-an-id/0.png').status_code == 404       # bad id
+    assert client.get(f'/frames/{"0" * 32}/0.png').status_code == 404     # unknown array
+    assert client.get(f'/frames/{frames}/0.gif').status_code == 404       # unknown format
@@ -0,0 +1,3 @@
+"""
+Performance benchmarks (run: python benchmarks/run_benchmarks.py --help)
+"""
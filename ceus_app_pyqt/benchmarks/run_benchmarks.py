@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline benchmarks
+Runs every analysis stage on synthetic clips of several sizes, records wall
+time, peak RSS and traced allocations per stage, writes the results as JSON
+and compares them with a baseline run
+
+Run from ceus_app_pyqt:
+    python benchmarks/run_benchmarks.py --sizes small medium
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/<commit>.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Add parent directory to path to make 'src' importable as a package
+app_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+
+from src.analysis.models import fit_model
+from src.core import DICOMLoader, detect_flash_ceus_refined, extract_tics_from_masks, motion_compensate
+from src.core.preprocessing import preprocess_ceus
+from src.core.roi_manager import rasterize_polygon
+from src.models import fit_washin
+from src.models.export_tables import build_export_tables, write_csv_bundle
+from src.utils.converters import to_gray, ycbcr_to_rgb
+from src.utils.synthetic import write_synthetic_clip
+
+# LOESS lives in the repository-level src/utils, which ceus_app_pyqt/src/utils
+# shadows on sys.path: load it from its file
+LOESS_PATH = app_dir.parent / 'src' / 'utils' / 'loess.py'
+if LOESS_PATH.is_file():
+    _spec = importlib.util.spec_from_file_location('_bench_loess', LOESS_PATH)
+    _loess = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(_loess)
+    loess_smooth = _loess.loess_smooth
+else:
+    loess_smooth = None
+
+try:
+    import psutil
+except ImportError:  # Optional: peak RSS falls back to resource / unavailable
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+RESULTS_VERSION = 1
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+# Clip sizes (frames, height, full split-screen width)
+SIZES = {
+    'small': dict(T=60, H=120, W=320),
+    'medium': dict(T=200, H=240, W=640),
+    'large': dict(T=400, H=480, W=1024),
+}
+STAGES = ('load', 'colour', 'flash', 'motion', 'preprocess', 'tic', 'loess', 'fit', 'export')
+
+# Same settings as the viewer's preprocessing
+PREPROCESS_PARAMS = dict(use_log=True, spatial='median', temporal='gaussian', t_win=3, baseline_frames=5)
+# ROI grid drawn over the CEUS region (rows x columns)
+ROI_GRID = (2, 4)
+
+
+# =============================================================================
+# Measurement
+# =============================================================================
+class _RSSSampler:
+    """Peak resident set size while a block runs (sampled in a thread)"""
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._proc = psutil.Process() if psutil is not None else None
+
+    def _rss(self) -> int:
+        if self._proc is not None:
+            return int(self._proc.memory_info().rss)
+        if resource is not None:
+            # Process-lifetime peak (KiB on Linux, bytes on macOS)
+            scale = 1 if sys.platform == 'darwin' else 1024
+            return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * scale
+        return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start = self.peak = self._rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+        return False
+
+
+def measure(fn: Callable[[], object], repeat: int = 3, trace: bool = True) -> dict:
+    """
+    Time a callable and measure its memory use
+
+    The callable runs `repeat` times untraced (wall times) and once more under
+    tracemalloc (allocations), since tracing slows Python-heavy code down.
+
+    Returns:
+        Dict with time_s (median), times, peak_rss_mb, rss_delta_mb and, when
+        traced, traced_peak_mb, traced_net_mb and live_blocks (blocks still
+        allocated after the call)
+    """
+    times = []
+    with _RSSSampler() as rss:
+        for _ in range(max(int(repeat), 1)):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+    out = {
+        'time_s': float(np.median(times)),
+        'times': [round(t, 6) for t in times],
+        'peak_rss_mb': rss.peak / 2 ** 20,
+        'rss_delta_mb': (rss.peak - rss.start) / 2 ** 20,
+    }
+    if trace:
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            # The return value stays alive until memory is read: it counts as net
+            returned = [fn()]
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            stats = after.compare_to(before, 'filename')
+            returned.clear()
+        finally:
+            tracemalloc.stop()
+        out.update(
+            traced_peak_mb=(peak - base) / 2 ** 20,
+            traced_net_mb=(current - base) / 2 ** 20,
+            live_blocks=int(sum(max(s.count_diff, 0) for s in stats)),
+        )
+    return out
+
+
+# =============================================================================
+# Pipeline stages
+# =============================================================================
+def _roi_polygons(shape) -> Dict[str, list]:
+    """Rectangular ROIs on a grid over the CEUS image ({label: [(x, y), ...]})"""
+    H, W = shape
+    rows, cols = ROI_GRID
+    h, w = H // rows, W // cols
+    out = {}
+    for r in range(rows):
+        for c in range(cols):
+            x0, y0 = c * w + w // 4, r * h + h // 4
+            x1, y1 = x0 + w // 2, y0 + h // 2
+            out[f"ROI_{r * cols + c + 1}"] = [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+    return out
+
+
+def _stage_load(state):
+    bmode, ceus = DICOMLoader(state['clip'].path).load()
+    state.update(bmode=bmode, ceus=ceus)
+    return bmode, ceus
+
+
+def _stage_colour(state):
+    # YBR -> RGB conversion plus the grayscale stack shared by registration/preprocessing
+    ceus = state['ceus']
+    rgb = np.stack([ycbcr_to_rgb(f) for f in ceus], axis=0)
+    gray = np.stack([to_gray(f) for f in rgb], axis=0)
+    return gray
+
+
+def _stage_flash(state):
+    flash, washout, _ = detect_flash_ceus_refined(state['ceus'])
+    state.update(flash=flash, washout=washout)
+    return flash, washout
+
+
+def _stage_motion(state):
+    w = state['washout']
+    corrected, shifts, _ = motion_compensate(state['ceus'][w:], state['bmode'][w:])
+    state['corrected'] = corrected
+    return corrected, shifts
+
+
+def _stage_preprocess(state):
+    pre = preprocess_ceus(state['corrected'], **PREPROCESS_PARAMS)
+    state['preprocessed'] = pre
+    return pre
+
+
+def _stage_tic(state):
+    pre = state['preprocessed']
+    shape = pre.shape[1:3]
+    masks = {label: rasterize_polygon(poly, shape) for label, poly in _roi_polygons(shape).items()}
+    series = extract_tics_from_masks(pre, masks)
+    t = np.arange(pre.shape[0]) / state['clip'].fps
+    state['tics'] = {label: (t, vi.astype(np.float64) - float(vi[0])) for label, vi in series.items()}
+    return series
+
+
+def _stage_loess(state):
+    state['filtered'] = {
+        label: loess_smooth(t, y, span=0.8, degree=2) for label, (t, y) in state['tics'].items()
+    }
+    return state['filtered']
+
+
+def _stage_fit(state):
+    fits = {}
+    for label, (t, y) in state['tics'].items():
+        params, _, _, _ = fit_washin(t, y, t_max=float(t[-1]))
+        lognormal = fit_model('lognormal', t, y, n_starts=10, random_state=0)
+        fits[label] = (params, lognormal['params'])
+    state['fits'] = fits
+    return fits
+
+
+def _stage_export(state):
+    tics = state['tics']
+    labels = list(tics)
+    filtered = state.get('filtered') or {label: y for label, (_, y) in tics.items()}
+    tables = build_export_tables(
+        labels, [tics[k][0] for k in labels], [tics[k][1] for k in labels], [filtered[k] for k in labels]
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        write_csv_bundle(Path(tmp) / 'export.zip', tables)
+    return tables
+
+
+STAGE_FUNCS = {
+    'load': _stage_load,
+    'colour': _stage_colour,
+    'flash': _stage_flash,
+    'motion': _stage_motion,
+    'preprocess': _stage_preprocess,
+    'tic': _stage_tic,
+    'loess': _stage_loess,
+    'fit': _stage_fit,
+    'export': _stage_export,
+}
+
+
+def _skip_reason(stage: str) -> Optional[str]:
+    if stage == 'loess' and loess_smooth is None:
+        return f'{LOESS_PATH} not found'
+    return None
+
+
+# =============================================================================
+# Suite
+# =============================================================================
+def git_commit() -> Optional[str]:
+    """Current commit of the working tree (None outside git)"""
+    try:
+        out = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=app_dir, capture_output=True, text=True, timeout=10
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_suite(
+    sizes: Sequence[str] = ('small',),
+    stages: Sequence[str] = STAGES,
+    repeat: int = 3,
+    trace: bool = True,
+    photometric: str = 'RGB',
+    size_specs: Optional[Dict[str, dict]] = None,
+    workdir: Optional[Path] = None,
+    log: Callable[[str], None] = print
+) -> dict:
+    """
+    Run the stages on one synthetic clip per size
+
+    Stages run in pipeline order (each uses the previous outputs); a stage
+    whose inputs are missing because an earlier one was not selected runs
+    its prerequisites once, unmeasured.
+
+    Args:
+        sizes: Size names (keys of SIZES or size_specs)
+        stages: Stages to measure (subset of STAGES)
+        repeat: Timed runs per stage
+        trace: Also run each stage once under tracemalloc
+        photometric: Pixel format of the clips ('RGB' or 'YBR_FULL_422')
+        size_specs: Extra/overriding {name: dict(T=, H=, W=)} sizes
+        workdir: Directory for the clips (temporary if None)
+        log: Progress output
+
+    Returns:
+        Results dict (see save_results)
+    """
+    specs = dict(SIZES, **(size_specs or {}))
+    unknown = [s for s in stages if s not in STAGE_FUNCS]
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown} (expected some of {list(STAGES)})")
+    results = {
+        'version': RESULTS_VERSION,
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': int(repeat),
+        'photometric': photometric,
+        'sizes': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(workdir) if workdir is not None else Path(tmp)
+        for name in sizes:
+            spec = specs[name]
+            clip = write_synthetic_clip(root / f"bench_{name}.dcm", photometric=photometric,
+                                        motion_amplitude=(1.5, 2.5), **spec)
+            state = {'clip': clip}
+            entry = {'clip': dict(spec, bytes=int(clip.path.stat().st_size)), 'stages': {}}
+            log(f"[{name}] T={spec['T']} H={spec['H']} W={spec['W']} ({entry['clip']['bytes'] / 2 ** 20:.1f} MB)")
+            for stage in STAGES:
+                fn = STAGE_FUNCS[stage]
+                reason = _skip_reason(stage)
+                if stage not in stages:
+                    # Prerequisite of a later stage: run once, unmeasured
+                    if reason is None and any(s in stages for s in STAGES[STAGES.index(stage) + 1:]):
+                        fn(state)
+                    continue
+                if reason is not None:
+                    entry['stages'][stage] = {'skipped': reason}
+                    log(f"  {stage:<11} skipped: {reason}")
+                    continue
+                m = measure(lambda: fn(state), repeat=repeat, trace=trace)
+                entry['stages'][stage] = m
+                mem = f"  traced peak {m['traced_peak_mb']:8.1f} MB" if 'traced_peak_mb' in m else ''
+                log(f"  {stage:<11} {m['time_s'] * 1e3:9.1f} ms  RSS +{m['rss_delta_mb']:7.1f} MB{mem}")
+            results['sizes'][name] = entry
+    return results
+
+
+def save_results(results: dict, path: Optional[Path] = None) -> Path:
+    """Write results as JSON (default: results/<commit>.json)"""
+    if path is None:
+        path = RESULTS_DIR / f"{results.get('commit') or 'local'}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2))
+    return path
+
+
+def compare_results(
+    current: dict,
+    baseline: dict,
+    threshold: float = 0.2,
+    min_time: float = 0.005,
+    memory_threshold: Optional[float] = None
+) -> List[dict]:
+    """
+    Stages slower (or hungrier) than the baseline beyond a relative threshold
+
+    Args:
+        current: Results of this run
+        baseline: Results to compare with
+        threshold: Allowed relative slowdown (0.2 = 20 %)
+        min_time: Baseline times below this (seconds) are ignored as noise
+        memory_threshold: Allowed relative growth of traced peak memory
+            (None = same as threshold)
+
+    Returns:
+        One dict per regression: size, stage, metric, baseline, current, ratio
+    """
+    memory_threshold = threshold if memory_threshold is None else memory_threshold
+    regressions = []
+    for size, entry in current.get('sizes', {}).items():
+        base_stages = baseline.get('sizes', {}).get(size, {}).get('stages', {})
+        for stage, m in entry.get('stages', {}).items():
+            b = base_stages.get(stage)
+            if not b or 'skipped' in b or 'skipped' in m:
+                continue
+            checks = [('time_s', threshold, min_time)]
+            if 'traced_peak_mb' in m and 'traced_peak_mb' in b:
+                checks.append(('traced_peak_mb', memory_threshold, 1.0))
+            for metric, limit, floor in checks:
+                old, new = float(b[metric]), float(m[metric])
+                if old < floor:
+                    continue
+                ratio = new / old
+                if ratio > 1.0 + limit:
+                    regressions.append(dict(size=size, stage=stage, metric=metric,
+                                            baseline=old, current=new, ratio=ratio))
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="CEUS pipeline benchmarks")
+    parser.add_argument('--sizes', nargs='+', default=['small', 'medium'], choices=list(SIZES))
+    parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage (median is kept)")
+    parser.add_argument('--photometric', default='RGB', choices=['RGB', 'YBR_FULL_422'])
+    parser.add_argument('--no-trace', action='store_true', help="Skip the tracemalloc run")
+    parser.add_argument('--output', type=Path, help="Results JSON (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--baseline', type=Path, help="Results JSON to compare with")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.stages, repeat=args.repeat, trace=not args.no_trace,
+                        photometric=args.photometric)
+    path = save_results(results, args.output)
+    print(f"Results written to {path}")
+    if args.baseline is None:
+        return 0
+    baseline = json.loads(Path(args.baseline).read_text())
+    regressions = compare_results(results, baseline, threshold=args.threshold)
+    for r in regressions:
+        print(f"REGRESSION {r['size']}/{r['stage']} {r['metric']}: "
+              f"{r['baseline']:.4g} -> {r['current']:.4g} (x{r['ratio']:.2f})")
+    if not regressions:
+        print(f"No regression beyond {args.threshold:.0%} against {baseline.get('commit') or args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,8 +3,10 @@ Model functions and multistart fitting for CEUS TICs.
 Reimplements models inspired by R app (lognormal, gamma variate, LDRW, FPT).
 """
 from __future__ import annotations
+import math
 import numpy as np
 from typing import Dict, Optional, Tuple
+from src.utils import perf
 
 try:
     from scipy.optimize import curve_fit
@@ -12,6 +14,8 @@ except Exception:  # SciPy optional
     curve_fit = None  # type: ignore
 
 EPS = 1e-9
+# np.trapz was renamed np.trapezoid in NumPy 2.0
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
 
 
 def lognormal_func(t, AUC, u, s, t0, C):
@@ -24,7 +28,7 @@ def lognormal_func(t, AUC, u, s, t0, C):
 def gamma_variate_func(t, AUC, a, b, t0, C):
     tt = np.clip(np.asarray(t, float) - t0, EPS, None)
     # Normalized gamma-like shape
-    pdf = (tt**a) * np.exp(-tt/b) / (b**(a+1) * np.math.gamma(a+1))
+    pdf = (tt**a) * np.exp(-tt/b) / (b**(a+1) * math.gamma(a+1))
     y = AUC * pdf + C
     return np.where(np.asarray(t) <= t0, C, y)
 
@@ -52,7 +56,7 @@ MODEL_FUNCS = {
 
 
 def _initial_guesses(model: str, t: np.ndarray, y: np.ndarray, t0_hint: float, C_hint: float):
-    AUC0 = max(float(np.trapz(np.clip(y - C_hint, 0, None), t)), EPS)
+    AUC0 = max(float(_trapezoid(np.clip(y - C_hint, 0, None), t)), EPS)
     if model == "lognormal":
         u0 = max(np.log(max(float(np.median(t - t0_hint)), EPS)), 0.0)
         s0 = 0.5
@@ -82,7 +86,9 @@ def _bounds(model: str, t: np.ndarray, y: np.ndarray):
     return (lower, upper)
 
 
+@perf.traced()
 def fit_model(model: str, t: np.ndarray, y: np.ndarray, *, t0_hint: Optional[float] = None, C_hint: Optional[float] = None, n_starts: int = 50, random_state: Optional[int] = None):
+    perf.count('fits')
     rng = np.random.default_rng(random_state)
     func = MODEL_FUNCS[model]
     t = np.asarray(t, float)
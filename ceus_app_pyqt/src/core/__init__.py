@@ -2,18 +2,45 @@
 Core analysis modules
 """
 from src.core.dicom_loader import DICOMLoader
-from src.core.flash_detection import detect_flash_ceus_refined
+from src.core.dicom_scan import scan_directory, find_clip
+from src.core.frame_decoder import decode_frames
+from src.core.flash_detection import (
+    detect_flash_ceus_refined, OnlineFlashDetector, FlashEvent, detect_flashes, segment_cycles
+)
 from src.core.preprocessing import preprocess_ceus
 from src.core.motion_compensation import motion_compensate
-from src.core.tic_analysis import extract_tic_from_roi
-from src.core.roi_manager import ROI, ROIManager
+from src.core.tic_analysis import extract_tic_from_roi, extract_tics_from_masks
+from src.core.tic_grid import block_labels, superpixel_labels, extract_block_tics, extract_label_tics
+from src.core.roi_manager import ROI, ROIManager, ROIMask
+from src.core.stack_store import StackStore
+from src.core.frame_stats import FrameStats
+from src.core.session import save_session, load_session
+from src.core.catalog import StudyCatalog
 
 __all__ = [
     'DICOMLoader',
+    'scan_directory',
+    'find_clip',
+    'decode_frames',
     'detect_flash_ceus_refined', 
+    'OnlineFlashDetector',
+    'FlashEvent',
+    'detect_flashes',
+    'segment_cycles',
     'preprocess_ceus',
     'motion_compensate',
     'extract_tic_from_roi',
+    'extract_tics_from_masks',
+    'block_labels',
+    'superpixel_labels',
+    'extract_block_tics',
+    'extract_label_tics',
     'ROI',
-    'ROIManager'
+    'ROIManager',
+    'ROIMask',
+    'StackStore',
+    'FrameStats',
+    'save_session',
+    'load_session',
+    'StudyCatalog'
 ]
@@ -0,0 +1,445 @@
+"""
+Study catalogue
+SQLite index of DICOM headers and per-ROI fitted parameters for cohort work:
+headers are read without pixel data, unchanged files are never re-read, and
+aggregates (e.g. mean AB per condition) are SQL queries, not CSV reloads.
+"""
+import json
+import math
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from src.core.dicom_scan import list_files, scan_file, scan_paths
+from src.utils import perf
+
+CATALOG_NAME = 'catalog.sqlite'
+CATALOG_VERSION = 1
+
+# Study status: indexed but not analysed, analysed, analysis raised, header unreadable
+PENDING, DONE, FAILED, UNREADABLE = 'pending', 'done', 'failed', 'unreadable'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS studies (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER,
+    mtime REAL,
+    patient_id TEXT,
+    condition TEXT,
+    manufacturer TEXT,
+    model_name TEXT,
+    fps REAL,
+    n_frames INTEGER,
+    rows INTEGER,
+    columns INTEGER,
+    photometric TEXT,
+    transfer_syntax TEXT,
+    regions TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    message TEXT,
+    indexed_at REAL,
+    processed_at REAL
+);
+CREATE INDEX IF NOT EXISTS studies_condition ON studies (condition);
+CREATE INDEX IF NOT EXISTS studies_status ON studies (status);
+CREATE TABLE IF NOT EXISTS results (
+    study_id INTEGER NOT NULL REFERENCES studies (id) ON DELETE CASCADE,
+    roi TEXT NOT NULL,
+    parameter TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (study_id, roi, parameter)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_parameter ON results (parameter);
+"""
+
+_HEADER_COLUMNS = (
+    'patient_id', 'condition', 'manufacturer', 'model_name', 'fps', 'n_frames',
+    'rows', 'columns', 'photometric', 'transfer_syntax', 'regions',
+)
+
+# Columns that may be used to group aggregates
+_GROUP_COLUMNS = ('condition', 'patient_id', 'manufacturer', 'roi')
+
+PathLike = Union[str, Path]
+
+
+def parse_study_name(path: PathLike) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Patient ID and condition from an 'ID_condition[_...]' file name (as in the R app)
+
+    Returns:
+        (patient_id, condition); condition is None without an underscore
+    """
+    parts = Path(path).stem.split('_')
+    patient = parts[0] or None
+    condition = parts[1] if len(parts) > 1 and parts[1] else None
+    return patient, condition
+
+
+@perf.traced()
+def read_study_header(path: PathLike) -> Dict[str, Any]:
+    """
+    Catalogue fields of one DICOM file, read without its pixel data
+
+    Args:
+        path: DICOM file
+
+    Returns:
+        Dictionary keyed like the studies table columns
+
+    Raises:
+        ValueError: If the file is not an image DICOM
+    """
+    scanned = scan_file(path)
+    if not scanned.is_image:
+        raise ValueError(scanned.error or f"Not a DICOM image: {path}")
+    patient, condition = parse_study_name(path)
+    return {
+        'patient_id': patient,
+        'condition': condition,
+        'manufacturer': scanned.manufacturer,
+        'model_name': scanned.model_name,
+        'fps': scanned.fps,
+        'n_frames': scanned.n_frames,
+        'rows': scanned.rows,
+        'columns': scanned.columns,
+        'photometric': scanned.photometric,
+        'transfer_syntax': scanned.transfer_syntax,
+        'regions': [
+            {'x0': r.x0, 'y0': r.y0, 'x1': r.x1, 'y1': r.y1, 'data_type': r.data_type, 'flags': r.flags}
+            for r in scanned.regions
+        ],
+    }
+
+
+def _header_or_error(path: str) -> Union[Dict[str, Any], Exception]:
+    try:
+        return read_study_header(path)
+    except Exception as e:
+        return e
+
+
+def _float(value) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+class StudyCatalog:
+    """
+    SQLite catalogue of studies (DICOM headers) and their fitted parameters
+
+    Example:
+        with StudyCatalog('cohort/catalog.sqlite') as cat:
+            cat.index('cohort/dicoms')
+            cat.run_batch(analyse)            # skips studies already done
+            cat.aggregate('AB', by='condition')
+    """
+
+    def __init__(self, path: PathLike = CATALOG_NAME):
+        """
+        Open (or create) a catalogue
+
+        Args:
+            path: SQLite file (':memory:' for a throwaway catalogue)
+        """
+        self.path = str(path)
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        if self.path != ':memory:':
+            self.conn.execute('PRAGMA journal_mode = WAL')
+        with self.conn:
+            self.conn.executescript(_SCHEMA)
+            self.conn.execute(f'PRAGMA user_version = {CATALOG_VERSION}')
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM studies').fetchone()[0]
+
+    @staticmethod
+    def _key(path: PathLike) -> str:
+        return str(Path(path).resolve())
+
+    def _study_id(self, path: PathLike) -> Optional[int]:
+        row = self.conn.execute('SELECT id FROM studies WHERE path = ?', (self._key(path),)).fetchone()
+        return None if row is None else row[0]
+
+    # -------------------------------------------------------------------------
+    # Indexing
+    # -------------------------------------------------------------------------
+    @perf.traced()
+    def index(
+        self,
+        paths: Union[PathLike, Iterable[PathLike]],
+        pattern: str = '*',
+        recursive: bool = True,
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, int]:
+        """
+        Add or refresh studies from files and directories
+
+        Files whose size and modification time match the catalogue are not
+        opened again. Files that are not DICOM images found while walking a
+        directory are ignored; explicitly listed ones are recorded as unreadable.
+
+        Args:
+            paths: File(s) and/or directory(ies)
+            pattern: Glob pattern for files inside directories
+            recursive: Walk sub-directories
+            workers: Header-reading threads (see dicom_scan.scan_paths)
+            progress: Optional callback(headers read, headers to read)
+
+        Returns:
+            Counts: {'added', 'updated', 'unchanged', 'unreadable', 'ignored'}
+        """
+        if isinstance(paths, (str, Path)):
+            paths = [paths]
+        files: List[Tuple[Path, bool]] = []
+        for p in map(Path, paths):
+            if p.is_dir():
+                files.extend(
+                    (f, False) for f in list_files(p, recursive, pattern, workers)
+                    if not f.name.startswith(CATALOG_NAME)
+                )
+            else:
+                files.append((p, True))
+
+        known = {
+            row['path']: (row['size'], row['mtime'], row['status'])
+            for row in self.conn.execute('SELECT path, size, mtime, status FROM studies')
+        }
+        counts = dict.fromkeys(('added', 'updated', 'unchanged', 'unreadable', 'ignored'), 0)
+        changed = []
+        for file, explicit in files:
+            key = self._key(file)
+            try:
+                st = os.stat(key)
+            except OSError:
+                counts['ignored'] += 1
+                continue
+            previous = known.get(key)
+            if previous is not None and previous[:2] == (st.st_size, st.st_mtime):
+                counts['unchanged'] += 1
+            else:
+                changed.append((key, st, explicit, previous is not None))
+
+        # Only new or modified files are opened (headers read in parallel)
+        headers = scan_paths([c[0] for c in changed], workers=workers, scan=_header_or_error)
+        now = time.time()
+        with self.conn:
+            for k, ((key, st, explicit, known_before), header) in enumerate(zip(changed, headers)):
+                if isinstance(header, Exception):
+                    if not explicit and not known_before:
+                        counts['ignored'] += 1
+                    else:
+                        self._upsert(key, st, {}, UNREADABLE, str(header), now)
+                        counts['unreadable'] += 1
+                else:
+                    # A modified file has to be analysed again
+                    self._upsert(key, st, header, PENDING, None, now)
+                    counts['updated' if known_before else 'added'] += 1
+                if progress is not None:
+                    progress(k + 1, len(changed))
+        return counts
+
+    def _upsert(self, key: str, st: os.stat_result, header: Dict[str, Any], status: str,
+                message: Optional[str], now: float) -> None:
+        values = {c: header.get(c) for c in _HEADER_COLUMNS}
+        values['regions'] = json.dumps(values['regions']) if values['regions'] is not None else None
+        if not header:
+            values['patient_id'], values['condition'] = parse_study_name(key)
+        study_id = self._study_id(key)
+        if study_id is not None:
+            self.conn.execute('DELETE FROM results WHERE study_id = ?', (study_id,))
+        columns = ('path', 'size', 'mtime') + _HEADER_COLUMNS + ('status', 'message', 'indexed_at', 'processed_at')
+        row = (key, st.st_size, st.st_mtime) + tuple(values[c] for c in _HEADER_COLUMNS) + (status, message, now, None)
+        updates = ', '.join(f'{c} = excluded.{c}' for c in columns[1:])
+        self.conn.execute(
+            f"INSERT INTO studies ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (path) DO UPDATE SET {updates}",
+            row,
+        )
+
+    def _ensure(self, path: PathLike) -> int:
+        """Study id, indexing the file first if needed"""
+        study_id = self._study_id(path)
+        if study_id is None:
+            self.index([path])
+            study_id = self._study_id(path)
+        if study_id is None:
+            raise KeyError(f"Study not in catalogue: {path}")
+        return study_id
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+    def studies(self, status: Optional[str] = None, condition: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Catalogued studies (regions decoded from JSON), ordered by path
+
+        Args:
+            status: Only studies with this status
+            condition: Only studies with this condition
+        """
+        query, params = 'SELECT * FROM studies', []
+        clauses = []
+        if status is not None:
+            clauses.append('status = ?')
+            params.append(status)
+        if condition is not None:
+            clauses.append('condition = ?')
+            params.append(condition)
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        out = []
+        for row in self.conn.execute(query + ' ORDER BY path', params):
+            study = dict(row)
+            study['regions'] = json.loads(study['regions']) if study['regions'] else []
+            out.append(study)
+        return out
+
+    def pending(self) -> List[str]:
+        """Paths of readable studies that have not been analysed successfully"""
+        rows = self.conn.execute(
+            'SELECT path FROM studies WHERE status IN (?, ?) ORDER BY path', (PENDING, FAILED))
+        return [row[0] for row in rows]
+
+    def results(self, path: Optional[PathLike] = None) -> List[Dict[str, Any]]:
+        """Fitted parameters as rows (path, patient_id, condition, roi, parameter, value)"""
+        query = (
+            'SELECT s.path, s.patient_id, s.condition, r.roi, r.parameter, r.value '
+            'FROM results r JOIN studies s ON s.id = r.study_id'
+        )
+        params: tuple = ()
+        if path is not None:
+            query += ' WHERE s.path = ?'
+            params = (self._key(path),)
+        return [dict(row) for row in self.conn.execute(query + ' ORDER BY s.path, r.roi, r.parameter', params)]
+
+    def aggregate(
+        self,
+        parameter: str,
+        by: str = 'condition',
+        roi: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Summary of one fitted parameter per group, computed in SQLite
+
+        Args:
+            parameter: Parameter name (e.g. 'AB', 'A', 'R-squared')
+            by: 'condition', 'patient_id', 'manufacturer' or 'roi'
+            roi: Only this ROI label (default: every ROI)
+
+        Returns:
+            One row per group: {by, 'studies', 'n', 'mean', 'std', 'min', 'max'}
+        """
+        if by not in _GROUP_COLUMNS:
+            raise ValueError(f"Cannot group by '{by}' (expected one of {_GROUP_COLUMNS})")
+        group = 'r.roi' if by == 'roi' else f's.{by}'
+        query = (
+            f'SELECT {group} AS grp, COUNT(DISTINCT s.id) AS studies, COUNT(r.value) AS n, '
+            'AVG(r.value) AS mean, SUM(r.value * r.value) AS sumsq, MIN(r.value) AS min, MAX(r.value) AS max '
+            'FROM results r JOIN studies s ON s.id = r.study_id '
+            'WHERE r.parameter = ? AND r.value IS NOT NULL'
+        )
+        params: list = [parameter]
+        if roi is not None:
+            query += ' AND r.roi = ?'
+            params.append(roi)
+        out = []
+        for row in self.conn.execute(query + f' GROUP BY {group} ORDER BY {group}', params):
+            n, mean = row['n'], row['mean']
+            # Sample standard deviation from the sums (SQLite has no STDEV)
+            var = (row['sumsq'] - n * mean * mean) / (n - 1) if n > 1 else math.nan
+            out.append({
+                by: row['grp'], 'studies': row['studies'], 'n': n, 'mean': mean,
+                'std': math.sqrt(max(var, 0.0)) if n > 1 else math.nan,
+                'min': row['min'], 'max': row['max'],
+            })
+        return out
+
+    # -------------------------------------------------------------------------
+    # Results and batch processing
+    # -------------------------------------------------------------------------
+    def set_status(self, path: PathLike, status: str, message: Optional[str] = None) -> None:
+        study_id = self._ensure(path)
+        with self.conn:
+            self.conn.execute(
+                'UPDATE studies SET status = ?, message = ?, processed_at = ? WHERE id = ?',
+                (status, message, time.time(), study_id),
+            )
+
+    def record_results(self, path: PathLike, parameters: Mapping[str, Mapping[str, float]]) -> None:
+        """
+        Replace the fitted parameters of a study and mark it done
+
+        Args:
+            path: Study file (indexed first if needed)
+            parameters: {roi: {parameter: value}}; non-finite values are stored as NULL
+        """
+        study_id = self._ensure(path)
+        rows = []
+        for roi, values in parameters.items():
+            for name, value in values.items():
+                rows.append((study_id, str(roi), str(name), _float(value)))
+        with self.conn:
+            self.conn.execute('DELETE FROM results WHERE study_id = ?', (study_id,))
+            self.conn.executemany('INSERT INTO results VALUES (?, ?, ?, ?)', rows)
+            self.conn.execute(
+                'UPDATE studies SET status = ?, message = NULL, processed_at = ? WHERE id = ?',
+                (DONE, time.time(), study_id),
+            )
+
+    def run_batch(
+        self,
+        process: Callable[[str], Mapping[str, Mapping[str, float]]],
+        force: bool = False,
+        progress: Optional[Callable[[int, int, str], None]] = None
+    ) -> Dict[str, int]:
+        """
+        Analyse catalogued studies, skipping those already done
+
+        Args:
+            process: Called with a study path, returns {roi: {parameter: value}}
+            force: Re-run studies that are already done
+            progress: Optional callback(done, total, path)
+
+        Returns:
+            Counts: {'processed', 'failed', 'skipped'}
+        """
+        if force:
+            todo = [s['path'] for s in self.studies() if s['status'] != UNREADABLE]
+        else:
+            todo = self.pending()
+        counts = {'processed': 0, 'failed': 0, 'skipped': len(self) - len(todo)}
+        for k, path in enumerate(todo):
+            try:
+                with perf.span('catalog.process', study=Path(path).name):
+                    parameters = process(path)
+            except Exception as e:
+                self.set_status(path, FAILED, str(e))
+                counts['failed'] += 1
+            else:
+                self.record_results(path, parameters or {})
+                counts['processed'] += 1
+            if progress is not None:
+                progress(k + 1, len(todo), path)
+        return counts
@@ -5,8 +5,22 @@ Extracts B-mode and CEUS stacks from DICOM files (GE + SuperSonic compatible)
 import numpy as np
 import pydicom
 from pathlib import Path
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, Iterator
 from src.utils.converters import ycbcr_to_rgb
+from src.core.frame_stats import FrameStats
+from src.core.dicom_scan import find_clip
+from src.core.row_reader import RowReader
+from src.core.frame_decoder import FrameDecoder
+from src.utils import perf
+
+try:
+    # pydicom >= 3: per-frame decoding straight from the file
+    from pydicom.pixels import iter_pixels as _iter_pixels, pixel_array as _pixel_array
+except Exception:
+    _iter_pixels = None
+    _pixel_array = None
+# pydicom >= 3 already returns YBR pixel data as RGB (as_rgb=True by default)
+_DECODES_YBR_TO_RGB = _iter_pixels is not None
 
 
 def _color_variance(stack: np.ndarray) -> float:
@@ -43,7 +57,27 @@ class DICOMLoader:
         self.ceus_stack: Optional[np.ndarray] = None
         self.bmode_region_idx: Optional[int] = None
         self.ceus_region_idx: Optional[int] = None
+        # Progressive loading state (see open() / iter_load())
+        self.n_frames: int = 0
+        self.frames_loaded: int = 0
+        self.ceus_intensity: Optional[np.ndarray] = None
+        # Per-frame statistics filled while decoding (ceus_intensity is their mean)
+        self.ceus_stats: Optional[FrameStats] = None
+        self.bmode_stats: Optional[FrameStats] = None
+        self._region_boxes: Dict[str, Optional[tuple]] = {}
+        self._frame_iter = None
+        self._frames_read: int = 0
+        self._full_array: Optional[np.ndarray] = None
+        self._stream_frames: bool = _iter_pixels is not None
+        # Region-only decoding (native files): rows [r0, r1) cover every region
+        self._row_reader: Optional[RowReader] = None
+        self._row_band: Tuple[int, int] = (0, 0)
+        self._band_boxes: Dict[str, Optional[tuple]] = {}
+        # Encapsulated (JPEG/RLE) files: chunks of frames decoded on a pool
+        self._frame_decoder: Optional[FrameDecoder] = None
+        self._decode_buffer: Optional[np.ndarray] = None
         
+    @perf.traced('dicom.load')
     def load(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
         """
         Load DICOM and extract B-mode/CEUS stacks
@@ -51,15 +85,36 @@ class DICOMLoader:
         Returns:
             Tuple (bmode_stack, ceus_stack)
         """
-        # Find DICOM file
+        self.open()
+        for _ in self.iter_load():
+            pass
+        return self.bmode_stack, self.ceus_stack
+    
+    @perf.traced('dicom.open')
+    def open(self) -> int:
+        """
+        Read header, decode the first frame and preallocate the stacks
+        
+        After open(), bmode_stack/ceus_stack have their final shape but only
+        frame 0 is filled; iter_load() decodes the remaining frames in order.
+        
+        Returns:
+            Number of frames in the file
+        """
+        # Find DICOM file (headers only: CEUS clips preferred over other files)
         if self.dicom_path.is_dir():
-            files = sorted([p for p in self.dicom_path.glob('*') if p.is_file()])
-            if not files:
-                raise FileNotFoundError(f"No file found in {self.dicom_path}")
-            self.dicom_path = files[0]
+            clip = find_clip(self.dicom_path)
+            if clip is None:
+                raise FileNotFoundError(f"No DICOM image found in {self.dicom_path}")
+            self.dicom_path = clip.path
         
-        # Read DICOM
-        self.ds = pydicom.dcmread(str(self.dicom_path), force=True)
+        # Read header only when frames can be decoded one by one from the file
+        self._frame_iter = None
+        self._frames_read = 0
+        self._full_array = None
+        self.ds = pydicom.dcmread(
+            str(self.dicom_path), force=True, stop_before_pixels=_iter_pixels is not None
+        )
         
         # Extract metadata
         self.metadata = {
@@ -78,105 +133,289 @@ class DICOMLoader:
             'InstitutionName': getattr(self.ds, 'InstitutionName', None),
         }
         
-        # Extract pixel array
-        arr = self.ds.pixel_array
+        try:
+            self.n_frames = max(1, int(self.metadata.get('NumberOfFrames') or 1))
+        except (TypeError, ValueError):
+            self.n_frames = 1
         
-        # Extract regions
-        self._extract_regions(arr)
+        # pydicom 3.0 iter_pixels() steps through native YBR_FULL_422 data with
+        # the 3-sample frame size: decode those frames by index instead
+        syntax = getattr(getattr(self.ds, 'file_meta', None), 'TransferSyntaxUID', None)
+        native_422 = (
+            self.metadata['PhotometricInterpretation'] == 'YBR_FULL_422'
+            and syntax is not None and not syntax.is_compressed
+        )
+        self._stream_frames = _iter_pixels is not None and not native_422
+        self._close_frame_decoder()
+        if _iter_pixels is not None and syntax is not None and syntax.is_encapsulated:
+            self._frame_decoder = FrameDecoder.open(self.dicom_path, as_rgb=_DECODES_YBR_TO_RGB)
+            if self._frame_decoder is not None:
+                self._stream_frames = False
         
-        return self.bmode_stack, self.ceus_stack
+        first = self._next_frame()
+        # Region classification needs a representative (middle) frame
+        mid = self.n_frames // 2
+        sample = first if mid == 0 else self._decode_frame(mid)
+        self._setup_regions(first, sample)
+        
+        self._open_row_reader()
+        if self._row_reader is not None:
+            self._close_frame_decoder()
+        
+        self.frames_loaded = 0
+        self._store_frame(0, first)
+        self.frames_loaded = 1
+        perf.count('frames_decoded')
+        return self.n_frames
     
-    def _extract_regions(self, arr: np.ndarray):
-        """Extract B-mode and CEUS from DICOM regions"""
-        regions = getattr(self.ds, 'SequenceOfUltrasoundRegions', None)
+    def iter_load(self, chunk: int = 8) -> Iterator[int]:
+        """
+        Decode the remaining frames in order into the preallocated stacks
         
-        if regions is None or len(regions) == 0:
-            # Fallback: use entire array as CEUS
-            self.ceus_stack = self._convert_colorspace(arr)
+        Args:
+            chunk: Number of frames decoded between two yields
+            
+        Yields:
+            Number of frames available so far (frames [0, n) are valid)
+        """
+        chunk = max(1, int(chunk))
+        if self._frame_decoder is not None:
+            # Keep every decoding worker busy
+            chunk = max(chunk, self._frame_decoder.batch)
+        while self.frames_loaded < self.n_frames:
+            stop = min(self.n_frames, self.frames_loaded + chunk)
+            with perf.span('dicom.decode', frames=stop - self.frames_loaded):
+                if self._row_reader is not None:
+                    r0, r1 = self._row_band
+                    for k in range(self.frames_loaded, stop):
+                        self._store_frame(k, self._row_reader.read_rows(k, r0, r1), self._band_boxes)
+                elif self._frame_decoder is not None:
+                    frames = self._decode_chunk(range(self.frames_loaded, stop))
+                    for i, k in enumerate(range(self.frames_loaded, stop)):
+                        self._store_frame(k, frames[i])
+                else:
+                    for k in range(self.frames_loaded, stop):
+                        self._store_frame(k, self._next_frame())
+            perf.count('frames_decoded', stop - self.frames_loaded)
+            self.frames_loaded = stop
+            yield stop
+        self._frame_iter = None
+        self._full_array = None
+        self._close_row_reader()
+        self._close_frame_decoder()
+    
+    def _decode_chunk(self, indices: range) -> np.ndarray:
+        """Decode a chunk of frames in parallel into a reused buffer"""
+        decoder = self._frame_decoder
+        n = len(indices)
+        if self._decode_buffer is None or len(self._decode_buffer) < n:
+            self._decode_buffer = np.empty((n,) + tuple(decoder.frame_shape), dtype=decoder.dtype)
+        return decoder.decode(indices, out=self._decode_buffer)
+    
+    def _close_frame_decoder(self):
+        if self._frame_decoder is not None:
+            self._frame_decoder.close()
+            self._frame_decoder = None
+        self._decode_buffer = None
+    
+    def _open_row_reader(self):
+        """Read later frames as row bands when the regions leave rows unused"""
+        self._close_row_reader()
+        if self.n_frames < 2 or not self._region_boxes:
+            return
+        boxes = list(self._region_boxes.values())
+        if any(box is None for box in boxes):
+            return
+        r0 = min(box[0] for box in boxes)
+        r1 = max(box[1] for box in boxes)
+        H = int(self.metadata.get('Rows') or 0)
+        if r1 - r0 >= H:
+            # Full-height regions: streaming whole frames is as fast
+            return
+        reader = RowReader.open(self.dicom_path, as_rgb=_DECODES_YBR_TO_RGB)
+        if reader is None:
+            return
+        self._row_reader = reader
+        self._row_band = (r0, r1)
+        self._band_boxes = {
+            kind: (box[0] - r0, box[1] - r0, box[2], box[3]) for kind, box in self._region_boxes.items()
+        }
+        perf.count('row_band_fraction', (r1 - r0) / H)
+    
+    def _close_row_reader(self):
+        if self._row_reader is not None:
+            self._row_reader.close()
+            self._row_reader = None
+    
+    def _next_frame(self) -> np.ndarray:
+        """Next frame in file order (pydicom >= 3 streams them from disk)"""
+        if self._stream_frames and self._full_array is None:
+            try:
+                if self._frame_iter is None:
+                    self._frame_iter = _iter_pixels(str(self.dicom_path))
+                frame = next(self._frame_iter)
+                self._frames_read += 1
+                return frame
+            except Exception:
+                # Fall back to a full decode (e.g. files pydicom cannot stream)
+                self._frame_iter = None
+                self._load_full_array()
+        frame = self._decode_frame(self._frames_read)
+        self._frames_read += 1
+        return frame
+    
+    def _decode_frame(self, index: int) -> np.ndarray:
+        """Decode a single frame by index"""
+        if self._frame_decoder is not None:
+            return self._frame_decoder.decode_frame(index)
+        if self._full_array is None and _pixel_array is not None:
+            try:
+                return _pixel_array(str(self.dicom_path), index=index)
+            except Exception:
+                self._load_full_array()
+        if self._full_array is None:
+            self._load_full_array()
+        arr = self._full_array
+        return arr if self.n_frames == 1 else arr[index]
+    
+    def _load_full_array(self):
+        """Decode every frame at once (pydicom < 3 or non-streamable files)"""
+        if self._full_array is not None:
             return
+        if getattr(self.ds, 'PixelData', None) is None:
+            self.ds = pydicom.dcmread(str(self.dicom_path), force=True)
+        self._full_array = self.ds.pixel_array
+    
+    def _setup_regions(self, first: np.ndarray, sample: np.ndarray):
+        """Classify regions and preallocate B-mode/CEUS stacks"""
+        self._region_boxes = {}
+        regions = getattr(self.ds, 'SequenceOfUltrasoundRegions', None)
         
-        # Parse all regions
-        all_regions = []
-        for i, reg in enumerate(regions):
-            dtype = getattr(reg, 'RegionDataType', None)
-            flags = getattr(reg, 'RegionFlags', None)
-            x0 = getattr(reg, 'RegionLocationMinX0', None)
-            y0 = getattr(reg, 'RegionLocationMinY0', None)
-            x1 = getattr(reg, 'RegionLocationMaxX1', None)
-            y1 = getattr(reg, 'RegionLocationMaxY1', None)
-            
-            if None in [x0, y0, x1, y1]:
-                continue
-            
-            # Clip coordinates
-            H, W = arr.shape[1], arr.shape[2]
-            x0 = max(0, min(int(x0), W - 1))
-            y0 = max(0, min(int(y0), H - 1))
-            x1 = max(0, min(int(x1), W - 1))
-            y1 = max(0, min(int(y1), H - 1))
-            
-            if x0 >= x1 or y0 >= y1:
-                continue
-            
-            # Extract region
-            if arr.ndim == 4:
-                region_stack = arr[:, y0:y1+1, x0:x1+1, :]
-            else:
-                region_stack = arr[:, y0:y1+1, x0:x1+1]
+        if regions is None or len(regions) == 0:
+            # Fallback: use entire frame as CEUS
+            self._region_boxes['ceus'] = None
+        else:
+            # Parse all regions
+            all_regions = []
+            H, W = first.shape[0], first.shape[1]
+            for i, reg in enumerate(regions):
+                dtype = getattr(reg, 'RegionDataType', None)
+                flags = getattr(reg, 'RegionFlags', None)
+                x0 = getattr(reg, 'RegionLocationMinX0', None)
+                y0 = getattr(reg, 'RegionLocationMinY0', None)
+                x1 = getattr(reg, 'RegionLocationMaxX1', None)
+                y1 = getattr(reg, 'RegionLocationMaxY1', None)
+                
+                if None in [x0, y0, x1, y1]:
+                    continue
+                
+                # Clip coordinates
+                x0 = max(0, min(int(x0), W - 1))
+                y0 = max(0, min(int(y0), H - 1))
+                x1 = max(0, min(int(x1), W - 1))
+                y1 = max(0, min(int(y1), H - 1))
+                
+                if x0 >= x1 or y0 >= y1:
+                    continue
+                
+                box = (y0, y1 + 1, x0, x1 + 1)
+                # One-frame stack used for colour-variance classification
+                region_sample = self._convert_colorspace(sample[None, box[0]:box[1], box[2]:box[3]])
+                all_regions.append((i, dtype, flags, x0, region_sample, box))
             
-            all_regions.append((i, dtype, flags, x0, region_stack))
+            # Classify regions
+            bmode, ceus = self._classify_regions(all_regions)
+            if ceus is not None:
+                self._region_boxes['ceus'] = ceus[5]
+            if bmode is not None:
+                self._region_boxes['bmode'] = bmode[5]
         
-        # Classify regions
-        self._classify_regions(all_regions)
+        # Preallocate stacks with the converted frame-0 layout
+        self.bmode_stack = None
+        self.ceus_stack = None
+        self.ceus_stats = None
+        self.bmode_stats = None
+        for kind, box in self._region_boxes.items():
+            crop = self._crop_frame(first, box)
+            stack = np.empty((self.n_frames,) + crop.shape, dtype=crop.dtype)
+            if kind == 'ceus':
+                self.ceus_stack = stack
+                self.ceus_stats = FrameStats.for_stack(stack)
+            else:
+                self.bmode_stack = stack
+                self.bmode_stats = FrameStats.for_stack(stack)
+        # Live view of the CEUS mean trace (NaN until each frame is decoded)
+        self.ceus_intensity = (
+            self.ceus_stats.mean if self.ceus_stats is not None
+            else np.full(self.n_frames, np.nan, dtype=np.float64)
+        )
+    
+    def _crop_frame(self, frame: np.ndarray, box: Optional[tuple]) -> np.ndarray:
+        """Region of one frame, colour-converted like the full stacks"""
+        if box is not None:
+            frame = frame[box[0]:box[1], box[2]:box[3]]
+        return self._convert_colorspace(frame[None])[0]
+    
+    def _store_frame(self, index: int, frame: np.ndarray, boxes: Optional[Dict[str, Optional[tuple]]] = None):
+        """Write one decoded frame (or row band, with boxes relative to it) into the preallocated stacks"""
+        boxes = self._region_boxes if boxes is None else boxes
+        if self.ceus_stack is not None:
+            self.ceus_stack[index] = self._crop_frame(frame, boxes.get('ceus'))
+            # Mean over pixels and channels (same as detect_flash_ceus_refined), plus
+            # percentiles and channel stats, while the frame is still in cache
+            self.ceus_stats.update(index, self.ceus_stack[index])
+        if self.bmode_stack is not None:
+            self.bmode_stack[index] = self._crop_frame(frame, boxes.get('bmode'))
+            self.bmode_stats.update(index, self.bmode_stack[index])
     
-    def _classify_regions(self, all_regions: list):
-        """Classify regions as B-mode or CEUS (GE = position, others = color variance)"""
-        manufacturer = getattr(self.ds, 'Manufacturer', '').lower()
+    def _classify_regions(self, all_regions: list) -> Tuple[Optional[tuple], Optional[tuple]]:
+        """Classify regions as B-mode or CEUS (GE = position, others = color variance)
+        
+        Returns:
+            Tuple (bmode_region, ceus_region) of entries from all_regions (or None)
+        """
+        manufacturer = (getattr(self.ds, 'Manufacturer', '') or '').lower()
         
         # Separate by DataType
-        type2_regions = [(idx, stack) for idx, dtype, flags, x0, stack in all_regions if dtype == 2]
-        type1_regions = [(idx, flags, x0, stack) for idx, dtype, flags, x0, stack in all_regions if dtype == 1]
+        type2_regions = [r for r in all_regions if r[1] == 2]
+        type1_regions = [r for r in all_regions if r[1] == 1]
         
         # Case 1: Explicit CEUS (DataType=2)
         if len(type2_regions) > 0:
-            self.ceus_region_idx, ceus_stack = type2_regions[0]
-            self.ceus_stack = self._convert_colorspace(ceus_stack)
-            
+            ceus = type2_regions[0]
+            self.ceus_region_idx = ceus[0]
+            bmode = None
             if len(type1_regions) > 0:
-                self.bmode_region_idx, _, _, bmode_stack = type1_regions[0]
-                self.bmode_stack = self._convert_colorspace(bmode_stack)
-            return
+                bmode = type1_regions[0]
+                self.bmode_region_idx = bmode[0]
+            return bmode, ceus
         
         # Case 2: Split-screen (2× DataType=1)
         if len(type1_regions) >= 2:
             if 'ge' in manufacturer:
                 # GE: classify by position (rightmost = CEUS)
-                sorted_regions = sorted(type1_regions, key=lambda x: x[2])
-                self.bmode_region_idx, _, _, bmode_stack = sorted_regions[0]
-                self.ceus_region_idx, _, _, ceus_stack = sorted_regions[1]
+                sorted_regions = sorted(type1_regions, key=lambda r: r[3])
+                bmode, ceus = sorted_regions[0], sorted_regions[1]
             else:
                 # Others: classify by color variance (highest = CEUS)
-                scores = [(idx, x0, stack, _color_variance(stack))
-                         for idx, flags, x0, stack in type1_regions]
-                scores.sort(key=lambda x: x[3], reverse=True)
-                
-                self.ceus_region_idx, _, ceus_stack, _ = scores[0]
-                self.bmode_region_idx, _, bmode_stack, _ = scores[1]
-            
-            self.ceus_stack = self._convert_colorspace(ceus_stack)
-            self.bmode_stack = self._convert_colorspace(bmode_stack)
-            return
+                scores = sorted(type1_regions, key=lambda r: _color_variance(r[4]), reverse=True)
+                ceus, bmode = scores[0], scores[1]
+            self.ceus_region_idx = ceus[0]
+            self.bmode_region_idx = bmode[0]
+            return bmode, ceus
         
         # Case 3: Single region → treat as CEUS
         if len(all_regions) == 1:
             self.ceus_region_idx = all_regions[0][0]
-            self.ceus_stack = self._convert_colorspace(all_regions[0][4])
+            return None, all_regions[0]
+        
+        return None, None
     
     def _convert_colorspace(self, stack: np.ndarray) -> np.ndarray:
-        """Convert YBR to RGB if needed"""
+        """Convert YBR to RGB if needed (frames decoded by pydicom >= 3 are RGB already)"""
         photo = getattr(self.ds, 'PhotometricInterpretation', None)
         
-        if photo and 'YBR' in str(photo) and stack.ndim == 4:
+        if photo and 'YBR' in str(photo) and stack.ndim == 4 and not _DECODES_YBR_TO_RGB:
             return np.stack([ycbcr_to_rgb(f) for f in stack], axis=0)
         
         return stack
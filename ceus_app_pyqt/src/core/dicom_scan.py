@@ -0,0 +1,302 @@
+"""
+Header-only DICOM scanning
+Walks directory trees on a thread pool, reads each header up to PixelData and
+classifies files (CEUS clip, other cine, single frame, non-image), so a clip
+and its region layout can be chosen without decoding any pixels.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple, Union
+
+import pydicom
+from src.utils import perf
+
+# File kinds, best clip candidates first
+CEUS = 'ceus'              # multi-frame with a contrast or split-screen region layout
+MULTIFRAME = 'multiframe'  # other multi-frame image (cine loop)
+SINGLE = 'single'          # single-frame image
+NON_IMAGE = 'non-image'    # DICOM without pixel rows (SR, DICOMDIR, ...)
+NOT_DICOM = 'not-dicom'
+KINDS = (CEUS, MULTIFRAME, SINGLE, NON_IMAGE, NOT_DICOM)
+
+# Values larger than this are not read from the header (parsed lazily if accessed)
+DEFER_SIZE = '4 KB'
+
+PathLike = Union[str, Path]
+
+
+@dataclass(frozen=True)
+class UltrasoundRegion:
+    """One item of SequenceOfUltrasoundRegions (inclusive pixel bounds)"""
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+    data_type: Optional[int] = None
+    flags: Optional[int] = None
+
+    @property
+    def box(self) -> Tuple[int, int, int, int]:
+        """(y0, y1, x0, x1) slice bounds"""
+        return (self.y0, self.y1 + 1, self.x0, self.x1 + 1)
+
+
+@dataclass(frozen=True)
+class ScannedFile:
+    """Header summary of one file"""
+    path: Path
+    kind: str
+    size: int = 0
+    n_frames: int = 0
+    rows: Optional[int] = None
+    columns: Optional[int] = None
+    photometric: Optional[str] = None
+    transfer_syntax: Optional[str] = None
+    manufacturer: Optional[str] = None
+    model_name: Optional[str] = None
+    fps: Optional[float] = None
+    regions: Tuple[UltrasoundRegion, ...] = ()
+    error: Optional[str] = None
+
+    @property
+    def is_image(self) -> bool:
+        return self.kind in (CEUS, MULTIFRAME, SINGLE)
+
+
+def _number(value, cast=float):
+    try:
+        return cast(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value) -> Optional[str]:
+    return str(value) if value not in (None, '') else None
+
+
+def frame_rate(ds) -> Optional[float]:
+    """Frame rate from a header (FrameTime, then CineRate, then RecommendedDisplayFrameRate)"""
+    frame_time = _number(getattr(ds, 'FrameTime', None))
+    if frame_time:
+        return 1000.0 / frame_time
+    for keyword in ('CineRate', 'RecommendedDisplayFrameRate'):
+        rate = _number(getattr(ds, keyword, None))
+        if rate:
+            return rate
+    return None
+
+
+def ultrasound_regions(ds) -> Tuple[UltrasoundRegion, ...]:
+    """Regions with complete bounds from SequenceOfUltrasoundRegions"""
+    out = []
+    for reg in getattr(ds, 'SequenceOfUltrasoundRegions', None) or []:
+        bounds = [_number(getattr(reg, k, None), int) for k in (
+            'RegionLocationMinX0', 'RegionLocationMinY0', 'RegionLocationMaxX1', 'RegionLocationMaxY1')]
+        if None in bounds:
+            continue
+        out.append(UltrasoundRegion(
+            *bounds,
+            data_type=_number(getattr(reg, 'RegionDataType', None), int),
+            flags=_number(getattr(reg, 'RegionFlags', None), int),
+        ))
+    return tuple(out)
+
+
+def _has_preamble(path: str) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(128)
+        return f.read(4) == b'DICM'
+
+
+def _classify(n_frames: int, rows: Optional[int], regions: Tuple[UltrasoundRegion, ...]) -> str:
+    if rows is None:
+        return NON_IMAGE
+    if n_frames <= 1:
+        return SINGLE
+    # Explicit contrast region (RegionDataType 2) or B-mode/CEUS side by side
+    types = [r.data_type for r in regions]
+    if 2 in types or types.count(1) >= 2:
+        return CEUS
+    return MULTIFRAME
+
+
+@perf.traced()
+def scan_file(path: PathLike) -> ScannedFile:
+    """
+    Read one file's header (never its pixel data) and classify it
+
+    Args:
+        path: File to scan
+
+    Returns:
+        ScannedFile (kind NOT_DICOM with the error message if unreadable)
+    """
+    path = Path(path)
+    try:
+        size = path.stat().st_size
+        # Files without the 128-byte preamble are accepted if they parse as a dataset
+        force = not _has_preamble(str(path))
+        ds = pydicom.dcmread(str(path), stop_before_pixels=True, force=force, defer_size=DEFER_SIZE)
+        if force and 'SOPClassUID' not in ds and 'Rows' not in ds:
+            return ScannedFile(path, NOT_DICOM, size=size)
+    except Exception as e:
+        return ScannedFile(path, NOT_DICOM, error=str(e) or type(e).__name__)
+
+    rows = _number(getattr(ds, 'Rows', None), int)
+    n_frames = (_number(getattr(ds, 'NumberOfFrames', None), int) or 1) if rows is not None else 0
+    regions = ultrasound_regions(ds)
+    syntax = getattr(getattr(ds, 'file_meta', None), 'TransferSyntaxUID', None)
+    return ScannedFile(
+        path, _classify(n_frames, rows, regions), size=size,
+        n_frames=n_frames, rows=rows,
+        columns=_number(getattr(ds, 'Columns', None), int),
+        photometric=_text(getattr(ds, 'PhotometricInterpretation', None)),
+        transfer_syntax=_text(syntax),
+        manufacturer=_text(getattr(ds, 'Manufacturer', None)),
+        model_name=_text(getattr(ds, 'ManufacturerModelName', None)),
+        fps=frame_rate(ds),
+        regions=regions,
+    )
+
+
+def _list_dir(directory: str) -> Tuple[List[str], List[str]]:
+    """(sub-directories, files) of a directory, hidden entries skipped"""
+    dirs, files = [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir():
+                        dirs.append(entry.path)
+                    elif entry.is_file():
+                        files.append(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return dirs, files
+
+
+def _default_workers() -> int:
+    # Header reads are I/O bound: more threads than cores pays off on network drives
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+@perf.traced()
+def list_files(
+    root: PathLike,
+    recursive: bool = True,
+    pattern: str = '*',
+    workers: Optional[int] = None
+) -> List[Path]:
+    """
+    Files of a directory tree (hidden entries skipped), directories listed in parallel
+
+    Returns:
+        Sorted file paths
+    """
+    files: List[str] = []
+    with ThreadPoolExecutor(max_workers=workers or _default_workers()) as pool:
+        listings = {pool.submit(_list_dir, str(root))}
+        while listings:
+            done, listings = wait(listings, return_when=FIRST_COMPLETED)
+            for future in done:
+                dirs, names = future.result()
+                if recursive:
+                    listings.update(pool.submit(_list_dir, d) for d in dirs)
+                files.extend(f for f in names if fnmatch(os.path.basename(f), pattern))
+    return [Path(f) for f in sorted(files)]
+
+
+@perf.traced()
+def scan_paths(
+    paths: Iterable[PathLike],
+    workers: Optional[int] = None,
+    scan: Callable[[str], object] = scan_file
+) -> list:
+    """
+    Apply a header reader to many files on a thread pool
+
+    Args:
+        paths: Files to read
+        workers: Thread count (default: 4 per CPU, at most 32)
+        scan: Function called with each path (default: scan_file)
+
+    Returns:
+        Results in input order
+    """
+    paths = [str(p) for p in paths]
+    if len(paths) <= 1:
+        return [scan(p) for p in paths]
+    with ThreadPoolExecutor(max_workers=workers or _default_workers()) as pool:
+        return list(pool.map(scan, paths))
+
+
+@perf.traced()
+def scan_directory(
+    root: PathLike,
+    recursive: bool = True,
+    pattern: str = '*',
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[int], None]] = None
+) -> List[ScannedFile]:
+    """
+    Walk a directory tree and scan every file, listing and reading in parallel
+
+    Sub-directory listings and header reads share one thread pool, so deep
+    trees and slow (network) drives are explored concurrently.
+
+    Args:
+        root: Directory (a file is scanned on its own)
+        recursive: Descend into sub-directories
+        pattern: Glob pattern matched against file names
+        workers: Thread count (default: 4 per CPU, at most 32)
+        progress: Optional callback(files scanned so far)
+
+    Returns:
+        ScannedFile list sorted by path
+    """
+    root = Path(root)
+    if not root.is_dir():
+        return [scan_file(root)]
+    results: List[ScannedFile] = []
+    with ThreadPoolExecutor(max_workers=workers or _default_workers()) as pool:
+        listings = {pool.submit(_list_dir, str(root))}
+        scans = set()
+        while listings or scans:
+            done, _ = wait(listings | scans, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in listings:
+                    listings.discard(future)
+                    dirs, files = future.result()
+                    if recursive:
+                        listings.update(pool.submit(_list_dir, d) for d in dirs)
+                    scans.update(pool.submit(scan_file, f) for f in files if fnmatch(os.path.basename(f), pattern))
+                else:
+                    scans.discard(future)
+                    results.append(future.result())
+                    if progress is not None:
+                        progress(len(results))
+    results.sort(key=lambda r: str(r.path))
+    return results
+
+
+def pick_clip(scanned: Iterable[ScannedFile]) -> Optional[ScannedFile]:
+    """
+    Best file to load: CEUS clips first, then other cine loops, then single
+    frames; the longest clip wins, then the first path
+    """
+    candidates = [s for s in scanned if s.is_image]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda s: (KINDS.index(s.kind), -s.n_frames, str(s.path)))
+
+
+def find_clip(directory: PathLike, recursive: bool = False, workers: Optional[int] = None) -> Optional[ScannedFile]:
+    """Scan a directory and return its best clip (see pick_clip), or None"""
+    return pick_clip(scan_directory(directory, recursive=recursive, workers=workers))
@@ -3,13 +3,17 @@ Flash and washout detection module
 Detects microbubble destruction flash and true reperfusion start
 """
 import numpy as np
-from typing import Tuple
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from src.utils import perf
 
 
+@perf.traced()
 def detect_flash_ceus_refined(
-    ceus_stack: np.ndarray,
+    ceus_stack: Optional[np.ndarray],
     exclude_first_n: int = 5,
-    search_window: int = 20
+    search_window: int = 20,
+    intensities: Optional[np.ndarray] = None
 ) -> Tuple[int, int, np.ndarray]:
     """
     Detect flash (microbubble destruction) and washout (darkest frame)
@@ -18,12 +22,17 @@ def detect_flash_ceus_refined(
         ceus_stack: CEUS video stack (T, H, W, C) or (T, H, W)
         exclude_first_n: Number of initial frames to exclude
         search_window: Search window after flash for washout detection
+        intensities: Optional precomputed mean intensity per frame (e.g. the
+            partial trace filled while a DICOM is still loading); when given,
+            ceus_stack is not read
         
     Returns:
         Tuple of (flash_idx, washout_idx, intensities)
     """
     # Calculate mean intensity per frame
-    if ceus_stack.ndim == 4:
+    if intensities is not None:
+        intensities = np.asarray(intensities, dtype=np.float64)
+    elif ceus_stack.ndim == 4:
         intensities = ceus_stack.mean(axis=(1, 2, 3))
     else:
         intensities = ceus_stack.mean(axis=(1, 2))
@@ -41,3 +50,248 @@ def detect_flash_ceus_refined(
     washout_idx = search_start + np.argmin(intensities[search_start:search_end])
     
     return int(flash_idx), int(washout_idx), intensities
+
+
+@dataclass(frozen=True)
+class FlashCandidate:
+    """One destruction flash of a multi-flash clip"""
+    frame: int      # frame before the intensity drop (as detect_flash_ceus_refined)
+    washout: int    # darkest frame in the search window after the flash
+    drop: float     # intensity drop over the flash (positive)
+    score: float    # drop in robust standard deviations of the gradient noise
+
+
+@perf.traced()
+def detect_flashes(
+    intensities: np.ndarray,
+    exclude_first_n: int = 5,
+    search_window: int = 20,
+    min_drop: float = 4.0,
+    min_distance: Optional[int] = None
+) -> List[FlashCandidate]:
+    """
+    Detect every destruction flash of a clip
+
+    Flashes are peaks of the negative intensity gradient (find_peaks on the
+    derivative of the per-frame trace) whose height stands out from the
+    gradient noise by at least min_drop robust sigmas.
+
+    Args:
+        intensities: Mean intensity per frame (T,)
+        exclude_first_n: Number of initial frames to exclude
+        search_window: Search window after each flash for washout detection
+        min_drop: Detection threshold in robust sigmas of the gradient
+        min_distance: Minimum number of frames between two flashes
+            (default: search_window)
+
+    Returns:
+        Flashes in frame order, each with a confidence score
+    """
+    from scipy.signal import find_peaks
+
+    y = np.asarray(intensities, dtype=np.float64).reshape(-1)
+    T = y.size
+    if T < 3:
+        return []
+    start = min(int(exclude_first_n), T // 10)
+    drops = -np.diff(y)
+    med = np.median(drops[start:])
+    sigma = 1.4826 * float(np.median(np.abs(drops[start:] - med)))
+    if sigma <= 0:
+        sigma = max(float(np.std(drops[start:])), 1e-12)
+    distance = max(1, int(min_distance if min_distance is not None else search_window))
+    # Leading frames are excluded by flattening them below any threshold
+    signal = drops.copy()
+    signal[:start] = -np.inf
+    peaks, props = find_peaks(signal, height=max(min_drop * sigma, 0.0), distance=distance)
+    flashes = []
+    for i, k in enumerate(peaks):
+        # Washout search stops at the next flash
+        end = min(T, k + int(search_window))
+        if i + 1 < len(peaks):
+            end = min(end, int(peaks[i + 1]) + 1)
+        washout = int(k + np.argmin(y[k:end]))
+        flashes.append(FlashCandidate(int(k), washout, float(drops[k]), float(drops[k] / sigma)))
+    return flashes
+
+
+@perf.traced()
+def segment_cycles(
+    flashes: List[FlashCandidate],
+    n_frames: int,
+    min_frames: int = 2
+) -> List[Tuple[int, int]]:
+    """
+    Destruction-replenishment cycles of a clip
+
+    Args:
+        flashes: Output of detect_flashes
+        n_frames: Number of frames in the clip
+        min_frames: Cycles shorter than this are dropped
+
+    Returns:
+        (start, stop) frame ranges, stop excluded: from each washout to the
+        next flash (or the end of the clip)
+    """
+    cycles = []
+    for i, flash in enumerate(flashes):
+        stop = flashes[i + 1].frame + 1 if i + 1 < len(flashes) else int(n_frames)
+        if stop - flash.washout >= min_frames:
+            cycles.append((flash.washout, stop))
+    return cycles
+
+
+def frame_intensity(frame: np.ndarray, stride: int = 1) -> float:
+    """
+    Mean intensity of one frame (over pixels and channels)
+
+    Args:
+        frame: Frame (H, W) or (H, W, C)
+        stride: Spatial subsampling step (1 = every pixel)
+
+    Returns:
+        Mean intensity
+    """
+    stride = max(int(stride), 1)
+    return float(np.asarray(frame)[::stride, ::stride].mean(dtype=np.float64))
+
+
+@dataclass(frozen=True)
+class FlashEvent:
+    """Flash or washout frame determined by OnlineFlashDetector"""
+    kind: str       # 'flash' or 'washout'
+    frame: int
+    value: float    # intensity gradient (flash) or intensity (washout)
+
+
+class OnlineFlashDetector:
+    """
+    Flash / washout detection on a stream of frames
+
+    Consumes one mean intensity (or one frame) at a time and keeps the most
+    negative intensity gradient seen so far. A candidate flash is reported
+    once search_window frames have followed it without a stronger drop and
+    the drop stands out from the gradient noise; its washout (darkest frame
+    in the search window) is reported with it. A later, stronger drop
+    supersedes it and is reported the same way.
+
+    finalize() gives the same result as detect_flash_ceus_refined on the
+    whole trace.
+
+    Example:
+        detector = OnlineFlashDetector(n_frames=len(stack))
+        for frame in frames:
+            for event in detector.push_frame(frame):
+                print(event.kind, event.frame)
+    """
+
+    def __init__(
+        self,
+        exclude_first_n: int = 5,
+        search_window: int = 20,
+        n_frames: Optional[int] = None,
+        min_drop: float = 4.0,
+        stride: int = 1
+    ):
+        """
+        Initialize detector
+
+        Args:
+            exclude_first_n: Number of initial frames to exclude
+            search_window: Search window after flash for washout detection
+                (also the number of frames needed to confirm a flash)
+            n_frames: Expected clip length if known (same start frame as the
+                batch detector for short clips)
+            min_drop: Minimum drop, in robust standard deviations of the
+                frame-to-frame gradient, for a flash to be reported
+            stride: Spatial subsampling step used by push_frame
+        """
+        self.exclude_first_n = int(exclude_first_n)
+        self.search_window = max(int(search_window), 1)
+        self.min_drop = float(min_drop)
+        self.stride = max(int(stride), 1)
+        self._start = min(self.exclude_first_n, int(n_frames) // 10) if n_frames else self.exclude_first_n
+        self._values: List[float] = []
+        self._best_k: Optional[int] = None
+        self._best_g = np.inf
+        self._checked_k: Optional[int] = None
+        self.flash_idx: Optional[int] = None
+        self.washout_idx: Optional[int] = None
+
+    @property
+    def intensities(self) -> np.ndarray:
+        return np.asarray(self._values, dtype=np.float64)
+
+    def push_frame(self, frame: np.ndarray) -> List[FlashEvent]:
+        """Add one frame (its strided mean intensity) and return the new events"""
+        return self.push(frame_intensity(frame, self.stride))
+
+    def extend(self, values) -> List[FlashEvent]:
+        """Add several mean intensities and return the new events"""
+        events: List[FlashEvent] = []
+        for v in np.asarray(values, dtype=np.float64).reshape(-1):
+            events.extend(self.push(v))
+        return events
+
+    def push(self, value: float) -> List[FlashEvent]:
+        """
+        Add the mean intensity of the next frame
+
+        Returns:
+            Events determined by this frame (usually empty)
+        """
+        self._values.append(float(value))
+        i = len(self._values) - 1
+        if i == 0:
+            return []
+        # Gradient k is the drop from frame k to frame k + 1 (flash = frame k)
+        k = i - 1
+        g = self._values[i] - self._values[k]
+        if k >= self._start and g < self._best_g:
+            self._best_g, self._best_k = g, k
+        if (
+            self._best_k is None
+            or self._best_k == self.flash_idx
+            or self._best_k == self._checked_k
+            or i - self._best_k < self.search_window
+        ):
+            return []
+        # Enough frames after the candidate: decide once per candidate
+        self._checked_k = self._best_k
+        if not self._is_significant():
+            return []
+        flash = self._best_k
+        window = self._values[flash:flash + self.search_window]
+        washout = flash + int(np.argmin(window))
+        self.flash_idx, self.washout_idx = flash, washout
+        return [
+            FlashEvent('flash', flash, float(self._best_g)),
+            FlashEvent('washout', washout, float(self._values[washout])),
+        ]
+
+    def _is_significant(self) -> bool:
+        """Candidate drop larger than min_drop robust sigmas of the other gradients"""
+        if not self._best_g < 0:
+            return False
+        grads = np.diff(np.asarray(self._values, dtype=np.float64))[self._start:]
+        others = np.delete(grads, self._best_k - self._start)
+        if others.size < 2:
+            return True
+        med = np.median(others)
+        sigma = 1.4826 * float(np.median(np.abs(others - med)))
+        return -self._best_g >= self.min_drop * sigma
+
+    def finalize(self) -> Tuple[int, int]:
+        """
+        Flash and washout over every frame pushed (end of stream)
+
+        Returns:
+            Tuple of (flash_idx, washout_idx), as detect_flash_ceus_refined
+        """
+        flash, washout, _ = detect_flash_ceus_refined(
+            None,
+            exclude_first_n=self.exclude_first_n,
+            search_window=self.search_window,
+            intensities=self.intensities,
+        )
+        return flash, washout
@@ -0,0 +1,323 @@
+"""
+Parallel decoding of encapsulated (compressed) pixel data
+Locates the JPEG/RLE/... frames of a multi-frame file from its item headers
+(without reading the pixel data into memory), then decodes frames on a pool
+into a preallocated array instead of pydicom's one-frame-after-another
+pixel_array. Decoders that hold the GIL (pydicom's RLE) run in worker
+processes, the others on threads.
+"""
+import mmap
+import os
+import struct
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pydicom
+from pydicom.encaps import encapsulate
+from pydicom.uid import RLELossless
+from src.utils import perf
+
+try:
+    from pydicom.pixels import get_decoder
+except ImportError:  # pydicom < 3: no stand-alone frame decoders
+    get_decoder = None
+
+_ITEM = 0xE000FFFE         # (FFFE,E000) little endian, read as uint32
+_SEQ_DELIMITER = 0xE0DDFFFE
+
+# Syntaxes whose decoder is pure Python (threads would not run concurrently)
+_GIL_BOUND = (RLELossless,)
+
+# Frames per task sent to worker processes
+_PROCESS_CHUNK = 4
+# Below this many pixels per decode call, thread overhead outweighs the gain
+_THREAD_MIN_PIXELS = 250_000
+# Starting worker processes costs about a second: only for large clips
+_PROCESS_MIN_PIXELS = 50_000_000
+
+# (offset, length) of a byte range in the file
+Span = Tuple[int, int]
+
+
+def _available_cpus() -> int:
+    try:
+        n = len(os.sched_getaffinity(0))
+    except AttributeError:
+        n = os.cpu_count() or 1
+    return max(1, min(n, 8))
+
+
+def _decode_options(ds, as_rgb: bool) -> Dict[str, object]:
+    """Pixel description passed to the decoder for a single frame"""
+    return {
+        'rows': int(ds.Rows),
+        'columns': int(ds.Columns),
+        'samples_per_pixel': int(getattr(ds, 'SamplesPerPixel', 1) or 1),
+        'bits_allocated': int(ds.BitsAllocated),
+        'bits_stored': int(getattr(ds, 'BitsStored', ds.BitsAllocated)),
+        'pixel_representation': int(getattr(ds, 'PixelRepresentation', 0) or 0),
+        'photometric_interpretation': str(ds.PhotometricInterpretation),
+        'planar_configuration': int(getattr(ds, 'PlanarConfiguration', 0) or 0),
+        'number_of_frames': 1,
+        'pixel_keyword': 'PixelData',
+        'as_rgb': as_rgb,
+    }
+
+
+def _read_items(buffer, offset: int) -> Optional[Tuple[bytes, List[Span]]]:
+    """Basic Offset Table and (offset, length) of each fragment after it"""
+    fragments = []
+    table = None
+    pos = offset
+    while pos + 8 <= len(buffer):
+        tag, length = struct.unpack_from('<II', buffer, pos)
+        pos += 8
+        if tag == _SEQ_DELIMITER:
+            return (table or b''), fragments
+        if tag != _ITEM or pos + length > len(buffer):
+            return None
+        if table is None:
+            table = bytes(buffer[pos:pos + length])
+        else:
+            fragments.append((pos, length))
+        pos += length
+    return None
+
+
+def _frame_spans(buffer, offset: int, n_frames: int) -> Optional[List[List[Span]]]:
+    """Fragments of each frame, grouped with the Basic Offset Table if needed"""
+    items = _read_items(buffer, offset)
+    if items is None:
+        return None
+    table, fragments = items
+    if len(fragments) == n_frames:
+        return [[f] for f in fragments]
+    if not table or not fragments:
+        return None
+    # Offsets are relative to the first fragment's item tag
+    first = fragments[0][0] - 8
+    starts = struct.unpack(f'<{len(table) // 4}I', table)
+    if len(starts) != n_frames:
+        return None
+    bounds = list(starts[1:]) + [float('inf')]
+    frames: List[List[Span]] = [[] for _ in range(n_frames)]
+    k = 0
+    for pos, length in fragments:
+        while pos - 8 - first >= bounds[k]:
+            k += 1
+        frames[k].append((pos, length))
+    return frames if all(frames) else None
+
+
+def _decode_one(syntax: str, options: Dict[str, object], frame: bytes) -> np.ndarray:
+    arr, _ = get_decoder(syntax).as_array(encapsulate([frame]), **options)
+    return arr
+
+
+def _decode_chunk(path: str, syntax: str, options: Dict[str, object], frames: List[List[Span]]) -> np.ndarray:
+    """Worker process entry point: read and decode several frames, stacked"""
+    out = []
+    with open(path, 'rb') as f:
+        for spans in frames:
+            data = b''
+            for pos, length in spans:
+                f.seek(pos)
+                data += f.read(length)
+            out.append(_decode_one(syntax, options, data))
+    return np.stack(out)
+
+
+class FrameDecoder:
+    """
+    Encoded frames of one file, decoded by index on a pool
+
+    Use FrameDecoder.open(); it returns None when the file is not encapsulated
+    or pydicom has no decoder for it (the loader then decodes as before).
+    Close the decoder (or use it as a context manager) to stop its pool and
+    release the file.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ds,
+        frames: List[List[Span]],
+        workers: Optional[int] = None,
+        processes: Optional[bool] = None,
+        as_rgb: bool = True
+    ):
+        self.path = Path(path)
+        self.syntax = str(ds.file_meta.TransferSyntaxUID)
+        self.n_frames = len(frames)
+        self.options = _decode_options(ds, as_rgb)
+        self.workers = max(1, int(workers or _available_cpus()))
+        if processes is None:
+            pixels = self.n_frames * int(ds.Rows) * int(ds.Columns)
+            processes = self.syntax in _GIL_BOUND and pixels >= _PROCESS_MIN_PIXELS
+        self.processes = processes
+        # Threads only help decoders that release the GIL
+        self.parallel = self.workers > 1 and (processes or self.syntax not in _GIL_BOUND)
+        self._spans = frames
+        self._file = open(self.path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._pool: Optional[Executor] = None
+        probe = self.decode_frame(0)
+        self.frame_shape = probe.shape
+        self.dtype = probe.dtype
+
+    @classmethod
+    def open(
+        cls,
+        path: Union[str, Path],
+        workers: Optional[int] = None,
+        processes: Optional[bool] = None,
+        as_rgb: bool = True
+    ) -> Optional['FrameDecoder']:
+        """
+        Decoder for a file, or None if it cannot be decoded here
+
+        Only the header and the fragment item headers are read; frames are
+        read from the file when decoded.
+
+        Args:
+            path: DICOM file
+            workers: Pool size (default: available CPUs, at most 8)
+            processes: Decode in worker processes instead of threads; default:
+                only for large clips whose decoder holds the GIL (RLE)
+            as_rgb: Return YBR colour data converted to RGB (like pydicom >= 3)
+        """
+        if get_decoder is None:
+            return None
+        try:
+            ds = pydicom.dcmread(str(path), defer_size=1024, force=True)
+            syntax = ds.file_meta.TransferSyntaxUID
+            if not syntax.is_encapsulated or not get_decoder(syntax).is_available:
+                return None
+            element = ds.get_item('PixelData', keep_deferred=True)
+            if element is None or getattr(element, 'value_tell', None) is None:
+                return None
+            n_frames = max(1, int(getattr(ds, 'NumberOfFrames', 1) or 1))
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                frames = _frame_spans(buffer, element.value_tell, n_frames)
+            if frames is None:
+                return None
+            return cls(path, ds, frames, workers=workers, processes=processes, as_rgb=as_rgb)
+        except Exception:
+            return None
+
+    def _frame_bytes(self, index: int) -> bytes:
+        return b''.join(self._map[pos:pos + length] for pos, length in self._spans[index])
+
+    def decode_frame(self, index: int) -> np.ndarray:
+        """Decode one frame in the calling thread"""
+        return _decode_one(self.syntax, self.options, self._frame_bytes(index))
+
+    @property
+    def batch(self) -> int:
+        """Frames per decode() call that keep every worker busy"""
+        if not self.parallel:
+            return 1
+        return self.workers * (_PROCESS_CHUNK if self.processes else 1)
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            if self.processes:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='frame-decode')
+        return self._pool
+
+    @perf.traced('dicom.decode_parallel')
+    def decode(self, indices: Optional[Sequence[int]] = None, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Decode frames into a preallocated array
+
+        Args:
+            indices: Frame indices (e.g. a range); default every frame
+            out: Array of shape (>= len(indices), *frame_shape) to fill,
+                allocated if None
+
+        Returns:
+            The filled frames, out[:len(indices)], in the order of indices
+        """
+        indices = list(range(self.n_frames) if indices is None else indices)
+        n = len(indices)
+        if out is None:
+            out = np.empty((n,) + tuple(self.frame_shape), dtype=self.dtype)
+        elif out.shape[0] < n or out.shape[1:] != tuple(self.frame_shape):
+            raise ValueError(f"Output array {out.shape} cannot hold {n} frames of {self.frame_shape}")
+        filled = out if out.shape[0] == n else out[:n]
+
+        pixels = n * int(np.prod(self.frame_shape[:2]))
+        if not self.parallel or n == 1 or (not self.processes and pixels < _THREAD_MIN_PIXELS):
+            for i, k in enumerate(indices):
+                filled[i] = self.decode_frame(k)
+        elif self.processes:
+            starts = range(0, n, _PROCESS_CHUNK)
+            futures = [
+                self._executor().submit(
+                    _decode_chunk, str(self.path), self.syntax, self.options,
+                    [self._spans[k] for k in indices[i:i + _PROCESS_CHUNK]]
+                )
+                for i in starts
+            ]
+            for i, fut in zip(starts, futures):
+                block = fut.result()
+                filled[i:i + len(block)] = block
+        else:
+            def fill(i: int) -> None:
+                filled[i] = self.decode_frame(indices[i])
+            # list() re-raises the first decoding error
+            list(self._executor().map(fill, range(n)))
+        perf.count('frames_decoded_parallel', n)
+        return filled
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'FrameDecoder':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def decode_frames(
+    path: Union[str, Path],
+    frames: Optional[Sequence[int]] = None,
+    workers: Optional[int] = None,
+    processes: Optional[bool] = None,
+    out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Decode the frames of an encapsulated multi-frame file in parallel
+
+    Args:
+        path: DICOM file (JPEG, RLE, ... transfer syntax)
+        frames: Frame indices or range to decode (default: all)
+        workers: Pool size (default: available CPUs, at most 8)
+        processes: Use worker processes instead of threads (default: for
+            large clips with a GIL-bound decoder)
+        out: Optional preallocated (>= n, H, W[, 3]) array to fill
+
+    Returns:
+        (n, H, W) or (n, H, W, 3) array
+
+    Raises:
+        ValueError: If the file is not encapsulated or has no available decoder
+    """
+    decoder = FrameDecoder.open(path, workers=workers, processes=processes)
+    if decoder is None:
+        raise ValueError(f"{path}: not encapsulated pixel data with an available decoder")
+    with decoder:
+        return decoder.decode(frames, out=out)
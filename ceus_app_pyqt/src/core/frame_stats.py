@@ -0,0 +1,206 @@
+"""
+Per-frame summary statistics
+Mean, percentiles and per-channel statistics of every frame of a stack,
+computed once (while decoding or in one pass) and shared by all consumers
+"""
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+from src.utils import perf
+
+# Percentiles kept for non-uint8 stacks (uint8 stacks keep exact histograms)
+DEFAULT_PERCENTILES = (1.0, 5.0, 50.0, 95.0, 99.0)
+
+
+class FrameStats:
+    """
+    Per-frame statistics of a (T, H, W) or (T, H, W, C) stack
+
+    uint8 frames are summarized by one 256-bin histogram per channel
+    (one bincount each), from which every statistic and any
+    percentile is exact. Other dtypes keep per-channel moments and extrema
+    plus DEFAULT_PERCENTILES. Frames not seen yet are NaN.
+
+    Example:
+        stats = FrameStats.from_stack(ceus_stack)
+        trace = stats.mean                 # same as ceus_stack.mean(axis=(1, 2, 3))
+        p95 = stats.percentile(95)
+    """
+
+    # Per-frame arrays saved by to_dict() (besides histograms / quantiles)
+    _ARRAYS = ('valid', 'mean', 'channel_mean', 'channel_std', 'channel_min', 'channel_max')
+
+    def __init__(
+        self,
+        n_frames: int,
+        n_channels: int = 1,
+        dtype=np.uint8,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES
+    ):
+        """
+        Initialize empty statistics
+
+        Args:
+            n_frames: Number of frames
+            n_channels: Channels per pixel (1 for grayscale stacks)
+            dtype: Stack dtype (uint8 enables exact histograms)
+            percentiles: Percentiles kept for non-uint8 stacks
+        """
+        self.n_frames = int(n_frames)
+        self.n_channels = max(int(n_channels), 1)
+        self.is_uint8 = np.dtype(dtype) == np.uint8
+        self.percentiles = tuple(float(q) for q in percentiles)
+        T, C = self.n_frames, self.n_channels
+        self.valid = np.zeros(T, dtype=bool)
+        # Mean over pixels and channels, filled as frames arrive
+        self.mean = np.full(T, np.nan, dtype=np.float64)
+        self.channel_mean = np.full((T, C), np.nan, dtype=np.float64)
+        self.channel_std = np.full((T, C), np.nan, dtype=np.float64)
+        self.channel_min = np.full((T, C), np.nan, dtype=np.float64)
+        self.channel_max = np.full((T, C), np.nan, dtype=np.float64)
+        if self.is_uint8:
+            self.histograms = np.zeros((T, C, 256), dtype=np.int32)
+            self._levels = np.arange(256, dtype=np.float64)
+        else:
+            self._quantiles = np.full((T, len(self.percentiles)), np.nan, dtype=np.float64)
+
+    @classmethod
+    def for_stack(cls, stack: np.ndarray, **kwargs) -> "FrameStats":
+        """Empty statistics sized for a stack (filled later with update())"""
+        C = stack.shape[3] if stack.ndim == 4 else 1
+        return cls(stack.shape[0], C, stack.dtype, **kwargs)
+
+    @classmethod
+    @perf.traced()
+    def from_stack(cls, stack: np.ndarray, chunk: int = 32, **kwargs) -> "FrameStats":
+        """
+        Statistics of a whole stack in one pass
+
+        Args:
+            stack: Image stack (T, H, W) or (T, H, W, C)
+            chunk: Frames summarized per step (non-uint8 stacks)
+        """
+        stats = cls.for_stack(stack, **kwargs)
+        if stats.is_uint8:
+            for i in range(stats.n_frames):
+                stats.update(i, stack[i])
+            return stats
+        for start in range(0, stats.n_frames, max(int(chunk), 1)):
+            block = np.asarray(stack[start:start + chunk])
+            n = block.shape[0]
+            flat = block.reshape(n, -1, stats.n_channels).astype(np.float64, copy=False)
+            stats._store_moments(slice(start, start + n), flat)
+            stats._quantiles[start:start + n] = np.percentile(
+                flat.reshape(n, -1), stats.percentiles, axis=1
+            ).T
+            stats.valid[start:start + n] = True
+        return stats
+
+    def update(self, index: int, frame: np.ndarray) -> None:
+        """Summarize one frame (e.g. right after it was decoded)"""
+        frame = np.asarray(frame)
+        if self.is_uint8:
+            # One bincount per channel straight on the uint8 values
+            pixels = frame.reshape(-1, self.n_channels)
+            for c in range(self.n_channels):
+                self.histograms[index, c] = np.bincount(pixels[:, c], minlength=256)
+            self._stats_from_histograms(slice(index, index + 1))
+        else:
+            flat = frame.reshape(1, -1, self.n_channels).astype(np.float64, copy=False)
+            self._store_moments(slice(index, index + 1), flat)
+            self._quantiles[index] = np.percentile(flat.reshape(-1), self.percentiles)
+        self.valid[index] = True
+
+    def _stats_from_histograms(self, rows: slice) -> None:
+        hist = self.histograms[rows].astype(np.float64)           # (n, C, 256)
+        count = hist.sum(axis=2)
+        s1 = hist @ self._levels
+        s2 = hist @ (self._levels ** 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = s1 / count
+            self.channel_mean[rows] = mean
+            self.channel_std[rows] = np.sqrt(np.maximum(s2 / count - mean ** 2, 0.0))
+            self.mean[rows] = s1.sum(axis=1) / count.sum(axis=1)
+        present = hist > 0
+        self.channel_min[rows] = np.where(present.any(axis=2), np.argmax(present, axis=2), np.nan)
+        self.channel_max[rows] = np.where(present.any(axis=2), 255 - np.argmax(present[..., ::-1], axis=2), np.nan)
+
+    def _store_moments(self, rows: slice, flat: np.ndarray) -> None:
+        """flat: (n, pixels, C) float64"""
+        self.channel_mean[rows] = flat.mean(axis=1)
+        self.channel_std[rows] = flat.std(axis=1)
+        self.channel_min[rows] = flat.min(axis=1)
+        self.channel_max[rows] = flat.max(axis=1)
+        self.mean[rows] = flat.reshape(flat.shape[0], -1).mean(axis=1)
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.valid.all())
+
+    def percentile(self, q: float) -> np.ndarray:
+        """
+        Per-frame percentile over pixels and channels
+
+        Args:
+            q: Percentile in [0, 100] (any value for uint8 stacks, one of
+                self.percentiles otherwise)
+
+        Returns:
+            (T,) float64 array (NaN for frames not seen yet)
+        """
+        q = float(q)
+        if not self.is_uint8:
+            if q not in self.percentiles:
+                raise ValueError(f"Percentile {q} not kept (available: {self.percentiles})")
+            return self._quantiles[:, self.percentiles.index(q)].copy()
+        cum = np.cumsum(self.histograms.sum(axis=1), axis=1)     # (T, 256)
+        total = cum[:, -1:]
+        # Linear interpolation between order statistics, like np.percentile
+        pos = q / 100.0 * (total - 1)
+        lo = (cum <= np.floor(pos)).sum(axis=1)
+        hi = (cum <= np.ceil(pos)).sum(axis=1)
+        frac = (pos - np.floor(pos))[:, 0]
+        out = lo + (hi - lo) * frac
+        return np.where(self.valid, out.astype(np.float64), np.nan)
+
+    def channel_stats(self, index: int) -> List[Tuple[float, float, float, float]]:
+        """(min, max, mean, std) per channel of one frame"""
+        return [
+            (float(self.channel_min[index, c]), float(self.channel_max[index, c]),
+             float(self.channel_mean[index, c]), float(self.channel_std[index, c]))
+            for c in range(self.n_channels)
+        ]
+
+    def head(self, n: int) -> Optional[np.ndarray]:
+        """Mean trace of the first n frames if they are all summarized, else None"""
+        n = min(int(n), self.n_frames)
+        if n <= 0 or not self.valid[:n].all():
+            return None
+        return self.mean[:n]
+
+    def to_dict(self) -> dict:
+        """Settings and arrays (e.g. to save them with a session)"""
+        out = {
+            'n_frames': self.n_frames,
+            'n_channels': self.n_channels,
+            'is_uint8': self.is_uint8,
+            'percentiles': list(self.percentiles),
+        }
+        for name in self._ARRAYS + (('histograms',) if self.is_uint8 else ('_quantiles',)):
+            out[name.lstrip('_')] = getattr(self, name)
+        return out
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "FrameStats":
+        """Statistics rebuilt from to_dict() output (arrays are used as given)"""
+        dtype = np.uint8 if state['is_uint8'] else np.float64
+        stats = cls(0, state['n_channels'], dtype, state['percentiles'])
+        stats.n_frames = int(state['n_frames'])
+        for name in cls._ARRAYS + (('histograms',) if stats.is_uint8 else ('_quantiles',)):
+            setattr(stats, name, np.asarray(state[name.lstrip('_')]))
+        return stats
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.mean, self.channel_mean, self.channel_std, self.channel_min, self.channel_max]
+        arrays.append(self.histograms if self.is_uint8 else self._quantiles)
+        return int(sum(a.nbytes for a in arrays))
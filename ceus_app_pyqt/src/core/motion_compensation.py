@@ -3,12 +3,14 @@ Motion compensation module
 Phase-correlation based registration for CEUS stacks
 """
 import numpy as np
-from typing import Tuple
+from typing import Callable, Optional, Tuple
 from skimage.registration import phase_cross_correlation
 from scipy.ndimage import shift as ndi_shift
 from src.utils.converters import to_gray
+from src.utils import perf
 
 
+@perf.traced('motion.reference')
 def _compute_reference(
     register_stack: np.ndarray,
     skip_first: int = 3,
@@ -37,10 +39,12 @@ def _compute_reference(
     return ref_gray, f"median[{start}:{end}]"
 
 
+@perf.traced('motion.estimate')
 def _estimate_shifts(
     register_stack: np.ndarray,
     ref_gray: np.ndarray,
-    upsample: int = 20
+    upsample: int = 20,
+    progress: Optional[Callable[[float, str], None]] = None
 ) -> np.ndarray:
     """
     Estimate shifts (dy, dx) between each frame and reference (subpixel)
@@ -49,6 +53,7 @@ def _estimate_shifts(
         register_stack: Stack to register
         ref_gray: Reference grayscale image
         upsample: Upsampling factor for subpixel precision
+        progress: Optional callback(fraction, message) called once per frame
         
     Returns:
         Shifts array (T, 2) with (dy, dx) per frame
@@ -63,15 +68,19 @@ def _estimate_shifts(
             upsample_factor=upsample
         )
         shifts[t] = (float(shift[0]), float(shift[1]))
+        if progress is not None:
+            progress((t + 1) / T, "Estimating motion...")
     
     return shifts
 
 
+@perf.traced('motion.apply')
 def _apply_shifts(
     target_stack: np.ndarray,
     shifts: np.ndarray,
     pad_mode: str = 'nearest',
-    order: int = 1
+    order: int = 1,
+    progress: Optional[Callable[[float, str], None]] = None
 ) -> np.ndarray:
     """
     Apply shifts (dy, dx) to each frame of target stack
@@ -81,6 +90,7 @@ def _apply_shifts(
         shifts: Shifts array (T, 2)
         pad_mode: Padding mode for shift
         order: Interpolation order
+        progress: Optional callback(fraction, message) called once per frame
         
     Returns:
         Transformed stack
@@ -103,16 +113,46 @@ def _apply_shifts(
             # Grayscale
             out[t] = ndi_shift(target_stack[t], shift=(dy, dx), 
                              order=order, mode=pad_mode)
+        if progress is not None:
+            progress((t + 1) / T, "Applying motion correction...")
     
     return out
 
 
+@perf.traced()
+def apply_shifts_to_stack(
+    target_stack: np.ndarray,
+    shifts: np.ndarray,
+    pad_mode: str = 'nearest',
+    order: int = 1,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> np.ndarray:
+    """
+    Apply previously estimated shifts to another stack (e.g. stabilize B-mode
+    with the shifts returned by motion_compensate)
+    
+    Args:
+        target_stack: Stack to transform (T, H, W) or (T, H, W, 3)
+        shifts: Shifts array (T, 2); extra rows are ignored
+        pad_mode: Padding mode for shift
+        order: Interpolation order
+        progress: Optional callback(fraction, message)
+        
+    Returns:
+        Transformed stack
+    """
+    T = min(len(target_stack), len(shifts))
+    return _apply_shifts(target_stack[:T], shifts[:T], pad_mode=pad_mode, order=order, progress=progress)
+
+
+@perf.traced()
 def motion_compensate(
     ceus_stack: np.ndarray,
     bmode_stack: np.ndarray = None,
     skip_first: int = 3,
     ref_window: int = 10,
-    upsample: int = 20
+    upsample: int = 20,
+    progress: Optional[Callable[[float, str], None]] = None
 ) -> Tuple[np.ndarray, np.ndarray, str]:
     """
     Motion compensate CEUS stack (optionally use B-mode for registration)
@@ -123,6 +163,8 @@ def motion_compensate(
         skip_first: Frames to skip for reference computation
         ref_window: Number of frames to median for reference
         upsample: Upsampling factor for subpixel precision
+        progress: Optional callback(fraction, message); estimation covers 0-0.7,
+            resampling 0.7-1. It may raise to abort the computation.
         
     Returns:
         Tuple of (ceus_corrected, shifts, source_info)
@@ -147,10 +189,15 @@ def motion_compensate(
     ref_gray, ref_info = _compute_reference(register_stack, skip_first, ref_window)
     
     # Estimate shifts on register_stack
-    shifts = _estimate_shifts(register_stack, ref_gray=ref_gray, upsample=upsample)
+    est_progress = None
+    apply_progress = None
+    if progress is not None:
+        est_progress = lambda f, msg: progress(0.7 * f, msg)
+        apply_progress = lambda f, msg: progress(0.7 + 0.3 * f, msg)
+    shifts = _estimate_shifts(register_stack, ref_gray=ref_gray, upsample=upsample, progress=est_progress)
     
     # Apply shifts on target_stack (CEUS)
-    ceus_corrected = _apply_shifts(target_stack, shifts, pad_mode='nearest', order=1)
+    ceus_corrected = _apply_shifts(target_stack, shifts, pad_mode='nearest', order=1, progress=apply_progress)
     
     source_info = "B-mode" if used_bmode else "CEUS"
     
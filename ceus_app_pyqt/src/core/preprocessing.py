@@ -3,11 +3,13 @@ CEUS preprocessing module
 Improves SNR through filtering, normalization, and background subtraction
 """
 import numpy as np
-from typing import Optional
+from typing import Callable, Optional
 from scipy.ndimage import median_filter, gaussian_filter, gaussian_filter1d
 from src.utils.converters import to_gray
+from src.utils import perf
 
 
+@perf.traced()
 def preprocess_ceus(
     stack: np.ndarray,
     use_log: bool = True,
@@ -16,7 +18,8 @@ def preprocess_ceus(
     spatial: Optional[str] = 'median',    # 'median'|'gaussian'|None
     temporal: Optional[str] = 'gaussian',  # 'gaussian'|'mean'|None
     t_win: int = 3,
-    baseline_frames: int = 5
+    baseline_frames: int = 5,
+    progress: Optional[Callable[[float, str], None]] = None
 ) -> np.ndarray:
     """
     Preprocess CEUS stack to improve SNR
@@ -29,17 +32,23 @@ def preprocess_ceus(
         temporal: Temporal filter ('gaussian', 'mean', or None)
         t_win: Temporal window size
         baseline_frames: Number of frames for baseline subtraction
+        progress: Optional callback(fraction, message) called after each stage
         
     Returns:
         Preprocessed stack (T, H, W) as float32
     """
     assert stack.ndim in (3, 4), "stack expected (T,H,W) or (T,H,W,3)"
     
+    def _report(fraction: float):
+        if progress is not None:
+            progress(fraction, "Preprocessing CEUS...")
+    
     X = stack.astype(np.float32)
     
     # Convert to grayscale if RGB
     if X.ndim == 4 and X.shape[-1] == 3:
         X = np.stack([to_gray(X[t]) for t in range(X.shape[0])], axis=0)
+    _report(0.15)
     
     # Normalization by global percentiles
     p1, p99 = np.percentile(X, [p_lo, p_hi])
@@ -51,12 +60,14 @@ def preprocess_ceus(
     if use_log:
         alpha = 20.0
         X = np.log1p(alpha * X) / np.log1p(alpha)
+    _report(0.3)
     
     # Spatial smoothing
     if spatial == 'median':
         X = median_filter(X, size=(1, 3, 3))
     elif spatial == 'gaussian':
         X = gaussian_filter(X, sigma=(0, 0.6, 0.6))
+    _report(0.7)
     
     # Background subtraction (baseline = median of N first frames)
     if baseline_frames is None:
@@ -68,6 +79,7 @@ def preprocess_ceus(
     if N > 0:
         baseline = np.median(X[:N], axis=0, keepdims=True)
         X = np.maximum(X - baseline, 0)
+    _report(0.8)
     
     # Temporal filter
     if temporal == 'gaussian' and X.shape[0] > 1:
@@ -84,5 +96,6 @@ def preprocess_ceus(
         for t in range(X.shape[0]):
             Y[t] = np.sum(X_pad[t:t+k] * kernel, axis=0)
         X = Y
+    _report(1.0)
     
     return X
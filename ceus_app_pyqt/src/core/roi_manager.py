@@ -4,7 +4,96 @@ ROI (Region of Interest) management module
 import numpy as np
 from typing import List, Tuple, Dict, Optional
 from dataclasses import dataclass, field
+from skimage.draw import polygon as sk_polygon
 from src.utils.validators import validate_roi
+from src.utils import perf
+
+
+@dataclass(frozen=True)
+class ROIMask:
+    """Rasterized ROI: sorted flat int32 indices into an (H, W) frame + bounding box"""
+    shape: Tuple[int, int]
+    indices: np.ndarray
+    bbox: Tuple[int, int, int, int]  # (y0, y1, x0, x1), half-open; empty ROI -> (0, 0, 0, 0)
+
+    @property
+    def n_pixels(self) -> int:
+        return int(self.indices.size)
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self.indices // self.shape[1]
+
+    @property
+    def cols(self) -> np.ndarray:
+        return self.indices % self.shape[1]
+
+    def to_mask(self) -> np.ndarray:
+        """Full (H, W) boolean mask"""
+        mask = np.zeros(self.shape, dtype=bool)
+        mask.reshape(-1)[self.indices] = True
+        return mask
+
+    def bbox_mask(self) -> np.ndarray:
+        """Boolean mask restricted to the bounding box"""
+        y0, y1, x0, x1 = self.bbox
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+        mask[self.rows - y0, self.cols - x0] = True
+        return mask
+
+    def bbox_indices(self) -> np.ndarray:
+        """Flat indices relative to the bounding box (for cropped frames)"""
+        y0, y1, x0, x1 = self.bbox
+        return ((self.rows - y0) * (x1 - x0) + (self.cols - x0)).astype(np.int32)
+
+
+@perf.traced()
+def rasterize_polygon(polygon: list, shape: Tuple[int, int]) -> ROIMask:
+    """
+    Rasterize a polygon once into compact flat indices
+
+    Args:
+        polygon: Points [(x, y), ...]
+        shape: Frame shape (H, W)
+
+    Returns:
+        ROIMask (pixels outside the frame are clipped)
+    """
+    shape = (int(shape[0]), int(shape[1]))
+    if polygon is None or len(polygon) == 0:
+        return ROIMask(shape, np.zeros(0, dtype=np.int32), (0, 0, 0, 0))
+    xs = [pt[0] for pt in polygon]
+    ys = [pt[1] for pt in polygon]
+    rr, cc = sk_polygon(ys, xs, shape=shape)
+    if rr.size == 0:
+        return ROIMask(shape, np.zeros(0, dtype=np.int32), (0, 0, 0, 0))
+    indices = np.unique(rr.astype(np.int64) * shape[1] + cc).astype(np.int32)
+    bbox = (int(rr.min()), int(rr.max()) + 1, int(cc.min()), int(cc.max()) + 1)
+    return ROIMask(shape, indices, bbox)
+
+
+def union_bbox(masks) -> Optional[Tuple[int, int, int, int]]:
+    """Bounding box (y0, y1, x0, x1) covering all non-empty masks, or None"""
+    boxes = [m.bbox for m in masks if m.n_pixels > 0]
+    if not boxes:
+        return None
+    return (
+        min(b[0] for b in boxes), max(b[1] for b in boxes),
+        min(b[2] for b in boxes), max(b[3] for b in boxes),
+    )
+
+
+# Colors assigned to new ROIs in turn
+ROI_COLORS = [
+    (255, 0, 0),    # Red
+    (0, 255, 0),    # Green
+    (0, 0, 255),    # Blue
+    (255, 255, 0),  # Yellow
+    (255, 0, 255),  # Magenta
+    (0, 255, 255),  # Cyan
+    (255, 128, 0),  # Orange
+    (128, 0, 255),  # Purple
+]
 
 
 @dataclass
@@ -12,10 +101,30 @@ class ROI:
     """Region of Interest polygone"""
     def __init__(self, label, polygon, color=(255,0,0), visible=True, metadata=None):
         self.label = label
+        self._masks: Dict[Tuple[int, int], ROIMask] = {}
         self.polygon = polygon  # Liste de points [(x, y), ...]
         self.color = color
         self.visible = visible
         self.metadata = metadata or {}
+
+    @property
+    def polygon(self) -> list:
+        return self._polygon
+
+    @polygon.setter
+    def polygon(self, value: list):
+        # New geometry: cached rasterizations are stale
+        self._polygon = value
+        self._masks = {}
+
+    def mask(self, shape: Tuple[int, int]) -> ROIMask:
+        """Rasterized ROI for a frame shape (computed once per polygon and shape)"""
+        key = (int(shape[0]), int(shape[1]))
+        cached = self._masks.get(key)
+        if cached is None:
+            cached = rasterize_polygon(self._polygon, key)
+            self._masks[key] = cached
+        return cached
     @property
     def area(self) -> float:
         # Aire du polygone (algorithme de Shoelace)
@@ -45,17 +154,7 @@ class ROIManager:
             label = f"ROI_{self._next_id}"
             self._next_id += 1
         if color is None:
-            colors = [
-                (255, 0, 0),    # Red
-                (0, 255, 0),    # Green
-                (0, 0, 255),    # Blue
-                (255, 255, 0),  # Yellow
-                (255, 0, 255),  # Magenta
-                (0, 255, 255),  # Cyan
-                (255, 128, 0),  # Orange
-                (128, 0, 255),  # Purple
-            ]
-            color = colors[len(self.rois) % len(colors)]
+            color = ROI_COLORS[len(self.rois) % len(ROI_COLORS)]
         roi = ROI(label=label, polygon=polygon, color=color)
         self.rois.append(roi)
         return roi
@@ -95,6 +194,18 @@ class ROIManager:
                 return roi
         return None
     
+    def masks(self, shape: Tuple[int, int]) -> Dict[str, ROIMask]:
+        """Rasterized ROIs {label: ROIMask} for a frame shape (cached per ROI)"""
+        return {roi.label: roi.mask(shape) for roi in self.rois}
+
+    def set_polygon(self, label: str, polygon: list) -> bool:
+        """Replace the polygon of an ROI (invalidates only its cached mask)"""
+        roi = self.get_roi(label)
+        if roi is None:
+            return False
+        roi.polygon = polygon
+        return True
+
     def get_all_visible(self) -> List[ROI]:
         """Get all visible ROIs"""
         return [roi for roi in self.rois if roi.visible]
@@ -0,0 +1,126 @@
+"""
+Row-band pixel reading
+Reads only the rows of a frame that intersect the regions of interest,
+straight from native (uncompressed) pixel data through a memory map.
+Split-screen clips skip their UI margins instead of decoding full frames.
+"""
+import mmap
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import pydicom
+
+try:
+    from pydicom.pixels import convert_color_space
+except ImportError:  # pydicom < 3
+    from pydicom.pixel_data_handlers.util import convert_color_space
+
+# Photometric interpretations returned as stored (colour ones optionally as RGB)
+_SUPPORTED = ('MONOCHROME1', 'MONOCHROME2', 'RGB', 'YBR_FULL', 'YBR_FULL_422')
+
+
+class RowReader:
+    """
+    Frame row bands read from a DICOM file without decoding whole frames
+
+    Use RowReader.open(); it returns None for files it cannot read (compressed
+    syntaxes, samples wider than 8 bits, big endian, ...), in which case frames
+    are decoded in full as before.
+    """
+
+    def __init__(self, path: Path, ds, offset: int, as_rgb: bool):
+        self.path = Path(path)
+        self.rows = int(ds.Rows)
+        self.columns = int(ds.Columns)
+        self.samples = int(getattr(ds, 'SamplesPerPixel', 1) or 1)
+        self.n_frames = max(1, int(getattr(ds, 'NumberOfFrames', 1) or 1))
+        self.photometric = str(getattr(ds, 'PhotometricInterpretation', 'MONOCHROME2'))
+        self.planar = int(getattr(ds, 'PlanarConfiguration', 0) or 0)
+        self.as_rgb = as_rgb
+        self._file = open(self.path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._native = self._native_view(offset)
+
+    @classmethod
+    def open(cls, path: Union[str, Path], as_rgb: bool = True) -> Optional['RowReader']:
+        """
+        Reader for a file, or None if its pixel data layout is not supported
+
+        Args:
+            path: DICOM file
+            as_rgb: Return YBR colour data converted to RGB (like pydicom >= 3)
+        """
+        try:
+            ds = pydicom.dcmread(str(path), defer_size=1024, force=True)
+            syntax = ds.file_meta.TransferSyntaxUID
+            element = ds.get_item('PixelData', keep_deferred=True)
+            if (element is None or getattr(element, 'value_tell', None) is None
+                    or int(getattr(ds, 'BitsAllocated', 0)) != 8
+                    or str(getattr(ds, 'PhotometricInterpretation', '')) not in _SUPPORTED
+                    or not syntax.is_little_endian or syntax.is_compressed):
+                return None
+            samples = int(getattr(ds, 'SamplesPerPixel', 1) or 1)
+            if ds.PhotometricInterpretation == 'YBR_FULL_422':
+                samples = 2
+            frames = max(1, int(getattr(ds, 'NumberOfFrames', 1) or 1))
+            if element.length < frames * int(ds.Rows) * int(ds.Columns) * samples:
+                return None
+            return cls(path, ds, element.value_tell, as_rgb)
+        except Exception:
+            return None
+
+    def _native_view(self, offset: int) -> np.ndarray:
+        """(frames, rows, ...) view of the native pixel data in the memory map"""
+        T, H, W, S = self.n_frames, self.rows, self.columns, self.samples
+        if self.photometric == 'YBR_FULL_422':
+            shape = (T, H, W // 2, 4)        # Y0 Y1 Cb Cr per pair of pixels
+        elif S == 1:
+            shape = (T, H, W)
+        elif self.planar == 1:
+            shape = (T, S, H, W)
+        else:
+            shape = (T, H, W, S)
+        return np.ndarray(shape, dtype=np.uint8, buffer=self._map, offset=offset)
+
+    def read_rows(self, index: int, r0: int, r1: int) -> np.ndarray:
+        """
+        Rows [r0, r1) of one frame
+
+        Args:
+            index: Frame index
+            r0, r1: Row range
+
+        Returns:
+            (r1 - r0, columns) or (r1 - r0, columns, 3) uint8; colour data
+            as RGB if as_rgb (a read-only view of the file when no conversion
+            is needed)
+        """
+        r0, r1 = max(0, int(r0)), min(self.rows, int(r1))
+        band = self._native_band(index, r0, r1)
+        if band.ndim == 3 and self.as_rgb and self.photometric.startswith('YBR'):
+            band = convert_color_space(band, 'YBR_FULL', 'RGB')
+        return band
+
+    def _native_band(self, index: int, r0: int, r1: int) -> np.ndarray:
+        frame = self._native[index]
+        if self.photometric == 'YBR_FULL_422':
+            pairs = frame[r0:r1]
+            band = np.empty((r1 - r0, self.columns, 3), dtype=np.uint8)
+            band[:, 0::2, 0] = pairs[..., 0]
+            band[:, 1::2, 0] = pairs[..., 1]
+            band[..., 1] = np.repeat(pairs[..., 2], 2, axis=1)
+            band[..., 2] = np.repeat(pairs[..., 3], 2, axis=1)
+            return band
+        if self.samples > 1 and self.planar == 1:
+            return np.moveaxis(frame[:, r0:r1], 0, -1)
+        return frame[r0:r1]
+
+    def close(self) -> None:
+        self._native = None
+        try:
+            self._map.close()
+        except (BufferError, ValueError):
+            # Views handed out still reference the map: it is released with them
+            pass
+        self._file.close()
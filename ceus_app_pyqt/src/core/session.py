@@ -0,0 +1,192 @@
+"""
+Analysis sessions
+Saves the state of an analysis (stacks, ROIs, TICs, fits ...) to a single
+file and restores it without decoding or registering anything again
+"""
+import json
+import os
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Union
+
+import numpy as np
+from src.utils import perf
+
+SESSION_VERSION = 1
+SESSION_SUFFIX = '.ceus'
+_META_NAME = 'session.json'
+# Key marking an array reference in the JSON tree
+_ARRAY_KEY = '__ndarray__'
+# Arrays at least this large are stored uncompressed so they can be memory-mapped
+MMAP_THRESHOLD = 1 << 20
+
+
+def _array_key(array: np.ndarray) -> tuple:
+    """Identity of an array's memory and layout (same key = same values)"""
+    return (array.__array_interface__['data'][0], array.shape, array.dtype.str, array.strides)
+
+
+class _Packer:
+    """Turns a state tree into JSON + a list of arrays to write"""
+
+    def __init__(self):
+        self.arrays: Dict[str, np.ndarray] = {}
+        self._seen: Dict[tuple, str] = {}
+
+    def pack(self, obj: Any) -> Any:
+        if isinstance(obj, dict):
+            return {str(k): self.pack(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [self.pack(v) for v in obj]
+        if isinstance(obj, np.ndarray):
+            if obj.ndim == 0:
+                return obj.item()
+            key = _array_key(obj)
+            name = self._seen.get(key)
+            if name is None:
+                # Arrays referenced several times (e.g. a display stack that is
+                # the primary stack itself) are written once
+                name = f"arrays/{len(self.arrays):04d}.npy"
+                self._seen[key] = name
+                self.arrays[name] = obj
+            return {_ARRAY_KEY: name}
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if obj is None or isinstance(obj, (bool, int, float, str)):
+            return obj
+        if isinstance(obj, Path):
+            return str(obj)
+        # Loader metadata may hold pydicom value types: keep their text
+        return str(obj)
+
+
+@perf.traced()
+def save_session(
+    path: Union[str, Path],
+    state: Dict[str, Any],
+    mmap_threshold: int = MMAP_THRESHOLD,
+    compresslevel: int = 6
+) -> Path:
+    """
+    Write an analysis state to a session file
+
+    The file is a ZIP container: the state tree as JSON (session.json) plus
+    one .npy member per array. Arrays of at least mmap_threshold bytes
+    (stacks) are stored uncompressed so load_session can memory-map them;
+    smaller ones (TICs, shifts, fit curves) are deflated. The file is written
+    next to its destination and moved into place once complete.
+
+    Args:
+        path: Destination file
+        state: Dict tree of JSON scalars, lists, dicts and NumPy arrays
+        mmap_threshold: Size in bytes from which arrays are stored uncompressed
+        compresslevel: Deflate level for small arrays and metadata
+
+    Returns:
+        Path of the written file
+    """
+    path = Path(path)
+    packer = _Packer()
+    meta = {'version': SESSION_VERSION, 'state': packer.pack(state)}
+    tmp = path.with_name(path.name + '.tmp')
+    try:
+        with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED, allowZip64=True, compresslevel=compresslevel) as zf:
+            zf.writestr(_META_NAME, json.dumps(meta))
+            for name, array in packer.arrays.items():
+                # Members opened by name are deflated (archive default)
+                member = name
+                if array.nbytes >= mmap_threshold:
+                    member = zipfile.ZipInfo(name)
+                    member.compress_type = zipfile.ZIP_STORED
+                # Streamed in blocks: no serialized copy of large stacks
+                with zf.open(member, 'w', force_zip64=True) as fp:
+                    np.lib.format.write_array(fp, np.asanyarray(array), allow_pickle=False)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return path
+
+
+def _stored_offset(path: Path, info: zipfile.ZipInfo) -> int:
+    """File offset of the data of an uncompressed member"""
+    with open(path, 'rb') as fp:
+        fp.seek(info.header_offset)
+        header = fp.read(30)
+        if header[:4] != b'PK\x03\x04':
+            raise ValueError(f"Corrupt session member {info.filename}")
+        name_len = int.from_bytes(header[26:28], 'little')
+        extra_len = int.from_bytes(header[28:30], 'little')
+        return info.header_offset + 30 + name_len + extra_len
+
+
+def _memmap_member(path: Path, info: zipfile.ZipInfo) -> np.ndarray:
+    """Read-only memory map of a stored .npy member (only its header is read)"""
+    start = _stored_offset(path, info)
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        version = np.lib.format.read_magic(fp)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(fp)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(fp)
+        offset = fp.tell()
+    if dtype.hasobject:
+        raise ValueError(f"Object array in session member {info.filename}")
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+    mm = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                   order='F' if fortran else 'C')
+    # Plain read-only ndarray view (the mapping stays alive through .base)
+    return np.asarray(mm)
+
+
+@perf.traced()
+def load_session(path: Union[str, Path], mmap: bool = True) -> Dict[str, Any]:
+    """
+    Read a session file written by save_session
+
+    Stored (large) arrays are memory-mapped: nothing is read until a frame
+    is accessed. Compressed (small) arrays are decoded. Every array is
+    read-only, and an array saved several times comes back as one object.
+
+    Args:
+        path: Session file
+        mmap: Memory-map large arrays (False reads them into memory)
+
+    Returns:
+        The state tree given to save_session (tuples come back as lists)
+    """
+    path = Path(path)
+    arrays: Dict[str, np.ndarray] = {}
+    with zipfile.ZipFile(path, 'r') as zf:
+        meta = json.loads(zf.read(_META_NAME))
+        version = int(meta.get('version', 0))
+        if version > SESSION_VERSION:
+            raise ValueError(f"Session version {version} is newer than supported ({SESSION_VERSION})")
+
+        def load_array(name: str) -> np.ndarray:
+            cached = arrays.get(name)
+            if cached is not None:
+                return cached
+            info = zf.getinfo(name)
+            if mmap and info.compress_type == zipfile.ZIP_STORED:
+                array = _memmap_member(path, info)
+            else:
+                with zf.open(info) as fp:
+                    array = np.lib.format.read_array(fp, allow_pickle=False)
+                array.flags.writeable = False
+            arrays[name] = array
+            return array
+
+        def unpack(obj: Any) -> Any:
+            if isinstance(obj, dict):
+                if set(obj) == {_ARRAY_KEY}:
+                    return load_array(obj[_ARRAY_KEY])
+                return {k: unpack(v) for k, v in obj.items()}
+            if isinstance(obj, list):
+                return [unpack(v) for v in obj]
+            return obj
+
+        return unpack(meta['state'])
+
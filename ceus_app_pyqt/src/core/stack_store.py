@@ -0,0 +1,246 @@
+"""
+Stack store
+Owns the image stacks of a study once, hands out read-only views and caches
+derived representations (grayscale, display) under a memory budget, plus the
+per-frame statistics of each stack
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+from src.core.frame_stats import FrameStats
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    """Read-only view of array (no copy; already read-only arrays are returned as-is)"""
+    if not array.flags.writeable:
+        return array
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+def _owner(array: np.ndarray) -> np.ndarray:
+    """Array owning the memory behind a chain of views"""
+    base = array
+    while isinstance(base.base, np.ndarray):
+        base = base.base
+    return base
+
+
+def format_bytes(n: float) -> str:
+    """Human readable size (MB below 1 GB, GB above)"""
+    if n >= 1024 ** 3:
+        return f"{n / 1024 ** 3:.2f} GB"
+    return f"{n / 1024 ** 2:.0f} MB"
+
+
+class StackStore:
+    """
+    Single owner of the stacks of a study
+
+    Primary stacks (raw CEUS, B-mode, preprocessed ...) are pinned: they stay
+    until replaced or removed. Derived representations are computed on first
+    request from a primary stack, cached, and evicted least-recently-used
+    when the cache exceeds the memory budget. A conversion that returns its
+    input unchanged costs nothing: the cached entry is a view of the primary.
+
+    Example:
+        store = StackStore(budget_bytes=2 * 1024 ** 3)
+        ceus = store.put('ceus', ceus_stack)
+        gray = store.derive('ceus', 'gray', to_gray_stack)
+    """
+
+    def __init__(self, budget_bytes: int = 2 * 1024 ** 3):
+        """
+        Initialize store
+
+        Args:
+            budget_bytes: Memory budget for derived representations
+        """
+        self.budget_bytes = int(budget_bytes)
+        self._primary: Dict[Hashable, np.ndarray] = {}
+        self._derived: "OrderedDict[Tuple[Hashable, Hashable], np.ndarray]" = OrderedDict()
+        # Per-frame statistics of primary stacks (small: kept until the primary changes)
+        self._stats: Dict[Hashable, FrameStats] = {}
+        # Derived entries may be requested from worker threads
+        self._lock = threading.RLock()
+
+    def put(self, key: Hashable, array: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Store (or replace) a primary stack
+
+        Args:
+            key: Stack name (e.g. 'ceus')
+            array: Stack; None removes the entry
+
+        Returns:
+            Read-only view of the stored stack (None if array is None)
+        """
+        with self._lock:
+            self._drop_derived(key)
+            if array is None:
+                self._primary.pop(key, None)
+                return None
+            view = _readonly(np.asarray(array))
+            self._primary[key] = view
+            return view
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        """Read-only view of a primary stack (the same object on every call)"""
+        with self._lock:
+            return self._primary.get(key)
+
+    def remove(self, key: Hashable) -> None:
+        self.put(key, None)
+
+    def derive(
+        self,
+        key: Hashable,
+        kind: Hashable,
+        fn: Callable[[np.ndarray], Optional[np.ndarray]]
+    ) -> Optional[np.ndarray]:
+        """
+        Derived representation of a primary stack, computed once
+
+        Args:
+            key: Primary stack name
+            kind: Representation name (e.g. 'gray', 'display')
+            fn: Conversion applied to the primary stack on a cache miss
+
+        Returns:
+            Read-only derived stack, or None if the primary is missing or
+            fn returned None
+        """
+        with self._lock:
+            cached = self._derived.get((key, kind))
+            if cached is not None:
+                self._derived.move_to_end((key, kind))
+                return cached
+            source = self._primary.get(key)
+        if source is None:
+            return None
+        # Compute outside the lock: conversions of large stacks take a while
+        value = fn(source)
+        if value is None:
+            return None
+        value = _readonly(np.asarray(value))
+        with self._lock:
+            if self._primary.get(key) is not source:
+                # Primary replaced meanwhile: result is stale, do not cache it
+                return value
+            self._derived[(key, kind)] = value
+            self._evict()
+            return value
+
+    def set_derived(self, key: Hashable, kind: Hashable, value: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Cache a derived representation computed elsewhere (e.g. in a worker)
+
+        Args:
+            key: Primary stack name
+            kind: Representation name
+            value: Derived stack; None drops the entry
+
+        Returns:
+            Read-only view of value
+        """
+        with self._lock:
+            if value is None:
+                self._derived.pop((key, kind), None)
+                return None
+            view = _readonly(np.asarray(value))
+            self._derived[(key, kind)] = view
+            self._derived.move_to_end((key, kind))
+            self._evict()
+            return view
+
+    def stats(self, key: Hashable) -> Optional[FrameStats]:
+        """
+        Per-frame statistics of a primary stack, computed once
+
+        Args:
+            key: Primary stack name
+
+        Returns:
+            FrameStats (cached until the primary is replaced), or None if the
+            primary is missing
+        """
+        with self._lock:
+            cached = self._stats.get(key)
+            if cached is not None:
+                return cached
+            source = self._primary.get(key)
+        if source is None:
+            return None
+        value = FrameStats.from_stack(source)
+        with self._lock:
+            if self._primary.get(key) is source:
+                self._stats[key] = value
+        return value
+
+    def set_stats(self, key: Hashable, stats: Optional[FrameStats]) -> None:
+        """Cache statistics computed elsewhere (e.g. while decoding); None drops them"""
+        with self._lock:
+            source = self._primary.get(key)
+            if stats is None or source is None:
+                self._stats.pop(key, None)
+                return
+            if stats.n_frames != source.shape[0]:
+                raise ValueError(f"Stats for {stats.n_frames} frames, stack '{key}' has {source.shape[0]}")
+            self._stats[key] = stats
+
+    def _drop_derived(self, key: Hashable) -> None:
+        for k in [k for k in self._derived if k[0] == key]:
+            del self._derived[k]
+        self._stats.pop(key, None)
+
+    def _evict(self) -> None:
+        while len(self._derived) > 1 and self.cache_nbytes > self.budget_bytes:
+            self._derived.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._primary.clear()
+            self._derived.clear()
+            self._stats.clear()
+
+    @staticmethod
+    def _unique_nbytes(arrays) -> int:
+        """Bytes of distinct buffers (views of the same memory count once)"""
+        owners = {}
+        for arr in arrays:
+            base = _owner(arr)
+            owners[id(base)] = base.nbytes
+        return int(sum(owners.values()))
+
+    @property
+    def pinned_nbytes(self) -> int:
+        with self._lock:
+            return self._unique_nbytes(self._primary.values())
+
+    @property
+    def cache_nbytes(self) -> int:
+        """Bytes held only by derived entries (views of primaries are free)"""
+        with self._lock:
+            primary = {id(_owner(a)) for a in self._primary.values()}
+            extra = [a for a in self._derived.values() if id(_owner(a)) not in primary]
+            return self._unique_nbytes(extra)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return self._unique_nbytes(list(self._primary.values()) + list(self._derived.values()))
+
+    def keys(self):
+        with self._lock:
+            return list(self._primary.keys())
+
+    def memory_summary(self) -> str:
+        """Short text for the status bar"""
+        return (
+            f"Mem: {format_bytes(self.nbytes)} "
+            f"(cache {format_bytes(self.cache_nbytes)} / {format_bytes(self.budget_bytes)})"
+        )
@@ -2,11 +2,20 @@
 Time-Intensity Curve (TIC) extraction module
 """
 import numpy as np
-from typing import Tuple
-from src.utils.converters import to_gray
+from typing import Callable, Dict, Optional, Tuple
 from src.utils.validators import validate_roi
+from src.core.roi_manager import ROIMask, union_bbox
+from src.utils import perf
 
+# Luminance weights used by src.utils.converters.to_gray (BT.601)
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float64)
 
+
+def _is_rgb(stack: np.ndarray) -> bool:
+    return stack.ndim == 4 and stack.shape[-1] == 3
+
+
+@perf.traced()
 def extract_tic_from_roi(
     stack: np.ndarray,
     roi: Tuple[int, int, int, int],
@@ -33,15 +42,14 @@ def extract_tic_from_roi(
     
     x0, y0, x1, y1 = clipped_roi
     
-    # Convert to grayscale if needed
-    if stack.ndim == 4 and stack.shape[-1] == 3:
-        stack_gray = np.stack([to_gray(f) for f in stack], axis=0)
+    # Crop first, then reduce: the mean of the luminance is the luminance of
+    # the per-channel means, so colour is never converted pixel by pixel
+    T = stack.shape[0]
+    crop = stack[:, y0:y1+1, x0:x1+1]
+    if _is_rgb(stack):
+        roi_series = (crop.reshape(T, -1, 3).mean(axis=1, dtype=np.float64) @ _LUMA).astype(np.float32)
     else:
-        stack_gray = stack.astype(np.float32)
-    
-    # Extract VI series in ROI
-    T = stack_gray.shape[0]
-    roi_series = stack_gray[:, y0:y1+1, x0:x1+1].reshape(T, -1).mean(axis=1)
+        roi_series = crop.reshape(T, -1).mean(axis=1, dtype=np.float64).astype(np.float32)
     
     # Time axis (seconds)
     time = np.arange(T, dtype=np.float32) / fps
@@ -51,3 +59,58 @@ def extract_tic_from_roi(
     dvi = roi_series - baseline
     
     return time, roi_series, dvi
+
+
+@perf.traced()
+def extract_tics_from_masks(
+    stack: np.ndarray,
+    masks: Dict[str, ROIMask],
+    chunk: int = 64,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Mean intensity per frame for several rasterized ROIs
+
+    Frames are cropped to the union bounding box of the ROIs and reduced
+    directly from the source dtype (uint8 RGB is never converted to a float
+    grayscale stack). For RGB input the result is the mean luminance, as with
+    to_gray.
+
+    Args:
+        stack: Image stack (T, H, W) or (T, H, W, 3)
+        masks: {label: ROIMask} rasterized for the stack frame shape
+        chunk: Frames reduced per step (bounds temporary memory)
+        progress: Optional callback(fraction, message) called after each chunk
+
+    Returns:
+        {label: vi} float32 series of length T (NaN for empty ROIs)
+    """
+    T = stack.shape[0]
+    frame_shape = tuple(stack.shape[1:3])
+    out = {label: np.full(T, np.nan, dtype=np.float32) for label in masks}
+    for label, m in masks.items():
+        if tuple(m.shape) != frame_shape:
+            raise ValueError(f"ROI '{label}' rasterized for {m.shape}, stack frames are {frame_shape}")
+    box = union_bbox(masks.values())
+    if box is None:
+        return out
+    y0, y1, x0, x1 = box
+    w = x1 - x0
+    rgb = _is_rgb(stack)
+    # Pixel indices relative to the union box
+    local = {
+        label: ((m.rows - y0) * w + (m.cols - x0)).astype(np.intp)
+        for label, m in masks.items() if m.n_pixels > 0
+    }
+    for start in range(0, T, chunk):
+        crop = stack[start:start + chunk, y0:y1, x0:x1]
+        n = crop.shape[0]
+        flat = crop.reshape(n, -1, 3) if rgb else crop.reshape(n, -1)
+        for label, idx in local.items():
+            sums = flat[:, idx].sum(axis=1, dtype=np.float64)
+            if rgb:
+                sums = sums @ _LUMA
+            out[label][start:start + n] = sums / idx.size
+        if progress is not None:
+            progress(min(T, start + n) / T, "Computing TICs...")
+    return out
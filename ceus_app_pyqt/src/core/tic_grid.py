@@ -0,0 +1,185 @@
+"""
+Grid TICs
+Partitions the field of view into square blocks or superpixels and extracts
+the TIC of every cell in one reduction
+"""
+import numpy as np
+from typing import Callable, Optional, Tuple
+from src.core.tic_analysis import _LUMA, _is_rgb
+from src.utils import perf
+
+Region = Tuple[int, int, int, int]  # (y0, y1, x0, x1), half-open
+
+
+def _region(shape: Tuple[int, int], region: Optional[Region]) -> Region:
+    H, W = int(shape[0]), int(shape[1])
+    if region is None:
+        return 0, H, 0, W
+    y0, y1, x0, x1 = (int(v) for v in region)
+    return max(y0, 0), min(y1, H), max(x0, 0), min(x1, W)
+
+
+@perf.traced()
+def block_labels(shape: Tuple[int, int], block: int, region: Optional[Region] = None) -> np.ndarray:
+    """
+    Label image of a grid of square blocks
+
+    Args:
+        shape: Frame shape (H, W)
+        block: Block size in pixels
+        region: Optional (y0, y1, x0, x1) area to partition (default: whole frame)
+
+    Returns:
+        (H, W) int32 labels numbered row-major from 0; -1 outside the region
+        and in the partial blocks along its bottom/right edges
+    """
+    block = max(int(block), 1)
+    y0, y1, x0, x1 = _region(shape, region)
+    nr, nc = max(y1 - y0, 0) // block, max(x1 - x0, 0) // block
+    labels = np.full((int(shape[0]), int(shape[1])), -1, dtype=np.int32)
+    if nr and nc:
+        grid = np.arange(nr * nc, dtype=np.int32).reshape(nr, nc)
+        labels[y0:y0 + nr * block, x0:x0 + nc * block] = np.repeat(np.repeat(grid, block, axis=0), block, axis=1)
+    return labels
+
+
+@perf.traced()
+def superpixel_labels(
+    image: np.ndarray,
+    size: int,
+    region: Optional[Region] = None,
+    compactness: float = 1.0,
+    sigma: float = 1.0
+) -> np.ndarray:
+    """
+    SLIC superpixels of a (B-mode) frame
+
+    Args:
+        image: Frame (H, W) or (H, W, 3); RGB is converted to luminance
+        size: Target superpixel size in pixels (about size x size each)
+        region: Optional (y0, y1, x0, x1) area to partition (default: whole frame)
+        compactness: SLIC compactness (intensities are scaled to [0, 1])
+        sigma: Gaussian smoothing before segmentation (tames speckle)
+
+    Returns:
+        (H, W) int32 labels numbered from 0 without gaps; -1 outside the region
+    """
+    from skimage.segmentation import slic
+
+    img = np.asarray(image, dtype=np.float64)
+    if img.ndim == 3 and img.shape[-1] == 3:
+        img = img @ _LUMA
+    y0, y1, x0, x1 = _region(img.shape, region)
+    labels = np.full(img.shape[:2], -1, dtype=np.int32)
+    crop = img[y0:y1, x0:x1]
+    if crop.size == 0:
+        return labels
+    lo, hi = float(crop.min()), float(crop.max())
+    crop = (crop - lo) / (hi - lo) if hi > lo else np.zeros_like(crop)
+    n_segments = max(1, int(round(crop.size / float(max(int(size), 1)) ** 2)))
+    seg = slic(crop, n_segments=n_segments, compactness=compactness, sigma=sigma, channel_axis=None, start_label=0)
+    # Renumber 0..n-1 (SLIC may skip labels)
+    _, seg = np.unique(seg, return_inverse=True)
+    labels[y0:y1, x0:x1] = seg.reshape(crop.shape)
+    return labels
+
+
+@perf.traced()
+def extract_label_tics(
+    stack: np.ndarray,
+    labels: np.ndarray,
+    chunk: int = 64,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> np.ndarray:
+    """
+    Mean intensity per frame of every labelled cell
+
+    Pixels are sorted by label once; each chunk of frames is then gathered in
+    that order and summed per cell with a single np.add.reduceat. For RGB
+    input the result is the mean luminance, as with to_gray.
+
+    Args:
+        stack: Image stack (T, H, W) or (T, H, W, 3)
+        labels: (H, W) int labels 0..n-1, negative = not used
+        chunk: Frames reduced per step (bounds temporary memory)
+        progress: Optional callback(fraction, message) called after each chunk
+
+    Returns:
+        (n_cells, T) float32 series (NaN for labels without pixels)
+    """
+    T = stack.shape[0]
+    labels = np.asarray(labels)
+    if labels.shape != tuple(stack.shape[1:3]):
+        raise ValueError(f"Labels {labels.shape} do not match stack frames {stack.shape[1:3]}")
+    n_cells = int(labels.max()) + 1 if labels.size else 0
+    out = np.full((max(n_cells, 0), T), np.nan, dtype=np.float32)
+    ys, xs = np.nonzero(labels >= 0)
+    if ys.size == 0:
+        return out
+    # Work inside the bounding box of the labelled pixels
+    y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    box = labels[y0:y1, x0:x1].reshape(-1)
+    idx = np.flatnonzero(box >= 0)
+    order = np.argsort(box[idx], kind='stable')
+    idx = idx[order]
+    sorted_labels = box[idx]
+    present, starts, counts = np.unique(sorted_labels, return_index=True, return_counts=True)
+    rgb = _is_rgb(stack)
+    for start in range(0, T, chunk):
+        crop = stack[start:start + chunk, y0:y1, x0:x1]
+        n = crop.shape[0]
+        flat = crop.reshape(n, -1, 3) if rgb else crop.reshape(n, -1)
+        vals = flat[:, idx].astype(np.float64)
+        if rgb:
+            vals = vals @ _LUMA
+        sums = np.add.reduceat(vals, starts, axis=1)
+        out[present, start:start + n] = (sums / counts).T
+        if progress is not None:
+            progress(min(T, start + n) / T, "Computing grid TICs...")
+    return out
+
+
+@perf.traced()
+def extract_block_tics(
+    stack: np.ndarray,
+    block: int,
+    region: Optional[Region] = None,
+    chunk: int = 64,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mean intensity per frame of every block of a square grid
+
+    Blocks are reduced with a reshape (no gather), in the numbering of
+    block_labels.
+
+    Args:
+        stack: Image stack (T, H, W) or (T, H, W, 3)
+        block: Block size in pixels
+        region: Optional (y0, y1, x0, x1) area to partition
+        chunk: Frames reduced per step
+        progress: Optional callback(fraction, message) called after each chunk
+
+    Returns:
+        Tuple of ((n_blocks, T) float32 series, (H, W) int32 labels)
+    """
+    block = max(int(block), 1)
+    T = stack.shape[0]
+    labels = block_labels(stack.shape[1:3], block, region)
+    y0, y1, x0, x1 = _region(stack.shape[1:3], region)
+    nr, nc = max(y1 - y0, 0) // block, max(x1 - x0, 0) // block
+    out = np.full((nr * nc, T), np.nan, dtype=np.float32)
+    if nr == 0 or nc == 0:
+        return out, labels
+    rgb = _is_rgb(stack)
+    for start in range(0, T, chunk):
+        crop = stack[start:start + chunk, y0:y0 + nr * block, x0:x0 + nc * block]
+        n = crop.shape[0]
+        if rgb:
+            sums = crop.reshape(n, nr, block, nc, block, 3).sum(axis=(2, 4), dtype=np.float64) @ _LUMA
+        else:
+            sums = crop.reshape(n, nr, block, nc, block).sum(axis=(2, 4), dtype=np.float64)
+        out[:, start:start + n] = (sums.reshape(n, nr * nc) / (block * block)).T
+        if progress is not None:
+            progress(min(T, start + n) / T, "Computing grid TICs...")
+    return out, labels
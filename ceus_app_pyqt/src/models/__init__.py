@@ -2,6 +2,9 @@
 Modeling and metrics
 """
 from src.models.washin_model import fit_washin, washin_model
-from src.models.metrics import compute_metrics, r2_score
+from src.models.metrics import compute_metrics, r2_score, perfusion_metrics
+from src.models.metrics_engine import MetricsEngine
+from src.models.parametric_maps import compute_parametric_maps, fit_washin_batch, summarize_curves
 
-__all__ = ['fit_washin', 'washin_model', 'compute_metrics', 'r2_score']
+__all__ = ['fit_washin', 'washin_model', 'compute_metrics', 'r2_score', 'perfusion_metrics', 'MetricsEngine',
+           'compute_parametric_maps', 'fit_washin_batch', 'summarize_curves']
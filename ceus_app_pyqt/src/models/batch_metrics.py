@@ -0,0 +1,145 @@
+"""
+Vectorized perfusion metrics for many TICs at once
+All metrics are computed with masked reductions over a (n_curves, T) array
+"""
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from src.utils import perf
+
+
+BATCH_METRIC_KEYS = ('AUC', 'MTT', 'Peak', 'TTP', 'Slope_10_90', 'MaxDiff', 'Mean', 'PeakAbs')
+
+
+def pad_curves(
+    times: Sequence[np.ndarray],
+    values: Sequence[np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pack curves of different lengths into padded 2-D arrays
+
+    Args:
+        times: List of 1-D time arrays
+        values: List of 1-D intensity arrays (same lengths as times)
+
+    Returns:
+        Tuple of (t, Y, mask), each (n_curves, T_max); padded entries have mask=False
+    """
+    n = len(values)
+    T = max((len(v) for v in values), default=0)
+    t_out = np.zeros((n, T), dtype=np.float64)
+    y_out = np.zeros((n, T), dtype=np.float64)
+    mask = np.zeros((n, T), dtype=bool)
+    for i, (t, y) in enumerate(zip(times, values)):
+        k = len(y)
+        t_out[i, :k] = np.asarray(t, float)[:k]
+        y_out[i, :k] = np.asarray(y, float)
+        mask[i, :k] = True
+    return t_out, y_out, mask
+
+
+def _compact(t: np.ndarray, Y: np.ndarray, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Move included samples to the front of each row (order preserved)"""
+    order = np.argsort(~mask, axis=1, kind='stable')
+    t_c = np.take_along_axis(t, order, axis=1)
+    y_c = np.take_along_axis(Y, order, axis=1)
+    m_c = np.take_along_axis(mask, order, axis=1)
+    return t_c, y_c, m_c
+
+
+@perf.traced()
+def batch_perfusion_metrics(
+    t: np.ndarray,
+    Y: np.ndarray,
+    mask: Optional[np.ndarray] = None,
+    clip_negative: bool = True
+) -> Dict[str, np.ndarray]:
+    """
+    Compute perfusion metrics for many curves in one pass
+
+    Excluded samples are dropped (neighbours on each side of a gap are joined),
+    which matches computing the metrics on t[mask], y[mask] curve by curve.
+
+    Args:
+        t: Time axis, shared (T,) or per curve (n_curves, T)
+        Y: Curves (n_curves, T) or a single curve (T,)
+        mask: Boolean inclusion mask (n_curves, T) or (T,); None = all included
+        clip_negative: Clamp negative values to 0 for AUC/MTT
+
+    Returns:
+        Dictionary of (n_curves,) float arrays: AUC, MTT, Peak, TTP, Slope_10_90,
+        MaxDiff (max |dy/dt|), Mean and PeakAbs (signed value of max |y|)
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+    n, T = Y.shape
+    t = np.asarray(t, dtype=np.float64)
+    t = np.broadcast_to(t, (n, T)) if t.ndim == 1 else np.atleast_2d(t)
+    if mask is None:
+        mask = np.ones((n, T), dtype=bool)
+    else:
+        mask = np.broadcast_to(np.asarray(mask, dtype=bool), (n, T))
+
+    out = {k: np.full(n, np.nan) for k in BATCH_METRIC_KEYS}
+    if n == 0 or T == 0:
+        return out
+
+    t_c, y_c, m_c = _compact(t, Y, mask)
+    count = m_c.sum(axis=1)
+    has_data = count > 0
+
+    # Consecutive included pairs -> trapezoids and finite differences
+    pair = m_c[:, 1:]
+    dt = np.where(pair, np.diff(t_c, axis=1), 0.0)
+    dy = np.diff(y_c, axis=1)
+
+    # AUC (trapezoidal) and MTT = first moment / area
+    y_auc = np.clip(y_c, 0.0, None) if clip_negative else y_c
+    y_mid = 0.5 * (y_auc[:, 1:] + y_auc[:, :-1])
+    ty = t_c * y_auc
+    ty_mid = 0.5 * (ty[:, 1:] + ty[:, :-1])
+    auc = np.where(pair, y_mid * dt, 0.0).sum(axis=1)
+    first_moment = np.where(pair, ty_mid * dt, 0.0).sum(axis=1)
+    out['AUC'] = np.where(has_data, auc, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out['MTT'] = np.where(has_data & np.isfinite(auc) & (auc > 0), first_moment / auc, np.nan)
+
+    # Peak and TTP
+    rows = np.arange(n)
+    i_max = np.argmax(np.where(m_c, y_c, -np.inf), axis=1)
+    peak = np.where(has_data, y_c[rows, i_max], np.nan)
+    out['Peak'] = peak
+    out['TTP'] = np.where(has_data, t_c[rows, i_max], np.nan)
+
+    # Signed peak by magnitude (R's peak_value) and mean
+    i_min = np.argmin(np.where(m_c, y_c, np.inf), axis=1)
+    y_min = y_c[rows, i_min]
+    out['PeakAbs'] = np.where(has_data, np.where(np.abs(peak) >= np.abs(y_min), peak, y_min), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out['Mean'] = np.where(has_data, np.where(m_c, y_c, 0.0).sum(axis=1) / count, np.nan)
+
+    # Slope between 10% and 90% of peak: closed-form masked least squares
+    with np.errstate(invalid='ignore'):
+        sel = m_c & (y_c >= 0.1 * peak[:, None]) & (y_c <= 0.9 * peak[:, None]) & (peak[:, None] > 0)
+    n_sel = sel.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_mean = np.where(sel, t_c, 0.0).sum(axis=1) / n_sel
+        y_mean = np.where(sel, y_c, 0.0).sum(axis=1) / n_sel
+        tc = np.where(sel, t_c - t_mean[:, None], 0.0)
+        yc = np.where(sel, y_c - y_mean[:, None], 0.0)
+        sxx = (tc * tc).sum(axis=1)
+        sxy = (tc * yc).sum(axis=1)
+        out['Slope_10_90'] = np.where((n_sel >= 2) & (sxx > 0), sxy / sxx, np.nan)
+
+    # MaxDiff = max absolute derivative between consecutive included samples
+    dt_safe = np.where(dt == 0, 1e-9, dt)
+    with np.errstate(invalid='ignore'):
+        deriv = np.abs(dy / dt_safe)
+    deriv = np.where(pair & np.isfinite(deriv), deriv, -np.inf)
+    maxdiff = deriv.max(axis=1) if T >= 2 else np.full(n, -np.inf)
+    out['MaxDiff'] = np.where(count >= 2, maxdiff, np.nan)
+    return out
+
+
+def metrics_rows(columns: Dict[str, np.ndarray], keys: Sequence[str] = BATCH_METRIC_KEYS) -> List[Dict[str, float]]:
+    """Split column arrays into one {metric: float} dict per curve"""
+    n = len(next(iter(columns.values()))) if columns else 0
+    return [{k: float(columns[k][i]) for k in keys} for i in range(n)]
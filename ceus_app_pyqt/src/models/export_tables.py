@@ -0,0 +1,271 @@
+"""
+Result export tables
+Signals, predicted curves and parameters of all ROIs built as columns
+straight from NumPy, written as a ZIP of CSVs or as typed Parquet / Arrow
+IPC files (optionally appended to a cohort-level dataset)
+"""
+import io
+import os
+import re
+import zipfile
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from src.utils import perf
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pads
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: without pyarrow only the CSV bundle is available
+    pa = pads = feather = pq = None
+
+
+TABLE_NAMES = ('signals', 'predicted', 'parameters')
+
+# Rows of the parameters table, in export order (one row per ROI and name)
+PARAMETER_NAMES = (
+    'A', 'B', 'AB', 'R-squared',
+    'AUC dVI_filt', 'AUC dVI_predict',
+    'Peak dVI', 'Peak dVI_filt',
+    'Mean dVI', 'Mean dVI_filt', 'Mean dVI_predict',
+    'MaxDiff dVI_filt', 'MaxDiff dVI_predict',
+)
+
+# Left out of CSVs when empty (the row-based CSV export only had it for fitted ROIs)
+_OPTIONAL_CSV_COLUMNS = ('dVI_predict',)
+
+# Columnar formats -> file suffix
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def columnar_available() -> bool:
+    """True if Parquet / Arrow export is possible (pyarrow installed)"""
+    return pa is not None
+
+
+def _categorical(codes: np.ndarray, categories: Sequence[str]) -> pd.Categorical:
+    return pd.Categorical.from_codes(np.asarray(codes, dtype=np.int32), categories=list(categories))
+
+
+def _concat(arrays: Sequence[np.ndarray]) -> np.ndarray:
+    if not arrays:
+        return np.zeros(0, dtype=np.float64)
+    return np.concatenate([np.asarray(a, dtype=np.float64).ravel() for a in arrays])
+
+
+@perf.traced()
+def build_export_tables(
+    labels: Sequence[str],
+    times: Sequence[np.ndarray],
+    signals: Sequence[np.ndarray],
+    filtered: Sequence[np.ndarray],
+    predicted: Optional[Sequence[Optional[np.ndarray]]] = None,
+    grids: Optional[Mapping[str, Tuple[np.ndarray, np.ndarray]]] = None,
+    parameters: Optional[np.ndarray] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Build the export tables of a study
+
+    Every column is one concatenated array; ROI (and parameter names) are
+    categorical columns sharing the list of labels across tables.
+
+    Args:
+        labels: ROI labels (n)
+        times: Included times of each ROI
+        signals: dVI of each ROI at those times
+        filtered: Filtered dVI of each ROI at those times
+        predicted: Wash-in prediction of each ROI at those times (None if not fitted)
+        grids: {label: (t, y)} predicted curve of fitted ROIs on a regular grid
+        parameters: (n, len(PARAMETER_NAMES)) values (non-finite -> NaN)
+
+    Returns:
+        {'signals', 'predicted', 'parameters'} DataFrames
+    """
+    labels = [str(label) for label in labels]
+    n = len(labels)
+    lengths = np.array([len(t) for t in times], dtype=np.int64)
+    roi = np.repeat(np.arange(n), lengths)
+
+    predicted = list(predicted) if predicted is not None else [None] * n
+    pred_inc = [
+        np.asarray(p, dtype=np.float64) if p is not None else np.full(k, np.nan)
+        for p, k in zip(predicted, lengths)
+    ]
+    tables = {
+        'signals': pd.DataFrame({
+            'ROI': _categorical(roi, labels),
+            'Time': _concat(times),
+            'dVI': _concat(signals),
+            'dVI_filt': _concat(filtered),
+            'dVI_predict': _concat(pred_inc),
+        }),
+    }
+
+    grids = grids or {}
+    fitted = [i for i, label in enumerate(labels) if label in grids]
+    grid_t = [grids[labels[i]][0] for i in fitted]
+    grid_y = [grids[labels[i]][1] for i in fitted]
+    tables['predicted'] = pd.DataFrame({
+        'ROI': _categorical(np.repeat(fitted, [len(t) for t in grid_t]).astype(np.int64), labels),
+        'Time': _concat(grid_t),
+        'dVI_predict': _concat(grid_y),
+    })
+
+    P = len(PARAMETER_NAMES)
+    values = np.full((n, P), np.nan) if parameters is None else np.asarray(parameters, dtype=np.float64).reshape(n, P)
+    tables['parameters'] = pd.DataFrame({
+        'ROI': _categorical(np.repeat(np.arange(n), P), labels),
+        'parameter': _categorical(np.tile(np.arange(P), n), PARAMETER_NAMES),
+        'value': np.where(np.isfinite(values), values, np.nan).ravel(),
+    })
+    return tables
+
+
+@perf.traced()
+def write_csv_bundle(path: Union[str, Path], tables: Mapping[str, pd.DataFrame]) -> Path:
+    """
+    Write the tables as <name>.csv members of a ZIP archive
+
+    Empty tables are left out, as are optional columns without any value.
+    CSVs are streamed into the archive (no temporary files).
+    """
+    path = Path(path)
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, df in tables.items():
+            if df.empty:
+                continue
+            empty = [c for c in _OPTIONAL_CSV_COLUMNS if c in df.columns and df[c].isna().all()]
+            df = df.drop(columns=empty)
+            with zf.open(f"{name}.csv", 'w') as raw:
+                with io.TextIOWrapper(raw, encoding='utf-8', newline='') as fp:
+                    df.to_csv(fp, index=False)
+    return path
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet / Arrow export requires pyarrow (pip install pyarrow)")
+
+
+def _check_format(fmt: str) -> str:
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}' (expected one of {sorted(COLUMNAR_FORMATS)})")
+    return fmt
+
+
+def _to_arrow(df: pd.DataFrame):
+    """
+    Arrow table with categorical columns as dictionary<int32, string>
+
+    Index width is fixed (pandas picks int8/int16 from the number of
+    categories), so files of different studies share one schema.
+    """
+    columns = []
+    for name in df.columns:
+        col = df[name]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            columns.append(pa.DictionaryArray.from_arrays(
+                pa.array(col.cat.codes.to_numpy(np.int32)),
+                pa.array([str(c) for c in col.cat.categories], type=pa.string()),
+            ))
+        else:
+            columns.append(pa.array(col.to_numpy()))
+    return pa.Table.from_arrays(columns, names=[str(c) for c in df.columns])
+
+
+def _write_table(path: Path, df: pd.DataFrame, fmt: str) -> None:
+    # Written next to its destination and moved into place once complete
+    tmp = path.with_name(path.name + '.tmp')
+    try:
+        table = _to_arrow(df)
+        if fmt == 'parquet':
+            pq.write_table(table, tmp, compression='zstd')
+        else:
+            feather.write_feather(table, tmp, compression='zstd')
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+@perf.traced()
+def write_columnar(
+    directory: Union[str, Path],
+    tables: Mapping[str, pd.DataFrame],
+    fmt: str = 'parquet'
+) -> Path:
+    """
+    Write each table to <directory>/<name>.parquet (or .arrow)
+
+    Args:
+        directory: Output directory (created if needed)
+        tables: Tables from build_export_tables
+        fmt: 'parquet' or 'arrow' (Arrow IPC / Feather v2)
+
+    Returns:
+        The output directory
+    """
+    _require_pyarrow()
+    suffix = COLUMNAR_FORMATS[_check_format(fmt)]
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, df in tables.items():
+        _write_table(directory / f"{name}{suffix}", df, fmt)
+    return directory
+
+
+def _study_file_name(study: str) -> str:
+    name = re.sub(r'[^\w.-]+', '_', str(study)).strip('._')
+    return name or 'study'
+
+
+@perf.traced()
+def append_to_dataset(
+    root: Union[str, Path],
+    tables: Mapping[str, pd.DataFrame],
+    study: str,
+    fmt: str = 'parquet'
+) -> Path:
+    """
+    Add one study to a cohort dataset
+
+    Layout: <root>/<table>/<study>.parquet, each file with a leading
+    dictionary-encoded Study column. Exporting a study again replaces its
+    files. Each <root>/<table> directory reads as one table, e.g.
+    pd.read_parquet(root / 'parameters') or read_dataset(root, 'parameters').
+
+    Args:
+        root: Dataset directory (created if needed)
+        tables: Tables from build_export_tables
+        study: Study identifier (e.g. the DICOM file name)
+        fmt: 'parquet' or 'arrow'
+
+    Returns:
+        The dataset directory
+    """
+    _require_pyarrow()
+    suffix = COLUMNAR_FORMATS[_check_format(fmt)]
+    root = Path(root)
+    file_name = _study_file_name(study) + suffix
+    for name, df in tables.items():
+        out = df.copy(deep=False)
+        out.insert(0, 'Study', _categorical(np.zeros(len(df), dtype=np.int32), [str(study)]))
+        folder = root / name
+        folder.mkdir(parents=True, exist_ok=True)
+        _write_table(folder / file_name, out, fmt)
+    return root
+
+
+@perf.traced()
+def read_dataset(root: Union[str, Path], table: str, fmt: str = 'parquet') -> pd.DataFrame:
+    """Load one table of a cohort dataset (all studies) as a DataFrame"""
+    _require_pyarrow()
+    fmt = _check_format(fmt)
+    folder = Path(root) / table
+    files = sorted(str(p) for p in folder.glob('*' + COLUMNAR_FORMATS[fmt]))
+    dataset = pads.dataset(files, format='parquet' if fmt == 'parquet' else 'ipc')
+    return dataset.to_table().to_pandas()
@@ -4,6 +4,7 @@ TIC metrics computation module
 import numpy as np
 from typing import Dict, Optional
 from scipy.ndimage import median_filter
+from src.models.batch_metrics import batch_perfusion_metrics, metrics_rows
 
 
 def r2_score(y_true: np.ndarray, y_pred: np.ndarray) -> float:
@@ -50,16 +51,19 @@ def compute_metrics(
     if params is not None:
         y_pred = washin_model_func(t_fit, *params)
         R2 = r2_score(y_fit, y_pred)
-        AUC_pred = float(np.trapz(y_pred, t_fit))
         A, B = params
     else:
         y_pred = np.zeros_like(t_fit)
         R2 = np.nan
-        AUC_pred = np.nan
         A, B = np.nan, np.nan
     
-    # AUC (filtered)
-    AUC_filt = float(np.trapz(y_fit, t_fit))
+    # AUC (filtered and predicted) in one batched call
+    if len(t_fit) > 0:
+        auc = batch_perfusion_metrics(t_fit, np.vstack([y_fit, y_pred]), clip_negative=False)['AUC']
+        AUC_filt = float(auc[0])
+        AUC_pred = float(auc[1]) if params is not None else np.nan
+    else:
+        AUC_filt = AUC_pred = np.nan
     
     # Peak values
     peak_dVI = float(np.nanmax(dvi))
@@ -89,6 +93,30 @@ def compute_metrics(
     }
 
 
+PERFUSION_METRIC_KEYS = ('AUC', 'MTT', 'Peak', 'TTP', 'Slope_10_90', 'MaxDiff')
+
+
+def perfusion_metrics(t: np.ndarray, y: np.ndarray) -> Dict[str, float]:
+    """
+    Compute basic perfusion metrics on a curve
+    
+    Args:
+        t: Time array (seconds)
+        y: Intensity curve (dVI) sampled at t
+        
+    Returns:
+        Dictionary with AUC, MTT, Peak, TTP, Slope_10_90 and MaxDiff
+    """
+    try:
+        t = np.asarray(t, float).ravel()
+        y = np.asarray(y, float).ravel()
+    except Exception:
+        return {k: float('nan') for k in PERFUSION_METRIC_KEYS}
+    if t.size == 0 or y.size == 0 or t.size != y.size:
+        return {k: float('nan') for k in PERFUSION_METRIC_KEYS}
+    return metrics_rows(batch_perfusion_metrics(t, y[None, :]), PERFUSION_METRIC_KEYS)[0]
+
+
 def apply_median_filter(dvi: np.ndarray, fps: float, window_s: float = 0.5) -> np.ndarray:
     """
     Apply median filter to dVI curve
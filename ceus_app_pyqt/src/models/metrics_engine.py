@@ -0,0 +1,136 @@
+"""
+Incremental RAW metrics engine
+Caches perfusion metrics per ROI and recomputes only ROIs marked dirty
+"""
+import numpy as np
+from typing import Callable, Dict, Hashable, Iterable, Optional, Set
+from src.models.metrics import perfusion_metrics, PERFUSION_METRIC_KEYS
+from src.models.batch_metrics import batch_perfusion_metrics, pad_curves, metrics_rows
+
+
+Smoother = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+class MetricsEngine:
+    """Per-ROI metrics cache with a dirty set
+
+    Typical use from the UI:
+        engine.mark_dirty(label)           # after a valid_mask toggle
+        changed = engine.update(tic_data)  # recompute dirty ROIs only
+    """
+
+    def __init__(self, smoother: Optional[Smoother] = None, config_key: Hashable = None):
+        """
+        Initialize engine
+
+        Args:
+            smoother: Optional callable (t, y) -> y_smooth applied before metrics
+            config_key: Hashable description of the smoothing settings
+        """
+        self._smoother = smoother
+        self._config_key = config_key
+        self._cache: Dict[str, Dict[str, float]] = {}
+        self._dirty: Set[str] = set()
+
+    def configure(self, smoother: Optional[Smoother], config_key: Hashable = None) -> bool:
+        """Set the smoother; invalidates every ROI when the settings changed.
+        Returns True if the cache was invalidated.
+        """
+        self._smoother = smoother
+        if config_key == self._config_key:
+            return False
+        self._config_key = config_key
+        self.invalidate_all()
+        return True
+
+    @property
+    def config_key(self) -> Hashable:
+        return self._config_key
+
+    def mark_dirty(self, labels) -> None:
+        """Mark one label (str) or several labels as needing recomputation"""
+        if isinstance(labels, str):
+            labels = [labels]
+        self._dirty.update(labels)
+
+    def is_dirty(self, label: str) -> bool:
+        return label in self._dirty or label not in self._cache
+
+    def invalidate_all(self) -> None:
+        self._dirty.update(self._cache.keys())
+
+    def remove(self, label: str) -> None:
+        self._cache.pop(label, None)
+        self._dirty.discard(label)
+
+    def rename(self, old_label: str, new_label: str) -> None:
+        if old_label in self._cache:
+            self._cache[new_label] = self._cache.pop(old_label)
+        if old_label in self._dirty:
+            self._dirty.discard(old_label)
+            self._dirty.add(new_label)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._dirty.clear()
+
+    def get(self, label: str) -> Optional[Dict[str, float]]:
+        """Cached metrics for label (None if never computed)"""
+        return self._cache.get(label)
+
+    @property
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        return dict(self._cache)
+
+    def _prepare_curve(self, time: np.ndarray, dvi: np.ndarray, valid_mask: Optional[np.ndarray] = None):
+        """Included (and optionally smoothed) points of a TIC"""
+        t = np.asarray(time, float)
+        y = np.asarray(dvi, float)
+        mask = np.ones(y.shape, dtype=bool) if valid_mask is None else np.asarray(valid_mask, dtype=bool)
+        t_use = t[mask]
+        y_use = y[mask]
+        if self._smoother is not None and t_use.size >= 3:
+            try:
+                y_use = np.asarray(self._smoother(t_use, y_use), float)
+            except Exception:
+                pass
+        return t_use, y_use
+
+    def compute_curve(self, time: np.ndarray, dvi: np.ndarray, valid_mask: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """Metrics for a single TIC restricted to its included points"""
+        return perfusion_metrics(*self._prepare_curve(time, dvi, valid_mask))
+
+    def update(self, tic_data: Dict[str, dict], labels: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, float]]:
+        """
+        Recompute metrics for dirty (or never computed) ROIs
+
+        Args:
+            tic_data: {label: {'time', 'dvi', 'valid_mask'}} as built by compute_all_tics
+            labels: Optional subset to consider (defaults to every label in tic_data)
+
+        Returns:
+            {label: metrics} for the ROIs that were recomputed
+        """
+        # Forget ROIs that no longer exist
+        for stale in [lbl for lbl in self._cache if lbl not in tic_data]:
+            self.remove(stale)
+        candidates = list(tic_data.keys()) if labels is None else [l for l in labels if l in tic_data]
+        dirty = [label for label in candidates if self.is_dirty(label)]
+        if not dirty:
+            return {}
+        times, values = [], []
+        for label in dirty:
+            tic = tic_data[label]
+            try:
+                t_use, y_use = self._prepare_curve(tic.get('time', []), tic.get('dvi', []), tic.get('valid_mask'))
+            except Exception:
+                t_use, y_use = np.empty(0), np.empty(0)
+            times.append(t_use)
+            values.append(y_use)
+        # One batched call for every dirty ROI
+        t_pad, y_pad, mask = pad_curves(times, values)
+        rows = metrics_rows(batch_perfusion_metrics(t_pad, y_pad, mask), PERFUSION_METRIC_KEYS)
+        changed = dict(zip(dirty, rows))
+        self._cache.update(changed)
+        self._dirty.difference_update(dirty)
+        return changed
@@ -0,0 +1,305 @@
+"""
+Pixel-wise parametric perfusion maps
+Fits the wash-in model y = A * (1 - exp(-B * t)) and computes AUC/TTP/Peak for
+every pixel (or every k x k block) of a stack with a batched, vectorized solver
+"""
+import os
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.models.batch_metrics import batch_perfusion_metrics
+from src.utils import perf
+
+
+MAP_KEYS = ('A', 'B', 'AxB', 'AUC', 'TTP', 'Peak', 'R2')
+
+# Same weights as src.utils.converters.to_gray (BT.601)
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float64)
+
+_GOLDEN = (np.sqrt(5.0) - 1.0) / 2.0
+
+# Curve samples (pixels x frames) above which n_workers=None uses processes
+_POOL_MIN_SAMPLES = 50_000_000
+
+
+def _available_cpus() -> int:
+    try:
+        n = len(os.sched_getaffinity(0))
+    except AttributeError:
+        n = os.cpu_count() or 1
+    return max(1, min(n, 8))
+
+
+def _washin_rss(
+    log_b: np.ndarray,
+    t: np.ndarray,
+    Y: np.ndarray,
+    syy: np.ndarray,
+    a_lo: float,
+    a_hi: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Residual sum of squares with A profiled out, one B per curve
+
+    For a fixed B the model is linear in A, so the best A is
+    sum(y*g) / sum(g^2) with g = 1 - exp(-B*t), clipped to its bounds.
+    """
+    g = -np.expm1(-np.exp(log_b)[:, None] * t[None, :])
+    num = np.einsum('ij,ij->i', Y, g)
+    den = np.einsum('ij,ij->i', g, g)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A = np.where(den > 0, num / den, 0.0)
+    A = np.clip(A, a_lo, a_hi)
+    return syy - 2.0 * A * num + A * A * den, A
+
+
+@perf.traced()
+def fit_washin_batch(
+    t: np.ndarray,
+    Y: np.ndarray,
+    bounds: Optional[Tuple[Tuple[float, float], Tuple[float, float]]] = None,
+    n_grid: int = 48,
+    n_refine: int = 16
+) -> Dict[str, np.ndarray]:
+    """
+    Least-squares fit of y = A * (1 - exp(-B * max(t, 0))) for many curves
+
+    A is solved in closed form for each trial B, so only B is searched:
+    a log-spaced grid shared by all curves (one matrix product), then a
+    golden-section refinement around the best grid point, vectorized over
+    curves.
+
+    Args:
+        t: Shared time axis (T,)
+        Y: Curves (n_curves, T)
+        bounds: ((A_lower, B_lower), (A_upper, B_upper)); None uses
+            A in [0, max(10 * max(y), 1)] and B in [1e-6, 50] like the
+            single-curve fit
+        n_grid: Number of grid values of B
+        n_refine: Golden-section iterations
+
+    Returns:
+        Dictionary of (n_curves,) float64 arrays: A, B, RSS, R2
+    """
+    t = np.maximum(np.asarray(t, dtype=np.float64), 0.0)
+    Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+    n, T = Y.shape
+    if n == 0 or T == 0:
+        empty = np.full(n, np.nan)
+        return {'A': empty, 'B': empty.copy(), 'RSS': empty.copy(), 'R2': empty.copy()}
+
+    perf.count('fits', n)
+    if bounds is None:
+        a_lo, b_lo = 0.0, 1e-6
+        a_hi = np.maximum(10.0 * Y.max(axis=1), 1.0)
+        b_hi = 50.0
+    else:
+        (a_lo, b_lo), (a_up, b_hi) = bounds
+        a_hi = np.full(n, float(a_up) if a_up and np.isfinite(a_up) else np.inf)
+    b_lo = max(float(b_lo), 1e-6)
+    b_hi = max(float(b_hi), b_lo)
+    a_lo = float(a_lo)
+
+    syy = np.einsum('ij,ij->i', Y, Y)
+
+    # Grid search over B (A profiled out)
+    log_grid = np.linspace(np.log(b_lo), np.log(b_hi), max(int(n_grid), 2))
+    G = -np.expm1(-np.exp(log_grid)[:, None] * t[None, :])       # (n_grid, T)
+    num = Y @ G.T                                                # (n, n_grid)
+    den = np.einsum('ij,ij->i', G, G)[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A_grid = np.where(den > 0, num / den, 0.0)
+    A_grid = np.clip(A_grid, a_lo, a_hi[:, None])
+    rss_grid = syy[:, None] - 2.0 * A_grid * num + A_grid * A_grid * den
+    k = np.argmin(rss_grid, axis=1)
+
+    # Golden-section refinement inside the neighbouring grid cells
+    lo = log_grid[np.maximum(k - 1, 0)]
+    hi = log_grid[np.minimum(k + 1, len(log_grid) - 1)]
+    c = hi - _GOLDEN * (hi - lo)
+    d = lo + _GOLDEN * (hi - lo)
+    fc, _ = _washin_rss(c, t, Y, syy, a_lo, a_hi)
+    fd, _ = _washin_rss(d, t, Y, syy, a_lo, a_hi)
+    for _ in range(int(n_refine)):
+        left = fc < fd
+        hi = np.where(left, d, hi)
+        lo = np.where(left, lo, c)
+        new = np.where(left, hi - _GOLDEN * (hi - lo), lo + _GOLDEN * (hi - lo))
+        f_new, _ = _washin_rss(new, t, Y, syy, a_lo, a_hi)
+        # Left: (c, d) <- (new, c); right: (c, d) <- (d, new)
+        c, d, fc, fd = (
+            np.where(left, new, d), np.where(left, c, new),
+            np.where(left, f_new, fd), np.where(left, fc, f_new),
+        )
+
+    # Keep the grid point if the bracket did not improve on it
+    log_b = np.where(fc <= fd, c, d)
+    rss, A = _washin_rss(log_b, t, Y, syy, a_lo, a_hi)
+    grid_best = rss_grid[np.arange(n), k]
+    use_grid = grid_best < rss
+    log_b = np.where(use_grid, log_grid[k], log_b)
+    A = np.where(use_grid, A_grid[np.arange(n), k], A)
+    rss = np.maximum(np.where(use_grid, grid_best, rss), 0.0)
+
+    sst = syy - T * Y.mean(axis=1) ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(sst > 0, 1.0 - rss / sst, np.nan)
+    return {'A': A, 'B': np.exp(log_b), 'RSS': rss, 'R2': r2}
+
+
+def summarize_curves(
+    t: np.ndarray,
+    Y: np.ndarray,
+    bounds,
+    n_grid: int,
+    n_refine: int
+) -> Dict[str, np.ndarray]:
+    """
+    Wash-in fit and perfusion metrics of many dVI curves on a shared time axis
+
+    Top-level so that chunks can be sent to worker processes.
+
+    Returns:
+        Dictionary of (n_curves,) float32 arrays keyed by MAP_KEYS
+    """
+    fit = fit_washin_batch(t, Y, bounds=bounds, n_grid=n_grid, n_refine=n_refine)
+    metrics = batch_perfusion_metrics(t, Y)
+    out = {
+        'A': fit['A'],
+        'B': fit['B'],
+        'AxB': fit['A'] * fit['B'],
+        'AUC': metrics['AUC'],
+        'TTP': metrics['TTP'],
+        'Peak': metrics['Peak'],
+        'R2': fit['R2'],
+    }
+    return {k: v.astype(np.float32) for k, v in out.items()}
+
+
+def _block_curves(band: np.ndarray, block: int, n_frames: int) -> np.ndarray:
+    """
+    dVI curves of the k x k blocks of a band of rows
+
+    Args:
+        band: (T, rows, cols[, 3]) with rows and cols multiples of block
+        block: Block size in pixels
+        n_frames: Number of leading frames kept
+
+    Returns:
+        (n_blocks, n_frames) float64 array, row-major over the blocks
+    """
+    band = band[:n_frames]
+    T, rows, cols = band.shape[:3]
+    rb, cb = rows // block, cols // block
+    if band.ndim == 4 and band.shape[-1] == 3:
+        # Mean of the luminance is the luminance of the per-channel means
+        blocks = band.reshape(T, rb, block, cb, block, 3).mean(axis=(2, 4), dtype=np.float64) @ _LUMA
+    else:
+        blocks = band.reshape(T, rb, block, cb, block).mean(axis=(2, 4), dtype=np.float64)
+    Y = np.ascontiguousarray(blocks.reshape(T, rb * cb).T)
+    # dVI convention of the TICs: delta from the first frame
+    Y -= Y[:, :1]
+    return np.nan_to_num(Y, copy=False)
+
+
+@perf.traced()
+def compute_parametric_maps(
+    stack: np.ndarray,
+    fps: float,
+    t_max: Optional[float] = None,
+    block: int = 1,
+    bounds: Optional[Tuple[Tuple[float, float], Tuple[float, float]]] = None,
+    chunk_pixels: int = 8192,
+    n_workers: Optional[int] = None,
+    n_grid: int = 48,
+    n_refine: int = 16,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Parametric perfusion maps of a stack
+
+    Each pixel (block=1) or each block x block superpixel gives one dVI curve
+    (mean luminance minus its first frame, as for ROI TICs) on t = frame / fps.
+    The wash-in model is fitted and AUC/TTP/Peak are computed on the frames
+    with t <= t_max. The stack is processed in bands of rows so that only
+    chunk_pixels curves are held at once; bands may be fitted in worker
+    processes. Rows/columns beyond the last full block are not mapped.
+
+    Args:
+        stack: Image stack (T, H, W) or (T, H, W, 3)
+        fps: Frames per second
+        t_max: End of the analysis window in seconds (None = whole stack)
+        block: Superpixel size in pixels
+        bounds: Wash-in bounds ((A_lower, B_lower), (A_upper, B_upper))
+        chunk_pixels: Curves per chunk (bounds memory use)
+        n_workers: Worker processes; None picks a count from the stack size,
+            1 fits in the calling thread
+        n_grid: Grid values of B (see fit_washin_batch)
+        n_refine: Golden-section iterations (see fit_washin_batch)
+        progress: Optional callback(fraction, message) called after each chunk
+
+    Returns:
+        Dictionary of (H // block, W // block) float32 maps keyed by MAP_KEYS
+    """
+    if stack.ndim not in (3, 4):
+        raise ValueError(f"Expected a (T, H, W) or (T, H, W, 3) stack, got {stack.shape}")
+    block = max(int(block), 1)
+    T, H, W = stack.shape[:3]
+    Hb, Wb = H // block, W // block
+    maps = {k: np.full((Hb, Wb), np.nan, dtype=np.float32) for k in MAP_KEYS}
+    if Hb == 0 or Wb == 0 or T == 0:
+        return maps
+
+    t = np.arange(T, dtype=np.float64) / float(fps)
+    n_frames = int(np.count_nonzero(t <= float(t_max))) if t_max is not None and t_max > 0 else T
+    n_frames = max(n_frames, 1)
+    t = t[:n_frames]
+
+    rows_per_chunk = max(1, int(chunk_pixels) // Wb)
+    bands = [(r, min(r + rows_per_chunk, Hb)) for r in range(0, Hb, rows_per_chunk)]
+
+    def band_curves(r0: int, r1: int) -> np.ndarray:
+        return _block_curves(stack[:, r0 * block:r1 * block, :Wb * block], block, n_frames)
+
+    def store(r0: int, r1: int, result: Dict[str, np.ndarray], done: int) -> None:
+        for k in MAP_KEYS:
+            maps[k][r0:r1] = result[k].reshape(r1 - r0, Wb)
+        if progress is not None:
+            progress(done / len(bands), "Computing parametric maps...")
+
+    if n_workers is None:
+        # Starting worker processes costs seconds: only worth it for big jobs
+        n_workers = _available_cpus() if Hb * Wb * n_frames >= _POOL_MIN_SAMPLES else 1
+    n_workers = max(1, min(int(n_workers), len(bands)))
+
+    if n_workers == 1:
+        for i, (r0, r1) in enumerate(bands):
+            store(r0, r1, summarize_curves(t, band_curves(r0, r1), bounds, n_grid, n_refine), i + 1)
+        return maps
+
+    # Worker processes: the main thread reads and block-averages the bands
+    # (cheap, needs the stack) while workers run the fits. At most two bands
+    # per worker are in flight to bound memory.
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    executor = ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn'))
+    pending = deque()
+    done = 0
+    try:
+        for r0, r1 in bands:
+            pending.append((r0, r1, executor.submit(summarize_curves, t, band_curves(r0, r1), bounds, n_grid, n_refine)))
+            while len(pending) >= 2 * n_workers:
+                p0, p1, fut = pending.popleft()
+                done += 1
+                store(p0, p1, fut.result(), done)
+        while pending:
+            p0, p1, fut = pending.popleft()
+            done += 1
+            store(p0, p1, fut.result(), done)
+    finally:
+        # Also reached on cancellation (progress raising): drop queued bands
+        executor.shutdown(wait=True, cancel_futures=True)
+    return maps
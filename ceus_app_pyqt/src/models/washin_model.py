@@ -5,6 +5,7 @@ Fits A*(1 - exp(-B*t)) to wash-in phase
 import numpy as np
 from scipy.optimize import curve_fit
 from typing import Tuple, Optional
+from src.utils import perf
 
 
 def washin_model(t: np.ndarray, A: float, B: float) -> np.ndarray:
@@ -22,6 +23,7 @@ def washin_model(t: np.ndarray, A: float, B: float) -> np.ndarray:
     return A * (1.0 - np.exp(-B * t))
 
 
+@perf.traced()
 def fit_washin(
     time: np.ndarray,
     dvi: np.ndarray,
@@ -67,6 +69,7 @@ def fit_washin(
         bounds = ([0.0, 0.1], [np.inf, 5.0])
     
     # Fit
+    perf.count('fits')
     try:
         params, pcov = curve_fit(
             washin_model, 
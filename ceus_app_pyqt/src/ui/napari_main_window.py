@@ -29,7 +29,7 @@ try:
     from src.analysis.models import fit_models
 except Exception:
     fit_models = None
-from skimage.draw import polygon as sk_polygon
+from src.core.roi_manager import rasterize_polygon
 
 
 class NapariCEUSWindow(QWidget):
@@ -1564,7 +1564,7 @@ class NapariCEUSWindow(QWidget):
             # Compute TIC for each ROI
             for roi in self.roi_manager.rois:
                 # Create mask from polygon
-                mask = self._polygon_to_mask(roi.polygon, data_gray.shape[1:])
+                mask = roi.mask(data_gray.shape[1:3]).to_mask()
                 
                 # Extract mean intensity in ROI for each frame
                 T = data_gray.shape[0]
@@ -1605,20 +1605,7 @@ class NapariCEUSWindow(QWidget):
     
     def _polygon_to_mask(self, poly_points: List[tuple], image_shape: tuple) -> np.ndarray:
         """Convert polygon to binary mask"""
-        mask = np.zeros(image_shape, dtype=bool)
-        # Extract x, y coordinates
-        xs = [pt[0] for pt in poly_points]
-        ys = [pt[1] for pt in poly_points]
-        # Log pour vérification
-        print(f"[DEBUG] ROI polygon points (x, y): {poly_points}")
-        print(f"[DEBUG] xs: {xs}")
-        print(f"[DEBUG] ys: {ys}")
-        print(f"[DEBUG] image_shape: {image_shape}")
-        # Use skimage polygon to fill
-        rr, cc = sk_polygon(ys, xs, shape=image_shape)
-        print(f"[DEBUG] mask indices rr: {rr}, cc: {cc}")
-        mask[rr, cc] = True
-        return mask
+        return rasterize_polygon(poly_points, image_shape).to_mask()
     
     def _rgb_to_pyqtgraph_color(self, rgb: tuple) -> str:
         """Convert RGB tuple to PyQtGraph color code"""
@@ -0,0 +1,246 @@
+"""
+Playback engine
+Background read-ahead of upcoming frames and a wall-clock playback
+schedule that drops frames instead of stalling when display falls behind
+"""
+import mmap
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional, Sequence, Set
+
+import numpy as np
+
+
+def _is_resident(array) -> bool:
+    """True if frames of array are plain in-memory numpy data (nothing to prefetch)"""
+    if not isinstance(array, np.ndarray):
+        return False
+    base = array
+    while isinstance(base, np.ndarray):
+        if isinstance(base, np.memmap):
+            return False
+        base = base.base
+    # Owner at the end of the view chain (None, bytes, mmap ...)
+    return not isinstance(base, mmap.mmap)
+
+
+def _touch(frame) -> None:
+    """Read every page of a frame once so it is resident when the viewer reads it"""
+    data = np.asarray(frame)
+    if data.size == 0:
+        return
+    if data.flags.c_contiguous:
+        # One byte per page (and the last one) is enough to fault the pages in
+        raw = data.reshape(-1).view(np.uint8)
+        raw[np.r_[0:raw.size:mmap.PAGESIZE, raw.size - 1]].max()
+    else:
+        data.max()
+
+
+class FramePrefetcher:
+    """
+    Read the next frames of one or more stacks ahead on a background thread
+
+    Frames [cursor, cursor + depth) (wrapping at the end of the clip) are
+    touched page by page, so that memmapped stacks are in the OS page cache
+    when the viewers read them. Nothing is copied: the viewers keep reading
+    the same arrays. The window holds at most `depth` frames. In-memory
+    numpy stacks are always ready and never touched.
+
+    Example:
+        pf = FramePrefetcher([ceus, bmode], depth=32)
+        pf.start()
+        pf.advance(frame)
+        if pf.is_ready(frame + 1): ...
+        pf.stop()
+    """
+
+    def __init__(self, sources: Sequence, depth: int = 32, loop: bool = True):
+        """
+        Initialize prefetcher
+
+        Args:
+            sources: Stacks indexed by frame (None entries are ignored); all
+                are assumed to have at least as many frames as the first
+            depth: Read-ahead window in frames
+            loop: Wrap around at the end (playback loops)
+        """
+        self.sources = [s for s in sources if s is not None]
+        self.n_frames = min((len(s) for s in self.sources), default=0)
+        self.depth = max(1, int(depth))
+        self.loop = loop
+        self._lazy = [i for i, s in enumerate(self.sources) if not _is_resident(s)]
+        self._ready: Set[int] = set()
+        self._cursor = 0
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self.frames_loaded = 0
+
+    @property
+    def needs_thread(self) -> bool:
+        return bool(self._lazy) and self.n_frames > 0
+
+    def start(self) -> None:
+        if not self.needs_thread or self._thread is not None:
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='frame-prefetch', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._ready.clear()
+
+    def _window(self) -> List[int]:
+        """Frame indices that should be read ahead for the current cursor"""
+        n = self.n_frames
+        span = min(self.depth, n)
+        if self.loop:
+            return [(self._cursor + k) % n for k in range(span)]
+        return list(range(self._cursor, min(n, self._cursor + span)))
+
+    def advance(self, frame: int) -> None:
+        """Move the read-ahead window to start at frame (called from the GUI thread)"""
+        if self.n_frames == 0:
+            return
+        frame = int(frame) % self.n_frames if self.loop else min(int(frame), self.n_frames - 1)
+        with self._cond:
+            if frame == self._cursor:
+                return
+            self._cursor = frame
+            # Frames behind the cursor may be paged out again: forget them
+            self._ready.intersection_update(self._window())
+            self._cond.notify_all()
+
+    def is_ready(self, frame: int) -> bool:
+        """True if frame can be displayed without waiting on I/O"""
+        if not self._lazy:
+            return True
+        with self._cond:
+            return int(frame) in self._ready
+
+    def _next_missing(self) -> Optional[int]:
+        for idx in self._window():
+            if idx not in self._ready:
+                return idx
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                idx = self._next_missing()
+                while idx is None and not self._stop:
+                    self._cond.wait(0.5)
+                    idx = self._next_missing()
+                if self._stop:
+                    return
+            try:
+                # Page-in (or decode) off the GUI thread; the data itself is not kept
+                for i in self._lazy:
+                    _touch(self.sources[i][idx])
+            except Exception:
+                return
+            with self._cond:
+                if self._stop:
+                    return
+                if idx in self._window():
+                    self._ready.add(idx)
+                    self.frames_loaded += 1
+
+
+class PlaybackClock:
+    """
+    Wall-clock playback schedule
+
+    The frame to show is derived from elapsed time, not from the number of
+    timer ticks: when a frame is not ready (or ticks arrive late) the clock
+    keeps running and the skipped frames are counted as dropped.
+    """
+
+    def __init__(
+        self,
+        fps: float,
+        n_frames: int,
+        start: int = 0,
+        loop: bool = True,
+        clock: Callable[[], float] = time.perf_counter,
+        window_s: float = 1.0
+    ):
+        """
+        Initialize clock
+
+        Args:
+            fps: Target frame rate
+            n_frames: Clip length
+            start: First frame
+            loop: Wrap around at the end
+            clock: Time source (seconds)
+            window_s: Averaging window for the achieved frame rate
+        """
+        self.fps = float(fps) if fps and fps > 0 else 10.0
+        self.n_frames = max(1, int(n_frames))
+        self.start = int(start) % self.n_frames
+        self.loop = loop
+        self._clock = clock
+        self._t0 = clock()
+        self._last_tick = 0
+        self._shown = deque()
+        self.window_s = float(window_s)
+        self.frames_shown = 0
+        self.frames_dropped = 0
+
+    def _tick(self) -> int:
+        return int((self._clock() - self._t0) * self.fps)
+
+    def target_frame(self, tick: Optional[int] = None) -> int:
+        """Frame that should be on screen now (or at a given tick)"""
+        k = self.start + (self._tick() if tick is None else tick)
+        if self.loop:
+            return k % self.n_frames
+        return min(k, self.n_frames - 1)
+
+    def next_frame(self, is_ready: Optional[Callable[[int], bool]] = None) -> Optional[int]:
+        """
+        Frame to display at this timer tick
+
+        Args:
+            is_ready: Optional predicate; frames that are not ready are skipped
+
+        Returns:
+            Frame index, or None if nothing new should be shown
+        """
+        tick = self._tick()
+        if tick <= self._last_tick and self.frames_shown:
+            return None
+        frame = self.target_frame(tick)
+        if is_ready is not None and not is_ready(frame):
+            return None
+        if self.frames_shown:
+            self.frames_dropped += max(0, tick - self._last_tick - 1)
+        self._last_tick = tick
+        self.frames_shown += 1
+        now = self._clock()
+        self._shown.append(now)
+        while self._shown and now - self._shown[0] > self.window_s:
+            self._shown.popleft()
+        return frame
+
+    @property
+    def achieved_fps(self) -> float:
+        """Displayed frames per second over the last window (drops to 0 on a stall)"""
+        now = self._clock()
+        while self._shown and now - self._shown[0] > self.window_s:
+            self._shown.popleft()
+        elapsed = min(self.window_s, now - self._t0)
+        return len(self._shown) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def finished(self) -> bool:
+        return not self.loop and self.start + self._tick() >= self.n_frames - 1
@@ -5,10 +5,12 @@ from src.ui.widgets.image_viewer import ImageViewerWidget
 from src.ui.widgets.tic_plot_widget import TICPlotWidget
 from src.ui.widgets.roi_panel import ROIPanel
 from src.ui.widgets.fit_panel import FitPanel
+from src.ui.widgets.perf_panel import PerfPanel
 
 __all__ = [
     'ImageViewerWidget',
     'TICPlotWidget',
     'ROIPanel',
     'FitPanel',
+    'PerfPanel',
 ]
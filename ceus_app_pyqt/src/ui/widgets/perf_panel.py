@@ -0,0 +1,150 @@
+"""
+Performance panel: live span timings, counters, profiler capture and trace export
+"""
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QCheckBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog, QMessageBox,
+    QPlainTextEdit
+)
+from PyQt5.QtCore import Qt, QTimer
+
+from src.utils import perf
+
+_COLUMNS = ("Span", "Calls", "Total (ms)", "Mean (ms)", "Max (ms)")
+
+
+class PerfPanel(QWidget):
+    """Table of recorded spans (slowest first) with recording/profiling controls"""
+
+    def __init__(self, parent=None, refresh_ms: int = 1000):
+        super().__init__(parent)
+        self.setWindowTitle("Performance")
+
+        self._create_widgets()
+        self._create_layout()
+        self._connect_signals()
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(refresh_ms))
+        self.timer.timeout.connect(self.refresh)
+        self.refresh()
+
+    def _create_widgets(self):
+        """Create widgets"""
+        self.chk_record = QCheckBox("Record")
+        self.chk_record.setChecked(perf.is_enabled())
+        self.chk_record.setToolTip("Time pipeline stages and UI actions (negligible cost when off)")
+
+        self.btn_profile = QPushButton("Start Profile")
+        self.btn_profile.setCheckable(True)
+        self.btn_profile.setToolTip(
+            f"Capture a {' / '.join(perf.profiling_backends())} profile of the main thread and background tasks"
+        )
+        self.btn_reset = QPushButton("Reset")
+        self.btn_export = QPushButton("Export Trace…")
+        self.btn_export.setToolTip("Save spans and counters as a Chrome trace (chrome://tracing, ui.perfetto.dev)")
+
+        self.table = QTableWidget(0, len(_COLUMNS))
+        self.table.setHorizontalHeaderLabels(list(_COLUMNS))
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setAlternatingRowColors(True)
+        self.table.verticalHeader().setVisible(False)
+
+        self.counters_label = QLabel("")
+        self.counters_label.setStyleSheet("color:#666;")
+        self.counters_label.setWordWrap(True)
+
+        self.profile_output = QPlainTextEdit()
+        self.profile_output.setReadOnly(True)
+        self.profile_output.setVisible(False)
+        self.profile_output.setStyleSheet("font-family: monospace;")
+
+    def _create_layout(self):
+        """Create layout"""
+        layout = QVBoxLayout()
+        controls = QHBoxLayout()
+        controls.addWidget(self.chk_record)
+        controls.addWidget(self.btn_profile)
+        controls.addStretch()
+        controls.addWidget(self.btn_reset)
+        controls.addWidget(self.btn_export)
+        layout.addLayout(controls)
+        layout.addWidget(self.table)
+        layout.addWidget(self.counters_label)
+        layout.addWidget(self.profile_output)
+        self.setLayout(layout)
+        self.resize(560, 420)
+
+    def _connect_signals(self):
+        """Connect signals"""
+        self.chk_record.toggled.connect(self._on_record_toggled)
+        self.btn_profile.toggled.connect(self._on_profile_toggled)
+        self.btn_reset.clicked.connect(self._on_reset)
+        self.btn_export.clicked.connect(self._on_export)
+
+    def showEvent(self, event):
+        self.timer.start()
+        self.refresh()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        """Reload the table and counters from the recorder"""
+        rows = perf.summary()
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            values = (row['name'], str(row['count']), f"{row['total_ms']:.1f}",
+                      f"{row['mean_ms']:.2f}", f"{row['max_ms']:.1f}")
+            for j, text in enumerate(values):
+                item = QTableWidgetItem(text)
+                if j > 0:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(i, j, item)
+        counts = perf.counters()
+        self.counters_label.setText(
+            "   ".join(f"{k}: {v:g}" for k, v in sorted(counts.items())) if counts else ""
+        )
+
+    def _on_record_toggled(self, checked: bool):
+        perf.enable(checked)
+        self.refresh()
+
+    def _on_profile_toggled(self, checked: bool):
+        if checked:
+            try:
+                backend = perf.start_profile()
+            except Exception as e:
+                QMessageBox.warning(self, "Profiler", str(e))
+                self.btn_profile.blockSignals(True)
+                self.btn_profile.setChecked(False)
+                self.btn_profile.blockSignals(False)
+                return
+            self.btn_profile.setText(f"Stop Profile ({backend})")
+            return
+        self.btn_profile.setText("Start Profile")
+        report = perf.stop_profile()
+        self.profile_output.setPlainText(report)
+        self.profile_output.setVisible(bool(report))
+
+    def _on_reset(self):
+        perf.reset()
+        self.refresh()
+
+    def _on_export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "ceus_trace.json", "Chrome trace (*.json)")
+        if not path:
+            return
+        try:
+            perf.export_chrome_trace(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Trace export failed:\n{e}")
+
+    def closeEvent(self, event):
+        # A capture left running would keep profiling the whole app
+        if perf.profile_active():
+            self.btn_profile.setChecked(False)
+        super().closeEvent(event)
@@ -0,0 +1,228 @@
+"""
+Background task runner for long GUI operations
+Runs callables on a QThreadPool and delivers progress/results on the Qt main thread
+"""
+import traceback
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from src.utils import perf
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task when cancellation was requested"""
+    pass
+
+
+class TaskSignals(QObject):
+    """Signals emitted by a running task (delivered to the main thread)"""
+    progress = pyqtSignal(int, str)      # percent (0-100), message
+    partial = pyqtSignal(object)         # intermediate result (see TaskContext.publish)
+    result = pyqtSignal(object)          # return value of the task
+    error = pyqtSignal(str, str)         # message, formatted traceback
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()              # always emitted last
+
+
+class TaskContext:
+    """Handle passed to the task function for progress and cancellation"""
+
+    def __init__(self, signals: TaskSignals):
+        self._signals = signals
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self) -> None:
+        self._cancel_event.set()
+
+    def check_cancelled(self) -> None:
+        """Raise TaskCancelled if cancellation was requested"""
+        if self._cancel_event.is_set():
+            raise TaskCancelled()
+
+    def report(self, fraction: float, message: str = "") -> None:
+        """
+        Report progress from the worker thread
+
+        Args:
+            fraction: Progress in [0, 1]
+            message: Optional short status text
+
+        Raises:
+            TaskCancelled: If the task was cancelled (progress points double as cancel points)
+        """
+        self.check_cancelled()
+        try:
+            pct = int(round(100.0 * min(max(float(fraction), 0.0), 1.0)))
+        except Exception:
+            pct = 0
+        self._signals.progress.emit(pct, message)
+
+    def publish(self, value: Any) -> None:
+        """Deliver an intermediate result to the main thread (e.g. first decoded frame)"""
+        self.check_cancelled()
+        self._signals.partial.emit(value)
+
+
+class Task(QRunnable):
+    """QRunnable wrapper calling fn(ctx, *args, **kwargs)"""
+
+    def __init__(self, name: str, fn: Callable[..., Any], *args, **kwargs):
+        super().__init__()
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self.context = TaskContext(self.signals)
+        self.done = threading.Event()
+
+    def cancel(self) -> None:
+        self.context.cancel()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.context.cancelled
+
+    def run(self):
+        try:
+            self.context.check_cancelled()
+            with perf.span(f"task.{self.name}"), perf.profile_thread():
+                value = self.fn(self.context, *self.args, **self.kwargs)
+            # A result computed after cancel() is stale: never deliver it
+            self.context.check_cancelled()
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.error.emit(str(e), traceback.format_exc())
+        else:
+            self.signals.result.emit(value)
+        finally:
+            self.done.set()
+            self.signals.finished.emit()
+
+
+class TaskRunner(QObject):
+    """
+    Submit named background tasks from the GUI
+
+    Only one task per name runs at a time: submitting a name that is already
+    running cancels the previous task (its result is discarded). Callbacks are
+    invoked on the main thread, so they may update widgets and window state.
+
+    Example:
+        runner.submit('tics', compute, rois,
+                      on_result=self._apply_tics, on_progress=self._on_progress)
+    """
+
+    task_started = pyqtSignal(str)
+    task_finished = pyqtSignal(str)
+
+    def __init__(self, parent: Optional[QObject] = None, max_threads: Optional[int] = None):
+        """
+        Initialize runner
+
+        Args:
+            parent: Qt parent object
+            max_threads: Optional cap on worker threads (defaults to Qt's ideal count)
+        """
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        if max_threads:
+            self.pool.setMaxThreadCount(int(max_threads))
+        self._tasks: Dict[str, Task] = {}
+
+    def submit(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        *args,
+        on_result: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[str, str], None]] = None,
+        on_progress: Optional[Callable[[int, str], None]] = None,
+        on_partial: Optional[Callable[[Any], None]] = None,
+        on_cancelled: Optional[Callable[[], None]] = None,
+        on_finished: Optional[Callable[[], None]] = None,
+        **kwargs
+    ) -> Task:
+        """
+        Run fn(ctx, *args, **kwargs) in the thread pool
+
+        Args:
+            name: Task slot; a running task with the same name is cancelled
+            fn: Callable executed in a worker thread (must not touch widgets)
+            on_result: Called with the return value
+            on_error: Called with (message, traceback) if fn raised
+            on_progress: Called with (percent, message) on ctx.report()
+            on_partial: Called with each value passed to ctx.publish()
+            on_cancelled: Called if the task was cancelled
+            on_finished: Called last in every case
+
+        Returns:
+            The submitted Task
+        """
+        self.cancel(name)
+        task = Task(name, fn, *args, **kwargs)
+        sig = task.signals
+        if on_progress is not None:
+            # Drop progress of a task that was superseded or cancelled
+            sig.progress.connect(lambda pct, msg: None if task.is_cancelled else on_progress(pct, msg))
+        if on_partial is not None:
+            sig.partial.connect(lambda value: None if task.is_cancelled else on_partial(value))
+        if on_result is not None:
+            # The result/error may already be queued when cancel() is called
+            sig.result.connect(lambda value: None if task.is_cancelled else on_result(value))
+        if on_error is not None:
+            sig.error.connect(lambda msg, tb: None if task.is_cancelled else on_error(msg, tb))
+        if on_cancelled is not None:
+            sig.cancelled.connect(on_cancelled)
+        sig.finished.connect(lambda: self._on_task_finished(task))
+        if on_finished is not None:
+            sig.finished.connect(on_finished)
+        self._tasks[name] = task
+        self.task_started.emit(name)
+        self.pool.start(task)
+        return task
+
+    def _on_task_finished(self, task: Task) -> None:
+        if self._tasks.get(task.name) is task:
+            del self._tasks[task.name]
+        self.task_finished.emit(task.name)
+
+    def is_running(self, name: Optional[str] = None) -> bool:
+        """True if a task with this name (or any task) is pending/running"""
+        if name is None:
+            return bool(self._tasks)
+        return name in self._tasks
+
+    def running_names(self):
+        return list(self._tasks.keys())
+
+    def cancel(self, name: str) -> bool:
+        """Request cancellation of the named task; returns True if one was running"""
+        task = self._tasks.pop(name, None)
+        if task is None:
+            return False
+        task.cancel()
+        # Remove it from the queue if it has not started yet
+        try:
+            if self.pool.tryTake(task):
+                task.done.set()
+                task.signals.cancelled.emit()
+                task.signals.finished.emit()
+        except Exception:
+            pass
+        return True
+
+    def cancel_all(self) -> None:
+        for name in list(self._tasks.keys()):
+            self.cancel(name)
+
+    def wait(self, msecs: int = -1) -> bool:
+        """Block until all pool threads are idle (used on close)"""
+        return self.pool.waitForDone(msecs)
@@ -3,5 +3,6 @@ Utility functions
 """
 from src.utils.converters import ycbcr_to_rgb, to_gray
 from src.utils.validators import validate_roi, validate_stack
+from src.utils.pyramid import build_pyramid, PyramidCache
 
-__all__ = ['ycbcr_to_rgb', 'to_gray', 'validate_roi', 'validate_stack']
+__all__ = ['ycbcr_to_rgb', 'to_gray', 'validate_roi', 'validate_stack', 'build_pyramid', 'PyramidCache']
@@ -0,0 +1,331 @@
+"""
+Pipeline instrumentation
+Timing spans, counters and an optional profiler capture, exportable as a
+Chrome trace (chrome://tracing, Perfetto). While recording is off a span
+costs one flag check.
+
+Example:
+    from src.utils import perf
+
+    @perf.traced()
+    def preprocess(stack): ...
+
+    with perf.span('tic.extract', rois=3):
+        ...
+    perf.count('frames_decoded')
+
+Recording is off by default; enable it with perf.enable() or by setting
+CEUS_PERF=1 in the environment.
+"""
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+try:
+    import pyinstrument
+except ImportError:  # Optional: cProfile is always available
+    pyinstrument = None
+
+# Events kept for the trace (oldest dropped first)
+MAX_EVENTS = 200_000
+
+
+class _State:
+    """Recorder state (module singleton)"""
+
+    def __init__(self):
+        self.enabled = os.environ.get('CEUS_PERF', '') not in ('', '0')
+        self.lock = threading.Lock()
+        self.t0 = time.perf_counter_ns()
+        self.reset()
+
+    def reset(self):
+        # (kind, name, start_ns, dur_ns or value, thread id, args)
+        self.events = deque(maxlen=MAX_EVENTS)
+        # name -> [count, total_ns, max_ns]
+        self.totals: Dict[str, List[int]] = {}
+        self.counters: Dict[str, float] = {}
+        self.threads: Dict[int, str] = {}
+
+
+_state = _State()
+
+
+def enable(on: bool = True) -> None:
+    """Start (or stop) recording spans and counters"""
+    _state.enabled = bool(on)
+
+
+def is_enabled() -> bool:
+    return _state.enabled
+
+
+def reset() -> None:
+    """Drop recorded spans, totals and counters"""
+    with _state.lock:
+        _state.reset()
+
+
+def _thread_id() -> int:
+    tid = threading.get_ident()
+    if tid not in _state.threads:
+        _state.threads[tid] = threading.current_thread().name
+    return tid
+
+
+def _record(name: str, start: int, duration: int, args: Optional[dict]) -> None:
+    tid = _thread_id()
+    with _state.lock:
+        _state.events.append(('X', name, start, duration, tid, args))
+        entry = _state.totals.get(name)
+        if entry is None:
+            _state.totals[name] = [1, duration, duration]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+            if duration > entry[2]:
+                entry[2] = duration
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name: str, args: Optional[dict]):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **args):
+    """
+    Context manager timing a block
+
+    Args:
+        name: Span name (dotted, e.g. 'motion.estimate')
+        **args: Extra values shown with the span in the trace
+    """
+    if not _state.enabled:
+        return _NO_SPAN
+    return _Span(name, args or None)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """
+    Decorator timing every call of a function
+
+    Args:
+        name: Span name (default: '<module>.<qualified name>')
+    """
+    def decorate(fn: Callable) -> Callable:
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(label, start, time.perf_counter_ns() - start, None)
+        return wrapper
+    return decorate
+
+
+def count(name: str, n: float = 1) -> None:
+    """Add n to a counter (e.g. frames decoded, fits run)"""
+    if not _state.enabled:
+        return
+    with _state.lock:
+        value = _state.counters.get(name, 0) + n
+        _state.counters[name] = value
+        _state.events.append(('C', name, time.perf_counter_ns(), value, 0, None))
+
+
+def counters() -> Dict[str, float]:
+    with _state.lock:
+        return dict(_state.counters)
+
+
+def summary() -> List[Dict[str, Any]]:
+    """Per-span totals, slowest first: name, count, total_ms, mean_ms, max_ms"""
+    with _state.lock:
+        items = [(name, list(v)) for name, v in _state.totals.items()]
+    rows = [
+        {'name': name, 'count': n, 'total_ms': total / 1e6, 'mean_ms': total / n / 1e6, 'max_ms': peak / 1e6}
+        for name, (n, total, peak) in items
+    ]
+    rows.sort(key=lambda r: r['total_ms'], reverse=True)
+    return rows
+
+
+def chrome_trace() -> dict:
+    """Recorded spans and counters in Chrome trace-event format"""
+    pid = os.getpid()
+    with _state.lock:
+        events = list(_state.events)
+        threads = dict(_state.threads)
+    out = [
+        {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': tname}}
+        for tid, tname in threads.items()
+    ]
+    for kind, name, start, value, tid, args in events:
+        ts = (start - _state.t0) / 1e3
+        if kind == 'X':
+            event = {'name': name, 'ph': 'X', 'ts': ts, 'dur': value / 1e3, 'pid': pid, 'tid': tid}
+            if args:
+                event['args'] = {k: v if isinstance(v, (int, float, str, bool)) else str(v) for k, v in args.items()}
+        else:
+            event = {'name': name, 'ph': 'C', 'ts': ts, 'pid': pid, 'args': {name: value}}
+        out.append(event)
+    return {'traceEvents': out, 'displayTimeUnit': 'ms'}
+
+
+def export_chrome_trace(path: Union[str, Path]) -> Path:
+    """Write chrome_trace() as JSON (open in chrome://tracing or ui.perfetto.dev)"""
+    path = Path(path)
+    path.write_text(json.dumps(chrome_trace()))
+    return path
+
+
+# =============================================================================
+# Profiler capture
+# =============================================================================
+class _Capture:
+    """Active profiler capture (main thread plus worker threads)"""
+
+    def __init__(self, backend: str):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.thread_profiles: List[cProfile.Profile] = []
+        if backend == 'pyinstrument':
+            self.profiler = pyinstrument.Profiler()
+        else:
+            self.profiler = cProfile.Profile()
+
+    def start(self):
+        if self.backend == 'pyinstrument':
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.backend == 'pyinstrument':
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+
+
+_capture: Optional[_Capture] = None
+
+
+def profiling_backends() -> List[str]:
+    return ['cprofile'] + (['pyinstrument'] if pyinstrument is not None else [])
+
+
+def profile_active() -> bool:
+    return _capture is not None
+
+
+def start_profile(backend: str = 'auto') -> str:
+    """
+    Start a profiler capture on the calling thread
+
+    Worker threads are included when they run inside profile_thread().
+
+    Args:
+        backend: 'cprofile', 'pyinstrument' or 'auto' (pyinstrument if installed)
+
+    Returns:
+        The backend used
+    """
+    global _capture
+    if _capture is not None:
+        raise RuntimeError("A profile capture is already running")
+    if backend == 'auto':
+        backend = 'pyinstrument' if pyinstrument is not None else 'cprofile'
+    if backend not in profiling_backends():
+        raise ValueError(f"Profiler '{backend}' not available (have {profiling_backends()})")
+    capture = _Capture(backend)
+    capture.start()
+    _capture = capture
+    return backend
+
+
+def stop_profile(path: Optional[Union[str, Path]] = None, limit: int = 40) -> str:
+    """
+    Stop the capture and return a text report
+
+    Args:
+        path: Optional file to save (.prof pstats for cProfile, .html for pyinstrument)
+        limit: Functions listed in the cProfile report (sorted by cumulative time)
+    """
+    global _capture
+    capture, _capture = _capture, None
+    if capture is None:
+        return ''
+    capture.stop()
+    if capture.backend == 'pyinstrument':
+        if path is not None:
+            Path(path).write_text(capture.profiler.output_html())
+        return capture.profiler.output_text()
+    stream = io.StringIO()
+    stats = pstats.Stats(capture.profiler, stream=stream)
+    with capture.lock:
+        for prof in capture.thread_profiles:
+            stats.add(prof)
+    if path is not None:
+        stats.dump_stats(str(path))
+    stats.sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+@contextmanager
+def profile_thread():
+    """Include the enclosed block (e.g. a worker task) in the running cProfile capture"""
+    capture = _capture
+    if capture is None or capture.backend != 'cprofile':
+        yield
+        return
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:
+        # Python >= 3.12 allows a single active cProfile (sys.monitoring)
+        yield
+        return
+    try:
+        yield
+    finally:
+        prof.disable()
+        with capture.lock:
+            capture.thread_profiles.append(prof)
@@ -0,0 +1,161 @@
+"""
+Multiscale display pyramids
+Downsampled copies (full, 2×, 4×) shared by every viewer showing a stack
+"""
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+from src.utils import perf
+
+
+def is_uint8_exact(stack: np.ndarray, chunk: int = 32) -> bool:
+    """
+    True if every value of the stack is an integer in [0, 255]
+
+    Such stacks (e.g. raw 8-bit frames stored as float32) can be displayed as
+    uint8 without changing pixel values or contrast limits.
+
+    Args:
+        stack: Image stack
+        chunk: Frames checked per step (bounds temporary memory)
+
+    Returns:
+        Whether a uint8 cast is lossless
+    """
+    data = np.asarray(stack)
+    if data.dtype == np.uint8:
+        return True
+    if data.dtype == np.bool_ or data.size == 0:
+        return False
+    if np.issubdtype(data.dtype, np.integer):
+        return int(data.min()) >= 0 and int(data.max()) <= 255
+    if not np.issubdtype(data.dtype, np.floating):
+        return False
+    if data.ndim == 0:
+        data = data.reshape(1)
+    for i in range(0, data.shape[0], chunk):
+        block = data[i:i + chunk]
+        if not np.all((block >= 0) & (block <= 255) & (block == np.floor(block))):
+            return False
+    return True
+
+
+def downsample_mean(stack: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Block-average the spatial axes (1, 2) of a stack by an integer factor
+
+    Trailing rows/columns that do not fill a block are dropped. The dtype is
+    preserved (integer levels are rounded).
+
+    Args:
+        stack: Stack (T, H, W) or (T, H, W, C)
+        factor: Downsampling factor (>= 2)
+
+    Returns:
+        Stack (T, H // factor, W // factor[, C])
+    """
+    T, H, W = stack.shape[:3]
+    h, w = H // factor, W // factor
+    tail = stack.shape[3:]
+    out = np.empty((T, h, w) + tail, dtype=stack.dtype)
+    is_int = np.issubdtype(stack.dtype, np.integer)
+    for t in range(T):
+        block = stack[t, :h * factor, :w * factor].reshape((h, factor, w, factor) + tail)
+        mean = block.mean(axis=(1, 3), dtype=np.float32)
+        out[t] = np.rint(mean) if is_int else mean
+    return out
+
+
+@perf.traced()
+def build_pyramid(
+    stack: np.ndarray,
+    factors: Sequence[int] = (2, 4),
+    min_size: int = 128
+) -> List[np.ndarray]:
+    """
+    Build a multiscale display pyramid [full, full/2, full/4, ...]
+
+    Stacks whose values fit exactly in uint8 are stored as uint8 (uint8 input
+    is reused as level 0 without copy); other stacks keep their dtype so pixel
+    values and contrast limits stay valid. Each level is computed from the
+    previous one. Levels whose smaller spatial side would drop below min_size
+    are skipped, so small clips get a single level (plain array display).
+
+    Args:
+        stack: Image stack (T, H, W) or (T, H, W, C)
+        factors: Downsampling factors relative to full resolution (increasing)
+        min_size: Minimum spatial side of a downsampled level
+
+    Returns:
+        List of arrays, full resolution first
+    """
+    base = np.asarray(stack)
+    if base.dtype != np.uint8 and is_uint8_exact(base):
+        base = base.astype(np.uint8)
+    levels = [base]
+    if base.ndim < 3:
+        return levels
+    prev_factor = 1
+    for f in factors:
+        f = int(f)
+        if f <= prev_factor or f % prev_factor:
+            continue
+        if min(base.shape[1], base.shape[2]) // f < min_size:
+            break
+        levels.append(downsample_mean(levels[-1], f // prev_factor))
+        prev_factor = f
+    return levels
+
+
+class PyramidCache:
+    """
+    Small LRU of display pyramids keyed by source array
+
+    The same source stack always yields the same level arrays, so viewers
+    displaying it (B-mode, CEUS, overlay) share memory and GPU uploads.
+    """
+
+    def __init__(self, max_entries: int = 4, factors: Sequence[int] = (2, 4), min_size: int = 128):
+        self.max_entries = int(max_entries)
+        self.factors = tuple(factors)
+        self.min_size = int(min_size)
+        # id(source) -> (source, levels); the source reference keeps id() unique
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, List[np.ndarray]]]" = OrderedDict()
+
+    def get(self, stack: np.ndarray) -> List[np.ndarray]:
+        """Pyramid levels for stack (built on first request)"""
+        key = id(stack)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is stack:
+            self._entries.move_to_end(key)
+            return entry[1]
+        levels = build_pyramid(stack, self.factors, self.min_size)
+        self._entries[key] = (stack, levels)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return levels
+
+    def put(self, stack: np.ndarray, levels: List[np.ndarray]) -> None:
+        """Insert levels built elsewhere (e.g. in a worker thread) for stack"""
+        self._entries[id(stack)] = (stack, list(levels))
+        self._entries.move_to_end(id(stack))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def peek(self, stack: np.ndarray) -> Optional[List[np.ndarray]]:
+        """Cached levels for stack, or None"""
+        entry = self._entries.get(id(stack))
+        return entry[1] if entry is not None and entry[0] is stack else None
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by pyramid levels (levels sharing the source are not counted)"""
+        total = 0
+        for source, levels in self._entries.values():
+            for lvl in levels:
+                if lvl is not source:
+                    total += lvl.nbytes
+        return total
@@ -0,0 +1,279 @@
+"""
+Synthetic CEUS clips
+Writes split-screen ultrasound DICOMs (B-mode + CEUS) with a flash, known
+per-region perfusion curves and rigid motion, returned with their ground
+truth so loading, flash detection, motion correction and fitting can be
+benchmarked and checked offline
+"""
+import numpy as np
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+from scipy.ndimage import gaussian_filter, shift as ndi_shift
+
+from src.analysis.models import lognormal_func
+from src.models.washin_model import washin_model
+
+# US Multi-frame Image Storage
+US_MULTIFRAME_SOP_CLASS = '1.2.840.10008.5.1.4.1.1.3.1'
+PHOTOMETRIC_MODES = ('RGB', 'YBR_FULL_422')
+# Colour of the CEUS overlay (pixel = intensity * tint); B-mode stays gray
+DEFAULT_TINT = (1.0, 0.75, 0.35)
+
+
+@dataclass
+class SyntheticRegion:
+    """
+    One perfused region of the CEUS image
+
+    Intensities are 0-255 values before tinting and noise; params are those
+    of the model (lognormal: AUC, u, s[, t0]; washin: A, B) for times in
+    seconds since the first frame after the flash, plus the background.
+    """
+    label: str
+    box: Tuple[int, int, int, int]    # (y0, y1, x0, x1) in CEUS region pixels (motion-free)
+    model: str                        # 'lognormal' or 'washin'
+    params: Dict[str, float]
+    background: float = 8.0           # intensity right after the flash
+
+    def curve(self, t: np.ndarray) -> np.ndarray:
+        """Refill intensity at times t (seconds after the flash)"""
+        if self.model == 'lognormal':
+            p = dict({'t0': 0.0}, **self.params)
+            return lognormal_func(t, p['AUC'], p['u'], p['s'], p['t0'], self.background)
+        if self.model == 'washin':
+            return self.background + washin_model(np.asarray(t, dtype=np.float64), **self.params)
+        raise ValueError(f"Unknown perfusion model '{self.model}' (expected 'lognormal' or 'washin')")
+
+    def mask(self, shape: Tuple[int, int]) -> np.ndarray:
+        """Boolean mask of the region in a (H, W) CEUS image"""
+        y0, y1, x0, x1 = self.box
+        out = np.zeros(shape, dtype=bool)
+        out[y0:y1, x0:x1] = True
+        return out
+
+
+@dataclass
+class SyntheticClip:
+    """A written synthetic clip and its ground truth"""
+    path: Path
+    fps: float
+    photometric: str
+    flash_idx: int                    # bright flash frame (frame before the drop)
+    washout_idx: int                  # darkest frame, first frame of the refill
+    bmode_box: Tuple[int, int, int, int]   # (y0, y1, x0, x1) in the full frame
+    ceus_box: Tuple[int, int, int, int]
+    regions: List[SyntheticRegion]
+    # (T, 2) content displacement (dy, dx) in pixels; motion_compensate
+    # estimates the correction, i.e. about -shifts (up to its reference)
+    shifts: np.ndarray
+    # (n_regions, T) motion-free mean intensity of each region per frame
+    intensities: np.ndarray
+    # (T, H, W, 3) uint8 RGB frames as rendered (before YBR encoding), if kept
+    frames: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def times(self) -> np.ndarray:
+        """Frame times in seconds"""
+        return np.arange(self.intensities.shape[1]) / self.fps
+
+    @property
+    def refill_times(self) -> np.ndarray:
+        """Times in seconds since the refill start (negative before it)"""
+        return (np.arange(self.intensities.shape[1]) - self.washout_idx) / self.fps
+
+
+def default_regions(H: int, W: int) -> List[SyntheticRegion]:
+    """Two regions side by side: a lognormal bolus and a slower wash-in"""
+    y0, y1 = H // 4, H // 4 + max(H // 3, 2)
+    w = max(W // 4, 2)
+    return [
+        SyntheticRegion('lognormal', (y0, y1, W // 8, W // 8 + w), 'lognormal',
+                        {'AUC': 400.0, 'u': float(np.log(3.0)), 's': 0.5}),
+        SyntheticRegion('washin', (y0, y1, W // 2 + W // 8, W // 2 + W // 8 + w), 'washin',
+                        {'A': 150.0, 'B': 0.6}),
+    ]
+
+
+def _motion(T: int, fps: float, amplitude: Union[float, Sequence[float]], period: float) -> np.ndarray:
+    """Breathing-like sinusoidal displacement (T, 2)"""
+    amp = np.broadcast_to(np.asarray(amplitude, dtype=np.float64), (2,))
+    phase = 2 * np.pi * np.arange(T) / (fps * period)
+    return np.stack([amp[0] * np.sin(phase), amp[1] * np.sin(phase + np.pi / 3)], axis=1)
+
+
+def _rgb_to_ybr_422(frames: np.ndarray) -> np.ndarray:
+    """
+    Encode RGB frames as native YBR_FULL_422 bytes (Y1 Y2 Cb Cr per pixel pair)
+
+    Full-range BT.601, the inverse of utils.converters.ycbcr_to_rgb; chroma is
+    averaged over horizontal pixel pairs.
+    """
+    rgb = frames.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    y = 0.299 * r + 0.587 * g + 0.114 * b
+    cb = 128.0 - 0.168736 * r - 0.331264 * g + 0.5 * b
+    cr = 128.0 + 0.5 * r - 0.418688 * g - 0.081312 * b
+    T, H, W = y.shape
+    out = np.empty((T, H, W // 2, 4), dtype=np.uint8)
+    out[..., 0] = np.clip(np.rint(y[..., 0::2]), 0, 255)
+    out[..., 1] = np.clip(np.rint(y[..., 1::2]), 0, 255)
+    out[..., 2] = np.clip(np.rint(0.5 * (cb[..., 0::2] + cb[..., 1::2])), 0, 255)
+    out[..., 3] = np.clip(np.rint(0.5 * (cr[..., 0::2] + cr[..., 1::2])), 0, 255)
+    return out
+
+
+def write_synthetic_clip(
+    path: Union[str, Path],
+    T: int = 120,
+    H: int = 120,
+    W: int = 320,
+    fps: float = 10.0,
+    photometric: str = 'RGB',
+    flash_frame: Optional[int] = None,
+    regions: Optional[Sequence[SyntheticRegion]] = None,
+    motion_amplitude: Union[float, Sequence[float]] = 0.0,
+    motion_period: float = 4.0,
+    shifts: Optional[np.ndarray] = None,
+    noise: float = 0.08,
+    flash_level: float = 230.0,
+    ceus_region_type: int = 1,
+    manufacturer: str = 'Synthetic',
+    margin: int = 0,
+    seed: int = 0,
+    keep_frames: bool = False
+) -> SyntheticClip:
+    """
+    Write a split-screen CEUS clip with known perfusion, flash and motion
+
+    The left half is a gray B-mode speckle image, the right half the tinted
+    CEUS image. Before the flash each region sits at its curve's maximum; the
+    flash frame is bright, the next frame dark, then every region refills
+    following its model. Both halves move by the same rigid displacement.
+
+    Args:
+        path: Output DICOM file
+        T: Number of frames
+        H: Frame height
+        W: Frame width (multiple of 4; each half is W // 2 wide)
+        fps: Frame rate (FrameTime = 1000 / fps)
+        photometric: 'RGB' or 'YBR_FULL_422' (native, chroma-subsampled)
+        flash_frame: Index of the flash frame (default T // 4)
+        regions: Perfused regions of the CEUS half (default: default_regions)
+        motion_amplitude: Sinusoidal displacement amplitude in pixels, scalar
+            or (dy, dx); 0 disables motion
+        motion_period: Motion period in seconds
+        shifts: Explicit (T, 2) displacement (overrides motion_amplitude)
+        noise: Relative standard deviation of the multiplicative speckle noise
+        flash_level: CEUS intensity of the flash frame
+        ceus_region_type: RegionDataType of the CEUS region (1 = split screen
+            classified by colour, 2 = explicit CEUS)
+        manufacturer: Manufacturer tag (e.g. 'GE' for position-based region classification)
+        margin: Rows of scanner UI (text bars) above and below the image
+            area; the frame is H + 2 * margin rows high
+        seed: Random seed (texture and noise)
+        keep_frames: Return the rendered RGB frames in SyntheticClip.frames
+
+    Returns:
+        SyntheticClip with the ground truth
+    """
+    if photometric not in PHOTOMETRIC_MODES:
+        raise ValueError(f"Unsupported photometric interpretation '{photometric}' (expected one of {PHOTOMETRIC_MODES})")
+    if W % 4 != 0:
+        raise ValueError(f"Width must be a multiple of 4 (two halves of even width), got {W}")
+    path = Path(path)
+    rng = np.random.default_rng(seed)
+    half = W // 2
+    flash = T // 4 if flash_frame is None else int(flash_frame)
+    if not 1 <= flash < T - 1:
+        raise ValueError(f"Flash frame must be in [1, {T - 2}], got {flash}")
+    regions = list(default_regions(H, half) if regions is None else regions)
+    if shifts is None:
+        shifts = _motion(T, fps, motion_amplitude, motion_period)
+    shifts = np.asarray(shifts, dtype=np.float64).reshape(T, 2)
+
+    # Ground-truth intensity of each region per frame
+    refill_t = (np.arange(T) - (flash + 1)) / fps
+    intensities = np.empty((len(regions), T), dtype=np.float64)
+    for k, reg in enumerate(regions):
+        curve = reg.curve(np.clip(refill_t, 0.0, None))
+        intensities[k] = curve
+        intensities[k, :flash] = curve[flash + 1:].max() if flash + 1 < T else curve.max()
+        intensities[k, flash] = flash_level
+    masks = [reg.mask((H, half)) for reg in regions]
+    background = np.zeros((H, half), dtype=np.float32)
+    tint = np.asarray(DEFAULT_TINT, dtype=np.float32)
+
+    # Static B-mode anatomy: smoothed speckle plus a few bright structures
+    yy, xx = np.mgrid[0:H, 0:half]
+    tissue = gaussian_filter(rng.random((H, half)).astype(np.float32), 1.5)
+    tissue = 40.0 + 120.0 * (tissue - tissue.min()) / max(float(np.ptp(tissue)), 1e-6)
+    for cy, cx, r in ((0.3, 0.3, 0.12), (0.65, 0.6, 0.18), (0.5, 0.85, 0.08)):
+        blob = ((yy - cy * H) ** 2 + (xx - cx * half) ** 2) < (r * min(H, half)) ** 2
+        tissue[blob] += 60.0
+
+    frames = np.empty((T, H, W, 3), dtype=np.uint8)
+    for t in range(T):
+        ceus = background.copy()
+        for k, m in enumerate(masks):
+            ceus[m] = intensities[k, t]
+        if t == flash:
+            ceus[:] = flash_level
+        move = tuple(shifts[t])
+        if move != (0.0, 0.0):
+            bmode = ndi_shift(tissue, move, order=1, mode='nearest')
+            ceus = ndi_shift(ceus, move, order=1, mode='nearest')
+        else:
+            bmode = tissue
+        speckle = 1.0 + noise * rng.standard_normal((2, H, half)).astype(np.float32)
+        frames[t, :, :half] = np.clip(bmode * speckle[0], 0, 255)[..., None]
+        frames[t, :, half:] = np.clip((ceus * speckle[1])[..., None] * tint, 0, 255)
+
+    if margin > 0:
+        # Dark UI bands with bright annotation bars, outside every region
+        ui = np.full((T, margin, W, 3), 12, dtype=np.uint8)
+        ui[:, margin // 3:margin // 3 + max(1, margin // 4), W // 16:W // 3] = 210
+        frames = np.concatenate([ui, frames, ui[:, ::-1]], axis=1)
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = US_MULTIFRAME_SOP_CLASS
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Modality = 'US'
+    ds.Manufacturer = manufacturer
+    ds.Rows, ds.Columns, ds.NumberOfFrames = H + 2 * margin, W, T
+    ds.SamplesPerPixel = 3
+    ds.PlanarConfiguration = 0
+    ds.PhotometricInterpretation = photometric
+    ds.BitsAllocated = ds.BitsStored = 8
+    ds.HighBit = 7
+    ds.PixelRepresentation = 0
+    ds.FrameTime = 1000.0 / fps
+    boxes = ((margin, margin + H, 0, half), (margin, margin + H, half, W))
+    seq = []
+    for (y0, y1, x0, x1), data_type in zip(boxes, (1, ceus_region_type)):
+        reg = Dataset()
+        reg.RegionSpatialFormat = 1
+        reg.RegionDataType = data_type
+        reg.RegionFlags = 0
+        reg.RegionLocationMinX0, reg.RegionLocationMaxX1 = x0, x1 - 1
+        reg.RegionLocationMinY0, reg.RegionLocationMaxY1 = y0, y1 - 1
+        seq.append(reg)
+    ds.SequenceOfUltrasoundRegions = seq
+    ds.PixelData = (_rgb_to_ybr_422(frames) if photometric == 'YBR_FULL_422' else frames).tobytes()
+    ds.save_as(str(path), enforce_file_format=True)
+
+    return SyntheticClip(
+        path=path, fps=float(fps), photometric=photometric,
+        flash_idx=flash, washout_idx=flash + 1,
+        bmode_box=boxes[0], ceus_box=boxes[1],
+        regions=regions, shifts=shifts, intensities=intensities,
+        frames=frames if keep_frames else None,
+    )
@@ -0,0 +1,40 @@
+"""
+Tests for the benchmark harness (tiny clip, few stages)
+"""
+import copy
+import json
+import sys
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+from benchmarks.run_benchmarks import compare_results, run_suite, save_results
+
+
+def test_suite_records_stages_and_flags_regressions(tmp_path):
+    results = run_suite(
+        sizes=['tiny'], stages=['load', 'tic', 'loess', 'export'], repeat=1,
+        size_specs={'tiny': dict(T=24, H=48, W=128)}, log=lambda msg: None,
+    )
+    stages = results['sizes']['tiny']['stages']
+    # Unselected prerequisites (flash, motion, preprocess) ran but are not reported
+    assert list(stages) == ['load', 'tic', 'loess', 'export']
+    assert 'skipped' not in stages['loess']
+    load = stages['load']
+    assert load['time_s'] > 0 and len(load['times']) == 1
+    assert load['traced_peak_mb'] > 0 and load['peak_rss_mb'] > 0
+
+    path = save_results(results, tmp_path / 'run.json')
+    baseline = json.loads(path.read_text())
+    assert compare_results(results, baseline) == []
+
+    slower = copy.deepcopy(results)
+    baseline['sizes']['tiny']['stages']['load']['time_s'] = 0.01
+    slower['sizes']['tiny']['stages']['load']['time_s'] = 0.02
+    baseline['sizes']['tiny']['stages']['tic']['time_s'] = 1e-6   # below the noise floor
+    slower['sizes']['tiny']['stages']['tic']['time_s'] = 1.0
+    regressions = compare_results(slower, baseline, threshold=0.2)
+    assert [(r['stage'], r['metric']) for r in regressions] == [('load', 'time_s')]
+    assert regressions[0]['ratio'] == 2.0
@@ -0,0 +1,89 @@
+"""
+Tests for the SQLite study catalogue (header index, batch skipping, aggregates)
+"""
+import os
+import sys
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import pytest
+from src.core import StudyCatalog
+from src.core import catalog as catalog_module
+from src.core.catalog import DONE, FAILED, PENDING, parse_study_name
+from src.utils.synthetic import write_synthetic_clip
+
+
+@pytest.fixture
+def cohort(tmp_path):
+    folder = tmp_path / 'dicoms'
+    (folder / 'visit2').mkdir(parents=True)
+    for name in ('P01_baseline.dcm', 'P02_baseline.dcm', 'visit2/P01_treated_v2.dcm'):
+        write_synthetic_clip(folder / name, T=8, H=32, W=96, fps=12.5)
+    (folder / 'notes.txt').write_text('not a DICOM file')
+    return folder
+
+
+def test_parse_study_name():
+    assert parse_study_name('/data/P07_stress_2.dcm') == ('P07', 'stress')
+    assert parse_study_name('P07.dcm') == ('P07', None)
+
+
+def test_index_reads_headers_once(cohort, tmp_path, monkeypatch):
+    db = tmp_path / 'catalog.sqlite'
+    with StudyCatalog(db) as cat:
+        counts = cat.index(cohort)
+        assert counts == {'added': 3, 'updated': 0, 'unchanged': 0, 'unreadable': 0, 'ignored': 1}
+        study = cat.studies(condition='treated')[0]
+        assert study['patient_id'] == 'P01' and study['status'] == PENDING
+        assert study['manufacturer'] == 'Synthetic' and study['fps'] == pytest.approx(12.5)
+        assert study['n_frames'] == 8 and (study['rows'], study['columns']) == (32, 96)
+        assert [r['data_type'] for r in study['regions']] == [1, 1]
+
+    # Reopening: unchanged files are not opened again, modified ones are re-read
+    def fail(path):
+        raise AssertionError(f"header read for unchanged file {path}")
+    monkeypatch.setattr(catalog_module, 'read_study_header', fail)
+    with StudyCatalog(db) as cat:
+        assert len(cat) == 3
+        assert cat.index(cohort)['unchanged'] == 3
+        monkeypatch.undo()
+        os.utime(cohort / 'P02_baseline.dcm', (1, 1))
+        assert cat.index(cohort)['updated'] == 1
+
+
+def test_batch_skips_processed_studies_and_aggregates(cohort, tmp_path):
+    calls = []
+
+    def process(path):
+        calls.append(Path(path).name)
+        if 'P02' in path:
+            raise RuntimeError('no flash found')
+        A, B = (10.0, 0.5) if 'baseline' in path else (20.0, 0.25)
+        return {'ROI_1': {'A': A, 'B': B, 'AB': A * B}, 'ROI_2': {'A': A + 2, 'B': B, 'AB': (A + 2) * B}}
+
+    with StudyCatalog(tmp_path / 'catalog.sqlite') as cat:
+        cat.index(cohort)
+        assert cat.run_batch(process) == {'processed': 2, 'failed': 1, 'skipped': 0}
+        assert cat.studies(status=FAILED)[0]['message'] == 'no flash found'
+        # Done studies are skipped; the failed one is retried
+        calls.clear()
+        assert cat.run_batch(process) == {'processed': 0, 'failed': 1, 'skipped': 2}
+        assert calls == ['P02_baseline.dcm']
+        assert len(cat.studies(status=DONE)) == 2
+
+        rows = {r['condition']: r for r in cat.aggregate('AB')}
+        assert rows['baseline']['mean'] == pytest.approx(5.5) and rows['baseline']['n'] == 2
+        assert rows['treated']['studies'] == 1 and rows['treated']['max'] == pytest.approx(5.5)
+        assert rows['baseline']['std'] == pytest.approx(0.7071, rel=1e-3)
+        assert [r['roi'] for r in cat.aggregate('A', by='roi')] == ['ROI_1', 'ROI_2']
+        with pytest.raises(ValueError):
+            cat.aggregate('A', by='path')
+
+        # Recording results directly (e.g. from the GUI) marks the study done
+        cat.record_results(cohort / 'P02_baseline.dcm', {'ROI_1': {'AB': 4.0, 'R-squared': float('nan')}})
+        assert cat.pending() == []
+        assert {r['parameter']: r['value'] for r in cat.results(cohort / 'P02_baseline.dcm')} == {
+            'AB': 4.0, 'R-squared': None}
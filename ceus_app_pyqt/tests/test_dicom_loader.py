@@ -0,0 +1,93 @@
+"""
+Tests for progressive DICOM loading
+"""
+import sys
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+from src.core import DICOMLoader, detect_flash_ceus_refined
+
+
+def _write_split_screen(path, T=12, H=40, W=80):
+    """RGB clip: gray B-mode on the left, coloured CEUS on the right"""
+    rng = np.random.default_rng(1)
+    frames = np.zeros((T, H, W, 3), dtype=np.uint8)
+    gray = rng.integers(0, 200, (T, H, W // 2), dtype=np.uint8)
+    frames[:, :, :W // 2, :] = gray[..., None]
+    frames[:, :, W // 2:, 0] = rng.integers(0, 255, (T, H, W // 2), dtype=np.uint8)
+    frames[:, :, W // 2:, 2] = 10 * np.arange(T, dtype=np.uint8)[:, None, None]
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.3.1'
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Manufacturer = 'SuperSonic Imagine'
+    ds.Rows, ds.Columns, ds.NumberOfFrames = H, W, T
+    ds.SamplesPerPixel = 3
+    ds.PlanarConfiguration = 0
+    ds.PhotometricInterpretation = 'RGB'
+    ds.BitsAllocated = ds.BitsStored = 8
+    ds.HighBit = 7
+    ds.PixelRepresentation = 0
+    ds.FrameTime = 100.0
+    regions = []
+    for x0, x1 in ((0, W // 2 - 1), (W // 2, W - 1)):
+        reg = Dataset()
+        reg.RegionDataType = 1
+        reg.RegionFlags = 0
+        reg.RegionLocationMinX0, reg.RegionLocationMaxX1 = x0, x1
+        reg.RegionLocationMinY0, reg.RegionLocationMaxY1 = 0, H - 1
+        regions.append(reg)
+    ds.SequenceOfUltrasoundRegions = regions
+    ds.PixelData = frames.tobytes()
+    ds.save_as(str(path), enforce_file_format=True)
+    return frames
+
+
+def test_progressive_matches_full_decode(tmp_path):
+    """Frames streamed into preallocated stacks equal the full pixel_array crops"""
+    path = tmp_path / "clip.dcm"
+    _write_split_screen(path)
+    ref = pydicom.dcmread(str(path)).pixel_array
+
+    loader = DICOMLoader(path)
+    n = loader.open()
+    assert n == 12 and loader.frames_loaded == 1
+    assert loader.ceus_stack.shape == (12, 40, 40, 3)
+    np.testing.assert_array_equal(loader.ceus_stack[0], ref[0, :, 40:])
+
+    counts = list(loader.iter_load(chunk=5))
+    assert counts == [6, 11, 12]
+    np.testing.assert_array_equal(loader.ceus_stack, ref[:, :, 40:])
+    np.testing.assert_array_equal(loader.bmode_stack, ref[:, :, :40])
+    assert loader.ceus_region_idx == 1 and loader.bmode_region_idx == 0
+    assert np.isclose(loader.get_fps(), 10.0)
+
+
+def test_load_and_partial_intensity_trace(tmp_path):
+    """load() still returns full stacks; flash detection accepts a partial trace"""
+    path = tmp_path / "clip.dcm"
+    _write_split_screen(path)
+    bmode, ceus = DICOMLoader(path).load()
+    assert bmode.shape[0] == ceus.shape[0] == 12
+
+    loader = DICOMLoader(path)
+    loader.open()
+    next(loader.iter_load(chunk=7))
+    trace = loader.ceus_intensity[:loader.frames_loaded]
+    np.testing.assert_allclose(trace, ceus[:8].mean(axis=(1, 2, 3)))
+    flash, washout, intensities = detect_flash_ceus_refined(None, intensities=trace)
+    expected = detect_flash_ceus_refined(ceus[:8])
+    assert (flash, washout) == expected[:2]
+    assert len(intensities) == 8
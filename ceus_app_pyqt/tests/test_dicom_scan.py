@@ -0,0 +1,89 @@
+"""
+Tests for header-only DICOM scanning and clip selection
+"""
+import sys
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+from src.core import DICOMLoader
+from src.core.dicom_scan import (
+    CEUS, MULTIFRAME, NON_IMAGE, NOT_DICOM, SINGLE, find_clip, list_files, pick_clip, scan_directory, scan_file,
+)
+from src.utils.synthetic import write_synthetic_clip
+
+
+def _write_dataset(path, frames=None):
+    """Minimal DICOM: a grayscale image (T, H, W) or, without frames, a non-image object"""
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.6.1' if frames is not None else '1.2.840.10008.5.1.4.1.1.88.11'
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    if frames is not None:
+        T, H, W = frames.shape
+        ds.Rows, ds.Columns = H, W
+        if T > 1:
+            ds.NumberOfFrames = T
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = 'MONOCHROME2'
+        ds.BitsAllocated = ds.BitsStored = 8
+        ds.HighBit = 7
+        ds.PixelRepresentation = 0
+        ds.PixelData = frames.tobytes()
+    ds.save_as(str(path), enforce_file_format=True)
+
+
+def test_scan_classifies_without_reading_pixels(tmp_path):
+    clip = write_synthetic_clip(tmp_path / 'b_clip.dcm', T=10, H=32, W=96, fps=8)
+    # Truncated pixel data: a full decode would fail, a header scan does not
+    data = clip.path.read_bytes()
+    (tmp_path / 'c_truncated.dcm').write_bytes(data[:len(data) // 2])
+    _write_dataset(tmp_path / 'a_single.dcm', np.zeros((1, 8, 8), np.uint8))
+    _write_dataset(tmp_path / 'd_cine.dcm', np.zeros((4, 8, 8), np.uint8))
+    _write_dataset(tmp_path / 'e_report.dcm')
+    (tmp_path / 'f_notes.txt').write_text('not a DICOM file\n')
+
+    scanned = {s.path.name: s for s in scan_directory(tmp_path, workers=3)}
+    assert {name: s.kind for name, s in scanned.items()} == {
+        'a_single.dcm': SINGLE, 'b_clip.dcm': CEUS, 'c_truncated.dcm': CEUS,
+        'd_cine.dcm': MULTIFRAME, 'e_report.dcm': NON_IMAGE, 'f_notes.txt': NOT_DICOM,
+    }
+    s = scanned['b_clip.dcm']
+    assert (s.n_frames, s.rows, s.columns, s.fps) == (10, 32, 96, 8.0)
+    assert [r.box for r in s.regions] == [(0, 32, 0, 48), (0, 32, 48, 96)]
+    assert s == scan_file(clip.path)
+
+
+def test_parallel_walk_and_loader_pick_the_ceus_clip(tmp_path):
+    for d in range(3):
+        for k in range(4):
+            folder = tmp_path / f'patient{d}' / f'series{k}'
+            folder.mkdir(parents=True)
+            _write_dataset(folder / 'IM0001', np.zeros((1, 8, 8), np.uint8))
+    assert len(list_files(tmp_path, workers=4)) == 12
+    assert len(scan_directory(tmp_path, recursive=False)) == 0
+    deep = scan_directory(tmp_path, workers=4)
+    assert len(deep) == 12 and [s.path for s in deep] == sorted(s.path for s in deep)
+
+    # The directory's first file in sorted order is a single frame, not the clip
+    study = tmp_path / 'study'
+    study.mkdir()
+    _write_dataset(study / 'IM0001', np.zeros((1, 48, 128), np.uint8))
+    _write_dataset(study / 'IM0002', np.zeros((3, 48, 128), np.uint8))
+    write_synthetic_clip(study / 'IM0003', T=12, H=48, W=128)
+    assert find_clip(study).path.name == 'IM0003'
+    assert pick_clip(scan_directory(study)) == find_clip(study)
+    assert pick_clip([]) is None
+
+    loader = DICOMLoader(study)
+    _, ceus = loader.load()
+    assert loader.dicom_path.name == 'IM0003' and ceus.shape[0] == 12
@@ -0,0 +1,67 @@
+"""
+Tests for result export tables
+"""
+import io
+import sys
+import zipfile
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.models.export_tables import (
+    PARAMETER_NAMES, append_to_dataset, build_export_tables, read_dataset, write_columnar, write_csv_bundle,
+)
+
+
+def _tables(labels=('ROI_1', 'ROI_2'), fitted=True):
+    times = [np.arange(5) / 2.0, np.arange(3, dtype=float)][:len(labels)]
+    times += [np.arange(4, dtype=float)] * (len(labels) - len(times))
+    predicted = [None] + [t + 1.0 for t in times[1:]] if fitted else None
+    grids = {labels[1]: (np.arange(0.0, 1.0, 0.1), np.linspace(0, 1, 10))} if fitted else None
+    params = np.arange(len(labels) * len(PARAMETER_NAMES), dtype=float).reshape(len(labels), -1)
+    params[0, 1] = np.inf
+    return build_export_tables(labels, times, [2 * t for t in times], [3 * t for t in times],
+                               predicted=predicted, grids=grids, parameters=params)
+
+
+def test_tables_are_built_column_wise():
+    tables = _tables()
+    sig = tables['signals']
+    assert list(sig.columns) == ['ROI', 'Time', 'dVI', 'dVI_filt', 'dVI_predict']
+    assert list(sig['ROI'].cat.categories) == ['ROI_1', 'ROI_2'] and len(sig) == 8
+    assert sig['dVI_predict'].isna().sum() == 5 and sig['dVI_predict'].iloc[-1] == 3.0
+    assert (tables['predicted']['ROI'] == 'ROI_2').all() and len(tables['predicted']) == 10
+    par = tables['parameters']
+    assert len(par) == 2 * len(PARAMETER_NAMES)
+    assert par['parameter'].iloc[len(PARAMETER_NAMES)] == 'A' and par['ROI'].iloc[-1] == 'ROI_2'
+    assert np.isnan(par['value'].iloc[1])
+
+
+def test_csv_bundle_matches_row_layout(tmp_path):
+    path = write_csv_bundle(tmp_path / 'out.zip', _tables(fitted=False))
+    with zipfile.ZipFile(path) as zf:
+        # No fit: no predicted table and no prediction column
+        assert zf.namelist() == ['signals.csv', 'parameters.csv']
+        sig = pd.read_csv(io.BytesIO(zf.read('signals.csv')))
+    assert list(sig.columns) == ['ROI', 'Time', 'dVI', 'dVI_filt']
+    assert sig['ROI'].tolist() == ['ROI_1'] * 5 + ['ROI_2'] * 3
+
+
+def test_columnar_files_and_cohort_dataset(tmp_path):
+    pytest.importorskip('pyarrow')
+    tables = _tables()
+    out = write_columnar(tmp_path / 'study.parquet', tables)
+    back = pd.read_parquet(out / 'parameters.parquet')
+    assert isinstance(back['ROI'].dtype, pd.CategoricalDtype) and len(back) == len(tables['parameters'])
+
+    many = _tables(labels=tuple(f"ROI_{i}" for i in range(300)))
+    append_to_dataset(tmp_path / 'cohort', tables, 'study A')
+    append_to_dataset(tmp_path / 'cohort', many, 'study B')
+    append_to_dataset(tmp_path / 'cohort', tables, 'study A')   # re-export replaces
+    signals = read_dataset(tmp_path / 'cohort', 'signals')
+    assert signals['Study'].value_counts().to_dict() == {'study A': 8, 'study B': len(many['signals'])}
@@ -0,0 +1,58 @@
+"""
+Tests for batch and streaming flash detection
+"""
+import sys
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+from src.core.flash_detection import (
+    detect_flash_ceus_refined, OnlineFlashDetector, detect_flashes, segment_cycles
+)
+
+
+def _trace(T=120, flash=40, seed=0):
+    """Enhanced plateau, destruction at `flash`, then replenishment"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(T, dtype=np.float64)
+    y = np.full(T, 80.0)
+    y[flash + 1:] = 20.0 + 50.0 * (1.0 - np.exp(-(t[flash + 1:] - flash) / 15.0))
+    y[flash + 3] = 18.0                      # darkest frame just after the flash
+    return y + rng.normal(0.0, 0.5, T)
+
+
+def test_online_events_before_end_and_match_batch():
+    y = _trace()
+    detector = OnlineFlashDetector(exclude_first_n=5, search_window=20, n_frames=len(y))
+    seen_at = {}
+    for i, v in enumerate(y):
+        for event in detector.push(v):
+            seen_at[event.kind] = (i, event.frame)
+    flash, washout, _ = detect_flash_ceus_refined(None, intensities=y)
+    # Determined as soon as the search window after the flash is available
+    assert seen_at['flash'] == (40 + 20, flash) and seen_at['washout'][1] == washout == 43
+    assert detector.finalize() == (flash, washout)
+
+
+def test_noise_only_emits_nothing_and_frames_are_subsampled():
+    rng = np.random.default_rng(1)
+    detector = OnlineFlashDetector(stride=4)
+    frames = rng.integers(100, 110, (60, 32, 32, 3), dtype=np.uint8)
+    events = [e for f in frames for e in detector.push_frame(f)]
+    assert events == [] and detector.flash_idx is None
+    assert np.isclose(detector.intensities[0], frames[0, ::4, ::4].mean())
+
+
+def test_multi_flash_cycles():
+    """Three destruction-replenishment cycles: every flash is found and scored"""
+    y = np.concatenate([_trace(T=60, flash=10, seed=s) for s in range(3)])
+    flashes = detect_flashes(y, search_window=20)
+    assert [f.frame for f in flashes] == [10, 70, 130]
+    assert [f.washout for f in flashes] == [13, 73, 133]
+    assert all(f.score > 20 for f in flashes)
+    assert segment_cycles(flashes, len(y)) == [(13, 71), (73, 131), (133, 180)]
+    # The single-flash detector keeps only the steepest one
+    assert detect_flash_ceus_refined(None, intensities=y)[0] in (10, 70, 130)
@@ -0,0 +1,96 @@
+"""
+Tests for parallel decoding of encapsulated multi-frame pixel data
+"""
+import sys
+from io import BytesIO
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+import pydicom
+import pytest
+from PIL import Image
+from pydicom.encaps import encapsulate
+from pydicom.uid import JPEGBaseline8Bit, RLELossless
+from src.core import DICOMLoader, decode_frames
+from src.core.frame_decoder import FrameDecoder
+from src.utils import perf
+from src.utils.synthetic import write_synthetic_clip
+
+
+def _jpeg_copy(src, dst, fragments_per_frame=1):
+    """Re-encode a native RGB clip as JPEG baseline (with a Basic Offset Table)"""
+    ds = pydicom.dcmread(str(src))
+    fragments = []
+    for frame in ds.pixel_array:
+        buf = BytesIO()
+        Image.fromarray(frame).save(buf, format='JPEG', quality=90)
+        fragments.append(buf.getvalue())
+    ds.PixelData = encapsulate(fragments, fragments_per_frame=fragments_per_frame, has_bot=True)
+    ds['PixelData'].VR = 'OB'
+    ds.PhotometricInterpretation = 'YBR_FULL_422'
+    ds.file_meta.TransferSyntaxUID = JPEGBaseline8Bit
+    ds.save_as(str(dst))
+    return dst
+
+
+def test_decode_frames_matches_pixel_array(tmp_path):
+    # Large enough for the thread pool to be used (JPEG releases the GIL)
+    clip = write_synthetic_clip(tmp_path / 'clip.dcm', T=12, H=128, W=256)
+    ds = pydicom.dcmread(str(clip.path))
+    ds.compress(RLELossless)
+    ds.save_as(str(tmp_path / 'rle.dcm'))
+    jpeg = _jpeg_copy(clip.path, tmp_path / 'jpeg.dcm')
+    split = _jpeg_copy(clip.path, tmp_path / 'split.dcm', fragments_per_frame=3)
+
+    for path in (tmp_path / 'rle.dcm', jpeg, split):
+        full = pydicom.dcmread(str(path)).pixel_array
+        np.testing.assert_array_equal(decode_frames(path, workers=3), full)
+        # Frame range into a preallocated array
+        out = np.zeros((4,) + full.shape[1:], dtype=full.dtype)
+        assert decode_frames(path, frames=range(5, 9), workers=2, out=out) is out
+        np.testing.assert_array_equal(out, full[5:9])
+        # A larger buffer: only the requested frames are returned
+        big = np.zeros((10,) + full.shape[1:], dtype=full.dtype)
+        part = decode_frames(path, frames=[2, 7], workers=2, out=big)
+        assert part.shape[0] == 2 and np.shares_memory(part, big)
+        np.testing.assert_array_equal(part, full[[2, 7]])
+
+    with FrameDecoder.open(jpeg, workers=3) as decoder:
+        assert decoder.parallel and not decoder.processes
+    # Small RLE clip: pure-Python decoder, no pool by default
+    with FrameDecoder.open(tmp_path / 'rle.dcm', workers=3) as decoder:
+        assert not decoder.parallel and decoder.batch == 1
+
+    # Worker processes, frames in any order
+    full = pydicom.dcmread(str(tmp_path / 'rle.dcm')).pixel_array
+    with FrameDecoder.open(tmp_path / 'rle.dcm', workers=2, processes=True) as decoder:
+        assert decoder.batch > decoder.workers
+        np.testing.assert_array_equal(decoder.decode([11, 0, 3]), full[[11, 0, 3]])
+
+    # Native pixel data is not handled here
+    assert FrameDecoder.open(clip.path) is None
+    with pytest.raises(ValueError):
+        decode_frames(clip.path)
+
+
+def test_loader_decodes_compressed_clips_in_parallel(tmp_path):
+    clip = write_synthetic_clip(tmp_path / 'clip.dcm', T=20, H=32, W=64)
+    jpeg = _jpeg_copy(clip.path, tmp_path / 'jpeg.dcm')
+    full = pydicom.dcmread(str(jpeg)).pixel_array
+
+    was_enabled = perf.is_enabled()
+    perf.reset()
+    perf.enable()
+    try:
+        bmode, ceus = DICOMLoader(jpeg).load()
+        decoded = perf.counters().get('frames_decoded_parallel', 0)
+    finally:
+        perf.enable(was_enabled)
+        perf.reset()
+    assert decoded == 19
+    for stack, (y0, y1, x0, x1) in ((bmode, clip.bmode_box), (ceus, clip.ceus_box)):
+        np.testing.assert_array_equal(stack, full[:, y0:y1, x0:x1])
@@ -0,0 +1,57 @@
+"""
+Tests for per-frame statistics
+"""
+import sys
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+import pytest
+from src.core import FrameStats, StackStore
+
+
+def test_uint8_stats_match_numpy():
+    rng = np.random.default_rng(0)
+    stack = rng.integers(0, 256, (7, 30, 40, 3), dtype=np.uint8)
+    stats = FrameStats.from_stack(stack)
+    assert stats.complete
+    assert np.allclose(stats.mean, stack.mean(axis=(1, 2, 3)))
+    flat = stack.reshape(7, -1)
+    for q in (0, 5, 50, 95, 99.5, 100):
+        assert np.allclose(stats.percentile(q), np.percentile(flat, q, axis=1))
+    ch = stack.reshape(7, -1, 3).astype(np.float64)
+    assert np.allclose(stats.channel_std, ch.std(axis=1))
+    mn, mx, mean, std = stats.channel_stats(3)[1]
+    assert (mn, mx) == (ch[3, :, 1].min(), ch[3, :, 1].max())
+
+    # Frame by frame: NaN until seen, head() only once the prefix is complete
+    live = FrameStats.for_stack(stack)
+    live.update(0, stack[0])
+    live.update(2, stack[2])
+    assert np.isnan(live.mean[1]) and live.head(1) is not None and live.head(3) is None
+
+
+def test_float_stats_keep_fixed_percentiles():
+    rng = np.random.default_rng(1)
+    stack = rng.normal(10.0, 2.0, (5, 20, 25)).astype(np.float32)
+    stats = FrameStats.from_stack(stack, chunk=2)
+    assert np.allclose(stats.mean, stack.mean(axis=(1, 2)), rtol=1e-5)
+    assert np.allclose(stats.percentile(95), np.percentile(stack.reshape(5, -1), 95, axis=1))
+    with pytest.raises(ValueError):
+        stats.percentile(42)
+
+
+def test_store_caches_stats_until_primary_changes():
+    store = StackStore()
+    stack = np.arange(4 * 8 * 8, dtype=np.uint8).reshape(4, 8, 8)
+    store.put('ceus', stack)
+    stats = store.stats('ceus')
+    assert store.stats('ceus') is stats
+    store.put('ceus', stack[::-1].copy())
+    assert store.stats('ceus') is not stats
+    with pytest.raises(ValueError):
+        store.set_stats('ceus', FrameStats(3))
+    assert store.stats('missing') is None
@@ -0,0 +1,112 @@
+"""
+Tests for perfusion metrics and the incremental metrics engine
+"""
+import sys
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+from src.models import perfusion_metrics, MetricsEngine
+
+# np.trapz was renamed np.trapezoid in NumPy 2.0
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+
+def _washin_tic(n=60, A=1.0, B=0.8, fps=10.0):
+    t = np.arange(n, dtype=np.float32) / fps
+    return t, (A * (1.0 - np.exp(-B * t))).astype(np.float32)
+
+
+def test_perfusion_metrics_washin():
+    """Metrics on a clean wash-in curve"""
+    t, y = _washin_tic()
+    md = perfusion_metrics(t, y)
+    assert set(md) == {'AUC', 'MTT', 'Peak', 'TTP', 'Slope_10_90', 'MaxDiff'}
+    assert md['TTP'] == float(t[-1])
+    assert abs(md['Peak'] - float(y[-1])) < 1e-6
+    assert md['AUC'] > 0 and md['Slope_10_90'] > 0 and md['MaxDiff'] > 0
+
+
+def test_perfusion_metrics_empty():
+    """Empty curves give NaN for every metric"""
+    md = perfusion_metrics(np.array([]), np.array([]))
+    assert all(np.isnan(v) for v in md.values())
+
+
+def test_engine_recomputes_only_dirty_rois():
+    """Toggling one point recomputes only the affected ROI"""
+    tic_data = {}
+    for i in range(5):
+        t, y = _washin_tic(A=1.0 + i)
+        tic_data[f"ROI_{i + 1}"] = {'time': t, 'dvi': y, 'valid_mask': np.ones_like(y, dtype=bool)}
+
+    engine = MetricsEngine()
+    assert len(engine.update(tic_data)) == 5
+    assert engine.update(tic_data) == {}
+
+    tic_data['ROI_3']['valid_mask'][-1] = False
+    engine.mark_dirty('ROI_3')
+    changed = engine.update(tic_data)
+    assert list(changed) == ['ROI_3']
+    assert changed['ROI_3']['TTP'] < float(tic_data['ROI_3']['time'][-1])
+
+
+def test_engine_config_change_invalidates():
+    """Changing smoothing settings invalidates all cached ROIs"""
+    t, y = _washin_tic()
+    tic_data = {'ROI_1': {'time': t, 'dvi': y, 'valid_mask': np.ones_like(y, dtype=bool)}}
+    engine = MetricsEngine()
+    engine.update(tic_data)
+    assert engine.configure(lambda tt, yy: yy * 0.5, ('scale', 0.5))
+    changed = engine.update(tic_data)
+    assert abs(changed['ROI_1']['Peak'] - 0.5 * float(y.max())) < 1e-6
+    assert not engine.configure(lambda tt, yy: yy * 0.5, ('scale', 0.5))
+
+
+def _reference_metrics(t, y):
+    """Single-curve metrics with plain NumPy (independent of batch_metrics)"""
+    y_pos = np.clip(y, 0, None)
+    auc = float(_trapezoid(y_pos, t))
+    i_max = int(np.argmax(y))
+    peak = float(y[i_max])
+    idx = np.where((y >= 0.1 * peak) & (y <= 0.9 * peak))[0]
+    slope = float(np.polyfit(t[idx], y[idx], 1)[0]) if peak > 0 and idx.size >= 2 else float('nan')
+    return {
+        'AUC': auc,
+        'MTT': float(_trapezoid(t * y_pos, t)) / auc if auc > 0 else float('nan'),
+        'Peak': peak,
+        'TTP': float(t[i_max]),
+        'Slope_10_90': slope,
+        'MaxDiff': float(np.max(np.abs(np.diff(y) / np.diff(t)))),
+        'Mean': float(np.mean(y)),
+    }
+
+
+def test_batch_metrics_match_single_curve():
+    """Masked batch metrics equal reference metrics on t[mask], y[mask]"""
+    from src.models.batch_metrics import batch_perfusion_metrics
+
+    rng = np.random.default_rng(0)
+    t = np.arange(80) / 10.0
+    Y = (1.0 - np.exp(-t))[None, :] * rng.uniform(0.5, 3.0, (20, 1)) + rng.normal(0, 0.1, (20, 80))
+    mask = rng.random((20, 80)) > 0.2
+    cols = batch_perfusion_metrics(t, Y, mask)
+    for i in range(20):
+        ref = _reference_metrics(t[mask[i]], Y[i, mask[i]])
+        for k, v in ref.items():
+            assert np.isclose(cols[k][i], v, equal_nan=True), (k, i)
+        assert np.isclose(perfusion_metrics(t[mask[i]], Y[i, mask[i]])['AUC'], cols['AUC'][i])
+
+
+def test_batch_metrics_variable_lengths():
+    """Padded curves of different lengths are handled via the mask"""
+    from src.models.batch_metrics import batch_perfusion_metrics, pad_curves
+
+    t1, y1 = _washin_tic(n=30)
+    t2, y2 = _washin_tic(n=60, A=2.0)
+    cols = batch_perfusion_metrics(*pad_curves([t1, t2], [y1, y2]))
+    assert np.isclose(cols['TTP'][0], t1[-1]) and np.isclose(cols['TTP'][1], t2[-1])
+    assert np.isclose(cols['Mean'][1], float(np.mean(y2)))
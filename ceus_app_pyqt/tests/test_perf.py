@@ -0,0 +1,90 @@
+"""
+Tests for pipeline instrumentation (spans, counters, trace export, profiler capture)
+"""
+import json
+import pstats
+import sys
+import threading
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+import pytest
+from src.core import preprocess_ceus
+from src.models import fit_washin
+from src.utils import perf
+
+
+@pytest.fixture
+def recording():
+    was_enabled = perf.is_enabled()
+    perf.reset()
+    perf.enable()
+    yield
+    perf.enable(was_enabled)
+    perf.reset()
+
+
+def test_disabled_recorder_is_a_no_op():
+    was_enabled = perf.is_enabled()
+    perf.enable(False)
+    perf.reset()
+    try:
+        with perf.span('idle'):
+            pass
+        perf.count('frames_decoded', 5)
+        assert perf.summary() == [] and perf.counters() == {}
+        assert perf.chrome_trace()['traceEvents'] == []
+    finally:
+        perf.enable(was_enabled)
+
+
+def test_spans_counters_and_chrome_trace(recording, tmp_path):
+    stack = np.random.default_rng(0).integers(0, 255, (6, 16, 16, 3), dtype=np.uint8)
+    preprocess_ceus(stack)
+    t = np.linspace(0, 5, 40)
+    fit_washin(t, 30 * (1 - np.exp(-0.8 * t)), t_max=5)
+    with perf.span('custom', rois=2):
+        threading.Thread(target=perf.count, args=('frames_decoded', 3), name='worker').start()
+
+    rows = {r['name']: r for r in perf.summary()}
+    assert rows['preprocessing.preprocess_ceus']['count'] == 1
+    assert rows['washin_model.fit_washin']['count'] == 1
+    assert rows['custom']['total_ms'] >= 0
+    assert perf.counters() == {'fits': 1, 'frames_decoded': 3}
+
+    trace = json.loads(perf.export_chrome_trace(tmp_path / 'trace.json').read_text())
+    events = trace['traceEvents']
+    custom = next(e for e in events if e['name'] == 'custom')
+    assert custom['ph'] == 'X' and custom['dur'] >= 0 and custom['args'] == {'rois': 2}
+    assert {'ph': 'C', 'name': 'fits', 'args': {'fits': 1}}.items() <= next(
+        e for e in events if e['ph'] == 'C' and e['name'] == 'fits').items()
+    assert any(e['ph'] == 'M' and e['args']['name'] == 'MainThread' for e in events)
+
+
+def test_profile_capture_includes_worker_threads(tmp_path):
+    def spin():
+        return sum(i * i for i in range(20000))
+
+    def busy_worker():
+        with perf.profile_thread():
+            spin()
+
+    perf.start_profile('cprofile')
+    try:
+        with pytest.raises(RuntimeError):
+            perf.start_profile('cprofile')
+        worker = threading.Thread(target=busy_worker)
+        worker.start()
+        worker.join()
+    finally:
+        report = perf.stop_profile(tmp_path / 'capture.prof', limit=20)
+    assert not perf.profile_active()
+    # The worker's profile was merged unless the interpreter allows a single profiler (3.12+)
+    functions = {name for _, _, name in pstats.Stats(str(tmp_path / 'capture.prof')).stats}
+    if sys.version_info < (3, 12):
+        assert 'spin' in functions
+    assert 'function calls' in report
@@ -0,0 +1,110 @@
+"""
+Tests for the playback prefetcher and clock
+"""
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+from src.ui.playback import FramePrefetcher, PlaybackClock
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_clock_drops_frames_when_late():
+    """Late ticks skip frames (counted as dropped) instead of slowing playback"""
+    t = _FakeClock()
+    clock = PlaybackClock(fps=20.0, n_frames=100, start=5, clock=t)
+    assert clock.next_frame() == 5
+    assert clock.next_frame() is None          # same tick: nothing new
+    t.now = 0.05
+    assert clock.next_frame() == 6
+    t.now = 0.30                               # GUI stalled for 250 ms
+    assert clock.next_frame() == 11
+    assert clock.frames_dropped == 4
+    t.now = 0.35
+    assert clock.next_frame(lambda f: False) is None   # frame not ready: hold
+    t.now = 0.40
+    assert clock.next_frame() == 13 and clock.frames_dropped == 5
+    t.now = 5.0 + 0.05 * 3
+    assert clock.next_frame() == (5 + 103) % 100
+
+
+def test_clock_achieved_fps():
+    t = _FakeClock()
+    clock = PlaybackClock(fps=10.0, n_frames=50, clock=t)
+    for k in range(20):
+        t.now = k * 0.1
+        clock.next_frame()
+    assert abs(clock.achieved_fps - 10.0) <= 1.5
+    t.now = 3.0                                # nothing shown for 2 s
+    assert clock.achieved_fps == 0.0
+
+
+def test_prefetcher_reads_memmap_ahead(tmp_path):
+    """Memmapped stacks are read ahead in a bounded window; in-memory stacks are always ready"""
+    path = tmp_path / "stack.dat"
+    mm = np.memmap(path, dtype=np.uint8, mode='w+', shape=(20, 8, 8))
+    mm[:] = np.arange(20, dtype=np.uint8)[:, None, None]
+    mm.flush()
+    lazy = np.memmap(path, dtype=np.uint8, mode='r', shape=(20, 8, 8))
+
+    assert FramePrefetcher([np.zeros((20, 8, 8))]).is_ready(7)
+
+    pf = FramePrefetcher([lazy, np.zeros((20, 8, 8))], depth=4)
+    pf.advance(18)
+    pf.start()
+    try:
+        deadline = time.time() + 5
+        while not all(pf.is_ready(i) for i in (18, 19, 0, 1)) and time.time() < deadline:
+            time.sleep(0.01)
+        assert all(pf.is_ready(i) for i in (18, 19, 0, 1))
+        assert pf.frames_loaded == 4 and not pf.is_ready(2)
+        pf.advance(0)
+        assert not pf.is_ready(18) and pf.is_ready(1)
+    finally:
+        pf.stop()
+
+
+class _RecordingStack:
+    """Lazy stack that records which frames were read"""
+
+    def __init__(self, n):
+        self.n = n
+        self.reads = []
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, idx):
+        self.reads.append(idx)
+        return np.full((4, 4), idx, dtype=np.uint8)
+
+
+def test_prefetcher_reads_each_frame_once():
+    """Frames in the window are read once, ahead of the cursor, and not kept"""
+    stack = _RecordingStack(10)
+    pf = FramePrefetcher([stack], depth=3)
+    pf.advance(4)
+    pf.start()
+    try:
+        deadline = time.time() + 5
+        while not pf.is_ready(6) and time.time() < deadline:
+            time.sleep(0.01)
+        assert stack.reads == [4, 5, 6]
+        pf.advance(5)
+        while not pf.is_ready(7) and time.time() < deadline:
+            time.sleep(0.01)
+        assert stack.reads == [4, 5, 6, 7]
+    finally:
+        pf.stop()
@@ -0,0 +1,48 @@
+"""
+Tests for multiscale display pyramids
+"""
+import sys
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+from src.utils.pyramid import build_pyramid, is_uint8_exact, PyramidCache
+
+
+def test_pyramid_levels_uint8_shared():
+    """uint8 input is level 0 without copy; levels are block means"""
+    rng = np.random.default_rng(0)
+    stack = rng.integers(0, 256, (3, 64, 96, 3), dtype=np.uint8)
+    levels = build_pyramid(stack, factors=(2, 4), min_size=16)
+    assert levels[0] is stack
+    assert [lvl.shape for lvl in levels] == [(3, 64, 96, 3), (3, 32, 48, 3), (3, 16, 24, 3)]
+    expected = stack[1, :2, :2, 0].mean()
+    assert abs(int(levels[1][1, 0, 0, 0]) - expected) <= 0.5
+    assert all(lvl.dtype == np.uint8 for lvl in levels)
+
+
+def test_pyramid_dtype_and_min_size():
+    """Integral floats become uint8; other floats keep their values; small frames get one level"""
+    gray = np.arange(2 * 40 * 40, dtype=np.float32).reshape(2, 40, 40) % 256
+    assert is_uint8_exact(gray)
+    assert build_pyramid(gray, min_size=16)[0].dtype == np.uint8
+    scaled = gray / 255.0 - 0.5
+    levels = build_pyramid(scaled, factors=(2, 4), min_size=16)
+    assert len(levels) == 2 and levels[1].dtype == np.float32
+    assert np.isclose(levels[1][0, 0, 0], scaled[0, :2, :2].mean())
+    assert len(build_pyramid(gray, min_size=64)) == 1
+
+
+def test_pyramid_cache_reuses_levels():
+    """Same source -> same level arrays; LRU evicts the oldest stacks"""
+    cache = PyramidCache(max_entries=2, min_size=8)
+    stacks = [np.zeros((2, 32, 32), dtype=np.uint8) for _ in range(3)]
+    first = cache.get(stacks[0])
+    assert cache.get(stacks[0]) is first
+    cache.get(stacks[1])
+    cache.get(stacks[2])
+    assert cache.peek(stacks[0]) is None and cache.peek(stacks[2]) is not None
+    assert cache.nbytes == 2 * (2 * 16 * 16 + 2 * 8 * 8)
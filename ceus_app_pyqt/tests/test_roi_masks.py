@@ -0,0 +1,60 @@
+"""
+Tests for cached ROI rasterization
+"""
+import sys
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+from skimage.draw import polygon as sk_polygon
+from src.core.roi_manager import ROIManager, rasterize_polygon, union_bbox
+
+
+def test_mask_matches_skimage_and_bbox():
+    poly = [(30, 120), (50, 110), (60, 130), (45, 150), (20, 145)]
+    m = rasterize_polygon(poly, (200, 100))
+    ref = np.zeros((200, 100), dtype=bool)
+    rr, cc = sk_polygon([p[1] for p in poly], [p[0] for p in poly], shape=(200, 100))
+    ref[rr, cc] = True
+    assert m.indices.dtype == np.int32
+    assert np.array_equal(m.to_mask(), ref)
+    y0, y1, x0, x1 = m.bbox
+    assert np.array_equal(m.bbox_mask(), ref[y0:y1, x0:x1])
+    crop = np.arange(200 * 100).reshape(200, 100)[y0:y1, x0:x1]
+    assert np.array_equal(crop.reshape(-1)[m.bbox_indices()], m.indices)
+
+
+def test_mask_cache_invalidated_per_roi():
+    manager = ROIManager()
+    a = manager.add_roi([(10, 10), (40, 10), (40, 40), (10, 40)])
+    b = manager.add_roi([(50, 50), (60, 50), (60, 60)])
+    ma, mb = a.mask((100, 100)), b.mask((100, 100))
+    assert a.mask((100, 100)) is ma
+    manager.set_polygon(a.label, [(0, 0), (5, 0), (5, 5), (0, 5)])
+    assert a.mask((100, 100)) is not ma and b.mask((100, 100)) is mb
+    assert union_bbox(manager.masks((100, 100)).values()) == (0, 61, 0, 61)
+    assert rasterize_polygon([], (10, 10)).n_pixels == 0
+
+
+def test_bbox_cropped_tics_match_full_gray():
+    """Cropped uint8 reduction equals the mean of the full grayscale stack"""
+    from src.core.tic_analysis import extract_tics_from_masks, extract_tic_from_roi
+    from src.utils.converters import to_gray
+
+    rng = np.random.default_rng(1)
+    stack = rng.integers(0, 256, (6, 60, 80, 3), dtype=np.uint8)
+    manager = ROIManager()
+    manager.add_roi([(10, 10), (30, 12), (25, 35)])
+    manager.add_roi([(50, 40), (70, 40), (70, 55), (50, 55)])
+    masks = manager.masks((60, 80))
+    series = extract_tics_from_masks(stack, masks, chunk=4)
+    gray = np.stack([to_gray(f) for f in stack])
+    for label, m in masks.items():
+        ref = gray.reshape(6, -1)[:, m.indices].mean(axis=1)
+        assert np.allclose(series[label], ref, atol=1e-3)
+    # Rectangle ROI path: crop before converting
+    _, vi, _ = extract_tic_from_roi(stack, (5, 6, 20, 30), fps=10.0)
+    assert np.allclose(vi, gray[:, 6:31, 5:21].reshape(6, -1).mean(axis=1), atol=1e-3)
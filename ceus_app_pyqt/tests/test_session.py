@@ -0,0 +1,51 @@
+"""
+Tests for analysis session files
+"""
+import sys
+import zipfile
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+from src.core import FrameStats, save_session, load_session
+
+
+def test_session_round_trip_memory_maps_stacks(tmp_path):
+    rng = np.random.default_rng(0)
+    ceus = rng.integers(0, 256, (20, 64, 80, 3), dtype=np.uint8)
+    pre = rng.random((12, 64, 80)).astype(np.float32)
+    state = {
+        'stacks': {'ceus': ceus, 'ceus_display': [ceus, True, None], 'pre': pre},
+        'flash_idx': np.int64(5),
+        'rois': [{'label': 'ROI_1', 'polygon': [(1, 2), (30, 2), (30, 40)], 'color': (255, 0, 0)}],
+        'tics': {'ROI_1': {'time': np.arange(12) / 10.0, 'valid_mask': np.ones(12, dtype=bool)}},
+        'fits': {'ROI_1': {'washin': {'params': np.array([1.5, 0.3]), 'rss': np.inf}, 'gamma': None}},
+    }
+    path = save_session(tmp_path / 'study.ceus', state, mmap_threshold=64 * 1024)
+    with zipfile.ZipFile(path) as zf:
+        kinds = {i.filename: i.compress_type for i in zf.infolist()}
+    # ceus is written once although referenced twice; only stacks are stored raw
+    assert len(kinds) == 1 + 5
+    assert sorted(kinds.values()).count(zipfile.ZIP_STORED) == 2
+
+    out = load_session(path)
+    restored = out['stacks']['ceus']
+    assert isinstance(restored.base, np.memmap) and not restored.flags.writeable
+    assert np.array_equal(restored, ceus) and np.array_equal(out['stacks']['pre'], pre)
+    assert out['stacks']['ceus_display'][0] is restored
+    assert out['flash_idx'] == 5 and out['rois'][0]['polygon'][1] == [30, 2]
+    assert out['tics']['ROI_1']['valid_mask'].dtype == bool
+    assert out['fits']['ROI_1']['washin']['rss'] == np.inf and out['fits']['ROI_1']['gamma'] is None
+    assert not isinstance(load_session(path, mmap=False)['stacks']['pre'].base, np.memmap)
+
+
+def test_frame_stats_survive_a_session(tmp_path):
+    stack = np.arange(6 * 10 * 10, dtype=np.uint8).reshape(6, 10, 10)
+    stats = FrameStats.from_stack(stack)
+    save_session(tmp_path / 's.ceus', {'stats': stats.to_dict()})
+    back = FrameStats.from_dict(load_session(tmp_path / 's.ceus')['stats'])
+    assert back.complete and np.array_equal(back.mean, stats.mean)
+    assert np.array_equal(back.percentile(90), stats.percentile(90))
@@ -0,0 +1,55 @@
+"""
+Tests for the stack store
+"""
+import sys
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import numpy as np
+import pytest
+from src.core.stack_store import StackStore
+
+
+def test_put_returns_readonly_view_without_copy():
+    store = StackStore()
+    raw = np.zeros((4, 8, 8), dtype=np.uint8)
+    view = store.put('ceus', raw)
+    assert np.shares_memory(view, raw) and store.get('ceus') is view
+    with pytest.raises(ValueError):
+        view[0, 0, 0] = 1
+    # Identity conversion costs nothing
+    same = store.derive('ceus', 'display', lambda s: s)
+    assert np.shares_memory(same, raw)
+    assert store.nbytes == raw.nbytes and store.cache_nbytes == 0
+
+
+def test_derive_is_lazy_and_cached():
+    store = StackStore()
+    store.put('ceus', np.ones((4, 8, 8, 3), dtype=np.uint8))
+    calls = []
+
+    def gray(s):
+        calls.append(1)
+        return s.mean(axis=-1).astype(np.float32)
+
+    a = store.derive('ceus', 'gray', gray)
+    b = store.derive('ceus', 'gray', gray)
+    assert a is b and len(calls) == 1
+    assert store.cache_nbytes == a.nbytes
+    # Replacing the primary invalidates its derived entries
+    store.put('ceus', np.zeros((2, 8, 8, 3), dtype=np.uint8))
+    assert store.derive('ceus', 'gray', gray).shape == (2, 8, 8) and len(calls) == 2
+
+
+def test_budget_evicts_least_recently_used():
+    store = StackStore(budget_bytes=3000)
+    for key in ('a', 'b', 'c'):
+        store.put(key, np.zeros((1000,), dtype=np.uint8))
+    fn = lambda s: s.astype(np.float32)       # 4000 bytes > budget on its own
+    store.derive('a', 'f', fn)
+    store.derive('b', 'f', fn)
+    assert ('a', 'f') not in store._derived and ('b', 'f') in store._derived
+    assert 'Mem:' in store.memory_summary()
@@ -0,0 +1,115 @@
+"""
+Tests for the background task runner
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add src to path
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+from PyQt5.QtCore import QCoreApplication, QEventLoop
+from src.ui.workers import TaskRunner
+
+
+def _app():
+    return QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+
+
+def _wait_until(predicate, timeout_s=5.0):
+    app = _app()
+    deadline = time.time() + timeout_s
+    while not predicate() and time.time() < deadline:
+        app.processEvents(QEventLoop.AllEvents, 20)
+        time.sleep(0.005)
+    return predicate()
+
+
+def test_result_and_progress_on_main_thread():
+    """Callbacks run on the main thread with progress and result"""
+    _app()
+    runner = TaskRunner()
+    main_thread = threading.get_ident()
+    seen = {'progress': [], 'threads': set()}
+
+    def work(ctx, n):
+        for i in range(n):
+            ctx.report((i + 1) / n, "step")
+        return threading.get_ident()
+
+    def on_progress(pct, msg):
+        seen['progress'].append(pct)
+        seen['threads'].add(threading.get_ident())
+
+    def on_result(worker_thread):
+        seen['worker'] = worker_thread
+        seen['threads'].add(threading.get_ident())
+
+    runner.submit('job', work, 4, on_result=on_result, on_progress=on_progress)
+    assert _wait_until(lambda: 'worker' in seen and not runner.is_running())
+    assert seen['worker'] != main_thread
+    assert seen['threads'] == {main_thread}
+    assert seen['progress'][-1] == 100
+
+
+def test_cancel_discards_result():
+    """A cancelled task never delivers its result"""
+    _app()
+    runner = TaskRunner()
+    started = threading.Event()
+    events = []
+
+    def work(ctx):
+        started.set()
+        while True:
+            ctx.report(0.5)
+            time.sleep(0.005)
+
+    runner.submit('job', work, on_result=lambda v: events.append('result'),
+                  on_cancelled=lambda: events.append('cancelled'))
+    assert started.wait(2.0)
+    assert runner.cancel('job')
+    assert _wait_until(lambda: 'cancelled' in events)
+    assert 'result' not in events
+
+
+def test_cancel_after_return_discards_queued_result():
+    """Cancelling once fn returned drops the result still queued for the main thread"""
+    _app()
+    runner = TaskRunner()
+    events = []
+
+    task = runner.submit('job', lambda ctx: 42, on_result=events.append,
+                         on_error=lambda msg, tb: events.append(msg),
+                         on_finished=lambda: events.append('finished'))
+    # The worker has emitted the result, but no event was processed yet
+    assert task.done.wait(2.0)
+    assert runner.cancel('job')
+    assert _wait_until(lambda: 'finished' in events)
+    assert events == ['finished']
+
+
+def test_error_and_resubmit_supersedes():
+    """Errors are reported; resubmitting a name cancels the previous task"""
+    _app()
+    runner = TaskRunner()
+    errors, results = [], []
+    gate = threading.Event()
+
+    def failing(ctx):
+        raise ValueError("boom")
+
+    def slow(ctx, value):
+        gate.wait(2.0)
+        ctx.check_cancelled()
+        return value
+
+    runner.submit('fail', failing, on_error=lambda msg, tb: errors.append(msg))
+    runner.submit('job', slow, 1, on_result=results.append)
+    runner.submit('job', slow, 2, on_result=results.append)
+    gate.set()
+    assert _wait_until(lambda: errors and results and not runner.is_running())
+    assert errors == ["boom"]
+    assert results == [2]
@@ -5,6 +5,8 @@ Full-featured version using Napari for visualization and Qt for controls
 import os
 os.environ['QT_API'] = 'pyqt5'  # Force PyQt5 before Napari import
 
+import logging
+import time
 import numpy as np
 from pathlib import Path
 from typing import List, Optional, Tuple
@@ -12,28 +14,48 @@ import napari
 from napari._qt.qt_event_loop import get_qapp
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QSlider, QGroupBox, QFileDialog, QMessageBox, QListWidget, QInputDialog, QShortcut, QApplication, QSpacerItem, QFrame,
-    QAbstractItemView, QSplitter, QCheckBox, QTableWidget, QTableWidgetItem, QHeaderView, QFormLayout, QDoubleSpinBox
+    QSlider, QGroupBox, QFileDialog, QMessageBox, QListWidget, QInputDialog, QShortcut, QSpacerItem, QFrame,
+    QAbstractItemView, QSplitter, QCheckBox, QTableWidget, QTableWidgetItem, QHeaderView, QFormLayout, QDoubleSpinBox, QSpinBox
 )
 from PyQt5.QtWidgets import QSizePolicy
-from PyQt5.QtCore import Qt, QTimer, QSize
+from PyQt5.QtCore import Qt, QTimer, QSize, pyqtSlot
 from PyQt5.QtGui import QKeySequence, QMovie
 # Savitzky–Golay no longer used for overlay/fit; LOESS is used to match R app.
 
 from src.core import (
-    DICOMLoader, detect_flash_ceus_refined, 
-    preprocess_ceus, motion_compensate, ROIManager
+    DICOMLoader, detect_flash_ceus_refined, OnlineFlashDetector, FlashEvent,
+    detect_flashes, segment_cycles,
+    preprocess_ceus, motion_compensate, ROIManager, StackStore, FrameStats,
+    extract_tics_from_masks, save_session, load_session
 )
+from src.core.session import SESSION_SUFFIX
+from src.core.catalog import CATALOG_NAME, StudyCatalog
+from src.core.stack_store import format_bytes
+from src.core.roi_manager import rasterize_polygon
+from src.utils import perf
 from src.utils.converters import to_gray
+from src.utils.pyramid import PyramidCache, build_pyramid
 from src.ui.widgets.tic_plot_widget import TICPlotWidget
 from src.utils.loess import loess_smooth
+from src.models.metrics import perfusion_metrics, PERFUSION_METRIC_KEYS
+from src.models.batch_metrics import batch_perfusion_metrics, pad_curves
+from src.models.export_tables import (
+    append_to_dataset, build_export_tables, columnar_available, write_columnar, write_csv_bundle,
+)
+from src.models.metrics_engine import MetricsEngine
+from src.models.parametric_maps import compute_parametric_maps, summarize_curves
+from src.core.tic_grid import extract_block_tics, extract_label_tics, superpixel_labels
+from src.core.roi_manager import ROI_COLORS
+from src.ui.workers import TaskRunner, TaskCancelled
+from src.ui.playback import FramePrefetcher, PlaybackClock
 from src.ui.widgets.fit_panel import FitPanel
-import pandas as pd
+from src.ui.widgets.perf_panel import PerfPanel
 try:
     from src.analysis.models import fit_models
 except Exception:
     fit_models = None
-from skimage.draw import polygon as sk_polygon
+
+logger = logging.getLogger(__name__)
 
 
 class NapariCEUSWindow(QWidget):
@@ -53,6 +75,11 @@ class NapariCEUSWindow(QWidget):
         self.fps = None
         self.flash_idx = None
         self.washout_idx = None
+        # Motion correction of the preprocessed window (per-frame shifts, reference stack)
+        self.motion_shifts = None
+        self.motion_source = None
+        # True while flash/washout come from the detector run during loading
+        self._flash_streamed = False
         self.current_frame = 0
         self._bmode_display_stack = None
         self._bmode_channel_axis = None
@@ -65,6 +92,23 @@ class NapariCEUSWindow(QWidget):
         # ROI management
         self.roi_manager = ROIManager()
         self.roi_tic_data = {}  # {roi_label: (time, vi, dvi)}
+        self._tic_colors = {}  # {label: (r, g, b)} colour each TIC was plotted with
+        self._auto_labels = set()  # labels of automatic TICs (grid cells, cycles) in roi_tic_data
+        self.grid_summary = {}  # {cell_label: {A, B, AxB, AUC, TTP, Peak, R2}}
+        self.cycle_summary = {}  # {'<roi>_C<n>': {A, B, AxB, AUC, TTP, Peak, R2}}
+        # RAW metrics cache (recomputes only ROIs whose valid_mask changed)
+        self.metrics_engine = MetricsEngine()
+        # Metrics table cells per ROI {label: {metric: QTableWidgetItem}} for in-place updates
+        self._metrics_items = {}
+        # Background tasks (load, preprocessing, TICs, fit) keep the UI responsive
+        self.task_runner = TaskRunner(self)
+        # Single owner of the study stacks (read-only views, cached conversions)
+        self.stacks = StackStore()
+        # Multiscale display levels shared by the B-mode, CEUS and overlay viewers
+        self._pyramids = PyramidCache(max_entries=4)
+        # Progressive DICOM loading: full stacks being filled in the background
+        self._loading = False
+        self._loading_stacks = (None, None)
         # (Undo removed for TIC toggling simplification)
         
         # Create Napari viewers
@@ -86,6 +130,10 @@ class NapariCEUSWindow(QWidget):
         self.playback_timer.setTimerType(Qt.PreciseTimer)
         self.playback_timer.timeout.connect(self._advance_frame)
         self.is_playing = False
+        # Read-ahead of upcoming frames + wall-clock schedule (drops frames when late)
+        self._prefetcher: Optional[FramePrefetcher] = None
+        self._playback_clock: Optional[PlaybackClock] = None
+        self._playback_stats_time = 0.0
         
         self.setWindowTitle("CEUS Analyzer - Napari Edition")
         self.resize(1800, 1000)
@@ -108,6 +156,8 @@ class NapariCEUSWindow(QWidget):
         self._last_tic_target = None  # (label, idx)
         # Résultats de fit par ROI {label: {model: {params, rss, y_fit}}}
         self.fit_results = {}
+        # Axe temps de chaque fit {label: t} (pour retracer les courbes)
+        self.fit_times = {}
         # Ensure we can receive key events
         try:
             self.setFocusPolicy(Qt.StrongFocus)
@@ -227,6 +277,9 @@ class NapariCEUSWindow(QWidget):
         """Create control widgets"""
         # Top control buttons
         self.btn_load = QPushButton("📁 Load DICOM")
+        self.btn_open_session = QPushButton("📂 Open Session")
+        self.btn_save_session = QPushButton("💾 Save Session")
+        self.btn_save_session.setEnabled(False)
         self.btn_detect_flash = QPushButton("⚡ Detect Flash")
         self.btn_set_flash_manual = QPushButton("✋ Set Flash Manually")
         self.btn_motion_correction = QPushButton("🎯 Motion Correction")
@@ -254,6 +307,35 @@ class NapariCEUSWindow(QWidget):
         self.btn_compute_tic = QPushButton("📊 Compute TICs")
         self.btn_compute_tic.setEnabled(False)
 
+        # Parametric maps (whole field of view, no ROI needed)
+        self.btn_parametric_maps = QPushButton("🗺 Parametric Maps")
+        self.btn_parametric_maps.setEnabled(False)
+        self.btn_parametric_maps.setToolTip(
+            "Fit the wash-in model on every block (t ≤ Tmax) and show A, B, A·B, AUC, TTP maps"
+        )
+        self.spin_map_block = QSpinBox()
+        self.spin_map_block.setRange(1, 32)
+        self.spin_map_block.setValue(4)
+        self.spin_map_block.setSuffix(" px")
+        self.spin_map_block.setToolTip("Superpixel size (1 = every pixel)")
+
+        # Grid TICs: automatic ROIs on a block / superpixel grid
+        self.btn_grid_tics = QPushButton("▦ Grid TICs")
+        self.btn_grid_tics.setEnabled(False)
+        self.btn_grid_tics.setToolTip("Compute, fit and summarize the TIC of every grid cell")
+        self.spin_grid_size = QSpinBox()
+        self.spin_grid_size.setRange(4, 256)
+        self.spin_grid_size.setValue(32)
+        self.spin_grid_size.setSuffix(" px")
+        self.spin_grid_size.setToolTip("Grid cell size")
+        self.chk_grid_superpixels = QCheckBox("Superpixels (B-mode)")
+        self.chk_grid_superpixels.setToolTip("Use SLIC superpixels of the B-mode image instead of square blocks")
+
+        # Multi-flash clips: one TIC per ROI and replenishment cycle
+        self.btn_cycle_tics = QPushButton("🔁 Cycle TICs")
+        self.btn_cycle_tics.setEnabled(False)
+        self.btn_cycle_tics.setToolTip("Detect every flash, split the clip into cycles and fit each ROI per cycle")
+
         # ROI list + actions
         self.roi_list_label = QLabel("<b>Active ROIs:</b>")
         self.roi_info_widget = QListWidget()
@@ -283,6 +365,17 @@ class NapariCEUSWindow(QWidget):
         # Status label
         self.status_label = QLabel("Ready to load DICOM")
         self.status_label.setStyleSheet("padding: 5px; background: #eaeaea; border-radius: 3px; color: #222;")
+        # Cancel button for background tasks (visible only while a task runs)
+        self.btn_cancel_task = QPushButton("✖ Cancel")
+        self.btn_cancel_task.setToolTip("Cancel the running operation(s)")
+        self.btn_cancel_task.setVisible(False)
+        self.memory_label = QLabel("")
+        self.memory_label.setToolTip("Memory held by the loaded stacks (cached conversions / budget)")
+        self.memory_label.setStyleSheet("color:#666;")
+        # Performance panel (tool window, created on first use)
+        self.btn_perf = QPushButton("⏱ Perf")
+        self.btn_perf.setToolTip("Stage timings, counters, profiler capture and trace export")
+        self.perf_panel: Optional[PerfPanel] = None
         
         # Analysis info label (above viewers)
         self.analysis_info_label = QLabel("Flash: —   Washout: —   ROI: 0 active")
@@ -307,6 +400,8 @@ class NapariCEUSWindow(QWidget):
         control_layout = QHBoxLayout()
         control_layout.setSpacing(12)
         control_layout.addWidget(self.btn_load)
+        control_layout.addWidget(self.btn_open_session)
+        control_layout.addWidget(self.btn_save_session)
         control_layout.addWidget(self.btn_detect_flash)
         control_layout.addWidget(self.btn_set_flash_manual)
         control_layout.addWidget(self.btn_motion_correction)
@@ -395,6 +490,16 @@ class NapariCEUSWindow(QWidget):
         roi_layout.addWidget(self.btn_draw_roi)
         roi_layout.addWidget(self.btn_clear_roi)
         roi_layout.addWidget(self.btn_compute_tic)
+        maps_row = QHBoxLayout()
+        maps_row.addWidget(self.btn_parametric_maps, stretch=1)
+        maps_row.addWidget(self.spin_map_block)
+        roi_layout.addLayout(maps_row)
+        grid_row = QHBoxLayout()
+        grid_row.addWidget(self.btn_grid_tics, stretch=1)
+        grid_row.addWidget(self.spin_grid_size)
+        roi_layout.addLayout(grid_row)
+        roi_layout.addWidget(self.chk_grid_superpixels)
+        roi_layout.addWidget(self.btn_cycle_tics)
         # Separator
         sep1 = QFrame(); sep1.setFrameShape(QFrame.HLine); sep1.setFrameShadow(QFrame.Sunken)
         roi_layout.addWidget(sep1)
@@ -565,10 +670,16 @@ class NapariCEUSWindow(QWidget):
             self.btn_refresh_metrics = QPushButton("🔄 Refresh Metrics")
             self.btn_refresh_metrics.setToolTip("Recompute RAW metrics using only currently included points")
             self.btn_export_metrics = QPushButton("⬇ Export CSV")
-            self.btn_export_metrics.setToolTip("Export all RAW and fitted metrics for all ROIs")
+            self.btn_export_metrics.setToolTip("Export all RAW and fitted metrics for all ROIs (ZIP of CSVs, Parquet or Arrow)")
+            self.btn_export_cohort = QPushButton("⬇ Add to Cohort")
+            self.btn_export_cohort.setToolTip(
+                "Record this study's fitted parameters in a cohort catalogue (SQLite) "
+                "and append its tables to the cohort Parquet dataset (requires pyarrow)"
+            )
             btn_row = QHBoxLayout()
             btn_row.addWidget(self.btn_refresh_metrics)
             btn_row.addWidget(self.btn_export_metrics)
+            btn_row.addWidget(self.btn_export_cohort)
             btn_row.addStretch()
             metrics_layout.addLayout(btn_row)
             # Placeholder initial state
@@ -629,7 +740,10 @@ class NapariCEUSWindow(QWidget):
             self.status_layout.setSpacing(6)
             self.status_layout.addWidget(self.status_label)
             self.status_layout.addWidget(self.spinner_label)
+            self.status_layout.addWidget(self.btn_cancel_task)
             self.status_layout.addStretch()
+            self.status_layout.addWidget(self.memory_label)
+            self.status_layout.addWidget(self.btn_perf)
 
             self.status_container = QWidget()
             self.status_container.setLayout(self.status_layout)
@@ -651,6 +765,8 @@ class NapariCEUSWindow(QWidget):
         """Connect signals and slots"""
         # Top buttons
         self.btn_load.clicked.connect(self.load_dicom)
+        self.btn_open_session.clicked.connect(self.open_session)
+        self.btn_save_session.clicked.connect(self.save_session)
         self.btn_detect_flash.clicked.connect(self.detect_flash)
         self.btn_set_flash_manual.clicked.connect(self.set_flash_manual)
         self.btn_motion_correction.clicked.connect(self.apply_motion_correction)
@@ -661,7 +777,12 @@ class NapariCEUSWindow(QWidget):
         self.btn_draw_roi.toggled.connect(self.toggle_roi_drawing)
         self.btn_clear_roi.clicked.connect(self.clear_rois)
         self.btn_compute_tic.clicked.connect(self.compute_all_tics)
+        self.btn_parametric_maps.clicked.connect(self.compute_perfusion_maps)
+        self.btn_grid_tics.clicked.connect(self.compute_grid_tics)
+        self.btn_cycle_tics.clicked.connect(self.compute_cycle_tics)
         self.btn_sync_zoom.toggled.connect(self._enable_sync_camera)
+        self.btn_cancel_task.clicked.connect(self._cancel_running_tasks)
+        self.btn_perf.clicked.connect(self._show_perf_panel)
         # ROI list actions
         self.roi_info_widget.itemSelectionChanged.connect(self._on_roi_selection_changed)
         self.btn_remove_selected_roi.clicked.connect(self._on_remove_selected_roi)
@@ -695,6 +816,8 @@ class NapariCEUSWindow(QWidget):
                 self.btn_refresh_metrics.clicked.connect(self._refresh_metrics_table)
             if hasattr(self, 'btn_export_metrics'):
                 self.btn_export_metrics.clicked.connect(self._export_metrics_csv)
+            if hasattr(self, 'btn_export_cohort'):
+                self.btn_export_cohort.clicked.connect(self._export_metrics_cohort)
             if hasattr(self, 'chk_metrics_smooth'):
                 self.chk_metrics_smooth.toggled.connect(lambda _: self._refresh_metrics_table())
             # Recompute overlay when LOESS span changes
@@ -731,8 +854,10 @@ class NapariCEUSWindow(QWidget):
     # DICOM Loading
     # =========================================================================
     
+    @pyqtSlot()
+    @perf.traced('ui.load_dicom')
     def load_dicom(self):
-        """Load DICOM file"""
+        """Load DICOM file (decoding runs in the background)"""
         default_path = Path(__file__).parent.parent.parent / "data"
         if not default_path.exists():
             default_path = Path.home()
@@ -753,202 +878,765 @@ class NapariCEUSWindow(QWidget):
         if not file_path:
             return
         
+        # Stop playback
+        if self.is_playing:
+            self.toggle_playback()
+        
+        self._run_task(
+            'load',
+            self._load_dicom_worker,
+            file_path,
+            busy_text="Loading DICOM...",
+            on_partial=self._on_dicom_partial,
+            on_result=self._apply_dicom_load_complete,
+            on_finished=self._on_dicom_load_finished,
+            error_title="Failed to load DICOM",
+        )
+    
+    def _load_dicom_worker(self, ctx, file_path: str) -> dict:
+        """Worker thread: decode the DICOM progressively (no widget access).
+
+        Frame 0 is published as soon as it is decoded, then the frame count
+        each time a batch of frames lands in the preallocated stacks.
+        """
+        ctx.report(0.0, "Reading DICOM...")
+        loader = DICOMLoader(Path(file_path))
+        n_frames = loader.open()
+        bmode_full, ceus_full = loader.bmode_stack, loader.ceus_stack
+        first = {
+            'file_path': file_path,
+            'loader': loader,
+            'bmode_full': bmode_full,
+            'ceus_full': ceus_full,
+            'bmode_stack': None if bmode_full is None else bmode_full[:1],
+            'ceus_stack': None if ceus_full is None else ceus_full[:1],
+            'fps': loader.get_fps(),
+        }
+        # Raw views are displayed while loading (display conversion happens at the end)
+        first['bmode_display'] = self._loading_display(first['bmode_stack'])
+        first['ceus_display'] = self._loading_display(first['ceus_stack'])
+        first['bmode_clims'] = self._compute_bmode_limits(first['bmode_stack'], q=(1, 99))
+        ctx.publish(first)
+        if ceus_full is None:
+            return first
+        
+        # Flash detection runs on the per-frame intensities as frames land
+        detector = OnlineFlashDetector(exclude_first_n=5, search_window=20, n_frames=n_frames)
+        last_publish = time.monotonic()
+        for n in loader.iter_load():
+            ctx.report(0.9 * n / n_frames, f"Loading frames {n}/{n_frames}...")
+            for event in detector.extend(loader.ceus_intensity[len(detector.intensities):n]):
+                ctx.publish(event)
+            # Throttle GUI updates (layer refresh + slider) to ~7 per second
+            now = time.monotonic()
+            if now - last_publish >= 0.15:
+                ctx.publish(n)
+                last_publish = now
+        
+        ctx.report(0.9, "Preparing display...")
+        out = dict(first)
+        # Refined on the whole trace (same result as the Detect Flash button)
+        out['flash'] = detector.finalize() if detector.flash_idx is not None else None
+        out['bmode_stack'] = bmode_full
+        out['ceus_stack'] = ceus_full
+        out['fps'] = loader.get_fps()
+        out['bmode_display'] = self._prepare_display_stack(bmode_full)
+        # Precompute robust contrast limits for B-mode
         try:
-            QApplication.setOverrideCursor(Qt.WaitCursor)
-            self._show_spinner(True)
-            self.status_label.setText("Loading DICOM...")
-            
-            # Stop playback
-            if self.is_playing:
-                self.toggle_playback()
-            
-            # Reset data
-            self.ceus_preprocessed = None
-            self.flash_idx = None
-            self.washout_idx = None
-            self.roi_manager.clear()
-            self.roi_tic_data.clear()
-            self.tic_plot.clear()
-            
-            # Load DICOM
-            self.dicom_loader = DICOMLoader(Path(file_path))
-            self.bmode_stack, self.ceus_stack = self.dicom_loader.load()
-            self.fps = self.dicom_loader.get_fps()
-            (
-                self._bmode_display_stack,
-                self._bmode_is_rgb,
-                self._bmode_channel_axis,
-            ) = self._prepare_display_stack(self.bmode_stack)
-            # Precompute robust contrast limits for B-mode
-            try:
-                self._bmode_auto_clims = self._compute_bmode_limits(self._bmode_display_stack, q=(1, 99))
-            except Exception:
-                self._bmode_auto_clims = None
-            (
+            out['bmode_clims'] = self._compute_bmode_limits(out['bmode_display'][0], q=(1, 99))
+        except Exception:
+            out['bmode_clims'] = None
+        ctx.report(0.95, "Preparing display...")
+        out['ceus_display'] = self._prepare_display_stack(ceus_full)
+        # Build the display pyramids here rather than on the GUI thread
+        out['pyramids'] = []
+        for key in ('bmode_display', 'ceus_display'):
+            ctx.check_cancelled()
+            data = out[key][0]
+            if data is not None:
+                # Frozen now so the store hands out this very object (pyramids are keyed on it)
+                data.flags.writeable = False
+                out['pyramids'].append((data, build_pyramid(data, self._pyramids.factors, self._pyramids.min_size)))
+        return out
+    
+    def _on_dicom_partial(self, value):
+        """Main thread: first frame (dict), flash/washout found so far (FlashEvent)
+        or number of frames loaded so far (int)."""
+        if isinstance(value, dict):
+            self._apply_loaded_dicom(value)
+        elif isinstance(value, FlashEvent):
+            self._on_stream_flash(value)
+        else:
+            self._on_dicom_frames(int(value))
+
+    def _on_stream_flash(self, event: FlashEvent):
+        """Main thread: flash or washout determined while the clip is still loading"""
+        # A flash set by hand (or detected explicitly) meanwhile takes precedence
+        if self.flash_idx is not None and not self._flash_streamed:
+            return
+        self._flash_streamed = True
+        if event.kind == 'flash':
+            self.flash_idx = int(event.frame)
+        else:
+            self.washout_idx = int(event.frame)
+        self._update_status_info()
+    
+    @staticmethod
+    def _loading_display(view: Optional[np.ndarray]):
+        """(data, is_rgb, channel_axis) for a raw stack shown while frames are still loading"""
+        if view is None:
+            return None, False, None
+        return view, bool(view.ndim >= 4 and view.shape[-1] in (3, 4)), None
+    
+    def _reset_study(self):
+        """Drop every stack and result of the current study (before installing another one)"""
+        # Analyses still running on the previous file are now stale
+        for name in ('processing', 'tics', 'fit', 'maps', 'grid', 'cycles'):
+            self.task_runner.cancel(name)
+        self._pyramids.clear()
+        self.stacks.clear()
+        
+        # Stop playback
+        if self.is_playing:
+            self.toggle_playback()
+        
+        # Reset data
+        self.ceus_preprocessed = None
+        self.motion_shifts = None
+        self.motion_source = None
+        self.flash_idx = None
+        self.washout_idx = None
+        self._flash_streamed = False
+        self.roi_manager.clear()
+        self.roi_tic_data.clear()
+        self._tic_colors = {}
+        self._auto_labels = set()
+        self.grid_summary = {}
+        self.cycle_summary = {}
+        self.fit_results = {}
+        self.fit_times = {}
+        self.metrics_engine.clear()
+        self.tic_plot.clear()
+
+    def _apply_loaded_dicom(self, loaded: dict):
+        """Main thread: install a new DICOM in the viewers (first frame while loading)"""
+        if loaded['ceus_stack'] is None:
+            QMessageBox.warning(self, "Warning", "No CEUS stack found in DICOM")
+            self.status_label.setText("❌ No CEUS stack found in DICOM")
+            return
+        
+        self._reset_study()
+        self.dicom_loader = loaded['loader']
+        self.bmode_stack = loaded['bmode_stack']
+        self.ceus_stack = loaded['ceus_stack']
+        self.fps = loaded['fps']
+        (
+            self._bmode_display_stack,
+            self._bmode_is_rgb,
+            self._bmode_channel_axis,
+        ) = loaded['bmode_display']
+        self._bmode_auto_clims = loaded.get('bmode_clims')
+        (
+            self._ceus_display_stack,
+            self._ceus_is_rgb,
+            self._ceus_channel_axis,
+        ) = loaded['ceus_display']
+        self._current_ceus_layer_name = 'CEUS (raw)'
+        # Full preallocated stacks being filled by the load task
+        self._loading_stacks = (loaded.get('bmode_full'), loaded.get('ceus_full'))
+        self._loading = True
+        
+        # Display in Napari viewers
+        if self.bmode_stack is not None:
+            self._show_bmode_layer('B-mode')
+        
+        # Remove existing CEUS layers
+        for layer in list(self.ceus_viewer.layers):
+            if layer.name not in ['ROIs']:
+                self.ceus_viewer.layers.remove(layer)
+        if self._ceus_display_stack is not None:
+            self._add_image_layer(
+                self.ceus_viewer,
                 self._ceus_display_stack,
-                self._ceus_is_rgb,
-                self._ceus_channel_axis,
-            ) = self._prepare_display_stack(self.ceus_stack)
-            self._current_ceus_layer_name = 'CEUS (raw)'
-            
-            if self.ceus_stack is None:
-                QMessageBox.warning(self, "Warning", "No CEUS stack found in DICOM")
-                return
-            
-            # Display in Napari viewers
-            if self.bmode_stack is not None:
-                # Remove existing layers
-                for layer in list(self.bmode_viewer.layers):
-                    if layer.name != 'ROIs':
-                        self.bmode_viewer.layers.remove(layer)
-                if self._bmode_display_stack is not None:
-                    b_layer = self._add_image_layer(
-                        self.bmode_viewer,
-                        self._bmode_display_stack,
-                        name='B-mode',
-                        channel_axis=self._bmode_channel_axis,
-                        rgb=self._bmode_is_rgb,
-                        colormap='gray',
-                        blending='opaque'
-                    )
-                    # Apply auto-contrast and gamma
-                    try:
-                        if b_layer is not None and self._bmode_auto_clims is not None:
-                            lo, hi = self._bmode_auto_clims
-                            if lo is not None and hi is not None:
-                                b_layer.contrast_limits = (float(lo), float(hi))
-                        if b_layer is not None and hasattr(b_layer, 'gamma'):
-                            b_layer.gamma = float(self._bmode_gamma)
-                    except Exception:
-                        pass
-            
-            # Remove existing CEUS layers
-            for layer in list(self.ceus_viewer.layers):
-                if layer.name not in ['ROIs']:
-                    self.ceus_viewer.layers.remove(layer)
-            if self._ceus_display_stack is not None:
-                self._add_image_layer(
-                    self.ceus_viewer,
-                    self._ceus_display_stack,
-                    name=self._current_ceus_layer_name,
-                    channel_axis=self._ceus_channel_axis,
-                    rgb=self._ceus_is_rgb,
-                    colormap='gray',
-                    blending='additive',
-                    opacity=0.7
-                )
+                name=self._current_ceus_layer_name,
+                channel_axis=self._ceus_channel_axis,
+                rgb=self._ceus_is_rgb,
+                colormap='gray',
+                blending='additive',
+                opacity=0.7
+            )
 
-            # Create/update ROI canvas above CEUS and shapes layer on top
-            self._remove_roi_canvas_if_exists()
-            self._ensure_roi_canvas_layer()
-            self._ensure_shapes_layer_exists_on_top()
-            # Configure ROI master depending on B-mode presence
-            if self.bmode_stack is not None:
-                self._ensure_bmode_shapes_layer_exists_on_top()
-                self._set_roi_master('bmode')
-                self._mirror_shapes_to_ceus()
-            else:
-                self._set_roi_master('ceus')
+        # Create/update ROI canvas above CEUS and shapes layer on top
+        self._remove_roi_canvas_if_exists()
+        self._ensure_roi_canvas_layer()
+        self._ensure_shapes_layer_exists_on_top()
+        # Configure ROI master depending on B-mode presence
+        if self.bmode_stack is not None:
+            self._ensure_bmode_shapes_layer_exists_on_top()
+            self._set_roi_master('bmode')
+            self._mirror_shapes_to_ceus()
+        else:
+            self._set_roi_master('ceus')
 
-            # Update overlay with current data
-            self._update_overlay_layers()
-            # Equalize initial camera view across viewers (one-time)
+        # Update overlay with current data
+        self._update_overlay_layers()
+        # Equalize initial camera view across viewers (one-time)
+        try:
+            self._on_master_camera_changed()
+        except Exception:
+            pass
+        
+        # Setup frame slider
+        n_frames = self.ceus_stack.shape[0]
+        self.frame_slider.setMaximum(n_frames - 1)
+        self.frame_slider.setValue(0)
+        self.current_frame = 0
+        
+        self.status_label.setText(f"Loading frames 1/{len(loaded['ceus_full'])}...")
+        self._update_ui_state()
+        self._update_frame_info()
+        # Set initial TIC x-range to full raw duration
+        try:
+            if self.fps and self.fps > 0 and self.ceus_stack is not None:
+                total_dur = len(self.ceus_stack) / float(self.fps)
+                self.tic_plot.plotItem.setXRange(0, total_dur)
+        except Exception:
+            pass
+        # Refresh info label defaults
+        self._update_status_info()
+    
+    def _set_layer_data(self, viewer: napari.Viewer, name: str, data: Optional[np.ndarray]):
+        """Swap the data of an existing image layer (no-op if the layer is absent)."""
+        if data is None:
+            return
+        try:
+            if name in viewer.layers:
+                viewer.layers[name].data = data
+        except Exception:
+            pass
+
+    def _show_bmode_layer(self, name: str):
+        """Replace the B-mode viewer image with the current B-mode display stack (auto-contrast + gamma)."""
+        for layer in list(self.bmode_viewer.layers):
+            if layer.name != 'ROIs':
+                self.bmode_viewer.layers.remove(layer)
+        if self._bmode_display_stack is None:
+            return None
+        b_layer = self._add_image_layer(
+            self.bmode_viewer,
+            self._bmode_display_stack,
+            name=name,
+            channel_axis=self._bmode_channel_axis,
+            rgb=self._bmode_is_rgb,
+            colormap='gray',
+            blending='opaque'
+        )
+        # Apply auto-contrast and gamma
+        try:
+            if b_layer is not None and self._bmode_auto_clims is not None:
+                lo, hi = self._bmode_auto_clims
+                if lo is not None and hi is not None:
+                    b_layer.contrast_limits = (float(lo), float(hi))
+            if b_layer is not None and hasattr(b_layer, 'gamma'):
+                b_layer.gamma = float(self._bmode_gamma)
+        except Exception:
+            pass
+        return b_layer
+
+    def _show_ceus_layer(self, **style):
+        """Replace the CEUS viewer image (and its stale maps) with the current CEUS display stack."""
+        self._remove_parametric_maps()
+        for layer in list(self.ceus_viewer.layers):
+            if 'CEUS' in layer.name:
+                self.ceus_viewer.layers.remove(layer)
+        if self._ceus_display_stack is None:
+            return None
+        return self._add_image_layer(
+            self.ceus_viewer,
+            self._ceus_display_stack,
+            name=self._current_ceus_layer_name,
+            channel_axis=self._ceus_channel_axis,
+            rgb=self._ceus_is_rgb,
+            **style
+        )
+
+    def _replace_image_layer(
+        self,
+        viewer: napari.Viewer,
+        name: str,
+        data: Optional[np.ndarray],
+        *,
+        channel_axis: Optional[int],
+        rgb: Optional[bool] = None,
+    ):
+        """Re-create an image layer at the same z-position, keeping its display settings."""
+        if data is None or name not in viewer.layers:
+            return None
+        try:
+            old = viewer.layers[name]
+            index = viewer.layers.index(old)
+            kwargs = dict(blending=old.blending, opacity=old.opacity)
+            colormap = getattr(getattr(old, 'colormap', None), 'name', 'gray')
+            if hasattr(old, 'gamma'):
+                kwargs['gamma'] = old.gamma
+            viewer.layers.remove(old)
+            layer = self._add_image_layer(
+                viewer, data, name=name, channel_axis=channel_axis,
+                rgb=rgb, colormap=colormap, **kwargs
+            )
+            if layer is not None:
+                viewer.layers.move(viewer.layers.index(layer), index)
+            return layer
+        except Exception as e:
+            logger.debug("replace layer '%s' error: %s", name, e)
+            return None
+
+    def _on_dicom_frames(self, n_loaded: int):
+        """Main thread: more frames landed, extend views, layers and slider."""
+        if not getattr(self, '_loading', False):
+            return
+        bmode_full, ceus_full = self._loading_stacks
+        if ceus_full is None:
+            return
+        # Views on the preallocated stacks: no copy, napari range = loaded frames
+        self.ceus_stack = ceus_full[:n_loaded]
+        self.bmode_stack = None if bmode_full is None else bmode_full[:n_loaded]
+        self._ceus_display_stack = self.ceus_stack
+        self._set_layer_data(self.ceus_viewer, self._current_ceus_layer_name, self.ceus_stack)
+        self._set_layer_data(self.overlay_viewer, f'{self._current_ceus_layer_name} (overlay)', self.ceus_stack)
+        if self.bmode_stack is not None:
+            self._bmode_display_stack = self.bmode_stack
+            self._set_layer_data(self.bmode_viewer, 'B-mode', self.bmode_stack)
+            self._set_layer_data(self.overlay_viewer, 'B-mode (base)', self.bmode_stack)
+        self.frame_slider.setMaximum(n_loaded - 1)
+        self._update_frame_info()
+
+    def _apply_dicom_load_complete(self, loaded: dict):
+        """Main thread: every frame is decoded, switch to the final display stacks."""
+        if not getattr(self, '_loading', False) or loaded.get('ceus_stack') is None:
+            return
+        self._loading = False
+        self._loading_stacks = (None, None)
+        self.bmode_stack = self.stacks.put('bmode', loaded['bmode_stack'])
+        self.ceus_stack = self.stacks.put('ceus', loaded['ceus_stack'])
+        # Per-frame statistics were filled while decoding: no second pass
+        loader = loaded.get('loader')
+        if loader is not None:
+            self.stacks.set_stats('bmode', loader.bmode_stats)
+            self.stacks.set_stats('ceus', loader.ceus_stats)
+        self.fps = loaded['fps']
+        (
+            self._bmode_display_stack,
+            self._bmode_is_rgb,
+            self._bmode_channel_axis,
+        ) = self._store_display('bmode', loaded['bmode_display'])
+        if loaded.get('bmode_clims') is not None:
+            self._bmode_auto_clims = loaded['bmode_clims']
+        (
+            self._ceus_display_stack,
+            self._ceus_is_rgb,
+            self._ceus_channel_axis,
+        ) = self._store_display('ceus', loaded['ceus_display'])
+        for data, levels in loaded.get('pyramids', []):
+            self._pyramids.put(data, levels)
+        if self._flash_streamed and loaded.get('flash') is not None:
+            self.flash_idx, self.washout_idx = loaded['flash']
+            self._update_status_info()
+        # Growing views were shown as plain arrays: rebuild as multiscale layers
+        self._replace_image_layer(
+            self.ceus_viewer,
+            self._current_ceus_layer_name,
+            self._ceus_display_stack,
+            channel_axis=self._ceus_channel_axis,
+            rgb=self._ceus_is_rgb,
+        )
+        if self._bmode_display_stack is not None:
+            b_layer = self._replace_image_layer(
+                self.bmode_viewer,
+                'B-mode',
+                self._bmode_display_stack,
+                channel_axis=self._bmode_channel_axis,
+                rgb=self._bmode_is_rgb,
+            )
             try:
-                self._on_master_camera_changed()
+                if b_layer is not None and self._bmode_auto_clims is not None:
+                    lo, hi = self._bmode_auto_clims
+                    b_layer.contrast_limits = (float(lo), float(hi))
             except Exception:
                 pass
-            
-            # Setup frame slider
-            n_frames = self.ceus_stack.shape[0]
-            self.frame_slider.setMaximum(n_frames - 1)
-            self.frame_slider.setValue(0)
-            self.current_frame = 0
-            
-            # Update status
-            manufacturer = self.dicom_loader.scanner_info.get('Manufacturer', 'Unknown')
-            model = self.dicom_loader.scanner_info.get('ManufacturerModelName', '')
-            bmode_info = f"B-mode: {self.bmode_stack.shape}" if self.bmode_stack is not None else "No B-mode"
-            self.status_label.setText(
-                f"✅ Loaded: {Path(file_path).name} | "
-                f"{manufacturer} {model} | "
-                f"FPS: {self.fps:.1f} | "
-                f"CEUS: {self.ceus_stack.shape} | {bmode_info}"
-            )
-            # Diagnostics (status tooltip + console) to investigate color format issues
-            try:
-                photo = self.dicom_loader.metadata.get('PhotometricInterpretation', None)
-                def _ch_stats(frame):
-                    try:
-                        if frame.ndim == 3 and frame.shape[-1] == 3:
-                            ch = [frame[..., i] for i in range(3)]
-                            stats = [
-                                (float(np.nanmin(c)), float(np.nanmax(c)), float(np.nanmean(c)), float(np.nanstd(c)))
-                                for c in ch
-                            ]
-                            return stats
-                        else:
-                            return [(float(np.nanmin(frame)), float(np.nanmax(frame)), float(np.nanmean(frame)), float(np.nanstd(frame)))]
-                    except Exception:
-                        return []
-                # Sample middle frame when possible
-                ceus_sample = None
-                bmode_sample = None
+        # ROI canvas was sized on the first frame
+        self._remove_roi_canvas_if_exists()
+        self._ensure_roi_canvas_layer()
+        self._ensure_shapes_layer_exists_on_top()
+        self._update_overlay_layers()
+        self.frame_slider.setMaximum(len(self.ceus_stack) - 1)
+        self._update_frame_info()
+        self._show_loaded_status(loaded['file_path'])
+        self._update_ui_state()
+        # Set initial TIC x-range to full raw duration
+        try:
+            if self.fps and self.fps > 0:
+                total_dur = len(self.ceus_stack) / float(self.fps)
+                self.tic_plot.plotItem.setXRange(0, total_dur)
+        except Exception:
+            pass
+
+    def _on_dicom_load_finished(self):
+        """Load task ended (done, cancelled or failed): keep the frames decoded so far."""
+        if self.task_runner.is_running('load') or not getattr(self, '_loading', False):
+            return
+        self._loading = False
+        self._loading_stacks = (None, None)
+        self._update_ui_state()
+
+    def _show_loaded_status(self, file_path: str):
+        """Status text + colour diagnostics for the loaded DICOM."""
+        manufacturer = self.dicom_loader.scanner_info.get('Manufacturer', 'Unknown')
+        model = self.dicom_loader.scanner_info.get('ManufacturerModelName', '')
+        bmode_info = f"B-mode: {self.bmode_stack.shape}" if self.bmode_stack is not None else "No B-mode"
+        self.status_label.setText(
+            f"✅ Loaded: {Path(file_path).name} | "
+            f"{manufacturer} {model} | "
+            f"FPS: {self.fps:.1f} | "
+            f"CEUS: {self.ceus_stack.shape} | {bmode_info}"
+        )
+        # Diagnostics (status tooltip + console) to investigate color format issues
+        try:
+            photo = self.dicom_loader.metadata.get('PhotometricInterpretation', None)
+            def _ch_stats(frame):
                 try:
-                    if self.ceus_stack is not None:
-                        ceus_sample = self.ceus_stack[min(len(self.ceus_stack)//2, len(self.ceus_stack)-1)]
-                    if self.bmode_stack is not None:
-                        bmode_sample = self.bmode_stack[min(len(self.bmode_stack)//2, len(self.bmode_stack)-1)]
+                    if frame.ndim == 3 and frame.shape[-1] == 3:
+                        ch = [frame[..., i] for i in range(3)]
+                        stats = [
+                            (float(np.nanmin(c)), float(np.nanmax(c)), float(np.nanmean(c)), float(np.nanstd(c)))
+                            for c in ch
+                        ]
+                        return stats
+                    else:
+                        return [(float(np.nanmin(frame)), float(np.nanmax(frame)), float(np.nanmean(frame)), float(np.nanstd(frame)))]
                 except Exception:
-                    pass
-                ceus_dtype = getattr(self.ceus_stack, 'dtype', None)
-                bmode_dtype = getattr(self.bmode_stack, 'dtype', None)
-                ceus_stats = _ch_stats(ceus_sample) if ceus_sample is not None else []
-                bmode_stats = _ch_stats(bmode_sample) if bmode_sample is not None else []
-                diag_lines = [
-                    f"PhotometricInterpretation={photo}",
-                    f"CEUS dtype={ceus_dtype}, stats={ceus_stats[:3] if ceus_stats else 'n/a'}",
-                    f"B-mode dtype={bmode_dtype}, stats={bmode_stats[:3] if bmode_stats else 'n/a'}",
-                ]
-                diag_text = " | ".join(diag_lines)
-                # Console log
-                print("[DICOM DIAG]", diag_text)
-                # Tooltip for quick inspection
+                    return []
+            def _mid_stats(stack, frame_stats):
+                # Middle frame: per-channel stats from the loader when already summarized
+                if stack is None:
+                    return []
+                mid = min(len(stack) // 2, len(stack) - 1)
                 try:
-                    self.status_label.setToolTip(diag_text)
+                    if frame_stats is not None and frame_stats.valid[mid]:
+                        return frame_stats.channel_stats(mid)
                 except Exception:
                     pass
-            except Exception:
-                pass
-            
-            self._update_ui_state()
-            self._update_frame_info()
-            # Set initial TIC x-range to full raw duration
+                return _ch_stats(stack[mid])
+            ceus_dtype = getattr(self.ceus_stack, 'dtype', None)
+            bmode_dtype = getattr(self.bmode_stack, 'dtype', None)
+            ceus_stats = _mid_stats(self.ceus_stack, getattr(self.dicom_loader, 'ceus_stats', None))
+            bmode_stats = _mid_stats(self.bmode_stack, getattr(self.dicom_loader, 'bmode_stats', None))
+            diag_lines = [
+                f"PhotometricInterpretation={photo}",
+                f"CEUS dtype={ceus_dtype}, stats={ceus_stats[:3] if ceus_stats else 'n/a'}",
+                f"B-mode dtype={bmode_dtype}, stats={bmode_stats[:3] if bmode_stats else 'n/a'}",
+            ]
+            diag_text = " | ".join(diag_lines)
+            # Console log
+            print("[DICOM DIAG]", diag_text)
+            # Tooltip for quick inspection
             try:
-                if self.fps and self.fps > 0 and self.ceus_stack is not None:
-                    total_dur = len(self.ceus_stack) / float(self.fps)
-                    self.tic_plot.plotItem.setXRange(0, total_dur)
+                self.status_label.setToolTip(diag_text)
             except Exception:
                 pass
-            # Refresh info label defaults
-            self._update_status_info()
-            
+        except Exception:
+            pass
+
+    # =========================================================================
+    # Sessions
+    # =========================================================================
+
+    @pyqtSlot()
+    @perf.traced('ui.save_session')
+    def save_session(self):
+        """Save the current analysis to a session file (written in the background)"""
+        if self.ceus_stack is None or getattr(self, '_loading', False):
+            return
+        default_path = Path.home()
+        try:
+            default_path = self.dicom_loader.dicom_path.with_suffix(SESSION_SUFFIX)
+        except Exception:
+            pass
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save session",
+            str(default_path),
+            f"CEUS sessions (*{SESSION_SUFFIX});;All files (*)"
+        )
+        if not file_path:
+            return
+        if not file_path.endswith(SESSION_SUFFIX):
+            file_path += SESSION_SUFFIX
+        # Stacks are read-only: the worker writes the very arrays the viewers show
+        self._run_task(
+            'session',
+            self._save_session_worker,
+            file_path,
+            self._session_state(),
+            busy_text="Saving session...",
+            on_result=lambda path: self.status_label.setText(f"💾 Session saved: {Path(path).name}"),
+            error_title="Failed to save session",
+        )
+
+    def _save_session_worker(self, ctx, file_path: str, state: dict) -> str:
+        """Worker thread: write the session file"""
+        ctx.report(0.0, "Saving session...")
+        return str(save_session(file_path, state))
+
+    def _session_state(self) -> dict:
+        """Analysis state for save_session (arrays are referenced, not copied)"""
+        loader = self.dicom_loader
+
+        def raw_display(stack):
+            # Raw display is the stack itself for 8-bit data (stored once)
+            return None if stack is None else list(self._prepare_display_stack(stack))
+
+        def stats(key):
+            frame_stats = self._frame_stats(key)
+            return None if frame_stats is None else frame_stats.to_dict()
+
+        stacks = {
+            'ceus': self.ceus_stack,
+            'bmode': self.bmode_stack,
+            'ceus_display': raw_display(self.ceus_stack),
+            'bmode_display': raw_display(self.bmode_stack),
+        }
+        processed = None
+        if self.ceus_preprocessed is not None:
+            stabilized = self.stacks.derive('bmode', 'stabilized', lambda s: None)
+            processed = {
+                'motion_corrected': self.motion_source is not None,
+                'params': dict(self._PREPROCESS_PARAMS),
+                'ceus_preprocessed': self.ceus_preprocessed,
+                'ceus_display': [self._ceus_display_stack, self._ceus_is_rgb, self._ceus_channel_axis],
+                'bmode_display': None if stabilized is None else [stabilized, self._bmode_is_rgb, self._bmode_channel_axis],
+                'bmode_clims': None if stabilized is None else self._bmode_auto_clims,
+                'source_info': self.motion_source,
+                'shifts': self.motion_shifts,
+            }
+        # Display pyramids already built: restored layers skip the downsampling
+        pyramids = []
+        displays = [stacks['ceus_display'], stacks['bmode_display']]
+        if processed is not None:
+            displays += [processed['ceus_display'], processed['bmode_display']]
+        for display in displays:
+            levels = self._pyramids.peek(display[0]) if display is not None else None
+            if levels is not None and len(levels) > 1:
+                pyramids.append({'source': display[0], 'levels': levels})
+        return {
+            'source': {
+                'file_path': str(getattr(loader, 'dicom_path', '') or ''),
+                'metadata': dict(getattr(loader, 'metadata', {}) or {}),
+                'scanner_info': dict(getattr(loader, 'scanner_info', {}) or {}),
+            },
+            'fps': self.fps,
+            'flash_idx': self.flash_idx,
+            'washout_idx': self.washout_idx,
+            'current_frame': self.current_frame,
+            'stacks': stacks,
+            'frame_stats': {'ceus': stats('ceus'), 'bmode': stats('bmode') if self.bmode_stack is not None else None},
+            'processed': processed,
+            'processed_stats': stats('ceus_preprocessed') if processed is not None else None,
+            'pyramids': pyramids,
+            'rois': [
+                {'label': roi.label, 'polygon': roi.polygon, 'color': roi.color,
+                 'visible': roi.visible, 'metadata': roi.metadata}
+                for roi in self.roi_manager.rois
+            ],
+            'tics': {label: dict(tic) for label, tic in self.roi_tic_data.items()},
+            'tic_colors': dict(self._tic_colors),
+            'auto_labels': sorted(self._auto_labels),
+            'grid_summary': self.grid_summary,
+            'cycle_summary': self.cycle_summary,
+            'fits': {
+                label: {'t': self.fit_times[label], 'results': results}
+                for label, results in self.fit_results.items()
+                if label in self.fit_times and label in self.roi_tic_data
+            },
+        }
+
+    @pyqtSlot()
+    @perf.traced('ui.open_session')
+    def open_session(self):
+        """Restore an analysis saved with Save Session (stacks are memory-mapped)"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Open session",
+            str(Path.home()),
+            f"CEUS sessions (*{SESSION_SUFFIX});;All files (*)"
+        )
+        if not file_path:
+            return
+        try:
+            state = load_session(file_path)
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to load DICOM:\n{str(e)}")
-            self.status_label.setText(f"❌ Error loading DICOM: {str(e)}")
-        finally:
-            try:
-                QApplication.restoreOverrideCursor()
-            except Exception:
-                pass
-            try:
-                self._show_spinner(False)
-            except Exception:
-                pass
-    
+            QMessageBox.critical(self, "Error", f"Failed to open session:\n{str(e)}")
+            return
+        # A DICOM still loading would overwrite the restored stacks
+        self.task_runner.cancel('load')
+        try:
+            self._apply_session(state)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to restore session:\n{str(e)}")
+            return
+        self.status_label.setText(f"📂 Session restored: {Path(file_path).name}")
+
+    def _apply_session(self, state: dict):
+        """Main thread: install a saved analysis (stacks are memory-mapped, each viewer layer is built once)"""
+        source = state.get('source') or {}
+        stacks = state['stacks']
+        loader = DICOMLoader(Path(source.get('file_path') or '.'))
+        loader.metadata = source.get('metadata') or {}
+        loader.scanner_info = source.get('scanner_info') or {}
+        loader.n_frames = loader.frames_loaded = len(stacks['ceus'])
+        saved_stats = state.get('frame_stats') or {}
+        if saved_stats.get('ceus') is not None:
+            loader.ceus_stats = FrameStats.from_dict(saved_stats['ceus'])
+            loader.ceus_intensity = loader.ceus_stats.mean
+        if saved_stats.get('bmode') is not None:
+            loader.bmode_stats = FrameStats.from_dict(saved_stats['bmode'])
+
+        def display(value):
+            return (None, False, None) if value is None else tuple(value)
+
+        self._reset_study()
+        self._loading = False
+        self._loading_stacks = (None, None)
+        self.dicom_loader = loader
+        self.fps = float(state['fps'])
+        self.bmode_stack = self.stacks.put('bmode', stacks.get('bmode'))
+        self.ceus_stack = self.stacks.put('ceus', stacks['ceus'])
+        self.stacks.set_stats('bmode', loader.bmode_stats)
+        self.stacks.set_stats('ceus', loader.ceus_stats)
+        (
+            self._bmode_display_stack,
+            self._bmode_is_rgb,
+            self._bmode_channel_axis,
+        ) = self._store_display('bmode', display(stacks.get('bmode_display')))
+        self._bmode_auto_clims = self._compute_bmode_limits(self._bmode_display_stack, q=(1, 99))
+        (
+            self._ceus_display_stack,
+            self._ceus_is_rgb,
+            self._ceus_channel_axis,
+        ) = self._store_display('ceus', display(stacks.get('ceus_display')))
+        self._current_ceus_layer_name = 'CEUS (raw)'
+        bmode_name = 'B-mode'
+        ceus_style = dict(colormap='gray', blending='additive', opacity=0.7)
+
+        # Preprocessed / motion-corrected window, as left by _apply_preprocessed / _apply_motion_corrected
+        processed = state.get('processed')
+        if processed is not None:
+            saved = state.get('processed_stats')
+            self.ceus_preprocessed = self.stacks.put('ceus_preprocessed', processed['ceus_preprocessed'])
+            self.stacks.set_stats('ceus_preprocessed', None if saved is None else FrameStats.from_dict(saved))
+            (
+                self._ceus_display_stack,
+                self._ceus_is_rgb,
+                self._ceus_channel_axis,
+            ) = self._store_display('ceus_preprocessed', display(processed['ceus_display']))
+            self._current_ceus_layer_name = 'CEUS (preprocessed)'
+            ceus_style = dict(colormap='magma', blending='additive', opacity=0.7)
+            if processed.get('motion_corrected'):
+                self.motion_shifts = processed.get('shifts')
+                self.motion_source = processed.get('source_info')
+                self._current_ceus_layer_name = 'CEUS (motion corrected + preprocessed)'
+                if processed.get('bmode_display') is not None:
+                    (
+                        self._bmode_display_stack,
+                        self._bmode_is_rgb,
+                        self._bmode_channel_axis,
+                    ) = self._store_display('bmode', display(processed['bmode_display']), kind='stabilized')
+                    if processed.get('bmode_clims') is not None:
+                        self._bmode_auto_clims = tuple(processed['bmode_clims'])
+                    bmode_name = 'B-mode (stabilized)'
+        for p in state.get('pyramids') or []:
+            self._pyramids.put(p['source'], p['levels'])
+        self.flash_idx = state.get('flash_idx')
+        self.washout_idx = state.get('washout_idx')
+
+        # Viewers: final layers only
+        if self.bmode_stack is not None:
+            self._show_bmode_layer(bmode_name)
+        self._show_ceus_layer(**ceus_style)
+        for layer in (self.shapes_layer, self.bmode_shapes_layer):
+            if layer is not None:
+                layer.data = []
+        self._remove_roi_canvas_if_exists()
+        self._ensure_roi_canvas_layer()
+        self._ensure_shapes_layer_exists_on_top()
+        if self.bmode_stack is not None:
+            self._ensure_bmode_shapes_layer_exists_on_top()
+            self._set_roi_master('bmode')
+        else:
+            self._set_roi_master('ceus')
+        self._update_overlay_layers()
+        try:
+            self._on_master_camera_changed()
+        except Exception:
+            pass
+        shown = self.ceus_preprocessed if self.ceus_preprocessed is not None else self.ceus_stack
+        self.frame_slider.setMaximum(len(shown) - 1)
+        self._show_loaded_status(str(loader.dicom_path))
+        try:
+            # Same x-range as after loading (full clip) or preprocessing (15 s window)
+            duration_s = 15 if processed is not None else len(self.ceus_stack) / float(self.fps)
+            self.tic_plot.plotItem.setXRange(0, duration_s)
+        except Exception:
+            pass
+
+        # ROIs: manager first, then the master shapes layer (no new ROI is created)
+        rois = state.get('rois') or []
+        for roi in rois:
+            added = self.roi_manager.add_roi(
+                [tuple(pt) for pt in roi['polygon']], label=roi['label'], color=tuple(roi['color'])
+            )
+            added.visible = bool(roi.get('visible', True))
+            added.metadata = roi.get('metadata') or {}
+        master = self.bmode_shapes_layer if self._roi_master == 'bmode' else self.shapes_layer
+        if rois and master is not None:
+            master.add(
+                [np.array([(pt[1], pt[0]) for pt in roi['polygon']], dtype=float) for roi in rois],
+                shape_type='polygon'
+            )
+        self._update_roi_info()
+
+        # TICs, automatic curves and their summaries, then the fits drawn over them
+        colors = state.get('tic_colors') or {}
+        tics = state.get('tics') or {}
+        if tics:
+            self._auto_labels = set(state.get('auto_labels') or [])
+            restored = {}
+            for label, tic in tics.items():
+                tic = dict(tic)
+                # Point exclusions are toggled in place: own a writable mask
+                tic['valid_mask'] = np.array(tic['valid_mask'], dtype=bool)
+                color = colors.get(label)
+                tic['color'] = tuple(color) if color is not None else None
+                restored[label] = tic
+            self._apply_tics(restored)
+        self.grid_summary = state.get('grid_summary') or {}
+        self.cycle_summary = state.get('cycle_summary') or {}
+        fits = state.get('fits') or {}
+        if fits:
+            self._apply_fit_results({'fits': {label: (f['t'], f['results']) for label, f in fits.items()}}, [])
+
+        self.frame_slider.setValue(min(int(state.get('current_frame') or 0), len(shown) - 1))
+        self.current_frame = self.frame_slider.value()
+        self._update_frame_info()
+        self._update_ui_state()
+        self._update_status_info()
+
     # =========================================================================
     # Flash Detection
     # =========================================================================
     
+    @pyqtSlot()
+    @perf.traced('ui.detect_flash')
     def detect_flash(self):
         """Detect flash and washout"""
         if self.ceus_stack is None:
@@ -958,10 +1646,12 @@ class NapariCEUSWindow(QWidget):
             self._show_spinner(True)
             self.status_label.setText("Detecting flash...")
             
+            self._flash_streamed = False
             self.flash_idx, self.washout_idx, _ = detect_flash_ceus_refined(
                 self.ceus_stack,
                 exclude_first_n=5,
-                search_window=20
+                search_window=20,
+                intensities=self._raw_intensity_trace()
             )
             
             self.status_label.setText(
@@ -980,21 +1670,48 @@ class NapariCEUSWindow(QWidget):
             except Exception:
                 pass
     
-    def set_flash_manual(self):
-        """Set flash frame manually to current frame"""
-        if self.ceus_stack is None:
+    def _raw_intensity_trace(self) -> Optional[np.ndarray]:
+        """Mean raw CEUS intensity per loaded frame, filled by the loader (None if unavailable)."""
+        try:
+            stats = getattr(self.dicom_loader, 'ceus_stats', None)
+            if stats is None or self.ceus_stack is None:
+                return None
+            return stats.head(len(self.ceus_stack))
+        except Exception:
+            return None
+
+    def _frame_stats(self, key: str) -> Optional[FrameStats]:
+        """Cached per-frame statistics of a stored stack (computed once if missing)."""
+        try:
+            return self.stacks.stats(key)
+        except Exception:
+            return None
+    
+    @pyqtSlot()
+    @perf.traced('ui.set_flash_manual')
+    def set_flash_manual(self):
+        """Set flash frame manually to current frame"""
+        if self.ceus_stack is None:
             return
         
         self.flash_idx = self.current_frame
+        self._flash_streamed = False
         
         # Estimate washout
         search_window = 20
         ceus_data = self.ceus_preprocessed if self.ceus_preprocessed is not None else self.ceus_stack
         
-        if ceus_data.ndim == 4:
-            intensities = ceus_data.mean(axis=(1, 2, 3))
+        # Per-frame trace computed while loading / preprocessing
+        if self.ceus_preprocessed is None:
+            intensities = self._raw_intensity_trace()
         else:
-            intensities = ceus_data.mean(axis=(1, 2))
+            stats = self._frame_stats('ceus_preprocessed')
+            intensities = None if stats is None else stats.mean
+        if intensities is None:
+            if ceus_data.ndim == 4:
+                intensities = ceus_data.mean(axis=(1, 2, 3))
+            else:
+                intensities = ceus_data.mean(axis=(1, 2))
         
         search_start = self.flash_idx
         search_end = min(len(intensities), self.flash_idx + search_window)
@@ -1012,254 +1729,235 @@ class NapariCEUSWindow(QWidget):
     # Preprocessing
     # =========================================================================
     
+    def _washout_window(self, stack: Optional[np.ndarray], duration_s: float = 15) -> Optional[np.ndarray]:
+        """Frames [washout, washout + duration_s) of a stack (view, no copy)"""
+        if stack is None:
+            return None
+        frames = int(duration_s * self.fps)
+        end_idx = min(self.washout_idx + frames, len(self.ceus_stack))
+        return stack[self.washout_idx:end_idx]
+    
+    @pyqtSlot()
+    @perf.traced('ui.preprocess_ceus_stack')
     def preprocess_ceus_stack(self):
-        """Preprocess CEUS stack"""
+        """Preprocess CEUS stack (runs in the background)"""
         if self.ceus_stack is None or self.washout_idx is None:
             return
         
+        # Crop to washout + 15s
+        ceus_cropped = self._washout_window(self.ceus_stack)
+        self._run_task(
+            'processing',
+            self._preprocess_worker,
+            ceus_cropped,
+            busy_text="Preprocessing CEUS...",
+            on_result=self._apply_preprocessed,
+            error_title="Preprocessing failed",
+        )
+    
+    # preprocess_ceus settings (also recorded in saved sessions)
+    _PREPROCESS_PARAMS = dict(use_log=True, spatial='median', temporal='gaussian', t_win=3, baseline_frames=5)
+
+    def _preprocess_worker(self, ctx, ceus_cropped: np.ndarray) -> dict:
+        """Worker thread: preprocess the cropped CEUS window"""
+        preprocessed = preprocess_ceus(ceus_cropped, progress=ctx.report, **self._PREPROCESS_PARAMS)
+        return {
+            'ceus_preprocessed': preprocessed,
+            'ceus_stats': FrameStats.from_stack(preprocessed),
+            'ceus_display': self._prepare_display_stack(preprocessed),
+        }
+    
+    def _apply_preprocessed(self, result: dict):
+        """Main thread: show the preprocessed CEUS stack"""
+        self.ceus_preprocessed = self.stacks.put('ceus_preprocessed', result['ceus_preprocessed'])
+        self.stacks.set_stats('ceus_preprocessed', result.get('ceus_stats'))
+        self.motion_shifts = None
+        self.motion_source = None
+        (
+            self._ceus_display_stack,
+            self._ceus_is_rgb,
+            self._ceus_channel_axis,
+        ) = self._store_display('ceus_preprocessed', result['ceus_display'])
+        self._current_ceus_layer_name = 'CEUS (preprocessed)'
+        
+        # Update CEUS viewer (maps of the previous stack are stale)
+        self._show_ceus_layer(colormap='magma', blending='additive', opacity=0.7)
+
+        # Recreate ROI canvas and ensure shapes on top
+        self._remove_roi_canvas_if_exists()
+        self._ensure_roi_canvas_layer()
+        self._ensure_shapes_layer_exists_on_top()
+        if self.bmode_stack is not None:
+            self._ensure_bmode_shapes_layer_exists_on_top()
+            self._set_roi_master('bmode')
+            self._mirror_shapes_to_ceus()
+        else:
+            self._set_roi_master('ceus')
+
+        # Update overlay with preprocessed data
+        self._update_overlay_layers()
+        # Keep cameras aligned after update
+        try:
+            self._on_master_camera_changed()
+        except Exception:
+            pass
+        # Constrain TIC x-axis to preprocessing duration
         try:
-            self.status_label.setText("Preprocessing CEUS...")
-            QApplication.setOverrideCursor(Qt.WaitCursor)
-            self._show_spinner(True)
-            
-            # Crop to washout + 15s
             duration_s = 15
-            frames_15s = int(duration_s * self.fps)
-            end_idx = min(self.washout_idx + frames_15s, len(self.ceus_stack))
-            ceus_cropped = self.ceus_stack[self.washout_idx:end_idx]
-            
-            # Preprocess
-            self.ceus_preprocessed = preprocess_ceus(
-                ceus_cropped,
-                use_log=True,
-                spatial='median',
-                temporal='gaussian',
-                t_win=3,
-                baseline_frames=5
-            )
-            (
-                self._ceus_display_stack,
-                self._ceus_is_rgb,
-                self._ceus_channel_axis,
-            ) = self._prepare_display_stack(self.ceus_preprocessed)
-            self._current_ceus_layer_name = 'CEUS (preprocessed)'
-            
-            # Update CEUS viewer
-            for layer in list(self.ceus_viewer.layers):
-                if 'CEUS' in layer.name:
-                    self.ceus_viewer.layers.remove(layer)
-            if self._ceus_display_stack is not None:
-                self._add_image_layer(
-                    self.ceus_viewer,
-                    self._ceus_display_stack,
-                    name=self._current_ceus_layer_name,
-                    channel_axis=self._ceus_channel_axis,
-                    rgb=self._ceus_is_rgb,
-                    colormap='magma',
-                    blending='additive',
-                    opacity=0.7
-                )
-
-            # Recreate ROI canvas and ensure shapes on top
-            self._remove_roi_canvas_if_exists()
-            self._ensure_roi_canvas_layer()
-            self._ensure_shapes_layer_exists_on_top()
-            if self.bmode_stack is not None:
-                self._ensure_bmode_shapes_layer_exists_on_top()
-                self._set_roi_master('bmode')
-                self._mirror_shapes_to_ceus()
-            else:
-                self._set_roi_master('ceus')
-
-            # Update overlay with preprocessed data
-            self._update_overlay_layers()
-            # Keep cameras aligned after update
-            try:
-                self._on_master_camera_changed()
-            except Exception:
-                pass
-            # Constrain TIC x-axis to preprocessing duration
-            try:
-                duration_s = 15
-                self.tic_plot.plotItem.setXRange(0, duration_s)
-            except Exception:
-                pass
-            
-            # Reset frame controls
-            self.frame_slider.setMaximum(len(self.ceus_preprocessed) - 1)
-            self.frame_slider.setValue(0)
-            self.current_frame = 0
-            self._update_frame_info()
-            
-            self.status_label.setText("✅ Preprocessing complete")
-            self._update_ui_state()
-            self._update_status_info()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Preprocessing failed:\n{str(e)}")
-            self.status_label.setText(f"❌ Preprocessing error: {str(e)}")
-        finally:
-            try:
-                QApplication.restoreOverrideCursor()
-            except Exception:
-                pass
-            try:
-                self._show_spinner(False)
-            except Exception:
-                pass
+            self.tic_plot.plotItem.setXRange(0, duration_s)
+        except Exception:
+            pass
+        
+        # Reset frame controls
+        self.frame_slider.setMaximum(len(self.ceus_preprocessed) - 1)
+        self.frame_slider.setValue(0)
+        self.current_frame = 0
+        self._update_frame_info()
+        
+        self.status_label.setText("✅ Preprocessing complete")
+        self._update_ui_state()
+        self._update_status_info()
     
     # =========================================================================
     # Motion Correction
     # =========================================================================
     
+    @pyqtSlot()
+    @perf.traced('ui.apply_motion_correction')
     def apply_motion_correction(self):
-        """Apply motion correction"""
+        """Apply motion correction (runs in the background)"""
         if self.ceus_stack is None or self.washout_idx is None:
             return
         
-        try:
-            self.status_label.setText("Applying motion correction...")
-            QApplication.setOverrideCursor(Qt.WaitCursor)
-            self._show_spinner(True)
-            
-            # Crop stacks (align B-mode and CEUS on same time window)
-            duration_s = 15
-            frames_15s = int(duration_s * self.fps)
-            end_idx = min(self.washout_idx + frames_15s, len(self.ceus_stack))
-            ceus_cropped = self.ceus_stack[self.washout_idx:end_idx]
-            bmode_cropped = None
-            if self.bmode_stack is not None:
-                try:
-                    bmode_cropped = self.bmode_stack[self.washout_idx:end_idx]
-                except Exception:
-                    bmode_cropped = None
-            
-            # Motion compensate (estimate shifts on B-mode window when available)
-            from src.core.motion_compensation import apply_shifts_to_stack
-            ceus_corrected, shifts, source_info = motion_compensate(
-                ceus_cropped,
-                bmode_cropped
-            )
-            
-            # Preprocess corrected stack
-            self.ceus_preprocessed = preprocess_ceus(
-                ceus_corrected,
-                use_log=True,
-                spatial='median',
-                temporal='gaussian',
-                t_win=3,
-                baseline_frames=5
-            )
-            (
-                self._ceus_display_stack,
-                self._ceus_is_rgb,
-                self._ceus_channel_axis,
-            ) = self._prepare_display_stack(self.ceus_preprocessed)
-            self._current_ceus_layer_name = 'CEUS (motion corrected + preprocessed)'
-
-            # Also stabilize B-mode for the same window using estimated shifts
-            if bmode_cropped is not None and shifts is not None:
+        # Crop stacks (align B-mode and CEUS on same time window)
+        ceus_cropped = self._washout_window(self.ceus_stack)
+        bmode_cropped = None
+        if self.bmode_stack is not None:
+            try:
+                bmode_cropped = self._washout_window(self.bmode_stack)
+            except Exception:
+                bmode_cropped = None
+        self._run_task(
+            'processing',
+            self._motion_correction_worker,
+            ceus_cropped,
+            bmode_cropped,
+            busy_text="Applying motion correction...",
+            on_result=self._apply_motion_corrected,
+            error_title="Motion correction failed",
+        )
+    
+    def _motion_correction_worker(self, ctx, ceus_cropped: np.ndarray, bmode_cropped: Optional[np.ndarray]) -> dict:
+        """Worker thread: register, preprocess and stabilize the washout window"""
+        from src.core.motion_compensation import apply_shifts_to_stack
+        # Motion compensate (estimate shifts on B-mode window when available)
+        ceus_corrected, shifts, source_info = motion_compensate(
+            ceus_cropped,
+            bmode_cropped,
+            progress=lambda f, msg: ctx.report(0.6 * f, msg)
+        )
+        
+        # Preprocess corrected stack
+        preprocessed = preprocess_ceus(
+            ceus_corrected,
+            progress=lambda f, msg: ctx.report(0.6 + 0.3 * f, msg),
+            **self._PREPROCESS_PARAMS
+        )
+        result = {
+            'ceus_preprocessed': preprocessed,
+            'ceus_stats': FrameStats.from_stack(preprocessed),
+            'ceus_display': self._prepare_display_stack(preprocessed),
+            'source_info': source_info,
+            'shifts': shifts,
+            'bmode_display': None,
+            'bmode_clims': None,
+        }
+        
+        # Also stabilize B-mode for the same window using estimated shifts
+        if bmode_cropped is not None and shifts is not None:
+            try:
+                bmode_stabilized = apply_shifts_to_stack(
+                    bmode_cropped, shifts, pad_mode='nearest', order=1,
+                    progress=lambda f, msg: ctx.report(0.9 + 0.1 * f, "Stabilizing B-mode...")
+                )
+                result['bmode_display'] = self._prepare_display_stack(bmode_stabilized)
+                # Recompute auto-contrast for stabilized window
                 try:
-                    bmode_stabilized = apply_shifts_to_stack(bmode_cropped, shifts, pad_mode='nearest', order=1)
-                    (
-                        self._bmode_display_stack,
-                        self._bmode_is_rgb,
-                        self._bmode_channel_axis,
-                    ) = self._prepare_display_stack(bmode_stabilized)
-                    # Recompute auto-contrast for stabilized window
-                    try:
-                        self._bmode_auto_clims = self._compute_bmode_limits(self._bmode_display_stack, q=(1, 99))
-                    except Exception:
-                        pass
-                    # Update B-mode viewer layer
-                    for layer in list(self.bmode_viewer.layers):
-                        if layer.name != 'ROIs':
-                            self.bmode_viewer.layers.remove(layer)
-                    b_layer = self._add_image_layer(
-                        self.bmode_viewer,
-                        self._bmode_display_stack,
-                        name='B-mode (stabilized)',
-                        channel_axis=self._bmode_channel_axis,
-                        rgb=self._bmode_is_rgb,
-                        colormap='gray',
-                        blending='opaque'
-                    )
-                    try:
-                        if b_layer is not None and self._bmode_auto_clims is not None:
-                            lo, hi = self._bmode_auto_clims
-                            if lo is not None and hi is not None:
-                                b_layer.contrast_limits = (float(lo), float(hi))
-                        if b_layer is not None and hasattr(b_layer, 'gamma'):
-                            b_layer.gamma = float(self._bmode_gamma)
-                    except Exception:
-                        pass
+                    result['bmode_clims'] = self._compute_bmode_limits(result['bmode_display'][0], q=(1, 99))
                 except Exception:
                     pass
-            
-            # Update viewer
-            for layer in list(self.ceus_viewer.layers):
-                if 'CEUS' in layer.name:
-                    self.ceus_viewer.layers.remove(layer)
-            if self._ceus_display_stack is not None:
-                self._add_image_layer(
-                    self.ceus_viewer,
-                    self._ceus_display_stack,
-                    name=self._current_ceus_layer_name,
-                    channel_axis=self._ceus_channel_axis,
-                    rgb=self._ceus_is_rgb,
-                    colormap='magma',
-                    blending='additive',
-                    opacity=0.7
-                )
-
-            # Recreate ROI canvas and ensure shapes on top
-            self._remove_roi_canvas_if_exists()
-            self._ensure_roi_canvas_layer()
-            self._ensure_shapes_layer_exists_on_top()
-            if self.bmode_stack is not None:
-                self._ensure_bmode_shapes_layer_exists_on_top()
-                self._set_roi_master('bmode')
-                self._mirror_shapes_to_ceus()
-            else:
-                self._set_roi_master('ceus')
-            
-            # Reset frame controls
-            self.frame_slider.setMaximum(len(self.ceus_preprocessed) - 1)
-            self.frame_slider.setValue(0)
-            self.current_frame = 0
-            self._update_frame_info()
-            # Constrain TIC x-axis to preprocessing duration (same 15s window)
-            try:
-                duration_s = 15
-                self.tic_plot.plotItem.setXRange(0, duration_s)
+            except TaskCancelled:
+                raise
             except Exception:
                 pass
-            
-            self.status_label.setText(
-                f"✅ Motion correction complete (estimated from {source_info})"
-            )
-            self._update_ui_state()
-            self._update_status_info()
+        return result
+    
+    def _apply_motion_corrected(self, result: dict):
+        """Main thread: show motion-corrected CEUS (and stabilized B-mode)"""
+        self.ceus_preprocessed = self.stacks.put('ceus_preprocessed', result['ceus_preprocessed'])
+        self.stacks.set_stats('ceus_preprocessed', result.get('ceus_stats'))
+        source_info = result['source_info']
+        self.motion_shifts = result.get('shifts')
+        self.motion_source = source_info
+        (
+            self._ceus_display_stack,
+            self._ceus_is_rgb,
+            self._ceus_channel_axis,
+        ) = self._store_display('ceus_preprocessed', result['ceus_display'])
+        self._current_ceus_layer_name = 'CEUS (motion corrected + preprocessed)'
 
-            # Update overlay with motion-corrected preprocessed data
-            self._update_overlay_layers()
+        if result.get('bmode_display') is not None:
             try:
-                self._on_master_camera_changed()
-            except Exception:
-                pass
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Motion correction failed:\n{str(e)}")
-            self.status_label.setText(f"❌ Motion correction error: {str(e)}")
-        finally:
-            try:
-                QApplication.restoreOverrideCursor()
-            except Exception:
-                pass
-            try:
-                self._show_spinner(False)
+                (
+                    self._bmode_display_stack,
+                    self._bmode_is_rgb,
+                    self._bmode_channel_axis,
+                ) = self._store_display('bmode', result['bmode_display'], kind='stabilized')
+                if result.get('bmode_clims') is not None:
+                    self._bmode_auto_clims = result['bmode_clims']
+                # Update B-mode viewer layer
+                self._show_bmode_layer('B-mode (stabilized)')
             except Exception:
                 pass
+        
+        # Update viewer (maps of the previous stack are stale)
+        self._show_ceus_layer(colormap='magma', blending='additive', opacity=0.7)
+
+        # Recreate ROI canvas and ensure shapes on top
+        self._remove_roi_canvas_if_exists()
+        self._ensure_roi_canvas_layer()
+        self._ensure_shapes_layer_exists_on_top()
+        if self.bmode_stack is not None:
+            self._ensure_bmode_shapes_layer_exists_on_top()
+            self._set_roi_master('bmode')
+            self._mirror_shapes_to_ceus()
+        else:
+            self._set_roi_master('ceus')
+        
+        # Reset frame controls
+        self.frame_slider.setMaximum(len(self.ceus_preprocessed) - 1)
+        self.frame_slider.setValue(0)
+        self.current_frame = 0
+        self._update_frame_info()
+        # Constrain TIC x-axis to preprocessing duration (same 15s window)
+        try:
+            duration_s = 15
+            self.tic_plot.plotItem.setXRange(0, duration_s)
+        except Exception:
+            pass
+        
+        self.status_label.setText(
+            f"✅ Motion correction complete (estimated from {source_info})"
+        )
+        self._update_ui_state()
+        self._update_status_info()
+
+        # Update overlay with motion-corrected preprocessed data
+        self._update_overlay_layers()
+        try:
+            self._on_master_camera_changed()
+        except Exception:
+            pass
     
     # =========================================================================
     # ROI Management
@@ -1326,7 +2024,7 @@ class NapariCEUSWindow(QWidget):
             layers = self.ceus_viewer.layers
             if getattr(self, 'shapes_layer', None) in layers:
                 idx = layers.index(self.shapes_layer)
-                layers.move(idx, len(layers) - 1)
+                layers.move(idx, len(layers))
         except Exception:
             pass
 
@@ -1337,7 +2035,7 @@ class NapariCEUSWindow(QWidget):
             if getattr(self, 'shapes_layer', None) in layers:
                 if layers.index(self.shapes_layer) != len(layers) - 1:
                     try:
-                        layers.move(layers.index(self.shapes_layer), len(layers) - 1)
+                        layers.move(layers.index(self.shapes_layer), len(layers))
                         return
                     except Exception:
                         pass
@@ -1372,7 +2070,7 @@ class NapariCEUSWindow(QWidget):
             # reconnect events
             self.shapes_layer.events.data.connect(self._on_shapes_changed)
         except Exception as e:
-            print(f"[DEBUG] Failed to recreate shapes layer on top: {e}")
+            logger.debug("Failed to recreate shapes layer on top: %s", e)
 
     def _ensure_shapes_layer_exists_on_top(self):
         """Create the shapes layer if missing, with proper properties and z-order above images."""
@@ -1394,7 +2092,7 @@ class NapariCEUSWindow(QWidget):
             # Make sure it's last anyway
             self._ensure_shapes_on_top()
         except Exception as e:
-            print(f"[DEBUG] ensure shapes layer exists error: {e}")
+            logger.debug("ensure shapes layer exists error: %s", e)
 
     def _ensure_bmode_shapes_layer_exists_on_top(self):
         """Create a shapes layer on the B-mode viewer if missing, used to mirror CEUS ROIs."""
@@ -1423,11 +2121,11 @@ class NapariCEUSWindow(QWidget):
             try:
                 layers = self.bmode_viewer.layers
                 if self.bmode_shapes_layer in layers and layers.index(self.bmode_shapes_layer) != len(layers) - 1:
-                    layers.move(layers.index(self.bmode_shapes_layer), len(layers) - 1)
+                    layers.move(layers.index(self.bmode_shapes_layer), len(layers))
             except Exception:
                 pass
         except Exception as e:
-            print(f"[DEBUG] ensure B-mode shapes layer exists error: {e}")
+            logger.debug("ensure B-mode shapes layer exists error: %s", e)
 
     def _mirror_shapes_to_ceus(self):
         """Copy current B-mode shapes into CEUS shapes layer (2D coords)."""
@@ -1448,7 +2146,7 @@ class NapariCEUSWindow(QWidget):
                 shapes.append(coords)
             self.shapes_layer.data = shapes
         except Exception as e:
-            print(f"[DEBUG] mirror shapes to CEUS error: {e}")
+            logger.debug("mirror shapes to CEUS error: %s", e)
 
     def _mirror_shapes_to_bmode(self):
         """Copy current CEUS shapes into B-mode shapes layer (2D coords)."""
@@ -1463,7 +2161,7 @@ class NapariCEUSWindow(QWidget):
                     shapes.append(poly)
             self.bmode_shapes_layer.data = shapes
         except Exception as e:
-            print(f"[DEBUG] mirror shapes to B-mode error: {e}")
+            logger.debug("mirror shapes to B-mode error: %s", e)
 
     def _set_roi_master(self, master: str):
         """Set which shapes layer is the ROI master ('bmode' or 'ceus') and connect events accordingly."""
@@ -1499,7 +2197,7 @@ class NapariCEUSWindow(QWidget):
                     self._ensure_bmode_shapes_layer_exists_on_top()
                     self._mirror_shapes_to_bmode()
         except Exception as e:
-            print(f"[DEBUG] set_roi_master error: {e}")
+            logger.debug("set_roi_master error: %s", e)
 
     def _ensure_roi_canvas_layer(self):
         """Ensure an empty image layer exists above CEUS to anchor ROI draw order.
@@ -1509,13 +2207,14 @@ class NapariCEUSWindow(QWidget):
             data, _, channel_axis, is_rgb = self._get_current_ceus_data()
             if data is None:
                 return
-            # Create an all-zeros float32 image matching CEUS spatial dims
+            # Create an all-zeros image matching CEUS spatial dims
             # If CEUS is RGB, drop the color channel for the canvas
             if is_rgb:
                 canvas_shape = data.shape[:-1]
             else:
                 canvas_shape = data.shape if channel_axis is None else data.shape[:-1]
-            canvas = np.zeros(canvas_shape, dtype=np.float32)
+            # One zero frame broadcast over time: no (T, H, W) allocation
+            canvas = np.broadcast_to(np.zeros((1,) + tuple(canvas_shape[1:]), dtype=np.uint8), canvas_shape)
             # Add as image with zero opacity to anchor ROI z-order
             self.roi_canvas_layer = self._add_image_layer(
                 self.ceus_viewer,
@@ -1526,13 +2225,15 @@ class NapariCEUSWindow(QWidget):
                 colormap='gray',
                 blending='translucent_no_depth',
                 opacity=0.0,
+                contrast_limits=(0, 1),
+                multiscale=False,
             )
             try:
                 self.roi_canvas_layer.z_index = 9_999
             except Exception:
                 pass
         except Exception as e:
-            print(f"[DEBUG] ensure ROI canvas error: {e}")
+            logger.debug("ensure ROI canvas error: %s", e)
 
     def _remove_roi_canvas_if_exists(self):
         try:
@@ -1560,6 +2261,92 @@ class NapariCEUSWindow(QWidget):
         except Exception:
             pass
 
+    def _set_busy(self, busy: bool):
+        """Spinner + cancel button while background tasks run."""
+        self._show_spinner(busy)
+        try:
+            self.btn_cancel_task.setVisible(busy)
+        except Exception:
+            pass
+
+    def _run_task(
+        self,
+        name: str,
+        fn,
+        *args,
+        busy_text: str = "Working...",
+        on_result=None,
+        on_partial=None,
+        on_finished=None,
+        error_title: str = "Operation failed",
+    ):
+        """Run fn(ctx, *args) on the thread pool and apply its result on the main thread.
+
+        A running task with the same name is cancelled first. fn must not touch
+        widgets; on_result receives its return value and may update the UI.
+        on_partial receives values published with ctx.publish() while fn runs;
+        on_finished is called last whatever the outcome.
+        """
+        self.status_label.setText(busy_text)
+        self._set_busy(True)
+
+        def _on_progress(pct: int, msg: str):
+            self.status_label.setText(f"{msg or busy_text} {pct}%")
+
+        def _on_error(message: str, tb: str):
+            logger.error("Task %s failed:\n%s", name, tb)
+            QMessageBox.critical(self, "Error", f"{error_title}:\n{message}")
+            self.status_label.setText(f"❌ {error_title}: {message}")
+
+        def _guarded(callback, stage):
+            def _call(value):
+                if callback is None:
+                    return
+                try:
+                    with perf.span(f"ui.{name}.{stage}"):
+                        callback(value)
+                except Exception as e:
+                    import traceback
+                    _on_error(str(e), traceback.format_exc())
+            return _call
+
+        def _on_cancelled():
+            # Superseded by a new task of the same name: keep its status text
+            if not self.task_runner.is_running(name):
+                self.status_label.setText(f"⏹ Cancelled: {busy_text.rstrip('.…')}")
+
+        def _on_finished():
+            self._set_busy(self.task_runner.is_running())
+            if on_finished is not None:
+                try:
+                    on_finished()
+                except Exception:
+                    pass
+
+        return self.task_runner.submit(
+            name, fn, *args,
+            on_result=_guarded(on_result, 'apply'),
+            on_partial=_guarded(on_partial, 'partial'),
+            on_error=_on_error,
+            on_progress=_on_progress,
+            on_cancelled=_on_cancelled,
+            on_finished=_on_finished,
+        )
+
+    def _show_perf_panel(self):
+        """Open the performance panel as a tool window."""
+        if self.perf_panel is None:
+            self.perf_panel = PerfPanel(self)
+            self.perf_panel.setWindowFlags(Qt.Tool)
+        self.perf_panel.show()
+        self.perf_panel.raise_()
+
+    def _cancel_running_tasks(self):
+        """Cancel every background task (results are discarded)."""
+        self.task_runner.cancel_all()
+        self._set_busy(False)
+        self.status_label.setText("⏹ Operation cancelled")
+
     def _update_status_info(self):
         """Met à jour le label d'information d'analyse au-dessus des viewers.
         Affiche Flash, Washout (en frame et secondes si FPS connu) et le nombre de ROIs actifs.
@@ -1628,12 +2415,35 @@ class NapariCEUSWindow(QWidget):
                 else:
                     data = np.clip(data, 0.0, 255.0).astype(np.uint8)
         else:
-            # Grayscale path for analysis
-            if data.dtype != np.float32:
+            # Grayscale: 8-bit stays uint8 (display only, 4× lighter), else float32
+            if data.dtype not in (np.uint8, np.float32):
                 data = data.astype(np.float32, copy=False)
 
         return data, is_rgb, channel_axis
 
+    def _store_display(self, key: str, prepared: tuple, kind: str = 'display') -> tuple:
+        """Register a prepared (data, is_rgb, channel_axis) display stack in the stack store.
+
+        When no conversion was needed the display data is the stored stack itself,
+        so it costs no extra memory.
+        """
+        data, is_rgb, channel_axis = prepared
+        if data is not None:
+            data = self.stacks.set_derived(key, kind, data)
+        self._update_memory_label()
+        return data, is_rgb, channel_axis
+
+    def _update_memory_label(self):
+        """Stack store and display pyramid memory in the status bar."""
+        try:
+            text = self.stacks.memory_summary()
+            pyramid_bytes = self._pyramids.nbytes
+            if pyramid_bytes:
+                text += f" | pyramids {format_bytes(pyramid_bytes)}"
+            self.memory_label.setText(text)
+        except Exception:
+            pass
+
     def _to_grayscale_stack(self, stack: Optional[np.ndarray]) -> Optional[np.ndarray]:
         """Return a float32 grayscale representation used for analysis tasks."""
         if stack is None:
@@ -1692,10 +2502,33 @@ class NapariCEUSWindow(QWidget):
         colormap: str = 'gray',
         **kwargs
     ):
-        """Utility to add an image layer with optional RGB handling."""
+        """Utility to add an image layer with optional RGB handling.
+
+        Display stacks go through the shared pyramid cache: napari gets the
+        multiscale levels (full, 2×, 4×) and the same arrays are reused by
+        every viewer showing that stack. Pass multiscale=False for scratch
+        layers; stacks still growing during a progressive load bypass it.
+        """
         if data is None:
             return None
 
+        multiscale = kwargs.pop('multiscale', True) and not getattr(self, '_loading', False)
+        # Optional time crop applied to every level (keeps the cached levels shared)
+        n_frames = kwargs.pop('n_frames', None)
+        levels = [data]
+        if multiscale:
+            try:
+                levels = self._pyramids.get(data)
+            except Exception:
+                levels = [data]
+        if n_frames is not None:
+            levels = [lvl[:n_frames] for lvl in levels]
+        if len(levels) > 1:
+            data = levels
+            kwargs['multiscale'] = True
+        else:
+            data = levels[0]
+
         layer_kwargs = dict(name=name, **kwargs)
         # Prefer true-color display when requested
         if bool(rgb):
@@ -1734,22 +2567,21 @@ class NapariCEUSWindow(QWidget):
         if ceus_data is None:
             return
 
-        # Align time dimension: crop both to min length
+        # Align time dimension: crop both to min length (the crop is applied
+        # to the shared pyramid levels, not to a new array per viewer)
         try:
             T_ceus = ceus_data.shape[0]
             T_b = self._bmode_display_stack.shape[0]
             T = min(T_ceus, T_b)
-            b_aligned = self._bmode_display_stack[:T]
-            c_aligned = ceus_data[:T]
         except Exception:
             # Fallback to raw arrays if unexpected dims
-            b_aligned = self._bmode_display_stack
-            c_aligned = ceus_data
+            T = None
 
         # Add base B-mode
         b_base_layer = self._add_image_layer(
             self.overlay_viewer,
-            b_aligned,
+            self._bmode_display_stack,
+            n_frames=T,
             name='B-mode (base)',
             channel_axis=self._bmode_channel_axis,
             rgb=self._bmode_is_rgb,
@@ -1770,7 +2602,8 @@ class NapariCEUSWindow(QWidget):
         # Add CEUS overlay with transparency
         self._add_image_layer(
             self.overlay_viewer,
-            c_aligned,
+            ceus_data,
+            n_frames=T,
             name=f'{ceus_name} (overlay)',
             channel_axis=ceus_channel_axis,
             rgb=ceus_is_rgb,
@@ -1783,7 +2616,7 @@ class NapariCEUSWindow(QWidget):
         try:
             current_step = list(self.overlay_viewer.dims.current_step)
             if len(current_step) > 0:
-                current_step[0] = min(self.current_frame, len(c_aligned) - 1)
+                current_step[0] = min(self.current_frame, len(ceus_data) - 1 if T is None else T - 1)
                 self.overlay_viewer.dims.current_step = tuple(current_step)
         except Exception:
             pass
@@ -1795,6 +2628,7 @@ class NapariCEUSWindow(QWidget):
         except Exception:
             pass
     
+    @perf.traced('ui.on_shapes_changed')
     def _on_shapes_changed(self, event):
         """Handle shapes layer data change (master layer drives ROI updates)."""
         # Only react to changes on the configured master layer
@@ -1820,12 +2654,7 @@ class NapariCEUSWindow(QWidget):
         if current_napari_shapes > current_managed_rois:
             # New shape added
             new_shape_data = master_layer.data[-1]
-            # Debug infos to verify shape dimensionality
-            try:
-                print(f"[DEBUG] New shape data shape: {getattr(new_shape_data, 'shape', None)}")
-                print(f"[DEBUG] New shape data sample: {new_shape_data[:3] if len(new_shape_data) > 2 else new_shape_data}")
-            except Exception:
-                pass
+            logger.debug("New shape data shape: %s", getattr(new_shape_data, 'shape', None))
             
             # Convert Napari polygon coordinates (frame, y, x) to (x, y) list
             # Note: Napari uses (t, y, x) for 3D+time data
@@ -1897,7 +2726,7 @@ class NapariCEUSWindow(QWidget):
                 self._camera_sync_callbacks.clear()
                 self.status_label.setText("🔍 Sync Zoom/Pan: OFF")
         except Exception as e:
-            print(f"[DEBUG] Sync camera toggle error: {e}")
+            logger.debug("Sync camera toggle error: %s", e)
             pass
 
     def _on_any_camera_changed(self, source_viewer):
@@ -1925,8 +2754,10 @@ class NapariCEUSWindow(QWidget):
         try:
             self._on_any_camera_changed(self.ceus_viewer)
         except Exception as e:
-            print(f"[DEBUG] Camera sync error: {e}")
+            logger.debug("Camera sync error: %s", e)
     
+    @pyqtSlot()
+    @perf.traced('ui.clear_rois')
     def clear_rois(self):
         """Clear all ROIs"""
         if self.shapes_layer is not None:
@@ -1938,6 +2769,12 @@ class NapariCEUSWindow(QWidget):
                 pass
         self.roi_manager.clear()
         self.roi_tic_data.clear()
+        self._tic_colors = {}
+        self._auto_labels = set()
+        self.grid_summary = {}
+        self.cycle_summary = {}
+        self.metrics_engine.clear()
+        self._metrics_items = {}
         self.tic_plot.clear()
         self._update_roi_info()
         self.status_label.setText("🗑️ All ROIs cleared")
@@ -2017,6 +2854,8 @@ class NapariCEUSWindow(QWidget):
             if lbl in self.roi_tic_data:
                 self.roi_tic_data.pop(lbl, None)
                 self.tic_plot.remove_tic_curve(lbl)
+            self.metrics_engine.remove(lbl)
+            self._metrics_items.pop(lbl, None)
         # Sync mirrored shapes according to master
         if self._roi_master == 'bmode':
             self._mirror_shapes_to_ceus()
@@ -2054,15 +2893,20 @@ class NapariCEUSWindow(QWidget):
         # Update TIC curve label and stored data key
         if old_label in self.roi_tic_data:
             self.roi_tic_data[new_label] = self.roi_tic_data.pop(old_label)
+            self._tic_colors[new_label] = self._tic_colors.pop(old_label, None)
             self.tic_plot.rename_tic_curve(old_label, new_label)
+            self.metrics_engine.rename(old_label, new_label)
+            self._metrics_items.pop(old_label, None)
         self.status_label.setText(f"✏️ Renamed ROI '{old_label}' → '{new_label}'")
     
     # =========================================================================
     # TIC Analysis
     # =========================================================================
     
+    @pyqtSlot()
+    @perf.traced('ui.compute_all_tics')
     def compute_all_tics(self):
-        """Compute TIC for all ROIs"""
+        """Compute TIC for all ROIs (runs in the background)"""
         if len(self.roi_manager.rois) == 0:
             QMessageBox.warning(self, "Warning", "No ROIs defined")
             return
@@ -2074,100 +2918,432 @@ class NapariCEUSWindow(QWidget):
             QMessageBox.warning(self, "Warning", "No image data available")
             return
         
-        try:
-            self.status_label.setText("Computing TICs...")
-            
-            # Clear existing TIC data and plot
-            self.roi_tic_data.clear()
-            self.tic_plot.clear()
-            self.tic_plot.clear_smooth_overlays()
-            
-            data_gray = self._to_grayscale_stack(data_stack)
-            if data_gray is None:
-                QMessageBox.warning(self, "Warning", "Unable to prepare CEUS data for TIC computation")
-                return
-            data_gray = data_gray.astype(np.float32, copy=False)
+        # Snapshot ROIs so drawing can continue while the task runs; masks are
+        # rasterized once per polygon and reused by later runs
+        frame_shape = data_stack.shape[1:3]
+        rois = [(roi.label, roi.mask(frame_shape), roi.color) for roi in self.roi_manager.rois]
+        self._run_task(
+            'tics',
+            self._compute_tics_worker,
+            data_stack,
+            rois,
+            float(self.fps),
+            busy_text="Computing TICs...",
+            on_result=self._apply_tics,
+            error_title="TIC computation failed",
+        )
+    
+    def _compute_tics_worker(self, ctx, data_stack: np.ndarray, rois: list, fps: float) -> Optional[dict]:
+        """Worker thread: mean intensity per ROI and frame"""
+        ctx.report(0.0, "Computing TICs...")
+        if data_stack.ndim not in (3, 4):
+            return None
+        T = data_stack.shape[0]
+        # Time axis
+        time = np.arange(T, dtype=np.float32) / fps
+        # Reduce inside the union bounding box of the ROIs only, straight from
+        # the source dtype (no full-frame grayscale copy)
+        series = extract_tics_from_masks(
+            data_stack, {label: m for label, m, _ in rois}, progress=ctx.report
+        )
+        
+        tics = {}
+        for label, _, color in rois:
+            vi = series[label]
             
-            # Compute TIC for each ROI
-            for roi in self.roi_manager.rois:
-                # Create mask from polygon
-                mask = self._polygon_to_mask(roi.polygon, data_gray.shape[1:])
-                
-                # Extract mean intensity in ROI for each frame
-                T = data_gray.shape[0]
-                vi = np.zeros(T, dtype=np.float32)
-                
-                for t in range(T):
-                    vi[t] = data_gray[t][mask].mean()
-                
-                # Compute dVI (delta from baseline)
-                baseline = vi[0]
-                dvi = vi - baseline
-                
-                # Time axis
-                time = np.arange(T, dtype=np.float32) / self.fps
-                valid_mask = np.ones_like(dvi, dtype=bool)
-                
-                # Store
-                self.roi_tic_data[roi.label] = {
-                    'time': time,
-                    'dvi': dvi,
-                    'valid_mask': valid_mask,
-                }
+            # Compute dVI (delta from baseline)
+            baseline = vi[0]
+            dvi = vi - baseline
+            tics[label] = {
+                'time': time,
+                'dvi': dvi,
+                'valid_mask': np.ones_like(dvi, dtype=bool),
+                'color': color,
+            }
+        return tics
+    
+    # (map key, layer title, colormap); the first layer is shown, the others hidden
+    _PARAMETRIC_MAP_LAYERS = (
+        ('AxB', 'A·B', 'turbo'),
+        ('A', 'A', 'viridis'),
+        ('B', 'B', 'viridis'),
+        ('AUC', 'AUC', 'magma'),
+        ('TTP', 'TTP', 'viridis'),
+        ('Peak', 'Peak', 'magma'),
+        ('R2', 'R²', 'gray'),
+    )
+
+    def _washin_fit_settings(self) -> Tuple[Optional[float], Optional[tuple]]:
+        """(t_max, bounds) of the fit panel, shared by the ROI fits and the batched fits"""
+        try:
+            t_max = float(self.fit_panel.t_max_spin.value())
+            bounds = (
+                (self.fit_panel.a_lower_spin.value(), self.fit_panel.b_lower_spin.value()),
+                (self.fit_panel.a_upper_spin.value(), self.fit_panel.b_upper_spin.value()),
+            )
+            return t_max, bounds
+        except Exception:
+            return None, None
 
-                # Add to plot
-                self.tic_plot.add_tic_curve(
-                    roi.label,
-                    time,
-                    dvi,
-                    valid_mask,
-                    color=self._rgb_to_pyqtgraph_color(roi.color)
-                )
-                # Overlays will be computed after all curves are added
-                # based on current smoothing settings and valid_mask
-                
-            # After plotting all ROIs, set crosshair and overlays
-            try:
-                self.tic_plot.update_crosshair(self.current_frame)
-            except Exception:
-                pass
-            # Build/update smoothing overlays according to UI state
-            try:
-                self._recompute_overlays_all()
-            except Exception:
-                pass
-            # Interval selector disabled per user request
+    @pyqtSlot()
+    @perf.traced('ui.compute_perfusion_maps')
+    def compute_perfusion_maps(self):
+        """Parametric perfusion maps over the whole image (runs in the background)"""
+        # Use preprocessed data if available, otherwise raw (same as TICs)
+        data_stack = self.ceus_preprocessed if self.ceus_preprocessed is not None else self.ceus_stack
+        if data_stack is None:
+            QMessageBox.warning(self, "Warning", "No image data available")
+            return
+        if not self.fps or self.fps <= 0:
+            QMessageBox.warning(self, "Warning", "Unknown frame rate")
+            return
+
+        block = int(self.spin_map_block.value())
+        t_max, bounds = self._washin_fit_settings()
+        self._run_task(
+            'maps',
+            self._perfusion_maps_worker,
+            data_stack,
+            float(self.fps),
+            t_max,
+            block,
+            bounds,
+            busy_text="Computing parametric maps...",
+            on_result=lambda maps: self._apply_perfusion_maps(maps, block),
+            error_title="Parametric maps failed",
+        )
 
-            self.status_label.setText(f"✅ Computed TICs for {len(self.roi_manager.rois)} ROI(s)")
-            # Met à jour le tableau des métriques (RAW uniquement tant qu'il n'y a pas de fit)
+    def _perfusion_maps_worker(self, ctx, data_stack: np.ndarray, fps: float, t_max: Optional[float],
+                               block: int, bounds) -> dict:
+        """Worker thread: batched wash-in fit and metrics per block"""
+        ctx.report(0.0, "Computing parametric maps...")
+        return compute_parametric_maps(
+            data_stack, fps, t_max=t_max, block=block, bounds=bounds, progress=ctx.report
+        )
+
+    def _apply_perfusion_maps(self, maps: dict, block: int):
+        """Main thread: show the maps as image layers of the CEUS viewer"""
+        self._remove_parametric_maps()
+        # Map pixel (i, j) is the mean of the block starting at (i*block, j*block)
+        scale = (float(block), float(block))
+        translate = (0.5 * (block - 1), 0.5 * (block - 1))
+        for i, (key, title, cmap) in enumerate(self._PARAMETRIC_MAP_LAYERS):
+            data = maps.get(key)
+            if data is None:
+                continue
+            finite = data[np.isfinite(data)]
+            lo, hi = (np.percentile(finite, (1, 99)) if finite.size else (0.0, 1.0))
+            if not hi > lo:
+                hi = lo + 1.0
             try:
-                self._refresh_metrics_table()
-            except Exception:
-                pass
-            
+                self.ceus_viewer.add_image(
+                    data,
+                    name=f"Map: {title}",
+                    colormap=cmap,
+                    contrast_limits=(float(lo), float(hi)),
+                    scale=scale,
+                    translate=translate,
+                    opacity=0.8,
+                    blending='translucent',
+                    visible=(i == 0),
+                )
+            except Exception as e:
+                logger.warning("Unable to add map layer %s: %s", title, e)
+        self._ensure_shapes_on_top()
+        h, w = maps['A'].shape if 'A' in maps else (0, 0)
+        self.status_label.setText(f"✅ Parametric maps: {w}×{h} blocks of {block} px (toggle layers in the CEUS viewer)")
+
+    @pyqtSlot()
+    @perf.traced('ui.compute_grid_tics')
+    def compute_grid_tics(self):
+        """TICs of every block / superpixel cell, fitted and summarized (runs in the background)"""
+        data_stack = self.ceus_preprocessed if self.ceus_preprocessed is not None else self.ceus_stack
+        if data_stack is None:
+            QMessageBox.warning(self, "Warning", "No image data available")
+            return
+        size = int(self.spin_grid_size.value())
+        # Superpixels follow the anatomy of the B-mode frame (same geometry as CEUS)
+        bmode = None
+        if self.chk_grid_superpixels.isChecked():
+            stack = self.bmode_stack
+            if stack is not None and tuple(stack.shape[1:3]) == tuple(data_stack.shape[1:3]):
+                bmode = stack
+            else:
+                self.status_label.setText("B-mode unavailable or of a different size: using square blocks")
+        t_max, bounds = self._washin_fit_settings()
+        self._run_task(
+            'grid',
+            self._compute_grid_tics_worker,
+            data_stack,
+            bmode,
+            size,
+            float(self.fps),
+            t_max,
+            bounds,
+            busy_text="Computing grid TICs...",
+            on_result=self._apply_grid_tics,
+            error_title="Grid TIC computation failed",
+        )
+
+    def _compute_grid_tics_worker(self, ctx, data_stack: np.ndarray, bmode: Optional[np.ndarray], size: int,
+                                  fps: float, t_max: Optional[float], bounds) -> Optional[dict]:
+        """Worker thread: grid TICs in the compute_all_tics format plus a fit summary per cell"""
+        ctx.report(0.0, "Computing grid TICs...")
+        if data_stack.ndim not in (3, 4):
+            return None
+        if bmode is not None:
+            # Temporal mean of a few frames: less speckle than a single frame
+            step = max(1, len(bmode) // 16)
+            frame = bmode[::step].mean(axis=0)
+            labels = superpixel_labels(frame, size)
+            series = extract_label_tics(data_stack, labels, progress=ctx.report)
+        else:
+            series, labels = extract_block_tics(data_stack, size, progress=ctx.report)
+        if series.shape[0] == 0:
+            return None
+
+        T = data_stack.shape[0]
+        time = np.arange(T, dtype=np.float32) / fps
+        dvi = series - series[:, :1]
+        valid = np.isfinite(dvi).all(axis=1)
+
+        # Wash-in fit and metrics of every cell on the fit window
+        n_fit = int(np.count_nonzero(time <= t_max)) if t_max else T
+        summary = summarize_curves(time[:max(n_fit, 1)].astype(np.float64),
+                                   np.nan_to_num(dvi[:, :max(n_fit, 1)]), bounds, 48, 16)
+
+        tics, names = {}, []
+        for k in np.flatnonzero(valid):
+            label = f"Grid_{k + 1:03d}"
+            names.append(label)
+            tics[label] = {
+                'time': time,
+                'dvi': dvi[k],
+                'valid_mask': np.ones(T, dtype=bool),
+                'color': ROI_COLORS[(len(names) - 1) % len(ROI_COLORS)],
+            }
+        return {
+            'tics': tics,
+            'names': names,
+            'cells': np.flatnonzero(valid),
+            'labels': labels,
+            'summary': summary,
+            'superpixels': bmode is not None,
+            'size': size,
+        }
+
+    def _apply_grid_tics(self, result: Optional[dict]):
+        """Main thread: plot grid TICs like ROI TICs and show the A·B heterogeneity map"""
+        if result is None:
+            self.status_label.setText("❌ No grid cell in the image")
+            return
+        self._auto_labels = set(result['names'])
+        self._apply_tics(result['tics'])
+
+        summary, cells = result['summary'], result['cells']
+        self.grid_summary = {
+            name: {key: float(values[k]) for key, values in summary.items()}
+            for name, k in zip(result['names'], cells)
+        }
+
+        # Cell values painted on the label image (NaN outside the grid)
+        axb = np.full(len(summary['AxB']) + 1, np.nan, dtype=np.float32)
+        axb[:-1] = summary['AxB']
+        painted = axb[result['labels']]          # label -1 picks the trailing NaN
+        self._remove_parametric_maps()
+        finite = axb[np.isfinite(axb)]
+        lo, hi = (np.percentile(finite, (1, 99)) if finite.size else (0.0, 1.0))
+        if not hi > lo:
+            hi = lo + 1.0
+        try:
+            self.ceus_viewer.add_image(
+                painted,
+                name="Map: Grid A·B",
+                colormap='turbo',
+                contrast_limits=(float(lo), float(hi)),
+                opacity=0.6,
+                blending='translucent',
+            )
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"TIC computation failed:\n{str(e)}")
-            self.status_label.setText(f"❌ TIC computation error: {str(e)}")
+            logger.warning("Unable to add grid map: %s", e)
+        self._ensure_shapes_on_top()
+
+        kind = "superpixels" if result['superpixels'] else f"{result['size']} px blocks"
+        vals = summary['AxB'][cells]
+        vals = vals[np.isfinite(vals)]
+        if vals.size:
+            med = float(np.median(vals))
+            cv = 100.0 * float(np.std(vals)) / abs(float(np.mean(vals))) if np.mean(vals) != 0 else float('nan')
+            self.status_label.setText(
+                f"✅ Grid TICs: {len(cells)} cells ({kind}) — A·B median {med:.3g}, CV {cv:.0f}%"
+            )
+        else:
+            self.status_label.setText(f"✅ Grid TICs: {len(cells)} cells ({kind})")
+
+    @pyqtSlot()
+    @perf.traced('ui.compute_cycle_tics')
+    def compute_cycle_tics(self):
+        """TICs of every ROI in every destruction-replenishment cycle (runs in the background)"""
+        if len(self.roi_manager.rois) == 0:
+            QMessageBox.warning(self, "Warning", "No ROIs defined")
+            return
+        # Cycles span the whole clip: preprocessed stacks are cropped to one washout window
+        data_stack = self.ceus_stack
+        if data_stack is None:
+            QMessageBox.warning(self, "Warning", "No image data available")
+            return
+        frame_shape = data_stack.shape[1:3]
+        rois = [(roi.label, roi.mask(frame_shape), roi.color) for roi in self.roi_manager.rois]
+        t_max, bounds = self._washin_fit_settings()
+        self._run_task(
+            'cycles',
+            self._compute_cycle_tics_worker,
+            data_stack,
+            self._raw_intensity_trace(),
+            rois,
+            float(self.fps),
+            t_max,
+            bounds,
+            busy_text="Computing cycle TICs...",
+            on_result=self._apply_cycle_tics,
+            error_title="Cycle TIC computation failed",
+        )
+
+    def _compute_cycle_tics_worker(self, ctx, data_stack: np.ndarray, intensities: Optional[np.ndarray],
+                                   rois: list, fps: float, t_max: Optional[float], bounds) -> dict:
+        """Worker thread: flashes, cycles, per-cycle TICs and a batched wash-in fit of all of them"""
+        ctx.report(0.0, "Detecting flashes...")
+        if intensities is None:
+            intensities = data_stack.reshape(len(data_stack), -1).mean(axis=1)
+        flashes = detect_flashes(intensities, exclude_first_n=5, search_window=20)
+        # Cycles shorter than the washout search window are too short to fit
+        cycles = segment_cycles(flashes, len(data_stack), min_frames=20)
+        out = {'flashes': flashes, 'cycles': cycles, 'tics': {}, 'names': [], 'owners': []}
+        if not cycles:
+            return out
+
+        # One pass over the clip, then cycles are slices of the ROI series
+        series = extract_tics_from_masks(
+            data_stack, {label: m for label, m, _ in rois}, progress=ctx.report
+        )
+        for label, _, color in rois:
+            vi = series[label]
+            for c, (start, stop) in enumerate(cycles, 1):
+                segment = vi[start:stop]
+                name = f"{label}_C{c}"
+                out['tics'][name] = {
+                    'time': np.arange(stop - start, dtype=np.float32) / fps,
+                    'dvi': segment - segment[0],
+                    'valid_mask': np.ones(stop - start, dtype=bool),
+                    'color': color,
+                }
+                out['names'].append(name)
+                out['owners'].append(label)
+
+        # Every (ROI, cycle) curve fitted at once on the common fit window
+        n = min(stop - start for start, stop in cycles)
+        time = np.arange(n, dtype=np.float64) / fps
+        if t_max:
+            n = max(1, int(np.count_nonzero(time <= t_max)))
+        Y = np.stack([out['tics'][name]['dvi'][:n] for name in out['names']])
+        out['summary'] = summarize_curves(time[:n], np.nan_to_num(Y.astype(np.float64)), bounds, 48, 16)
+        return out
+
+    def _apply_cycle_tics(self, result: dict):
+        """Main thread: plot per-cycle TICs and report replicate statistics per ROI"""
+        cycles = result['cycles']
+        if not cycles:
+            self.status_label.setText("No destruction-replenishment cycle found")
+            return
+        self._auto_labels = set(result['names'])
+        self._apply_tics(result['tics'])
+
+        summary = result['summary']
+        self.cycle_summary = {
+            name: {key: float(values[i]) for key, values in summary.items()}
+            for i, name in enumerate(result['names'])
+        }
+        # Cycles are replicate measurements: mean ± SD of A·B per ROI
+        parts = []
+        owners = np.asarray(result['owners'])
+        for label in dict.fromkeys(result['owners']):
+            vals = summary['AxB'][owners == label]
+            vals = vals[np.isfinite(vals)]
+            if vals.size:
+                sd = float(np.std(vals, ddof=1)) if vals.size > 1 else 0.0
+                parts.append(f"{label} A·B {float(np.mean(vals)):.3g} ± {sd:.2g}")
+        frames = ", ".join(str(f.frame) for f in result['flashes'])
+        self.status_label.setText(
+            f"✅ {len(cycles)} cycle(s), flashes at frames {frames} — " + "; ".join(parts)
+        )
+
+    def _remove_parametric_maps(self):
+        """Remove map layers from the CEUS viewer"""
+        try:
+            for layer in list(self.ceus_viewer.layers):
+                if layer.name.startswith('Map: '):
+                    self.ceus_viewer.layers.remove(layer)
+        except Exception:
+            pass
+
+    def _apply_tics(self, tics: Optional[dict]):
+        """Main thread: store and plot computed TICs"""
+        if tics is None:
+            QMessageBox.warning(self, "Warning", "Unable to prepare CEUS data for TIC computation")
+            self.status_label.setText("❌ Unable to prepare CEUS data for TIC computation")
+            return
+        
+        # Clear existing TIC data and plot
+        self.roi_tic_data.clear()
+        self._tic_colors = {}
+        self.metrics_engine.clear()
+        self.tic_plot.clear()
+        self.tic_plot.clear_smooth_overlays()
+        
+        # ROIs removed while the task was running are skipped (grid cells have no ROI)
+        current_labels = {roi.label for roi in self.roi_manager.rois} | self._auto_labels
+        for label, tic in tics.items():
+            if label not in current_labels:
+                continue
+            color = tic.pop('color', None)
+            # Store
+            self.roi_tic_data[label] = tic
+            self._tic_colors[label] = color
+            
+            # Add to plot
+            self.tic_plot.add_tic_curve(
+                label,
+                tic['time'],
+                tic['dvi'],
+                tic['valid_mask'],
+                color=self._rgb_to_pyqtgraph_color(color)
+            )
+            # Overlays will be computed after all curves are added
+            # based on current smoothing settings and valid_mask
+            
+        # After plotting all ROIs, set crosshair and overlays
+        try:
+            self.tic_plot.update_crosshair(self.current_frame)
+        except Exception:
+            pass
+        # Build/update smoothing overlays according to UI state
+        try:
+            self._recompute_overlays_all()
+        except Exception:
+            pass
+        # Interval selector disabled per user request
+
+        self.status_label.setText(f"✅ Computed TICs for {len(self.roi_tic_data)} ROI(s)")
+        self._update_memory_label()
+        # Met à jour le tableau des métriques (RAW uniquement tant qu'il n'y a pas de fit)
+        try:
+            self._refresh_metrics_table()
+        except Exception:
+            pass
     
     def _polygon_to_mask(self, poly_points: List[tuple], image_shape: tuple) -> np.ndarray:
-        """Convert polygon to binary mask"""
-        mask = np.zeros(image_shape, dtype=bool)
-        if poly_points is None or len(poly_points) == 0:
-            print("[DEBUG] _polygon_to_mask: poly_points is empty, returning empty mask.")
-            return mask
-        # Extract x, y coordinates
-        xs = [pt[0] for pt in poly_points]
-        ys = [pt[1] for pt in poly_points]
-        # Log pour vérification
-        print(f"[DEBUG] ROI polygon points (x, y): {poly_points}")
-        print(f"[DEBUG] xs: {xs}")
-        print(f"[DEBUG] ys: {ys}")
-        print(f"[DEBUG] image_shape: {image_shape}")
-        # Use skimage polygon to fill
-        rr, cc = sk_polygon(ys, xs, shape=image_shape)
-        print(f"[DEBUG] mask indices rr: {rr}, cc: {cc}")
-        mask[rr, cc] = True
-        return mask
+        """Convert polygon to binary mask (prefer ROI.mask(), which is cached)"""
+        return rasterize_polygon(poly_points, image_shape).to_mask()
     
     def _rgb_to_pyqtgraph_color(self, rgb: tuple) -> str:
         """Convert RGB tuple to PyQtGraph color code"""
@@ -2191,83 +3367,11 @@ class NapariCEUSWindow(QWidget):
     # Model Fitting
     # =========================================================================
     def _metrics_from_curve(self, t: np.ndarray, y: np.ndarray) -> dict:
-        """Compute basic perfusion metrics on a curve: AUC, MTT, Peak, TTP, Slope 10–90%."""
-        try:
-            t = np.asarray(t, float)
-            y = np.asarray(y, float)
-        except Exception:
-            return {'AUC': float('nan'), 'MTT': float('nan'), 'Peak': float('nan'), 'TTP': float('nan'), 'Slope_10_90': float('nan')}
-        if t.size == 0 or y.size == 0:
-            return {'AUC': float('nan'), 'MTT': float('nan'), 'Peak': float('nan'), 'TTP': float('nan'), 'Slope_10_90': float('nan')}
-
-        # AUC with non-negative clamp
-        y_pos = np.clip(y, 0, None)
-        try:
-            auc = float(np.trapz(y_pos, t))
-        except Exception:
-            auc = float('nan')
-        # MTT = first moment / area
-        try:
-            mtt = float(np.trapz(t * y_pos, t) / auc) if np.isfinite(auc) and auc > 0 else float('nan')
-        except Exception:
-            mtt = float('nan')
-        # Peak and TTP
-        try:
-            i_max = int(np.argmax(y)) if y.size else -1
-            peak = float(y[i_max]) if i_max >= 0 else float('nan')
-            ttp = float(t[i_max]) if i_max >= 0 else float('nan')
-        except Exception:
-            peak, ttp = float('nan'), float('nan')
-        # Slope between 10% and 90% of peak
-        try:
-            if np.isfinite(peak) and peak > 0:
-                y10, y90 = 0.1 * peak, 0.9 * peak
-                idx = np.where((y >= y10) & (y <= y90))[0]
-                if idx.size >= 2:
-                    coef = np.polyfit(t[idx], y[idx], 1)
-                    slope = float(coef[0])
-                else:
-                    slope = float('nan')
-            else:
-                slope = float('nan')
-        except Exception:
-            slope = float('nan')
-        # MaxDiff = max absolute derivative
-        try:
-            if t.size >= 2:
-                dt = np.diff(t)
-                dy = np.diff(y)
-                # Avoid division by zero
-                dt = np.where(dt == 0, 1e-9, dt)
-                maxdiff = float(np.nanmax(np.abs(dy / dt)))
-            else:
-                maxdiff = float('nan')
-        except Exception:
-            maxdiff = float('nan')
-        return {'AUC': auc, 'MTT': mtt, 'Peak': peak, 'TTP': ttp, 'Slope_10_90': slope, 'MaxDiff': maxdiff}
-
-    def _export_metrics_csv(self):
-        """Export results to a ZIP archive with three CSVs: augmented, predicted, parameters.
-        Mirrors the R app export structure as closely as possible.
-        """
-        if not self.roi_tic_data:
-            QMessageBox.information(self, "Export", "No ROI TIC data to export.")
-            return
-        # Choose output path
-        try:
-            default_name = "CEUS-Export.zip"
-            save_path, sel = QFileDialog.getSaveFileName(self, "Export CEUS Results", default_name, "ZIP Files (*.zip);;All Files (*)")
-        except Exception:
-            save_path = None
-        if not save_path:
-            return
-        if not save_path.lower().endswith('.zip'):
-            save_path = save_path + '.zip'
+        """Compute basic perfusion metrics on a curve: AUC, MTT, Peak, TTP, Slope 10–90%, MaxDiff."""
+        return perfusion_metrics(t, y)
 
-        import os
-        import tempfile
-        import zipfile
-        import numpy as np
+    def _export_tables(self):
+        """Build the signals / predicted / parameters tables of all ROIs (None if nothing to export)."""
         try:
             from src.analysis.models import washin_func
         except Exception:
@@ -2276,9 +3380,14 @@ class NapariCEUSWindow(QWidget):
         span = float(self.spin_fit_smooth_window.value()) if hasattr(self, 'spin_fit_smooth_window') else 0.8
         span = min(1.0, max(0.1, span))
 
-        augmented_rows = []
-        predicted_rows = []
-        params_rows = []
+        # Per-ROI arrays (included points); rows are built column-wise by build_export_tables
+        export_labels = []
+        raw_curves = ([], [])      # (t_inc, y_inc)
+        filt_curves = ([], [])     # (t_inc, y_loess)
+        pred_inc = []              # washin prediction at t_inc (None when not fitted)
+        pred_curves = ([], [])     # (t_grid, y_grid) for fitted ROIs only
+        pred_index = {}            # label -> index in pred_curves
+        fit_params = []            # (A, B, AB, r2) per exported ROI
 
         for label, tic in self.roi_tic_data.items():
             try:
@@ -2305,9 +3414,6 @@ class NapariCEUSWindow(QWidget):
             y_pred_inc = None
             A = B = AB = np.nan
             r2 = np.nan
-            auc_pred = np.nan
-            mean_pred = np.nan
-            maxdiff_pred = np.nan
             try:
                 wres = (self.fit_results or {}).get(label, {}).get('washin') if hasattr(self, 'fit_results') else None
             except Exception:
@@ -2317,7 +3423,7 @@ class NapariCEUSWindow(QWidget):
                     p = np.asarray(wres['params'], float).ravel()
                     if p.size >= 2:
                         A = float(p[0]); B = float(p[1]); AB = float(A * B)
-                    y_pred_inc = washin_func(t_inc, *p)
+                    y_pred_inc = np.asarray(washin_func(t_inc, *p), float)
                     # R2 on included window
                     if y_inc.size > 1:
                         ss_res = float(np.sum((y_inc - y_pred_inc) ** 2))
@@ -2326,117 +3432,127 @@ class NapariCEUSWindow(QWidget):
                     # Predicted curve on 0..8s grid (like R)
                     t_grid = np.arange(0.0, 8.0 + 1e-12, 0.1)
                     y_grid = washin_func(t_grid, *p)
-                    for ti, yi in zip(t_grid, y_grid):
-                        predicted_rows.append({
-                            'ROI': label,
-                            'Time': float(ti),
-                            'dVI_predict': float(yi),
-                        })
-                    # AUC/mean/MaxDiff on predicted grid
-                    try:
-                        auc_pred = float(np.trapz(y_grid, t_grid))
-                    except Exception:
-                        auc_pred = float('nan')
-                    mean_pred = float(np.nanmean(y_grid)) if y_grid.size else float('nan')
-                    try:
-                        if t_grid.size >= 2:
-                            dtg = np.diff(t_grid); dyg = np.diff(y_grid)
-                            dtg = np.where(dtg == 0, 1e-9, dtg)
-                            maxdiff_pred = float(np.nanmax(np.abs(dyg / dtg)))
-                        else:
-                            maxdiff_pred = float('nan')
-                    except Exception:
-                        maxdiff_pred = float('nan')
+                    pred_index[label] = len(pred_curves[0])
+                    pred_curves[0].append(t_grid)
+                    pred_curves[1].append(y_grid)
                 except Exception:
                     y_pred_inc = None
 
-            # Augmented rows (included points)
-            for i in range(t_inc.size):
-                row = {
-                    'ROI': label,
-                    'Time': float(t_inc[i]),
-                    'dVI': float(y_inc[i]),
-                    'dVI_filt': float(y_loess[i])
-                }
-                if y_pred_inc is not None and i < len(y_pred_inc):
-                    row['dVI_predict'] = float(y_pred_inc[i])
-                augmented_rows.append(row)
+            export_labels.append(label)
+            raw_curves[0].append(t_inc); raw_curves[1].append(y_inc)
+            filt_curves[0].append(t_inc); filt_curves[1].append(y_loess)
+            pred_inc.append(y_pred_inc)
+            fit_params.append((A, B, AB, r2))
 
-            # Parameters/metrics (tidy style)
-            # Peak by magnitude (R's peak_value)
-            try:
-                max_pos = float(np.nanmax(y_inc))
-                min_neg = float(np.nanmin(y_inc))
-                peak_raw = max_pos if abs(max_pos) >= abs(min_neg) else min_neg
-            except Exception:
-                peak_raw = float('nan')
-            try:
-                max_pos_f = float(np.nanmax(y_loess))
-                min_neg_f = float(np.nanmin(y_loess))
-                peak_filt = max_pos_f if abs(max_pos_f) >= abs(min_neg_f) else min_neg_f
-            except Exception:
-                peak_filt = float('nan')
-            # AUC/means for filtered
-            try:
-                auc_filt = float(np.trapz(y_loess, t_inc))
-            except Exception:
-                auc_filt = float('nan')
-            mean_raw = float(np.nanmean(y_inc)) if y_inc.size else float('nan')
-            mean_filt = float(np.nanmean(y_loess)) if y_loess.size else float('nan')
-            # MaxDiff for filtered (abs slope)
-            try:
-                if t_inc.size >= 2:
-                    dt = np.diff(t_inc); dy = np.diff(y_loess)
-                    dt = np.where(dt == 0, 1e-9, dt)
-                    maxdiff_filt = float(np.nanmax(np.abs(dy / dt)))
-                else:
-                    maxdiff_filt = float('nan')
-            except Exception:
-                maxdiff_filt = float('nan')
-
-            # Build tidy rows
-            def add_param(name: str, value: float):
-                params_rows.append({'ROI': label, 'parameter': name, 'value': float(value) if np.isfinite(value) else np.nan})
-
-            add_param('A', A)
-            add_param('B', B)
-            add_param('AB', AB)
-            add_param('R-squared', r2)
-            add_param('AUC dVI_filt', auc_filt)
-            add_param('AUC dVI_predict', auc_pred)
-            add_param('Peak dVI', peak_raw)
-            add_param('Peak dVI_filt', peak_filt)
-            add_param('Mean dVI', mean_raw)
-            add_param('Mean dVI_filt', mean_filt)
-            add_param('Mean dVI_predict', mean_pred)
-            add_param('MaxDiff dVI_filt', maxdiff_filt)
-            add_param('MaxDiff dVI_predict', maxdiff_pred)
-
-        # Write CSVs into a temp directory, then zip
-        try:
-            with tempfile.TemporaryDirectory() as tmp:
-                aug_path = os.path.join(tmp, 'signals.csv')
-                pred_path = os.path.join(tmp, 'predicted.csv')
-                par_path = os.path.join(tmp, 'parameters.csv')
-                # DataFrames
-                if augmented_rows:
-                    pd.DataFrame(augmented_rows).to_csv(aug_path, index=False)
-                if predicted_rows:
-                    pd.DataFrame(predicted_rows).to_csv(pred_path, index=False)
-                if params_rows:
-                    pd.DataFrame(params_rows).to_csv(par_path, index=False)
-                # Create ZIP
-                with zipfile.ZipFile(save_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
-                    if os.path.exists(aug_path):
-                        zf.write(aug_path, arcname=os.path.basename(aug_path))
-                    if os.path.exists(pred_path):
-                        zf.write(pred_path, arcname=os.path.basename(pred_path))
-                    if os.path.exists(par_path):
-                        zf.write(par_path, arcname=os.path.basename(par_path))
+        if not export_labels:
+            return None
+
+        # Parameters/metrics (tidy style): one batched call per curve family
+        raw_m = batch_perfusion_metrics(*pad_curves(*raw_curves), clip_negative=False)
+        filt_m = batch_perfusion_metrics(*pad_curves(*filt_curves), clip_negative=False)
+        pred_m = batch_perfusion_metrics(*pad_curves(*pred_curves), clip_negative=False)
+        # Predicted-curve metrics aligned on exported ROIs (NaN when not fitted)
+        rows = [i for i, label in enumerate(export_labels) if label in pred_index]
+        cols = [pred_index[export_labels[i]] for i in rows]
+
+        def pred_val(key: str) -> np.ndarray:
+            out = np.full(len(export_labels), np.nan)
+            out[rows] = pred_m[key][cols]
+            return out
+
+        fit = np.asarray(fit_params, dtype=np.float64)
+        # Peak by magnitude (R's peak_value); column order follows PARAMETER_NAMES
+        parameters = np.column_stack([
+            fit[:, 0], fit[:, 1], fit[:, 2], fit[:, 3],
+            filt_m['AUC'], pred_val('AUC'),
+            raw_m['PeakAbs'], filt_m['PeakAbs'],
+            raw_m['Mean'], filt_m['Mean'], pred_val('Mean'),
+            filt_m['MaxDiff'], pred_val('MaxDiff'),
+        ])
+        grids = {label: (pred_curves[0][j], pred_curves[1][j]) for label, j in pred_index.items()}
+        return build_export_tables(
+            export_labels, raw_curves[0], raw_curves[1], filt_curves[1],
+            predicted=pred_inc, grids=grids, parameters=parameters,
+        )
+
+    @pyqtSlot()
+    @perf.traced('ui.export_metrics_csv')
+    def _export_metrics_csv(self):
+        """Export results as three tables: signals (augmented), predicted, parameters.
+        Mirrors the R app export structure as closely as possible. Written as a ZIP of CSVs,
+        or as a folder of typed Parquet / Arrow IPC files when pyarrow is installed.
+        """
+        if not self.roi_tic_data:
+            QMessageBox.information(self, "Export", "No ROI TIC data to export.")
+            return
+        # Choose output path (and format through the filter)
+        filters = ["ZIP of CSVs (*.zip)"]
+        if columnar_available():
+            filters += ["Parquet folder (*.parquet)", "Arrow IPC folder (*.arrow)"]
+        try:
+            default_name = "CEUS-Export.zip"
+            save_path, sel = QFileDialog.getSaveFileName(self, "Export CEUS Results", default_name, ";;".join(filters))
+        except Exception:
+            save_path, sel = None, ''
+        if not save_path:
+            return
+        fmt = 'parquet' if 'parquet' in (sel or '') else 'arrow' if 'arrow' in (sel or '') else 'zip'
+        suffix = '.' + fmt
+        root, ext = os.path.splitext(save_path)
+        if ext.lower() != suffix:
+            save_path = (root if ext.lower() in ('.zip', '.parquet', '.arrow') else save_path) + suffix
+
+        try:
+            tables = self._export_tables()
+            if tables is None:
+                QMessageBox.information(self, "Export", "No included TIC points to export.")
+                return
+            if fmt == 'zip':
+                write_csv_bundle(save_path, tables)
+            else:
+                write_columnar(save_path, tables, fmt=fmt)
             QMessageBox.information(self, "Export", f"Exported results to:\n{save_path}")
         except Exception as e:
             QMessageBox.warning(self, "Export", f"Failed to export: {e}")
 
+    @pyqtSlot()
+    @perf.traced('ui.export_metrics_cohort')
+    def _export_metrics_cohort(self):
+        """Add this study to a cohort folder: catalogue entry + Parquet tables (one file per study and table)."""
+        if not self.roi_tic_data:
+            QMessageBox.information(self, "Export", "No ROI TIC data to export.")
+            return
+        try:
+            root = QFileDialog.getExistingDirectory(self, "Cohort Dataset Folder")
+        except Exception:
+            root = None
+        if not root:
+            return
+        source = str(getattr(self.dicom_loader, 'dicom_path', '') or '')
+        study = Path(source).stem if source else 'study'
+        try:
+            tables = self._export_tables()
+            if tables is None:
+                QMessageBox.information(self, "Export", "No included TIC points to export.")
+                return
+            done = []
+            if source and Path(source).is_file():
+                params = tables['parameters'].dropna(subset=['value'])
+                fitted = {}
+                for roi, name, value in zip(params['ROI'], params['parameter'], params['value']):
+                    fitted.setdefault(str(roi), {})[str(name)] = float(value)
+                with StudyCatalog(Path(root) / CATALOG_NAME) as catalog:
+                    catalog.record_results(source, fitted)
+                done.append(f"catalogue ({CATALOG_NAME})")
+            if columnar_available():
+                append_to_dataset(root, tables, study)
+                done.append("Parquet tables")
+            else:
+                done.append("no Parquet tables: pyarrow not installed")
+            QMessageBox.information(self, "Export", f"Added '{study}' to cohort:\n{root}\n" + "\n".join(done))
+        except Exception as e:
+            QMessageBox.warning(self, "Export", f"Failed to export: {e}")
+
     def _extract_metrics_for_label(self, label: str) -> dict:
         """Return metrics dict for a single ROI label: {'raw': {...}, 'fits': {model: {..., RSS}}}."""
         out = {'raw': {}, 'fits': {}}
@@ -2458,32 +3574,32 @@ class NapariCEUSWindow(QWidget):
             mask = mask & (t_all >= a) & (t_all <= b)
         t = t_all[mask]; y = y_all[mask]
         # Optional smoothing for metrics: LOESS on included points (match R's filtered metrics)
-        y_for_metrics = y
-        try:
-            if getattr(self, 'chk_metrics_smooth', None) is not None and self.chk_metrics_smooth.isChecked():
-                span = float(self.spin_fit_smooth_window.value()) if hasattr(self, 'spin_fit_smooth_window') else 0.8
-                span = min(1.0, max(0.1, span))
-                if len(t) >= 3:
-                    try:
-                        y_for_metrics = loess_smooth(t, y, span=span, degree=2)
-                        # Anchor to zero baseline for ΔVI metrics
-                        if y_for_metrics.size:
-                            y_for_metrics = np.maximum(y_for_metrics - y_for_metrics[0], 0.0)
-                    except Exception:
-                        pass
-        except Exception:
-            pass
-        out['raw'] = self._metrics_from_curve(t, y_for_metrics)
-        # Fits if present
+        self._configure_metrics_engine()
+        if region is None:
+            self.metrics_engine.update(self.roi_tic_data, labels=[label])
+            out['raw'] = dict(self.metrics_engine.get(label) or {})
+        else:
+            out['raw'] = self.metrics_engine.compute_curve(t, y)
+        # Fits if present (all models in one batched metrics call)
         res = self.fit_results.get(label, {})
+        fit_names, fit_t, fit_y, fit_rss = [], [], [], []
         for m, r in (res or {}).items():
             try:
-                yhat = np.asarray(r.get('y_fit', []))
-                md = self._metrics_from_curve(t, yhat)
-                md['RSS'] = float(r.get('rss', np.nan))
-                out['fits'][m] = md
+                yhat = np.asarray(r.get('y_fit', []), float)
+                t_fit = np.asarray(r.get('t', t), float)
+                n = min(t_fit.size, yhat.size)
+                fit_names.append(m)
+                fit_t.append(t_fit[:n])
+                fit_y.append(yhat[:n])
+                fit_rss.append(float(r.get('rss', np.nan)))
             except Exception:
                 pass
+        if fit_names:
+            cols = batch_perfusion_metrics(*pad_curves(fit_t, fit_y))
+            for i, m in enumerate(fit_names):
+                md = {k: float(cols[k][i]) for k in PERFUSION_METRIC_KEYS}
+                md['RSS'] = fit_rss[i]
+                out['fits'][m] = md
         return out
 
     def _display_metrics_table(self, flat: dict, roi_label: Optional[str] = None):
@@ -2498,6 +3614,8 @@ class NapariCEUSWindow(QWidget):
             tbl.setSortingEnabled(False)
         except Exception:
             pass
+        # Table no longer holds the per-ROI RAW cells
+        self._metrics_items = {}
         tbl.setRowCount(0)
         row = 0
         # Header row
@@ -2529,11 +3647,41 @@ class NapariCEUSWindow(QWidget):
         except Exception:
             pass
 
+    def _metrics_smoothing_settings(self):
+        """Return (smoother, key) for RAW metrics: LOESS anchored at zero when enabled, else (None, None)."""
+        try:
+            enabled = getattr(self, 'chk_metrics_smooth', None) is not None and self.chk_metrics_smooth.isChecked()
+        except Exception:
+            enabled = False
+        if not enabled:
+            return None, None
+        span = float(self.spin_fit_smooth_window.value()) if hasattr(self, 'spin_fit_smooth_window') else 0.8
+        span = min(1.0, max(0.1, span))
+
+        def _smoother(t: np.ndarray, y: np.ndarray) -> np.ndarray:
+            y_sm = loess_smooth(t, y, span=span, degree=2)
+            # Anchor to zero baseline for displayed RAW(LOESS) metrics
+            if y_sm.size:
+                y_sm = np.maximum(y_sm - y_sm[0], 0.0)
+            return y_sm
+
+        return _smoother, ('loess', round(span, 4))
+
+    def _configure_metrics_engine(self) -> bool:
+        """Push current smoothing settings to the metrics engine. Returns True if the cache was invalidated."""
+        smoother, key = self._metrics_smoothing_settings()
+        return self.metrics_engine.configure(smoother, key)
+
+    @staticmethod
+    def _format_metric_value(v) -> str:
+        return f"{v:.4f}" if isinstance(v, float) and np.isfinite(v) else "N/A"
+
     def _refresh_metrics_table(self):
         """Recalcule et affiche les métriques RAW pour toutes les ROIs.
         Ne montre pas les fits (ceci est réservé aux résultats d'un fit sur une sélection).
         Crée un flatten clair: ROI.<label>.<Metric>
         Si aucune ROI ou TICs absents, affiche un placeholder.
+        Les métriques viennent du MetricsEngine (seules les ROIs modifiées sont recalculées).
         """
         if not hasattr(self, 'metrics_table') or self.metrics_table is None:
             return
@@ -2543,17 +3691,21 @@ class NapariCEUSWindow(QWidget):
                 tbl.setSortingEnabled(False)
             except Exception:
                 pass
+            self._metrics_items = {}
             if len(self.roi_tic_data) == 0:
                 # Table placeholder
                 tbl.setRowCount(1)
-                from PyQt5.QtWidgets import QTableWidgetItem
                 tbl.setItem(0, 0, QTableWidgetItem("No TIC metrics yet"))
                 tbl.setItem(0, 1, QTableWidgetItem("Compute TICs"))
                 tbl.setItem(0, 2, QTableWidgetItem("—"))
                 return
+            self._configure_metrics_engine()
+            self.metrics_engine.update(self.roi_tic_data)
+            # Indicate smoothing if enabled
+            raw_tag = "RAW (LOESS)" if self.metrics_engine.config_key is not None else "RAW"
             tbl.setRowCount(0)
             row = 0
-            for label, tic in self.roi_tic_data.items():
+            for label in self.roi_tic_data.keys():
                 # ROI header
                 tbl.insertRow(row)
                 hdr = QTableWidgetItem(label)
@@ -2563,41 +3715,20 @@ class NapariCEUSWindow(QWidget):
                     pass
                 hdr.setFlags(Qt.ItemIsEnabled)
                 tbl.setItem(row, 0, hdr)
-                # Indicate smoothing if enabled
-                raw_tag = "RAW (LOESS)" if (getattr(self, 'chk_metrics_smooth', None) is not None and self.chk_metrics_smooth.isChecked()) else "RAW"
                 tbl.setItem(row, 1, QTableWidgetItem(raw_tag))
                 tbl.setItem(row, 2, QTableWidgetItem(""))
                 row += 1
-                try:
-                    t = np.asarray(tic.get('time', []))
-                    y = np.asarray(tic.get('dvi', []))
-                    mask = np.asarray(tic.get('valid_mask', np.ones_like(y, dtype=bool)))
-                    t_use = t[mask]; y_use = y[mask]
-                    # Apply LOESS for metrics if enabled (match R)
-                    try:
-                        if getattr(self, 'chk_metrics_smooth', None) is not None and self.chk_metrics_smooth.isChecked():
-                            span = float(self.spin_fit_smooth_window.value()) if hasattr(self, 'spin_fit_smooth_window') else 0.8
-                            span = min(1.0, max(0.1, span))
-                            if len(t_use) >= 3:
-                                try:
-                                    y_use = loess_smooth(t_use, y_use, span=span, degree=2)
-                                    # Anchor to zero baseline for displayed RAW(LOESS) metrics
-                                    if y_use.size:
-                                        y_use = np.maximum(y_use - y_use[0], 0.0)
-                                except Exception:
-                                    pass
-                    except Exception:
-                        pass
-                    md = self._metrics_from_curve(t_use, y_use)
-                    for k, v in md.items():
-                        tbl.insertRow(row)
-                        tbl.setItem(row, 0, QTableWidgetItem(label))
-                        tbl.setItem(row, 1, QTableWidgetItem(k))
-                        val_str = f"{v:.4f}" if isinstance(v, float) and np.isfinite(v) else "N/A"
-                        tbl.setItem(row, 2, QTableWidgetItem(val_str))
-                        row += 1
-                except Exception:
-                    pass
+                md = self.metrics_engine.get(label) or {}
+                cells = {}
+                for k, v in md.items():
+                    tbl.insertRow(row)
+                    tbl.setItem(row, 0, QTableWidgetItem(label))
+                    tbl.setItem(row, 1, QTableWidgetItem(k))
+                    value_item = QTableWidgetItem(self._format_metric_value(v))
+                    tbl.setItem(row, 2, value_item)
+                    cells[k] = value_item
+                    row += 1
+                self._metrics_items[label] = cells
             try:
                 tbl.setSortingEnabled(True)
                 tbl.resizeColumnsToContents()
@@ -2605,9 +3736,38 @@ class NapariCEUSWindow(QWidget):
                 pass
         except Exception:
             pass
-    
+
+    def _update_metrics_for_labels(self, labels: List[str]):
+        """Recompute metrics for the given ROIs only and patch their value cells in place.
+        Falls back to a full table rebuild when the table does not hold those ROIs
+        (e.g. after a fit result view) or when smoothing settings changed.
+        """
+        if not hasattr(self, 'metrics_table') or self.metrics_table is None:
+            return
+        labels = [lbl for lbl in labels if lbl in self.roi_tic_data]
+        if not labels:
+            return
+        self.metrics_engine.mark_dirty(labels)
+        invalidated = self._configure_metrics_engine()
+        if invalidated or any(lbl not in self._metrics_items for lbl in labels):
+            self._refresh_metrics_table()
+            return
+        changed = self.metrics_engine.update(self.roi_tic_data, labels=labels)
+        for label, md in changed.items():
+            cells = self._metrics_items.get(label, {})
+            for k, v in md.items():
+                item = cells.get(k)
+                if item is None:
+                    continue
+                text = self._format_metric_value(v)
+                if item.text() != text:
+                    item.setText(text)
+
+    @perf.traced('ui.on_fit_requested')
     def on_fit_requested(self, params: dict):
-        """Fit des modèles pour les ROI sélectionnées, en respectant valid_mask et l'intervalle optionnel."""
+        """Fit des modèles pour les ROI sélectionnées, en respectant valid_mask et l'intervalle optionnel.
+        Le fit tourne en arrière-plan; les courbes sont ajoutées à la fin sur le thread principal.
+        """
         if len(self.roi_tic_data) == 0:
             QMessageBox.warning(self, "Warning", "No TIC data available. Compute TICs first.")
             return
@@ -2636,19 +3796,16 @@ class NapariCEUSWindow(QWidget):
             except Exception:
                 t0_hint = None
 
-        # Interval selector disabled; use only global Tmax window
-        use_region = None
-        region = None
-
-        model_colors = {
-            "lognormal": "#e41a1c",
-            "gamma": "#377eb8",
-            "ldrw": "#4daf4a",
-            "fpt": "#984ea3",
-            "washin": "#000080",  # navy
-        }
+        # Interval selector disabled; use only global Tmax window [0, Tmax]
+        try:
+            tmax_global = float(params.get('t_max')) if params and 't_max' in params else (
+                float(self.spin_plot_tmax.value()) if getattr(self, 'spin_plot_tmax', None) is not None else None
+            )
+        except Exception:
+            tmax_global = None
 
-        any_fitted = False
+        # Snapshot the fitted points now: valid_mask may be toggled while the fit runs
+        curves = []
         for label in labels:
             tic = self.roi_tic_data.get(label)
             if not tic:
@@ -2660,31 +3817,39 @@ class NapariCEUSWindow(QWidget):
                 continue
 
             mask = mask_valid.copy()
-            # Region selection removed; do nothing here
-
-            # If no explicit region requested, apply global Tmax window [0, Tmax]
-            if (use_region is None) or (not use_region.isChecked()):
-                try:
-                    tmax_global = float(params.get('t_max')) if params and 't_max' in params else (
-                        float(self.spin_plot_tmax.value()) if getattr(self, 'spin_plot_tmax', None) is not None else None
-                    )
-                except Exception:
-                    tmax_global = None
-                if tmax_global is not None and tmax_global > 0:
-                    mask &= (t_all <= float(tmax_global))
+            if tmax_global is not None and tmax_global > 0:
+                mask &= (t_all <= float(tmax_global))
 
             t = t_all[mask]
             y = y_all[mask]
             if t.size < 5:
                 continue
+            curves.append((label, t, y))
+
+        self._run_task(
+            'fit',
+            self._fit_worker,
+            curves,
+            dict(params or {}),
+            t0_hint,
+            busy_text="Fitting models...",
+            on_result=lambda out: self._apply_fit_results(out, labels),
+            error_title="Fit failed",
+        )
 
+    def _fit_worker(self, ctx, curves: list, params: dict, t0_hint: Optional[float]) -> dict:
+        """Worker thread: fit every model on each (label, t, y) curve"""
+        fits = {}
+        failed = []
+        ctx.report(0.0, "Fitting models...")
+        for i, (label, t, y) in enumerate(curves):
             # Match R app: do NOT smooth before fitting; fit uses raw dVI (after exclusions/region)
-
             C_hint = float(np.percentile(y, 10))
             try:
                 # Core models
                 results = fit_models(t, y, models=("lognormal", "gamma", "ldrw", "fpt"),
                                      t0_hint=t0_hint, C_hint=C_hint, n_starts=60)
+                ctx.check_cancelled()
                 # Wash-in model using UI A/B starts and bounds
                 # Data-driven initial guesses for wash-in when possible
                 A_start, B_start = self._estimate_washin_initials(t, y, t0_hint)
@@ -2704,8 +3869,10 @@ class NapariCEUSWindow(QWidget):
                 from src.analysis.models import fit_washin_model
                 wres = fit_washin_model(t, y, A_start=A_start, B_start=B_start, bounds=bounds, t0_hint=t0_hint, C_hint=C_hint, n_starts=40)
                 results["washin"] = wres
+            except TaskCancelled:
+                raise
             except Exception as e:
-                self.status_label.setText(f"Fit failed for {label}: {e}")
+                failed.append((label, str(e)))
                 continue
 
             # Force all fitted model curves to start at zero (baseline anchored)
@@ -2721,7 +3888,27 @@ class NapariCEUSWindow(QWidget):
             except Exception:
                 pass
 
+            fits[label] = (t, results)
+            ctx.report((i + 1) / max(len(curves), 1), f"Fitting models ({i + 1}/{len(curves)})...")
+        return {'fits': fits, 'failed': failed}
+
+    def _apply_fit_results(self, out: dict, labels: List[str]):
+        """Main thread: store fits, draw fit curves and show metrics"""
+        model_colors = {
+            "lognormal": "#e41a1c",
+            "gamma": "#377eb8",
+            "ldrw": "#4daf4a",
+            "fpt": "#984ea3",
+            "washin": "#000080",  # navy
+        }
+
+        any_fitted = False
+        for label, (t, results) in out.get('fits', {}).items():
+            # ROI removed while fitting
+            if label not in self.roi_tic_data:
+                continue
             self.fit_results[label] = results
+            self.fit_times[label] = t
             any_fitted = True
 
             # Superposer les courbes de fit sur la plage t filtrée
@@ -2737,7 +3924,12 @@ class NapariCEUSWindow(QWidget):
                 pass
 
         # Summary status after processing all labels
-        self.status_label.setText("✅ Fit completed" if any_fitted else "ℹ️ Nothing to fit (empty selection or insufficient points)")
+        failed = out.get('failed', [])
+        if failed and not any_fitted:
+            label, err = failed[-1]
+            self.status_label.setText(f"Fit failed for {label}: {err}")
+        else:
+            self.status_label.setText("✅ Fit completed" if any_fitted else "ℹ️ Nothing to fit (empty selection or insufficient points)")
 
         # Display metrics for single selected ROI (raw + fits)
         try:
@@ -2786,6 +3978,7 @@ class NapariCEUSWindow(QWidget):
 
     # (Removed old modifier-based toggle handlers)
 
+    @perf.traced('ui.toggle_last_tic_point')
     def _toggle_last_tic_point(self):
         """Toggle valid_mask for the last clicked TIC point."""
         if self._last_tic_target is None:
@@ -2795,12 +3988,11 @@ class NapariCEUSWindow(QWidget):
         if not tic:
             return
         mask = tic.get('valid_mask')
-        print(f"[DEBUG] valid_mask before: {mask}")
         if mask is None or idx < 0 or idx >= len(mask):
-            print(f"[DEBUG] mask is None or idx out of bounds: idx={idx}, mask_len={len(mask) if mask is not None else 'N/A'}")
+            logger.debug("No valid_mask entry for %s point %d", label, idx)
             return
         mask[idx] = not bool(mask[idx])
-        print(f"[DEBUG] valid_mask after: {mask}")
+        logger.debug("%s point %d %s", label, idx, 'included' if mask[idx] else 'excluded')
         try:
             self.tic_plot.update_tic_curve(label, tic['time'], tic['dvi'], tic['valid_mask'])
             # Recompute smoothing overlay for this label according to UI state
@@ -2809,7 +4001,7 @@ class NapariCEUSWindow(QWidget):
             pass
         # Refresh metrics to reflect included/excluded points
         try:
-            self._refresh_metrics_table()
+            self._update_metrics_for_labels([label])
         except Exception:
             pass
 
@@ -2831,6 +4023,7 @@ class NapariCEUSWindow(QWidget):
             return
 
         idx = self.current_frame
+        toggled = []
         for label in labels:
             tic = self.roi_tic_data.get(label)
             if not tic:
@@ -2839,21 +4032,15 @@ class NapariCEUSWindow(QWidget):
             if mask is None or idx < 0 or idx >= len(mask):
                 continue
             mask[idx] = not bool(mask[idx])
+            toggled.append(label)
             try:
                 self.tic_plot.update_tic_curve(label, tic['time'], tic['dvi'], tic['valid_mask'])
                 self._recompute_overlay_for_label(label)
             except Exception:
                 pass
-        # Recompute metrics display after exclusions/inclusions changed
-        try:  # Initial metrics refresh (placeholder updated)
-            self._refresh_metrics_table()
-        except Exception:
-            pass
-
-        # Also refresh after toggling the last clicked TIC point (single-label case)
+        # Recompute metrics only for the ROIs whose exclusions/inclusions changed
         try:
-            if self._last_tic_target and self._last_tic_target[0]:
-                self._refresh_metrics_table()
+            self._update_metrics_for_labels(toggled)
         except Exception:
             pass
 
@@ -2977,16 +4164,48 @@ class NapariCEUSWindow(QWidget):
             return
         
         if not self.is_playing:
+            data = self.ceus_preprocessed if self.ceus_preprocessed is not None else self.ceus_stack
+            fps = self.fps if self.fps and self.fps > 0 else 10.0
             self.is_playing = True
             self.play_button.setText("⏸ Pause")
-            interval_ms = int(1000 / self.fps) if self.fps > 0 else 100
+            self._start_playback_engine(fps, len(data))
+            self._playback_stats_time = time.monotonic()
+            # Tick at twice the frame rate; the clock decides which frame is due
+            interval_ms = max(5, int(500 / fps))
             self.playback_timer.start(interval_ms)
-            self.status_label.setText(f"▶ Playing at {self.fps:.1f} FPS")
+            self.status_label.setText(f"▶ Playing at {fps:.1f} FPS")
         else:
             self.is_playing = False
             self.play_button.setText("▶ Play")
             self.playback_timer.stop()
-            self.status_label.setText("⏸ Paused")
+            self._stop_prefetcher()
+            clock = self._playback_clock
+            self._playback_clock = None
+            if clock is not None and clock.frames_dropped:
+                self.status_label.setText(f"⏸ Paused ({clock.frames_dropped} frames dropped)")
+            else:
+                self.status_label.setText("⏸ Paused")
+
+    def _start_playback_engine(self, fps: float, n_frames: int):
+        """(Re)create the playback clock and the frame prefetcher from the current frame."""
+        self._stop_prefetcher()
+        start = min(self.current_frame, max(0, n_frames - 1))
+        # Prefetch what the viewers will read: ~2 s ahead, bounded
+        depth = int(min(64, max(8, 2 * fps)))
+        self._prefetcher = FramePrefetcher(
+            [self._ceus_display_stack, self._bmode_display_stack], depth=depth
+        )
+        self._prefetcher.advance(start)
+        self._prefetcher.start()
+        self._playback_clock = PlaybackClock(fps, n_frames, start=start)
+
+    def _stop_prefetcher(self):
+        if self._prefetcher is not None:
+            try:
+                self._prefetcher.stop()
+            except Exception:
+                pass
+            self._prefetcher = None
     
     def _advance_frame(self):
         """Advance to next frame during playback"""
@@ -2994,9 +4213,23 @@ class NapariCEUSWindow(QWidget):
         if data is None:
             return
         
-        next_frame = self.current_frame + 1
-        if next_frame >= len(data):
-            next_frame = 0
+        clock = self._playback_clock
+        if clock is not None and clock.n_frames != len(data):
+            # Displayed stack changed during playback (e.g. motion correction)
+            self._start_playback_engine(clock.fps, len(data))
+            clock = self._playback_clock
+        if clock is None:
+            next_frame = self.current_frame + 1
+            if next_frame >= len(data):
+                next_frame = 0
+        else:
+            # Frame due now; None while it is not due yet or still being read
+            next_frame = clock.next_frame(self._prefetcher.is_ready if self._prefetcher is not None else None)
+            if self._prefetcher is not None:
+                self._prefetcher.advance(clock.target_frame())
+            self._update_playback_stats()
+            if next_frame is None or next_frame == self.current_frame or next_frame >= len(data):
+                return
         
         self.frame_slider.blockSignals(True)
         self.frame_slider.setValue(next_frame)
@@ -3006,10 +4239,26 @@ class NapariCEUSWindow(QWidget):
         self._sync_viewer_frames()
         self._update_frame_info()
     
+    def _update_playback_stats(self):
+        """Achieved vs target FPS in the status bar (about once per second)"""
+        clock = self._playback_clock
+        now = time.monotonic()
+        if clock is None or now - self._playback_stats_time < 1.0:
+            return
+        self._playback_stats_time = now
+        text = f"▶ Playing {clock.achieved_fps:.1f} / {clock.fps:.1f} FPS"
+        if clock.frames_dropped:
+            text += f" | {clock.frames_dropped} dropped"
+        self.status_label.setText(text)
+
+    @perf.traced('ui.on_frame_changed')
     def on_frame_changed(self, frame_idx: int):
         """Handle frame slider change"""
         if frame_idx != self.current_frame:
             self.current_frame = frame_idx
+            if self.is_playing and self._playback_clock is not None:
+                # User seek while playing: continue from the new position
+                self._start_playback_engine(self._playback_clock.fps, self._playback_clock.n_frames)
             self._sync_viewer_frames()
             self._update_frame_info()
             self.tic_plot.update_crosshair(frame_idx)
@@ -3067,6 +4316,8 @@ class NapariCEUSWindow(QWidget):
     # Reset
     # =========================================================================
     
+    @pyqtSlot()
+    @perf.traced('ui.reset_analysis')
     def reset_analysis(self):
         """Reset all analysis (keep DICOM loaded)"""
         if self.ceus_stack is None:
@@ -3080,6 +4331,10 @@ class NapariCEUSWindow(QWidget):
         )
         
         if reply == QMessageBox.Yes:
+            # Results of running analyses would refer to the discarded state
+            for name in ('processing', 'tics', 'fit', 'maps', 'grid', 'cycles'):
+                self.task_runner.cancel(name)
+            
             # Stop playback
             if self.is_playing:
                 self.toggle_playback()
@@ -3087,12 +4342,17 @@ class NapariCEUSWindow(QWidget):
             # Reset derived data
             self.flash_idx = None
             self.washout_idx = None
+            self._flash_streamed = False
             self.ceus_preprocessed = None
+            self.motion_shifts = None
+            self.motion_source = None
+            self.stacks.remove('ceus_preprocessed')
+            self.stacks.set_derived('bmode', 'stabilized', None)
             (
                 self._ceus_display_stack,
                 self._ceus_is_rgb,
                 self._ceus_channel_axis,
-            ) = self._prepare_display_stack(self.ceus_stack)
+            ) = self._store_display('ceus', self._prepare_display_stack(self.ceus_stack))
             self._current_ceus_layer_name = 'CEUS (raw)'
             # Restore raw B-mode display as well
             if self.bmode_stack is not None:
@@ -3101,29 +4361,9 @@ class NapariCEUSWindow(QWidget):
                         self._bmode_display_stack,
                         self._bmode_is_rgb,
                         self._bmode_channel_axis,
-                    ) = self._prepare_display_stack(self.bmode_stack)
+                    ) = self._store_display('bmode', self._prepare_display_stack(self.bmode_stack))
                     self._bmode_auto_clims = self._compute_bmode_limits(self._bmode_display_stack, q=(1, 99))
-                    for layer in list(self.bmode_viewer.layers):
-                        if layer.name != 'ROIs':
-                            self.bmode_viewer.layers.remove(layer)
-                    b_layer = self._add_image_layer(
-                        self.bmode_viewer,
-                        self._bmode_display_stack,
-                        name='B-mode',
-                        channel_axis=self._bmode_channel_axis,
-                        rgb=self._bmode_is_rgb,
-                        colormap='gray',
-                        blending='opaque'
-                    )
-                    try:
-                        if b_layer is not None and self._bmode_auto_clims is not None:
-                            lo, hi = self._bmode_auto_clims
-                            if lo is not None and hi is not None:
-                                b_layer.contrast_limits = (float(lo), float(hi))
-                        if b_layer is not None and hasattr(b_layer, 'gamma'):
-                            b_layer.gamma = float(self._bmode_gamma)
-                    except Exception:
-                        pass
+                    self._show_bmode_layer('B-mode')
                 except Exception:
                     pass
             
@@ -3131,19 +4371,7 @@ class NapariCEUSWindow(QWidget):
             self.clear_rois()
             
             # Restore raw CEUS view
-            for layer in list(self.ceus_viewer.layers):
-                if 'CEUS' in layer.name:
-                    self.ceus_viewer.layers.remove(layer)
-            if self._ceus_display_stack is not None:
-                self._add_image_layer(
-                    self.ceus_viewer,
-                    self._ceus_display_stack,
-                    name=self._current_ceus_layer_name,
-                    channel_axis=self._ceus_channel_axis,
-                    rgb=self._ceus_is_rgb,
-                    colormap='gray',
-                    blending='opaque'
-                )
+            self._show_ceus_layer(colormap='gray', blending='opaque')
 
             # Refresh overlay to raw
             self._update_overlay_layers()
@@ -3173,19 +4401,36 @@ class NapariCEUSWindow(QWidget):
         has_data = self.ceus_stack is not None
         has_flash = self.flash_idx is not None
         has_preprocessed = self.ceus_preprocessed is not None
+        # Cropping to the washout window needs every frame decoded
+        loading = bool(getattr(self, '_loading', False))
+        self._update_memory_label()
         
         self.btn_detect_flash.setEnabled(has_data)
         self.btn_set_flash_manual.setEnabled(has_data)
-        self.btn_motion_correction.setEnabled(has_data and has_flash)
-        self.btn_preprocess.setEnabled(has_data and has_flash)
+        self.btn_motion_correction.setEnabled(has_data and has_flash and not loading)
+        self.btn_preprocess.setEnabled(has_data and has_flash and not loading)
         self.btn_reset.setEnabled(has_data)
+        self.btn_save_session.setEnabled(has_data and not loading)
         self.play_button.setEnabled(has_data)
         self.frame_slider.setEnabled(has_data)
         self.btn_draw_roi.setEnabled(has_data)
         self.btn_clear_roi.setEnabled(len(self.roi_manager.rois) > 0)
+        self.btn_parametric_maps.setEnabled(has_data and not loading)
+        self.btn_grid_tics.setEnabled(has_data and not loading)
+        self.btn_cycle_tics.setEnabled(has_data and not loading)
     
     def closeEvent(self, event):
         """Handle window close"""
+        # Stop background tasks before tearing down the viewers
+        self.playback_timer.stop()
+        self._stop_prefetcher()
+        try:
+            self.task_runner.cancel_all()
+            self.task_runner.wait(2000)
+        except Exception:
+            pass
+        if self.perf_panel is not None:
+            self.perf_panel.close()
         # Close Napari viewers
         self.bmode_viewer.close()
         self.ceus_viewer.close()